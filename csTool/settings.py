@@ -137,3 +137,92 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Added by developer
 LOGIN_URL = "/login/"
+
+# Report result cache shared by users of the same database
+REPORT_CACHE_MAX_ENTRIES = 256
+REPORT_CACHE_TTL = 300
+
+# Asynchronous report jobs run by "python manage.py run_report_jobs"
+# Set REPORT_JOB_WORKER once the worker runs, so report previews queue their exact result
+REPORT_JOB_WORKER = False
+REPORT_JOB_CONCURRENCY = 2
+REPORT_JOB_MAX_ATTEMPTS = 3
+REPORT_JOB_RESULT_TTL = 3600
+REPORT_JOB_STALE_SECONDS = 1800
+
+# Rows fetched per fetchmany call when streaming report responses
+REPORT_STREAM_BATCH_SIZE = 500
+
+# Report exports encode in a process pool once they pass this many rows
+REPORT_EXPORT_PROCESSES = 2
+REPORT_EXPORT_POOL_MIN_ROWS = 10000
+
+# Multi-database reports run on this many threads, each database with its own timeout
+REPORT_FANOUT_WORKERS = 4
+REPORT_FANOUT_TIMEOUT = 60
+
+# Seconds a report statement may run, per engine and per database alias (0 for no limit)
+REPORT_STATEMENT_TIMEOUTS = {"mssql": 300, "postgresql": 300}
+REPORT_ALIAS_STATEMENT_TIMEOUTS = {}
+
+# Partitioned reports split their date range into at most this many slices, run on this many threads
+REPORT_PARTITION_WORKERS = 4
+REPORT_PARTITION_MAX_SLICES = 24
+
+# Date segments of additive reports kept for reuse when a later request overlaps them
+REPORT_SEGMENT_MAX_ENTRIES = 1024
+REPORT_SEGMENT_TTL = 300
+
+# Rows in a report page when the request sets no limit, and the largest limit accepted
+REPORT_PAGE_DEFAULT_LIMIT = 100
+REPORT_PAGE_MAX_LIMIT = 1000
+
+# Report runs slower than this many milliseconds are kept in the slow query log
+# for this many days. The log is written by a background thread with a bounded queue
+REPORT_SLOW_QUERY_THRESHOLD_MS = 2000
+REPORT_SLOW_QUERY_RETENTION_DAYS = 30
+REPORT_SLOW_QUERY_QUEUE_SIZE = 1000
+
+# Identical reports requested while one runs wait up to this many seconds for its result.
+# With REPORT_COALESCE_CROSS_PROCESS the wait also covers other worker processes through
+# a lock row in the default database, which keeps the result this many seconds
+REPORT_COALESCE_CROSS_PROCESS = False
+REPORT_COALESCE_WAIT_TIMEOUT = 300
+REPORT_COALESCE_POLL_INTERVAL = 0.25
+REPORT_COALESCE_RESULT_TTL = 30
+
+# Report warm-up from the report history, run daily at these "HH:MM" times inside each
+# worker (or with "python manage.py warm_report_cache"). The best sets of each database
+# over the history window are warmed, at most this many at a time per alias
+REPORT_WARMUP_TIMES = []
+REPORT_WARMUP_MAX_SETS = 10
+REPORT_WARMUP_HISTORY_DAYS = 30
+REPORT_WARMUP_HALF_LIFE_DAYS = 7
+REPORT_WARMUP_ALIAS_CONCURRENCY = 2
+REPORT_WARMUP_ALIAS_CONCURRENCIES = {}
+REPORT_WARMUP_TTL = 14400
+
+# Snapshots of report results kept with the report history, stored compressed as
+# "arrow" (pyarrow) or "msgpack" (msgpack and zstandard) files in this directory.
+# Results with more rows than REPORT_SNAPSHOT_MAX_ROWS are not kept
+REPORT_SNAPSHOT_DIR = BASE_DIR / "report_snapshots"
+REPORT_SNAPSHOT_FORMAT = "arrow"
+REPORT_SNAPSHOT_MAX_ROWS = 100000
+REPORT_SNAPSHOT_ZSTD_LEVEL = 3
+
+# Largest number of parameter sets accepted by one batch request, and of sets of one
+# report grouped into a single UNION ALL query
+REPORT_BATCH_MAX_ITEMS = 50
+REPORT_BATCH_MAX_GROUP_SIZE = 8
+
+# Aliases whose assignment history is held in memory as NumPy arrays (requires numpy)
+# to answer department hours for any date range. Each index is rebuilt when its source
+# tables change, checked every REPORT_COLUMNAR_REFRESH_INTERVAL seconds
+REPORT_COLUMNAR_ALIASES = []
+REPORT_COLUMNAR_REFRESH_INTERVAL = 300
+
+# Aliases answering the department active hours report from an in-memory interval index
+# of their assignments. The index is rebuilt when its source tables change, checked at
+# most every REPORT_INTERVAL_CHECK_INTERVAL seconds
+REPORT_INTERVAL_ALIASES = []
+REPORT_INTERVAL_CHECK_INTERVAL = 60
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, DatabaseConnection, RanReportParameter
+from django.db.models import Avg, Count, Max, Sum
+from .models import User, DatabaseConnection, RanReportParameter, RollupWatermark, CubeWatermark, ReportJob, SlowReportQuery, ReportSnapshot
 from django.contrib.auth.admin import UserAdmin
 
 class UserAdminCustom(UserAdmin):
@@ -18,4 +19,56 @@ class DatabaseConnectionsAdmin(admin.ModelAdmin):
 
 @admin.register(RanReportParameter)
 class RanReportParametersAdmin(admin.ModelAdmin):
-    list_display = ["user", "database_name", "report_type", "ran_on_date", "start_date", "end_date"]
\ No newline at end of file
+    list_display = ["user", "database_name", "report_type", "ran_on_date", "start_date", "end_date"]
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ["connection_key", "last_day", "refreshed_on"]
+
+@admin.register(CubeWatermark)
+class CubeWatermarkAdmin(admin.ModelAdmin):
+    list_display = ["connection_key", "last_month", "refreshed_on"]
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ["user", "database_alias", "report_id", "report_type", "status", "attempts", "created_on", "finished_on"]
+    list_filter = ["status", "database_alias"]
+
+@admin.register(ReportSnapshot)
+class ReportSnapshotAdmin(admin.ModelAdmin):
+    list_display = ["run", "database_alias", "report_id", "format", "row_count", "size_bytes", "created_on"]
+    list_filter = ["format", "database_alias"]
+
+@admin.register(SlowReportQuery)
+class SlowReportQueryAdmin(admin.ModelAdmin):
+    list_display = ["ran_on", "user", "database_alias", "report_id", "report_type", "row_count", "duration_ms"]
+    list_filter = ["database_alias", "report_id", "ran_on"]
+    search_fields = ["report_id", "database_alias", "user__username"]
+    date_hierarchy = "ran_on"
+    ordering = ["-ran_on"]
+    readonly_fields = [field.name for field in SlowReportQuery._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+
+        # Aggregates follow the filters of the change list
+        try:
+            queryset = response.context_data["cl"].queryset
+        except (AttributeError, KeyError):
+            return response
+
+        aggregates = {
+            "runs": Count("id"),
+            "avg_ms": Avg("duration_ms"),
+            "max_ms": Max("duration_ms"),
+            "total_rows": Sum("row_count"),
+        }
+        response.context_data["summary"] = queryset.aggregate(**aggregates)
+        response.context_data["summary_by_report"] = (
+            queryset.order_by().values("database_alias", "report_id").annotate(**aggregates).order_by("-max_ms")
+        )
+
+        return response
@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class CsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cs_app'
+
+    def ready(self):
+        # Register the report definitions and compile their statements once at startup
+        import cs_app.utils.report_definitions  # noqa: F401
+        from cs_app.utils.report_registry import compile_reports
+
+        compile_reports()
+
+        # Warm-ups scheduled with REPORT_WARMUP_TIMES start with the first request a process serves
+        from django.core.signals import request_started
+        from cs_app.utils.report_warmup import SCHEDULER_DISPATCH_UID, start_scheduler
+
+        request_started.connect(start_scheduler, dispatch_uid=SCHEDULER_DISPATCH_UID)
+
+        # Columnar indexes of REPORT_COLUMNAR_ALIASES are loaded and refreshed by the serving processes
+        from cs_app.utils.report_columnar import ENGINE_DISPATCH_UID, start_engine
+
+        request_started.connect(start_engine, dispatch_uid=ENGINE_DISPATCH_UID)
@@ -216,3 +216,47 @@ describe("test dropdown menu jquery eventlistener", () => {
         expect(dropButton.text()).toBe("Custom");
     });
 });
+
+describe("isAsyncReport function", () => {
+    let dom;
+
+    beforeEach(() => {
+        dom = new JSDOM(`
+        <!DOCTYPE html>
+        <html>
+          <body>
+            <input type="checkbox" id="run-in-background" />
+          </body>
+        </html>
+      `);
+        global.document = dom.window.document;
+        global.window = dom.window;
+        global.$ = require("jquery")(dom.window);
+    });
+
+    afterEach(() => {
+        dom.window.close();
+        jest.clearAllMocks();
+    });
+
+    test("should run reports directly by default", () => {
+        expect(genRepScript.isAsyncReport({ time_range: "All Time" })).toBe(false);
+        expect(genRepScript.isAsyncReport({ time_range: "Custom" })).toBe(false);
+    });
+
+    test("should queue reports the user runs in background", () => {
+        $("#run-in-background").prop("checked", true);
+
+        expect(genRepScript.isAsyncReport({ time_range: "YTD" })).toBe(true);
+    });
+});
+
+describe("newRequestId function", () => {
+    test("should create a different id for every report", () => {
+        const firstId = genRepScript.newRequestId();
+        const secondId = genRepScript.newRequestId();
+
+        expect(typeof firstId).toBe("string");
+        expect(firstId).not.toBe(secondId);
+    });
+});
@@ -0,0 +1,31 @@
+"""
+Management command to purge old entries of the slow report query log.
+
+Deletes SlowReportQuery rows older than the retention period. Run it on a schedule
+(for example nightly from cron):
+
+    python manage.py purge_slow_queries --days 30
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+import cs_app.utils.report_slowlog as report_slowlog
+
+
+class Command(BaseCommand):
+    help = "Deletes slow report query log entries older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Days entries are kept. Defaults to REPORT_SLOW_QUERY_RETENTION_DAYS.",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days must not be negative")
+
+        deleted = report_slowlog.purge_slow_queries(options["days"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} slow report query entries"))
@@ -0,0 +1,78 @@
+"""
+Management command to refresh the local department and shift cube.
+
+Loads the cube cells of complete months newer than the watermark of each alias
+into the default database. Run it on a schedule (for example monthly from cron):
+
+    python manage.py refresh_cube --alias data
+
+Databases added from the change database page only exist in the web process that
+added them. --saved also refreshes the databases of the saved connection history:
+
+    python manage.py refresh_cube --saved
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import cs_app.utils.report_cube as report_cube
+import cs_app.views.change_database_views as change_database
+
+
+class Command(BaseCommand):
+    help = "Incrementally loads month, department, group and shift counts into the local cube."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--alias",
+            action="append",
+            dest="aliases",
+            help="Database alias to refresh. May be repeated. Defaults to every configured alias except default.",
+        )
+        parser.add_argument(
+            "--through",
+            dest="through_month",
+            help="Last month to load as YYYY-MM. Defaults to last month.",
+        )
+        parser.add_argument(
+            "--saved",
+            action="store_true",
+            help="Also refresh the databases of the saved connection history.",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or [
+            alias for alias in settings.DATABASES if alias != "default"
+        ]
+
+        through_month = None
+        if options["through_month"]:
+            try:
+                through_month = report_cube.month_start(options["through_month"])
+            except ValueError:
+                raise CommandError("--through must be a month in YYYY-MM format")
+
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f"Database alias '{alias}' is not configured")
+
+            self.refresh(alias, through_month)
+
+        if options["saved"]:
+            for alias in change_database.register_saved_connections():
+                # A saved database may be unreachable without the credentials it was
+                # added with, which must not stop the other refreshes
+                try:
+                    self.refresh(alias, through_month)
+                except Exception as e:
+                    self.stderr.write(f"{alias}: {e}")
+
+    def refresh(self, alias, through_month):
+        loaded = report_cube.refresh_cube(alias, through_month)
+        watermark = report_cube.get_cube_watermark(alias)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{alias}: loaded {loaded} cube cells, watermark {report_cube.format_label(watermark)}"
+            )
+        )
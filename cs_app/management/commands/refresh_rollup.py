@@ -0,0 +1,80 @@
+"""
+Management command to refresh the local daily rollup of department hours.
+
+Loads department-by-day counts newer than the watermark of each alias into the
+default database. Run it on a schedule (for example nightly from cron):
+
+    python manage.py refresh_rollup --alias data
+
+Databases added from the change database page only exist in the web process that
+added them. --saved also refreshes the databases of the saved connection history:
+
+    python manage.py refresh_rollup --saved
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from datetime import date
+
+import cs_app.utils.report_rollup as rollup
+import cs_app.views.change_database_views as change_database
+
+
+class Command(BaseCommand):
+    help = "Incrementally loads department-by-day counts into the local rollup."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--alias",
+            action="append",
+            dest="aliases",
+            help="Database alias to refresh. May be repeated. Defaults to every configured alias except default.",
+        )
+        parser.add_argument(
+            "--through",
+            dest="through_day",
+            help="Last day to load as YYYY-MM-DD. Defaults to yesterday.",
+        )
+        parser.add_argument(
+            "--saved",
+            action="store_true",
+            help="Also refresh the databases of the saved connection history.",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or [
+            alias for alias in settings.DATABASES if alias != "default"
+        ]
+
+        through_day = None
+        if options["through_day"]:
+            try:
+                through_day = date.fromisoformat(options["through_day"])
+            except ValueError:
+                raise CommandError("--through must be a date in YYYY-MM-DD format")
+
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f"Database alias '{alias}' is not configured")
+
+            self.refresh(alias, through_day)
+
+        if options["saved"]:
+            for alias in change_database.register_saved_connections():
+                # A saved database may be unreachable without the credentials it was
+                # added with, which must not stop the other refreshes
+                try:
+                    self.refresh(alias, through_day)
+                except Exception as e:
+                    self.stderr.write(f"{alias}: {e}")
+
+    def refresh(self, alias, through_day):
+        loaded = rollup.refresh_rollup(alias, through_day)
+        watermark = rollup.get_rollup_watermark(alias)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{alias}: loaded {loaded} rollup rows, watermark {watermark}"
+            )
+        )
@@ -0,0 +1,86 @@
+"""
+Management command that runs queued asynchronous report jobs.
+
+Claims jobs from the ReportJob table of the default database and runs them on a
+thread pool limited to --concurrency jobs at a time. Expired job results are purged,
+jobs of crashed workers are requeued and the queries of jobs cancelled by their user
+are stopped while polling. The databases of the saved connection history are
+configured before new jobs start, so jobs on databases added at runtime by the web
+process find them:
+
+    python manage.py run_report_jobs --concurrency 2
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cs_app.utils.report_jobs as report_jobs
+import cs_app.views.change_database_views as change_database
+import time
+
+
+DEFAULT_CONCURRENCY = 2
+
+
+def run_job_in_thread(job_id):
+    """Runs a job and closes the database connections the worker thread opened."""
+
+    try:
+        return report_jobs.run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Runs queued asynchronous report jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=getattr(settings, "REPORT_JOB_CONCURRENCY", DEFAULT_CONCURRENCY),
+            help="Maximum number of jobs run at the same time.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls of the job table.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs currently queued and exit.",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                report_jobs.requeue_stale_jobs()
+                report_jobs.purge_expired_jobs()
+
+                for future in [future for future in running if future.done()]:
+                    running.pop(future)
+                    if future.exception():
+                        self.stderr.write(f"Report job crashed: {future.exception()}")
+
+                report_jobs.cancel_flagged_jobs(list(running.values()))
+
+                claimed = report_jobs.claim_jobs(concurrency - len(running))
+                if claimed:
+                    change_database.register_saved_connections()
+
+                for job_id in claimed:
+                    running[executor.submit(run_job_in_thread, job_id)] = job_id
+                    self.stdout.write(f"Started report job {job_id}")
+
+                if options["once"] and not running:
+                    break
+
+                time.sleep(options["poll_interval"])
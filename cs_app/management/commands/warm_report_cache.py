@@ -0,0 +1,83 @@
+"""
+Management command to warm report results from the report history.
+
+Mines RanReportParameter for the parameter sets run most often and most recently
+and computes their results, at most --concurrency at a time per database alias.
+Run it ahead of business hours (for example from cron):
+
+    python manage.py warm_report_cache --alias data --limit 10
+
+The report cache lives in each worker process, so the warmed results only reach
+the web workers with REPORT_COALESCE_CROSS_PROCESS, through the flight table of
+the default database. Without it the command still warms the remote database's
+own buffers, and REPORT_WARMUP_TIMES schedules the warm-up inside the workers.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import cs_app.utils.report_warmup as report_warmup
+
+
+class Command(BaseCommand):
+    help = "Precomputes the most frequent and most recent report parameter sets."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--alias",
+            action="append",
+            dest="aliases",
+            help="Database alias to warm. May be repeated. Defaults to every configured alias except default.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Parameter sets warmed per alias. Defaults to REPORT_WARMUP_MAX_SETS.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Reports run at the same time per alias. Defaults to REPORT_WARMUP_ALIAS_CONCURRENCY.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the parameter sets that would be warmed without running them.",
+        )
+
+    def handle(self, *args, **options):
+        for alias in options["aliases"] or []:
+            if alias not in settings.DATABASES:
+                raise CommandError(f"Database alias '{alias}' is not configured")
+
+        if not getattr(settings, "REPORT_COALESCE_CROSS_PROCESS", False):
+            self.stderr.write(
+                "REPORT_COALESCE_CROSS_PROCESS is off, so results are not shared with the web workers"
+            )
+
+        sets = report_warmup.mine_warmup_sets(options["aliases"], options["limit"])
+
+        if options["dry_run"]:
+            for warmup_set in sets:
+                self.stdout.write(
+                    f"{warmup_set.alias}: {warmup_set.time_range} {warmup_set.start_date} to "
+                    f"{warmup_set.end_date} (score {warmup_set.score:.2f})"
+                )
+            return
+
+        if options["concurrency"] is not None and options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        results = report_warmup.warm_sets(sets, concurrency=options["concurrency"])
+
+        for result in results:
+            line = (
+                f"{result['alias']}: {result['time_range']} {result['start_date']} to {result['end_date']}"
+            )
+
+            if result["error"]:
+                self.stderr.write(f"{line} failed: {result['error']}")
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(f"{line} warmed {result['rows']} rows in {result['seconds']}s")
+                )
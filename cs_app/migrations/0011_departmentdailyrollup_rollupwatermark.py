@@ -0,0 +1,39 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0010_ranreportparameter_database_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100, unique=True)),
+                ('last_day', models.DateField()),
+                ('refreshed_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DepartmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100)),
+                ('day', models.DateField()),
+                ('department_name', models.CharField(max_length=100)),
+                ('assignment_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['database_alias', 'day'], name='cs_app_depa_databas_7f0a7a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departmentdailyrollup',
+            constraint=models.UniqueConstraint(fields=('database_alias', 'day', 'department_name'), name='unique_department_daily_rollup'),
+        ),
+    ]
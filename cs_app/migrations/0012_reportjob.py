@@ -0,0 +1,39 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0011_departmentdailyrollup_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100)),
+                ('report_type', models.TextField()),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('result', models.TextField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('started_on', models.DateTimeField(blank=True, null=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('expires_on', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_on'], name='cs_app_repo_status_c1f9bf_idx')],
+            },
+        ),
+    ]
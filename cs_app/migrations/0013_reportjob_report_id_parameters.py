@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0012_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='report_id',
+            field=models.CharField(default='department_hours', max_length=100),
+        ),
+    ]
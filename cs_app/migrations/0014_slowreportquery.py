@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:09
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0013_reportjob_report_id_parameters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowReportQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100)),
+                ('report_id', models.CharField(max_length=100)),
+                ('report_type', models.TextField(blank=True, default='')),
+                ('parameters', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('row_count', models.IntegerField(default=0)),
+                ('duration_ms', models.FloatField()),
+                ('stage_timings', models.JSONField(blank=True, default=dict)),
+                ('ran_on', models.DateTimeField()),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slow_report_queries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ran_on'], name='cs_app_slow_ran_on_356ef9_idx'), models.Index(fields=['database_alias', 'report_id'], name='cs_app_slow_databas_be3ba9_idx')],
+            },
+        ),
+    ]
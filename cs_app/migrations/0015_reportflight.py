@@ -0,0 +1,28 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0014_slowreportquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFlight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('owner', models.CharField(max_length=200)),
+                ('done', models.BooleanField(default=False)),
+                ('result', models.BinaryField(blank=True, null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('expires_on', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_on'], name='cs_app_repo_expires_194aa7_idx')],
+            },
+        ),
+    ]
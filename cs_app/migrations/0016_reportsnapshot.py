@@ -0,0 +1,31 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:20
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0015_reportflight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100)),
+                ('report_id', models.CharField(max_length=100)),
+                ('parameters', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('columns', models.JSONField(blank=True, default=list)),
+                ('row_count', models.IntegerField(default=0)),
+                ('format', models.CharField(max_length=20)),
+                ('blob_name', models.CharField(db_index=True, max_length=100)),
+                ('size_bytes', models.IntegerField(default=0)),
+                ('created_on', models.DateTimeField()),
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='cs_app.ranreportparameter')),
+            ],
+        ),
+    ]
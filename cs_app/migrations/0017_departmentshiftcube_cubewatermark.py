@@ -0,0 +1,41 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0016_reportsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CubeWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100, unique=True)),
+                ('last_month', models.DateField()),
+                ('refreshed_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DepartmentShiftCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database_alias', models.CharField(max_length=100)),
+                ('month', models.DateField()),
+                ('department_name', models.CharField(max_length=100)),
+                ('group_name', models.CharField(max_length=100)),
+                ('shift_name', models.CharField(max_length=100)),
+                ('assignment_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['database_alias', 'month'], name='cs_app_depa_databas_ec594a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departmentshiftcube',
+            constraint=models.UniqueConstraint(fields=('database_alias', 'month', 'department_name', 'group_name', 'shift_name'), name='unique_department_shift_cube_cell'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+def clear_rollup(apps, schema_editor):
+    # Rows were keyed by alias name, which cannot be traced back to a server.
+    # The next refresh_rollup run reloads them under the connection identity
+    apps.get_model('cs_app', 'DepartmentDailyRollup').objects.all().delete()
+    apps.get_model('cs_app', 'RollupWatermark').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0017_departmentshiftcube_cubewatermark'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_rollup, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='departmentdailyrollup',
+            name='unique_department_daily_rollup',
+        ),
+        migrations.RemoveIndex(
+            model_name='departmentdailyrollup',
+            name='cs_app_depa_databas_7f0a7a_idx',
+        ),
+        migrations.RenameField(
+            model_name='departmentdailyrollup',
+            old_name='database_alias',
+            new_name='connection_key',
+        ),
+        migrations.RenameField(
+            model_name='rollupwatermark',
+            old_name='database_alias',
+            new_name='connection_key',
+        ),
+        migrations.AlterField(
+            model_name='departmentdailyrollup',
+            name='connection_key',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='rollupwatermark',
+            name='connection_key',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='departmentdailyrollup',
+            constraint=models.UniqueConstraint(fields=('connection_key', 'day', 'department_name'), name='unique_department_daily_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='departmentdailyrollup',
+            index=models.Index(fields=['connection_key', 'day'], name='cs_app_depa_connect_bb2471_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0018_rollup_connection_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='connection',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
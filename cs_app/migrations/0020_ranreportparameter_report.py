@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0019_reportjob_connection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ranreportparameter',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='ranreportparameter',
+            name='report_id',
+            field=models.CharField(default='department_hours', max_length=100),
+        ),
+    ]
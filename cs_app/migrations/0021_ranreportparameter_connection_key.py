@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0020_ranreportparameter_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ranreportparameter',
+            name='connection_key',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+def clear_cube(apps, schema_editor):
+    # Cells were keyed by alias name, which cannot be traced back to a server.
+    # The next refresh_cube run reloads them under the connection identity
+    apps.get_model('cs_app', 'DepartmentShiftCube').objects.all().delete()
+    apps.get_model('cs_app', 'CubeWatermark').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0021_ranreportparameter_connection_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_cube, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='departmentshiftcube',
+            name='unique_department_shift_cube_cell',
+        ),
+        migrations.RemoveIndex(
+            model_name='departmentshiftcube',
+            name='cs_app_depa_databas_ec594a_idx',
+        ),
+        migrations.RenameField(
+            model_name='departmentshiftcube',
+            old_name='database_alias',
+            new_name='connection_key',
+        ),
+        migrations.RenameField(
+            model_name='cubewatermark',
+            old_name='database_alias',
+            new_name='connection_key',
+        ),
+        migrations.AlterField(
+            model_name='departmentshiftcube',
+            name='connection_key',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='cubewatermark',
+            name='connection_key',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='departmentshiftcube',
+            constraint=models.UniqueConstraint(fields=('connection_key', 'month', 'department_name', 'group_name', 'shift_name'), name='unique_department_shift_cube_cell'),
+        ),
+        migrations.AddIndex(
+            model_name='departmentshiftcube',
+            index=models.Index(fields=['connection_key', 'month'], name='cs_app_depa_connect_5758f7_idx'),
+        ),
+    ]
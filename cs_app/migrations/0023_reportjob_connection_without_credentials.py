@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 15:20
+
+from django.db import migrations
+
+
+def strip_credentials(apps, schema_editor):
+    # Jobs used to keep the whole DATABASES entry of their alias, passwords included
+    ReportJob = apps.get_model('cs_app', 'ReportJob')
+
+    for job in ReportJob.objects.exclude(connection={}):
+        job.connection = {key: str(job.connection.get(key) or "") for key in ("ENGINE", "HOST", "PORT", "NAME")}
+        job.save(update_fields=["connection"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs_app', '0022_cube_connection_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_credentials, migrations.RunPython.noop),
+    ]
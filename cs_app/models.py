@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -28,3 +29,143 @@ class RanReportParameter(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     database_name = models.CharField(max_length=100, default="")
+    # connection_identity of the alias the report ran against
+    connection_key = models.CharField(max_length=255, default="", blank=True)
+    report_id = models.CharField(max_length=100, default="department_hours")
+    # Values of the report parameters other than the dates, like a comparison range
+    parameters = models.JSONField(default=dict, blank=True)
+
+
+class DepartmentDailyRollup(models.Model):
+    connection_key = models.CharField(max_length=255)
+    day = models.DateField()
+    department_name = models.CharField(max_length=100)
+    assignment_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["connection_key", "day", "department_name"],
+                name="unique_department_daily_rollup",
+            )
+        ]
+        indexes = [models.Index(fields=["connection_key", "day"])]
+
+
+class RollupWatermark(models.Model):
+    connection_key = models.CharField(max_length=255, unique=True)
+    last_day = models.DateField()
+    refreshed_on = models.DateTimeField(auto_now=True)
+
+
+class DepartmentShiftCube(models.Model):
+    connection_key = models.CharField(max_length=255)
+    month = models.DateField()
+    department_name = models.CharField(max_length=100)
+    group_name = models.CharField(max_length=100)
+    shift_name = models.CharField(max_length=100)
+    assignment_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["connection_key", "month", "department_name", "group_name", "shift_name"],
+                name="unique_department_shift_cube_cell",
+            )
+        ]
+        indexes = [models.Index(fields=["connection_key", "month"])]
+
+
+class CubeWatermark(models.Model):
+    connection_key = models.CharField(max_length=255, unique=True)
+    last_month = models.DateField()
+    refreshed_on = models.DateTimeField(auto_now=True)
+
+
+class ReportJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="report_jobs"
+    )
+    database_alias = models.CharField(max_length=100)
+    # Settings of the alias while the job is pending, for workers that lack aliases
+    # added at runtime. Cleared when the job finishes
+    connection = models.JSONField(default=dict, blank=True)
+    report_id = models.CharField(max_length=100, default="department_hours")
+    parameters = models.JSONField(default=dict, blank=True)
+    report_type = models.TextField()
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    cancel_requested = models.BooleanField(default=False)
+    result = models.TextField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(null=True, blank=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+    expires_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_on"])]
+
+
+class SlowReportQuery(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="slow_report_queries"
+    )
+    database_alias = models.CharField(max_length=100)
+    report_id = models.CharField(max_length=100)
+    report_type = models.TextField(blank=True, default="")
+    parameters = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    row_count = models.IntegerField(default=0)
+    duration_ms = models.FloatField()
+    stage_timings = models.JSONField(default=dict, blank=True)
+    ran_on = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ran_on"]),
+            models.Index(fields=["database_alias", "report_id"]),
+        ]
+
+
+class ReportFlight(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    owner = models.CharField(max_length=200)
+    done = models.BooleanField(default=False)
+    result = models.BinaryField(null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    expires_on = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["expires_on"])]
+
+
+class ReportSnapshot(models.Model):
+    run = models.OneToOneField(
+        RanReportParameter, on_delete=models.CASCADE, related_name="snapshot"
+    )
+    database_alias = models.CharField(max_length=100)
+    report_id = models.CharField(max_length=100)
+    parameters = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    columns = models.JSONField(default=list, blank=True)
+    row_count = models.IntegerField(default=0)
+    format = models.CharField(max_length=20)
+    blob_name = models.CharField(max_length=100, db_index=True)
+    size_bytes = models.IntegerField(default=0)
+    created_on = models.DateTimeField()
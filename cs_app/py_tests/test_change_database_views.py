@@ -2,7 +2,7 @@ import json
 
 from django.test import TestCase
 from django.urls import reverse
-from ..models import User
+from ..models import User, DatabaseConnection, DepartmentDailyRollup, RollupWatermark, DepartmentShiftCube, CubeWatermark
 from django.conf import settings
 
 from unittest.mock import patch, MagicMock
@@ -13,7 +13,12 @@ from cs_app.views import (
     remove_conn,
     validate_db_fields,
     construct_config,
+    register_saved_connections,
 )
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_queries import connection_identity
+
+from datetime import date
 
 
 class ChangeDatabaseViewTests(TestCase):
@@ -207,6 +212,7 @@ class RemoveConfigTests(TestCase):
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": "test_db.sqlite",
         }
+        self.addCleanup(settings.DATABASES.pop, self.alias, None)
 
     def test_remove_config_success(self):
         self.assertIn(self.alias, settings.DATABASES)
@@ -217,6 +223,72 @@ class RemoveConfigTests(TestCase):
         remove_config("nonexistent_db")
         self.assertIn(self.alias, settings.DATABASES)
 
+    def test_remove_config_invalidates_cached_reports(self):
+        key = make_cache_key(
+            self.alias, "department_hours", {"start_date": "2009-01-01", "end_date": "2009-12-31"}
+        )
+        report_cache.set(key, [])
+
+        remove_config(self.alias)
+
+        self.assertIsNone(report_cache.get(key))
+
+    def test_remove_config_keeps_rollup(self):
+        connection_key = connection_identity(self.alias)
+        RollupWatermark.objects.create(connection_key=connection_key, last_day=date(2009, 1, 31))
+        DepartmentDailyRollup.objects.create(
+            connection_key=connection_key, day=date(2009, 1, 10), department_name="Sales", assignment_count=2
+        )
+
+        remove_config(self.alias)
+
+        # Rollup rows are keyed by server and database, so other aliases of it still use them
+        self.assertTrue(RollupWatermark.objects.exists())
+        self.assertTrue(DepartmentDailyRollup.objects.exists())
+
+    def test_remove_config_keeps_cube(self):
+        connection_key = connection_identity(self.alias)
+        CubeWatermark.objects.create(connection_key=connection_key, last_month=date(2009, 1, 1))
+        DepartmentShiftCube.objects.create(
+            connection_key=connection_key,
+            month=date(2009, 1, 1),
+            department_name="Sales",
+            group_name="Sales and Marketing",
+            shift_name="Day",
+            assignment_count=2,
+        )
+
+        remove_config(self.alias)
+
+        self.assertTrue(CubeWatermark.objects.exists())
+        self.assertTrue(DepartmentShiftCube.objects.exists())
+
+
+class RegisterSavedConnectionsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.aliases = []
+        self.addCleanup(lambda: [settings.DATABASES.pop(alias, None) for alias in self.aliases])
+
+    def save_connection(self, name, host):
+        DatabaseConnection.objects.create(
+            user=self.user, engine="mssql", name=name, host=host, driver="ODBC Driver 17 for SQL Server", port=""
+        )
+
+    def test_saved_databases_are_configured_once(self):
+        self.save_connection("Archive", "server-a")
+        self.save_connection("Archive", "server-b")
+        self.save_connection("Archive", "server-a")
+
+        self.aliases = register_saved_connections()
+
+        self.assertEqual(len(self.aliases), 2)
+        self.assertEqual(
+            {settings.DATABASES[alias]["HOST"] for alias in self.aliases}, {"server-a", "server-b"}
+        )
+        self.assertEqual(settings.DATABASES[self.aliases[0]]["OPTIONS"]["trusted_connection"], "yes")
+
 
 class RemoveConnTests(TestCase):
 
@@ -226,6 +298,7 @@ class RemoveConnTests(TestCase):
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": "test_db.sqlite",
         }
+        self.addCleanup(settings.DATABASES.pop, self.alias, None)
 
     @patch("django.db.connections")
     def test_remove_conn_success(self, mock_connections):
@@ -237,6 +310,8 @@ class RemoveConnTests(TestCase):
 
 class GenerateUniqueAliasTests(TestCase):
     def setUp(self):
+        original_databases = settings.DATABASES
+        self.addCleanup(setattr, settings, "DATABASES", original_databases)
         settings.DATABASES = {
             "default": {
                 "ENGINE": "django.db.backends.sqlite3",
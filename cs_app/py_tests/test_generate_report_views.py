@@ -2,9 +2,15 @@ import json
 
 from django.test import TestCase
 from django.urls import reverse
-from ..models import User
+from ..models import User, RanReportParameter
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
 
 from cs_app.views import format_date
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_segments import segment_store
 
 
 class GenerateReportViewTests(TestCase):
@@ -59,6 +65,169 @@ class GenerateReportViewTests(TestCase):
         self.assertRedirects(response, f'/login/?next={reverse("generate_report")}')
 
 
+class LoadTableViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+        self.payload = {
+            "time_range": "Custom",
+            "start_date": "2009-01-01",
+            "end_date": "2009-12-31",
+        }
+        self.rows = [{"department_name": "Sales", "total_hours": 24.0}]
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_report(self, payload):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_load_table_returns_data(self, mock_query):
+        mock_query.return_value = self.rows
+
+        response = self.post_report(self.payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"data": self.rows})
+        self.assertTrue(RanReportParameter.objects.filter(user=self.user).exists())
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_load_table_reuses_cached_result(self, mock_query):
+        mock_query.return_value = self.rows
+
+        self.post_report(self.payload)
+        response = self.post_report(self.payload)
+
+        self.assertEqual(response.json(), {"data": self.rows})
+        mock_query.assert_called_once()
+        self.assertEqual(
+            mock_query.call_args[0][2],
+            {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)},
+        )
+        self.assertEqual(report_cache.stats()["hits"], 1)
+
+    @patch("cs_app.utils.report_functions.stream_statement")
+    def test_load_table_streams_ndjson(self, mock_stream):
+        mock_stream.return_value = iter([[("Sales", 24.0)], [("Engineering", 8.0)]])
+
+        response = self.post_report(dict(self.payload, stream="ndjson"))
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {"department_name": "Sales", "total_hours": 24.0},
+                {"department_name": "Engineering", "total_hours": 8.0},
+            ],
+        )
+
+    def test_load_table_invalid_stream_format(self):
+        response = self.post_report(dict(self.payload, stream="xml"))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_load_table_unknown_report(self):
+        response = self.post_report(dict(self.payload, report_id="missing"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unknown report"})
+
+    def test_load_table_internal_report_is_hidden(self):
+        response = self.post_report(dict(self.payload, report_id="department_daily_rollup"))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_load_table_invalid_date(self):
+        response = self.post_report(dict(self.payload, start_date="not a date"))
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_load_table_comparison_runs_one_query(self, mock_execute):
+        mock_execute.return_value.fetchall.return_value = [
+            ("Sales", Decimal("48.0"), Decimal("32.0"), Decimal("16.0"), Decimal("50.00")),
+            ("Shipping", Decimal("8.0"), Decimal("0"), Decimal("8.0"), None),
+        ]
+
+        response = self.post_report(
+            dict(
+                self.payload,
+                report_id="department_hours_comparison",
+                compare_start_date="2008-01-01",
+                compare_end_date="2008-12-31",
+            )
+        )
+
+        mock_execute.assert_called_once()
+        statement, params = mock_execute.call_args[0][1:]
+        self.assertEqual(statement.name, "department_hours_comparison_mssql")
+        self.assertEqual(
+            params,
+            [date(2009, 1, 1), date(2009, 12, 31), date(2008, 1, 1), date(2008, 12, 31)] * 2,
+        )
+        self.assertEqual(
+            response.json()["data"][0],
+            {
+                "department_name": "Sales",
+                "total_hours": "48.0",
+                "compare_hours": "32.0",
+                "hours_delta": "16.0",
+                "hours_delta_pct": "50.00",
+            },
+        )
+        self.assertIsNone(response.json()["data"][1]["hours_delta_pct"])
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_load_table_comparison_keeps_comparison_range_in_history(self, mock_execute):
+        mock_execute.return_value.fetchall.return_value = []
+
+        self.post_report(self.payload)
+        for compare_start_date in ("2008-01-01", "2007-01-01"):
+            self.post_report(
+                dict(
+                    self.payload,
+                    report_id="department_hours_comparison",
+                    compare_start_date=compare_start_date,
+                    compare_end_date="2008-12-31",
+                )
+            )
+
+        runs = RanReportParameter.objects.filter(user=self.user).order_by("pk")
+
+        self.assertEqual(
+            [(run.report_id, run.parameters) for run in runs],
+            [
+                ("department_hours", {}),
+                ("department_hours_comparison", {"compare_start_date": "2008-01-01", "compare_end_date": "2008-12-31"}),
+                ("department_hours_comparison", {"compare_start_date": "2007-01-01", "compare_end_date": "2008-12-31"}),
+            ],
+        )
+
+    def test_load_table_comparison_requires_comparison_range(self):
+        response = self.post_report(dict(self.payload, report_id="department_hours_comparison"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Parameter 'compare_start_date' is required"})
+
+    def test_load_table_invalid_method(self):
+        response = self.client.get(reverse("load_table"))
+
+        self.assertEqual(response.status_code, 400)
+
+
 class FormatDateTests(TestCase):
 
     def test_valid_date(self):
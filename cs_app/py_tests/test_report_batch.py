@@ -0,0 +1,178 @@
+import json
+
+from django.db import DatabaseError, connections
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User, RanReportParameter, ReportSnapshot
+
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from cs_app.utils.report_batch import BATCH_ITEM_COLUMN, split_batch_rows
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_queries import connection_identity
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter, get_report
+from cs_app.utils.report_segments import segment_store
+
+import cs_app.utils.report_functions as rf
+
+
+def year_values(year):
+    return {"start_date": date(year, 1, 1), "end_date": date(year, 12, 31)}
+
+
+def batch_cursor(rows):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows
+    return cursor
+
+
+class BatchStatementTests(TestCase):
+
+    def setUp(self):
+        self.definition = ReportDefinition(
+            report_id="batched",
+            title="Batched",
+            parameters=[ReportParameter("start_date"), ReportParameter("end_date")],
+            sql='SELECT "a" AS "name", COUNT(*) AS "total" FROM "t" WHERE "d" BETWEEN %s AND %s GROUP BY "a"',
+            columns=["name", "total"],
+        )
+        self.definition.compile()
+
+    def test_sets_are_joined_with_union_all(self):
+        statement = self.definition.batch_statement_for("mssql", 3)
+
+        self.assertEqual(statement.sql.count("UNION ALL"), 2)
+        self.assertEqual(statement.sql.count("%s"), 6)
+        self.assertIn(f"SELECT 2 AS [{BATCH_ITEM_COLUMN}], report_2.[name], report_2.[total]", statement.sql)
+
+    def test_groups_larger_than_the_limit_are_not_compiled(self):
+        with self.assertRaises(ValueError):
+            self.definition.batch_statement_for("postgresql", 9)
+
+    def test_rows_are_split_per_set(self):
+        rows = [(1, "b", 2), (0, "a", 1), (1, "c", 3)]
+
+        self.assertEqual(
+            split_batch_rows(self.definition, rows, 3),
+            [[{"name": "a", "total": 1}], [{"name": "b", "total": 2}, {"name": "c", "total": 3}], []],
+        )
+
+
+class GetReportBatchTests(TestCase):
+
+    def setUp(self):
+        report_cache.clear()
+        self.definition = get_report("department_hours")
+
+    def tearDown(self):
+        report_cache.clear()
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_pending_sets_run_in_one_query(self, mock_execute):
+        report_cache.set(make_cache_key("data", "department_hours", year_values(2008)), [{"cached": True}])
+        mock_execute.return_value = batch_cursor([(0, "Sales", 8), (1, "Sales", 16)])
+
+        results = rf.get_report_batch(
+            "data",
+            [
+                (self.definition, year_values(2008)),
+                (self.definition, year_values(2009)),
+                (self.definition, year_values(2010)),
+                (self.definition, year_values(2009)),
+            ],
+        )
+
+        mock_execute.assert_called_once()
+        statement, params = mock_execute.call_args[0][1:]
+        self.assertEqual(statement.name, "department_hours_mssql_batch_2")
+        self.assertEqual(params, [date(2009, 1, 1), date(2009, 12, 31), date(2010, 1, 1), date(2010, 12, 31)])
+        self.assertEqual([result["cached"] for result in results], [True, False, False, False])
+        self.assertEqual(results[1]["data"], results[3]["data"])
+        self.assertEqual(results[2]["data"], [{"department_name": "Sales", "total_hours": 16}])
+
+    @patch("cs_app.utils.report_functions.execute_statement", side_effect=DatabaseError("boom"))
+    def test_failing_group_fails_its_own_sets(self, mock_execute):
+        report_cache.set(make_cache_key("data", "department_hours", year_values(2008)), [])
+
+        results = rf.get_report_batch(
+            "data",
+            [(self.definition, year_values(2008)), (self.definition, year_values(2009))],
+            refresh=False,
+        )
+
+        self.assertEqual([result["status"] for result in results], ["ok", "error"])
+        self.assertEqual(results[1]["error"], "boom")
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_driver_errors_fail_their_own_sets(self, mock_execute):
+        # Like the raw pyodbc cursor of SQL Server, the cursor raises errors of the driver
+        mock_execute.return_value.fetchall.side_effect = connections["data"].Database.OperationalError("boom")
+
+        results = rf.get_report_batch(
+            "data",
+            [(self.definition, year_values(2008)), (self.definition, year_values(2009))],
+            refresh=False,
+        )
+
+        self.assertEqual([result["status"] for result in results], ["error", "error"])
+        self.assertEqual(results[0]["error"], "boom")
+
+
+class LoadBatchTableViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_batch(self, body):
+        return self.client.post(reverse("load_batch_table"), data=json.dumps(body), content_type="application/json")
+
+    @patch("cs_app.utils.report_snapshots.save_snapshot")
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_items_have_their_own_status(self, mock_execute, mock_snapshot):
+        mock_execute.return_value = batch_cursor([(0, "Sales", 8), (1, "Marketing", 16)])
+        RanReportParameter.objects.create(
+            user=self.user,
+            report_type="Custom",
+            ran_on_date=date(2024, 3, 15),
+            start_date=date(2009, 1, 1),
+            end_date=date(2009, 12, 31),
+            database_name="data",
+            connection_key=connection_identity("data"),
+        )
+
+        response = self.post_batch(
+            {
+                "refresh": True,
+                "items": [
+                    {"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31"},
+                    {"report_id": "missing"},
+                    {"time_range": "Custom", "start_date": "2010-01-01", "end_date": "2010-12-31"},
+                ],
+            }
+        )
+
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["ok", "error", "ok"])
+        self.assertEqual(results[1]["error"], "Unknown report")
+        self.assertEqual(results[2]["data"], [{"department_name": "Marketing", "total_hours": 16}])
+        self.assertEqual(RanReportParameter.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(mock_snapshot.call_count, 2)
+
+    def test_empty_and_oversized_batches_are_rejected(self):
+        self.assertEqual(self.post_batch({"items": []}).status_code, 400)
+
+        with self.settings(REPORT_BATCH_MAX_ITEMS=1):
+            response = self.post_batch({"items": [{}, {}]})
+
+        self.assertEqual(response.json()["error"], "Too many report parameter sets")
+        self.assertFalse(ReportSnapshot.objects.exists())
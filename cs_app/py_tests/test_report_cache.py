@@ -0,0 +1,65 @@
+from django.test import TestCase
+
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import ReportCache, make_cache_key
+
+
+class MakeCacheKeyTests(TestCase):
+
+    def test_key_is_normalized(self):
+        self.assertEqual(
+            make_cache_key("data", "department_hours", {"start_date": "2024-01-01 ", "end_date": ""}),
+            ("data", "department_hours", (("end_date", None), ("start_date", "2024-01-01"))),
+        )
+
+    def test_key_does_not_depend_on_user(self):
+        self.assertEqual(
+            make_cache_key("data", "department_hours", {"start_date": "2024-01-01", "end_date": "2024-02-01"}),
+            make_cache_key("data", "department_hours", {"start_date": "2024-01-01", "end_date": "2024-02-01"}),
+        )
+
+
+class ReportCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = ReportCache(max_entries=2, ttl_seconds=60)
+
+    def test_hit_and_miss_counters(self):
+        key = make_cache_key("data", "department_hours", {"start_date": "2024-01-01", "end_date": "2024-02-01"})
+
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, [{"department_name": "Sales", "total_hours": 8}])
+        self.assertEqual(self.cache.get(key), [{"department_name": "Sales", "total_hours": 8}])
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set(("data", "a"), 1)
+        self.cache.set(("data", "b"), 2)
+        self.cache.get(("data", "a"))
+        self.cache.set(("data", "c"), 3)
+
+        self.assertEqual(self.cache.get(("data", "a")), 1)
+        self.assertIsNone(self.cache.get(("data", "b")))
+        self.assertEqual(self.cache.get(("data", "c")), 3)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_expired_entry_is_a_miss(self):
+        with patch("cs_app.utils.report_cache.time.monotonic", return_value=1000):
+            self.cache.set(("data", "a"), 1)
+
+        with patch("cs_app.utils.report_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(self.cache.get(("data", "a")))
+
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_invalidate_alias(self):
+        self.cache.set(("data", "a"), 1)
+        self.cache.set(("other", "a"), 2)
+
+        self.assertEqual(self.cache.invalidate_alias("data"), 1)
+        self.assertIsNone(self.cache.get(("data", "a")))
+        self.assertEqual(self.cache.get(("other", "a")), 2)
@@ -0,0 +1,247 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from ..models import ReportFlight, User
+
+from decimal import Decimal
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_coalesce import (
+    SingleFlight,
+    acquire_flight,
+    flight_digest,
+    publish_flight,
+    run_flight,
+    wait_for_flight,
+)
+from cs_app.utils.report_inflight import ReportCancelled
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter
+
+import cs_app.utils.report_functions as rf
+import threading
+
+
+def run_in_threads(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+
+    return threads, results, errors
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def blocking(self, result=None, error=None):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            self.started.set()
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+
+        return compute, calls
+
+    def wait_for_followers(self, count):
+        while self.flights.stats()["followers"] < count:
+            threading.Event().wait(0.01)
+
+    @override_settings(REPORT_COALESCE_POLL_INTERVAL=0.01)
+    def test_concurrent_calls_share_one_computation(self):
+        compute, calls = self.blocking(result=["rows"])
+
+        threads, results, errors = run_in_threads(3, lambda: self.flights.do(("data", "r"), compute))
+        self.started.wait(5)
+        self.wait_for_followers(2)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [["rows"]] * 3)
+        self.assertEqual(self.flights.stats(), {"leaders": 1, "followers": 2, "running": 0})
+
+    @override_settings(REPORT_COALESCE_POLL_INTERVAL=0.01)
+    def test_failed_leader_hands_over(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                self.started.set()
+                self.release.wait(5)
+                raise ValueError("boom")
+            return ["rows"]
+
+        threads, results, errors = run_in_threads(2, lambda: self.flights.do(("data", "r"), compute))
+        self.started.wait(5)
+        self.wait_for_followers(1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([type(error) for error in errors if error], [ValueError])
+        self.assertIn(["rows"], results)
+
+    @override_settings(REPORT_COALESCE_POLL_INTERVAL=0.01)
+    def test_cancelled_leader_hands_over(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                self.started.set()
+                self.release.wait(5)
+                raise ReportCancelled("Report cancelled")
+            return ["rows"]
+
+        threads, results, errors = run_in_threads(2, lambda: self.flights.do(("data", "r"), compute))
+        self.started.wait(5)
+        self.wait_for_followers(1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(map(repr, results)), [repr(None), repr(["rows"])])
+
+
+@override_settings(REPORT_COALESCE_CROSS_PROCESS=True, REPORT_COALESCE_POLL_INTERVAL=0)
+class CrossProcessFlightTests(TransactionTestCase):
+
+    def test_lock_is_held_once(self):
+        self.assertTrue(acquire_flight("abc"))
+        self.assertFalse(acquire_flight("abc"))
+
+    def test_published_result_is_read_back(self):
+        rows = [{"department_name": "Sales", "total_hours": Decimal("24.0")}]
+        acquire_flight("abc")
+        publish_flight("abc", rows)
+
+        self.assertEqual(wait_for_flight("abc"), (True, rows))
+
+    def test_waits_for_other_process(self):
+        key = ("data", "department_hours", ())
+        rows = [{"department_name": "Sales"}]
+
+        with patch("cs_app.utils.report_coalesce.acquire_flight", return_value=False), patch(
+            "cs_app.utils.report_coalesce.wait_for_flight", return_value=(True, rows)
+        ):
+            result = run_flight(key, lambda: self.fail("computed twice"))
+
+        self.assertEqual(result, rows)
+
+    def test_flight_is_not_shared_inside_transaction(self):
+        with transaction.atomic():
+            self.assertEqual(run_flight(("data", "r"), lambda: ["rows"]), ["rows"])
+            self.assertFalse(ReportFlight.objects.exists())
+
+    @patch("cs_app.utils.report_functions.compute_report_data")
+    def test_report_request_holds_no_transaction_while_report_runs(self, mock_compute):
+        in_atomic_block = []
+
+        def compute(alias, definition, values, partition=None):
+            in_atomic_block.append(transaction.get_connection().in_atomic_block)
+            return []
+
+        mock_compute.side_effect = compute
+        user = User.objects.create_user(username="testuser", password="testpass")
+        user.active_database_alias = "data"
+        user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+
+        response = self.client.post(
+            reverse("load_table"),
+            data=json.dumps({"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(in_atomic_block, [False])
+        self.assertTrue(ReportFlight.objects.exists())
+        report_cache.clear()
+
+    def test_digest_follows_the_server_not_the_alias_name(self):
+        key = ("data", "department_hours", ())
+        digest = flight_digest(key)
+
+        with patch.dict(settings.DATABASES, renamed=settings.DATABASES["data"]):
+            self.assertEqual(flight_digest(("renamed",) + key[1:]), digest)
+
+        with patch.dict(settings.DATABASES["data"], HOST="another-server"):
+            self.assertNotEqual(flight_digest(key), digest)
+
+    def test_failed_computation_releases_lock(self):
+        def compute():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            run_flight(("data", "r"), compute)
+
+        self.assertFalse(ReportFlight.objects.exists())
+
+
+@override_settings(REPORT_COALESCE_POLL_INTERVAL=0.01)
+class GetReportDataCoalescingTests(TestCase):
+
+    def setUp(self):
+        report_cache.clear()
+        rf.report_flights.clear()
+        self.definition = ReportDefinition(
+            report_id="coalesced",
+            title="Coalesced",
+            parameters=[ReportParameter("start_date")],
+            sql="SELECT a FROM t WHERE d > %s",
+            columns=["a"],
+        )
+
+    def tearDown(self):
+        report_cache.clear()
+        rf.report_flights.clear()
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_identical_requests_run_one_query(self, mock_query):
+        started = threading.Event()
+        release = threading.Event()
+
+        def query(alias, definition, values):
+            started.set()
+            release.wait(5)
+            return [{"a": 1}]
+
+        mock_query.side_effect = query
+
+        threads, results, errors = run_in_threads(
+            2, lambda: rf.get_report_data("data", self.definition, {"start_date": "2009-01-01"})
+        )
+        started.wait(5)
+        while rf.report_flights.stats()["followers"] < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        mock_query.assert_called_once()
+        self.assertEqual(results, [[{"a": 1}], [{"a": 1}]])
@@ -0,0 +1,119 @@
+import unittest
+
+from django.test import TestCase, override_settings
+
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+from cs_app.utils.report_columnar import ColumnarEngine, ColumnarIndex, numpy_available
+
+import cs_app.utils.report_functions as rf
+
+
+ROWS = [
+    (date(2009, 1, 5), 3, "Sales", 1),
+    (datetime(2009, 1, 5, 0, 0), 1, "Engineering", 1),
+    (date(2009, 2, 1), 3, "Sales", 2),
+    (date(2009, 3, 15), 3, "Sales", 1),
+]
+
+
+@unittest.skipUnless(numpy_available(), "numpy is not installed")
+class ColumnarIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = ColumnarIndex(ROWS)
+
+    def test_range_bounds_are_inclusive(self):
+        self.assertEqual(
+            self.index.department_counts(date(2009, 1, 5), date(2009, 2, 1)),
+            {"Engineering": 1, "Sales": 2},
+        )
+
+    def test_range_without_assignments(self):
+        self.assertEqual(self.index.department_counts(date(2009, 1, 6), date(2009, 1, 31)), {})
+        self.assertEqual(self.index.department_counts(date(2009, 3, 1), date(2009, 2, 1)), {})
+
+    def test_all_time_range(self):
+        self.assertEqual(
+            self.index.department_counts(date(1000, 1, 1), date(9999, 12, 31)),
+            {"Engineering": 1, "Sales": 3},
+        )
+
+    def test_counts_limited_to_shifts(self):
+        self.assertEqual(
+            self.index.department_counts(date(2009, 1, 1), date(2009, 12, 31), shift_ids=[2]),
+            {"Sales": 1},
+        )
+        self.assertEqual(
+            self.index.department_counts(date(2009, 1, 1), date(2009, 2, 28), shift_ids=[1]),
+            {"Engineering": 1, "Sales": 1},
+        )
+
+
+@patch("cs_app.utils.report_columnar.numpy_available", return_value=True)
+@override_settings(REPORT_COLUMNAR_ALIASES=["data"])
+class ColumnarEngineTests(TestCase):
+
+    def setUp(self):
+        self.engine = ColumnarEngine()
+
+    def index(self, signature):
+        index = MagicMock()
+        index.signature = signature
+        return index
+
+    def test_unchanged_source_is_not_reloaded(self, mock_numpy):
+        with patch("cs_app.utils.report_columnar.build_index", return_value=self.index((4, None))) as mock_build, \
+                patch("cs_app.utils.report_columnar.fetch_signature", return_value=(4, None)):
+            self.assertTrue(self.engine.refresh("data"))
+            self.assertFalse(self.engine.refresh("data"))
+
+        mock_build.assert_called_once_with("data")
+
+    def test_changed_source_is_reloaded(self, mock_numpy):
+        fresh = self.index((5, None))
+
+        with patch("cs_app.utils.report_columnar.build_index", side_effect=[self.index((4, None)), fresh]), \
+                patch("cs_app.utils.report_columnar.fetch_signature", return_value=(5, None)):
+            self.engine.refresh("data")
+            self.assertTrue(self.engine.refresh("data"))
+
+        self.assertIs(self.engine.get("data"), fresh)
+
+    def test_failed_refresh_keeps_previous_index(self, mock_numpy):
+        previous = self.index((4, None))
+        self.engine._indexes["data"] = previous
+
+        with patch("cs_app.utils.report_columnar.fetch_signature", side_effect=Exception("boom")), \
+                self.assertLogs("cs_app.utils.report_columnar", level="ERROR"):
+            self.engine.refresh_all()
+
+        self.assertIs(self.engine.get("data"), previous)
+        self.assertEqual(self.engine.stats()["errors"], 1)
+
+    def test_engine_is_disabled_without_numpy(self, mock_numpy):
+        mock_numpy.return_value = False
+
+        self.assertFalse(self.engine.start())
+
+
+class PrecomputedDepartmentHoursTests(TestCase):
+
+    values = {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)}
+
+    @patch("cs_app.utils.report_functions.rollup_department_hours")
+    @patch("cs_app.utils.report_columnar.department_counts", return_value={"Sales": 3})
+    def test_columnar_index_answers_first(self, mock_counts, mock_rollup):
+        data = rf.precomputed_department_hours("data", self.values)
+
+        self.assertEqual(data, [{"department_name": "Sales", "total_hours": Decimal("24.0")}])
+        mock_counts.assert_called_once_with("data", date(2009, 1, 1), date(2009, 12, 31))
+        mock_rollup.assert_not_called()
+
+    @patch("cs_app.utils.report_functions.rollup_department_hours", return_value=None)
+    def test_alias_without_index_uses_rollup(self, mock_rollup):
+        self.assertIsNone(rf.precomputed_department_hours("data", self.values))
+
+        mock_rollup.assert_called_once_with("data", self.values)
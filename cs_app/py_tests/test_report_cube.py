@@ -0,0 +1,153 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+from ..models import User, DepartmentShiftCube, CubeWatermark
+
+from cs_app.utils.report_queries import connection_identity
+
+import cs_app.utils.report_cube as report_cube
+
+
+def add_cell(month, department_name, group_name, shift_name, assignment_count, connection_key=None):
+    DepartmentShiftCube.objects.create(
+        connection_key=connection_key or connection_identity("data"),
+        month=month,
+        department_name=department_name,
+        group_name=group_name,
+        shift_name=shift_name,
+        assignment_count=assignment_count,
+    )
+
+
+class RefreshCubeTests(TestCase):
+
+    def mock_execute(self, rows):
+        mock_execute = MagicMock()
+        mock_execute.return_value.fetchall.return_value = rows
+        return mock_execute
+
+    def test_first_refresh_loads_all_months(self):
+        rows = [
+            (date(2009, 1, 1), "Sales", "Sales and Marketing", "Day", 2),
+            (date(2009, 2, 1), "Sales", "Sales and Marketing", "Night", 1),
+        ]
+
+        with patch("cs_app.utils.report_cube.execute_statement", self.mock_execute(rows)):
+            loaded = report_cube.refresh_cube("data", date(2009, 2, 14))
+
+        self.assertEqual(loaded, 2)
+        self.assertEqual(DepartmentShiftCube.objects.count(), 2)
+        self.assertEqual(report_cube.get_cube_watermark("data"), date(2009, 2, 1))
+
+    def test_refresh_only_requests_months_after_watermark(self):
+        CubeWatermark.objects.create(connection_key=connection_identity("data"), last_month=date(2009, 1, 1))
+        mock_execute = self.mock_execute([])
+
+        with patch("cs_app.utils.report_cube.execute_statement", mock_execute):
+            report_cube.refresh_cube("data", date(2009, 2, 1))
+
+        self.assertEqual(mock_execute.call_args[0][2], [date(2009, 1, 31), date(2009, 2, 28)])
+        self.assertEqual(report_cube.get_cube_watermark("data"), date(2009, 2, 1))
+
+    def test_cube_follows_the_server_not_the_alias_name(self):
+        with patch("cs_app.utils.report_cube.execute_statement", self.mock_execute([])):
+            report_cube.refresh_cube("data", date(2009, 1, 31))
+
+        with patch("cs_app.utils.report_cube.connection_identity", return_value="mssql|other|sales|"):
+            self.assertIsNone(report_cube.get_cube_watermark("data"))
+
+    def test_refresh_up_to_date_does_nothing(self):
+        CubeWatermark.objects.create(connection_key=connection_identity("data"), last_month=date(2009, 1, 1))
+
+        with patch("cs_app.utils.report_cube.execute_statement") as mock_execute:
+            loaded = report_cube.refresh_cube("data", date(2009, 1, 31))
+
+        self.assertEqual(loaded, 0)
+        mock_execute.assert_not_called()
+
+
+class CubeQueryTests(TestCase):
+
+    def setUp(self):
+        add_cell(date(2009, 1, 1), "Sales", "Sales and Marketing", "Day", 2)
+        add_cell(date(2009, 1, 1), "Sales", "Sales and Marketing", "Night", 1)
+        add_cell(date(2009, 2, 1), "Sales", "Sales and Marketing", "Day", 3)
+        add_cell(date(2009, 2, 1), "Tool Design", "Research and Development", "Evening", 4)
+        add_cell(date(2009, 2, 1), "Sales", "Sales and Marketing", "Day", 9, connection_key="mssql|other|sales|")
+
+    def test_slice_sums_cells_per_dimension(self):
+        rows = report_cube.slice_cube("data", ["group_name"], start_month="2009-02")
+
+        self.assertEqual(
+            rows,
+            [
+                {"group_name": "Research and Development", "assignment_count": 4, "total_hours": Decimal("32.0")},
+                {"group_name": "Sales and Marketing", "assignment_count": 3, "total_hours": Decimal("24.0")},
+            ],
+        )
+
+    def test_dice_keeps_selected_values(self):
+        rows = report_cube.slice_cube("data", [], filters={"shift_name": ["Day"], "month": ["2009-01"]})
+
+        self.assertEqual(rows, [{"assignment_count": 2, "total_hours": Decimal("16.0")}])
+
+    def test_pivot_fills_missing_cells_and_totals(self):
+        pivot = report_cube.pivot_cube("data", measure="assignment_count")
+
+        self.assertEqual(pivot["row_labels"], ["Sales", "Tool Design"])
+        self.assertEqual(pivot["column_labels"], ["Day", "Evening", "Night"])
+        self.assertEqual(pivot["cells"], [[5, 0, 1], [0, 4, 0]])
+        self.assertEqual(pivot["row_totals"], [6, 4])
+        self.assertEqual(pivot["column_totals"], [5, 4, 1])
+        self.assertEqual(pivot["total"], 10)
+
+    def test_unknown_dimension_is_rejected(self):
+        with self.assertRaises(ValueError):
+            report_cube.slice_cube("data", ["employee"])
+
+
+class CubePivotViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        add_cell(date(2009, 1, 1), "Sales", "Sales and Marketing", "Day", 2)
+        add_cell(date(2009, 2, 1), "Sales", "Sales and Marketing", "Night", 1)
+
+    def post_pivot(self, body):
+        return self.client.post(reverse("cube_pivot"), data=json.dumps(body), content_type="application/json")
+
+    @patch("cs_app.utils.report_queries.execute_statement")
+    def test_pivot_is_answered_from_cube(self, mock_execute):
+        CubeWatermark.objects.create(connection_key=connection_identity("data"), last_month=date(2009, 2, 1))
+
+        response = self.post_pivot({"rows": "month", "columns": "shift_name", "end_month": "2009-02"})
+
+        document = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(document["row_labels"], ["2009-01", "2009-02"])
+        self.assertEqual(document["cells"], [["16.0", "0.0"], ["0.0", "8.0"]])
+        self.assertEqual(document["watermark"], "2009-02")
+        self.assertTrue(document["complete"])
+        mock_execute.assert_not_called()
+
+    def test_alias_without_cube(self):
+        response = self.post_pivot({})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"], "No cube for this database")
+
+    def test_invalid_pivot_is_rejected(self):
+        CubeWatermark.objects.create(connection_key=connection_identity("data"), last_month=date(2009, 2, 1))
+
+        response = self.post_pivot({"rows": "shift_name", "columns": "shift_name"})
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,86 @@
+from django.test import TestCase
+
+from datetime import date
+
+from cs_app.utils.report_dialects import get_dialect
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter
+
+import cs_app.utils.report_registry as registry
+
+
+class SqlDialectTests(TestCase):
+
+    def setUp(self):
+        self.mssql = get_dialect("mssql")
+        self.postgresql = get_dialect("postgresql")
+
+    def test_quote_name(self):
+        self.assertEqual(
+            self.mssql.quote_name("HumanResources.Department"), "[HumanResources].[Department]"
+        )
+        self.assertEqual(
+            self.postgresql.quote_name("HumanResources.Department"), '"humanresources"."department"'
+        )
+        self.assertEqual(self.mssql.quote_name("odd]name"), "[odd]]name]")
+
+    def test_date_literal(self):
+        self.assertEqual(self.mssql.date_literal(date(2009, 1, 31)), "CAST('20090131' AS date)")
+        self.assertEqual(self.postgresql.date_literal("2009-01-31"), "DATE '2009-01-31'")
+
+    def test_render_leaves_string_literals(self):
+        template = """SELECT "Name" AS "name", 'say "hi"' FROM "HumanResources"."Shift" WHERE "StartDate" > {d '2009-01-01'}"""
+
+        self.assertEqual(
+            self.mssql.render(template),
+            """SELECT [Name] AS [name], 'say "hi"' FROM [HumanResources].[Shift] """
+            """WHERE [StartDate] > CAST('20090101' AS date)""",
+        )
+        self.assertEqual(
+            self.postgresql.render(template),
+            """SELECT "name" AS "name", 'say "hi"' FROM "humanresources"."shift" """
+            """WHERE "startdate" > DATE '2009-01-01'""",
+        )
+
+    def test_render_tablesample_needs_percent(self):
+        with self.assertRaises(ValueError):
+            self.mssql.render("SELECT 1 FROM t {tablesample}")
+
+    def test_pagination_params(self):
+        self.assertEqual(self.mssql.pagination_params(20, 11), [20, 11])
+        self.assertEqual(self.postgresql.pagination_params(20, 11), [11, 20])
+
+    def test_unknown_engine(self):
+        self.assertIsNone(get_dialect("sqlite3"))
+
+
+class ReportRenderingTests(TestCase):
+
+    def test_report_sql_is_rendered_per_engine(self):
+        definition = registry.get_report("department_hours")
+
+        mssql = definition.statement_for("mssql").sql
+        postgresql = definition.statement_for("postgresql").sql
+
+        self.assertIn("FROM [HumanResources].[EmployeeDepartmentHistory]", mssql)
+        self.assertIn('AS [total_hours]', mssql)
+        self.assertIn('FROM "humanresources"."employeedepartmenthistory"', postgresql)
+        self.assertNotIn("[", postgresql)
+        self.assertNotIn("'", mssql + postgresql)
+
+    def test_engine_specific_sql(self):
+        definition = ReportDefinition(
+            report_id="fast_path",
+            title="Fast Path",
+            parameters=[ReportParameter("start_date")],
+            sql={
+                "mssql": 'SELECT "a" FROM "t" WITH (NOLOCK) WHERE "d" > %s',
+                "postgresql": 'SELECT "a" FROM "t" WHERE "d" > %s',
+            },
+            columns=["a"],
+        )
+        definition.compile()
+
+        self.assertEqual(
+            definition.statement_for("mssql").sql, "SELECT [a] FROM [t] WITH (NOLOCK) WHERE [d] > %s"
+        )
+        self.assertEqual(definition.statement_for("postgresql").sql, 'SELECT "a" FROM "t" WHERE "d" > %s')
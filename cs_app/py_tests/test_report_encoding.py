@@ -0,0 +1,158 @@
+import io
+import json
+import unittest
+
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from decimal import Decimal
+from datetime import date
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_encoding import (
+    encoded_response,
+    encoding_available,
+    negotiate_encoding,
+    to_columns,
+)
+
+
+COLUMNAR = "application/vnd.cstool.columnar+json"
+
+
+class NegotiateEncodingTests(TestCase):
+
+    def test_missing_header_selects_json(self):
+        self.assertEqual(negotiate_encoding(None), "json")
+        self.assertEqual(negotiate_encoding(""), "json")
+
+    def test_wildcard_selects_json(self):
+        self.assertEqual(negotiate_encoding("text/html, */*;q=0.8"), "json")
+
+    def test_columnar_json(self):
+        self.assertEqual(negotiate_encoding(COLUMNAR), "columnar")
+
+    def test_quality_order(self):
+        accept = f"application/json;q=0.5, {COLUMNAR};q=0.9"
+
+        self.assertEqual(negotiate_encoding(accept), "columnar")
+
+    def test_zero_quality_is_not_acceptable(self):
+        self.assertIsNone(negotiate_encoding(f"{COLUMNAR};q=0"))
+
+    def test_unknown_type_is_not_acceptable(self):
+        self.assertIsNone(negotiate_encoding("text/csv"))
+
+    @patch("cs_app.utils.report_encoding.encoding_available")
+    def test_unavailable_encoding_falls_back(self, mock_available):
+        mock_available.side_effect = lambda encoding: encoding != "msgpack"
+
+        self.assertEqual(
+            negotiate_encoding("application/x-msgpack, application/json;q=0.5"), "json"
+        )
+        self.assertIsNone(negotiate_encoding("application/x-msgpack"))
+
+
+class EncodedResponseTests(TestCase):
+
+    def setUp(self):
+        self.rows = [
+            {"department_name": "Sales", "total_hours": Decimal("24.0"), "day": date(2009, 1, 5)},
+            {"department_name": "Engineering", "total_hours": Decimal("8.0"), "day": date(2009, 1, 6)},
+        ]
+        self.columns = ["department_name", "total_hours", "day"]
+
+    def test_to_columns(self):
+        self.assertEqual(
+            to_columns(self.rows, ["department_name"]), [["Sales", "Engineering"]]
+        )
+
+    def test_columnar_json(self):
+        response = encoded_response(self.rows, self.columns, "columnar", {"databases": []})
+
+        self.assertEqual(response["Content-Type"], COLUMNAR)
+        self.assertEqual(response["Vary"], "Accept")
+        self.assertEqual(
+            json.loads(response.content),
+            {
+                "databases": [],
+                "columns": self.columns,
+                "data": [
+                    ["Sales", "Engineering"],
+                    ["24.0", "8.0"],
+                    ["2009-01-05", "2009-01-06"],
+                ],
+            },
+        )
+
+    @unittest.skipUnless(encoding_available("msgpack"), "msgpack is not installed")
+    def test_msgpack(self):
+        import msgpack
+
+        response = encoded_response(self.rows, self.columns, "msgpack")
+
+        self.assertEqual(
+            msgpack.unpackb(response.content)["data"][1], ["24.0", "8.0"]
+        )
+
+    @unittest.skipUnless(encoding_available("arrow"), "pyarrow is not installed")
+    def test_arrow(self):
+        import pyarrow as pa
+
+        response = encoded_response(self.rows, self.columns, "arrow", {"databases": []})
+        table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+
+        self.assertEqual(table.column_names, self.columns)
+        self.assertEqual(table.column("total_hours").to_pylist(), [Decimal("24.0"), Decimal("8.0")])
+        self.assertEqual(table.schema.metadata[b"databases"], b"[]")
+
+
+class LoadTableEncodingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+        self.payload = {
+            "time_range": "Custom",
+            "start_date": "2009-01-01",
+            "end_date": "2009-12-31",
+        }
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_report(self, accept):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(self.payload),
+            content_type="application/json",
+            HTTP_ACCEPT=accept,
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_columnar_response(self, mock_query):
+        mock_query.return_value = [{"department_name": "Sales", "total_hours": Decimal("24.0")}]
+
+        response = self.post_report(COLUMNAR)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {"columns": ["department_name", "total_hours"], "data": [["Sales"], ["24.0"]]},
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_unacceptable_encoding(self, mock_query):
+        response = self.post_report("text/csv")
+
+        self.assertEqual(response.status_code, 406)
+        mock_query.assert_not_called()
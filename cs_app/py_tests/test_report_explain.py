@@ -0,0 +1,126 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from unittest.mock import MagicMock, patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_explain import StageTimer, explain_mssql, explain_postgresql, parse_explain_mode
+from cs_app.utils.report_queries import ReportStatement
+from cs_app.utils.report_segments import segment_store
+
+
+class ExplainHelperTests(TestCase):
+
+    def setUp(self):
+        self.statement = ReportStatement("test_statement", "SELECT a FROM t WHERE d > %s")
+
+    def test_stage_timer_adds_up_repeated_stages(self):
+        timer = StageTimer()
+
+        with timer.stage("fetch"):
+            pass
+        with timer.stage("execute"):
+            pass
+        with timer.stage("fetch"):
+            pass
+
+        self.assertEqual(list(timer.as_dict()), ["fetch", "execute", "total"])
+
+    def test_parse_explain_mode(self):
+        self.assertIsNone(parse_explain_mode(None))
+        self.assertEqual(parse_explain_mode(True), "actual")
+        self.assertEqual(parse_explain_mode("estimated"), "estimated")
+        with self.assertRaises(ValueError):
+            parse_explain_mode("verbose")
+
+    def test_postgresql_actual_plan(self):
+        conn = MagicMock(spec=["cursor"])
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ('[{"Plan": {"Node Type": "Seq Scan"}}]',)
+
+        plan = explain_postgresql(conn, self.statement, [1], "actual")
+
+        cursor.execute.assert_called_once_with(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT a FROM t WHERE d > %s", [1]
+        )
+        self.assertEqual(plan, [{"Plan": {"Node Type": "Seq Scan"}}])
+
+    def test_mssql_actual_plan_follows_rows(self):
+        conn = MagicMock(spec=["connection"])
+        cursor = conn.connection.cursor.return_value
+        cursor.fetchone.side_effect = [("Sales",), ("<ShowPlanXML xmlns='...'>",)]
+        cursor.nextset.side_effect = [True, False]
+
+        plan = explain_mssql(conn, self.statement, [1], "actual")
+
+        self.assertEqual(plan, "<ShowPlanXML xmlns='...'>")
+        executed = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertEqual(
+            executed,
+            ["SET STATISTICS XML ON", "SELECT a FROM t WHERE d > ?", "SET STATISTICS XML OFF"],
+        )
+
+
+class LoadTableExplainTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+        self.payload = {
+            "time_range": "Custom",
+            "start_date": "2009-01-01",
+            "end_date": "2009-12-31",
+            "explain": "actual",
+        }
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_report(self, payload):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_explain_requires_staff(self):
+        response = self.post_report(self.payload)
+
+        self.assertEqual(response.status_code, 403)
+
+    @patch("cs_app.utils.report_functions.connections")
+    @patch("cs_app.utils.report_functions.explain_statement")
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_explain_returns_plan_and_timings(self, mock_execute, mock_explain, mock_connections):
+        self.user.is_staff = True
+        self.user.save()
+        mock_execute.return_value.fetchall.return_value = [("Sales", 24.0)]
+        mock_explain.return_value = {"mode": "actual", "format": "xml", "plan": "<ShowPlanXML/>"}
+
+        response = self.post_report(self.payload)
+
+        body = response.json()
+        self.assertEqual(body["data"], [{"department_name": "Sales", "total_hours": 24.0}])
+        self.assertEqual(body["explain"]["plan"]["plan"], "<ShowPlanXML/>")
+        self.assertEqual(
+            list(body["explain"]["timings"]),
+            ["history", "connect", "execute", "fetch", "serialize", "total"],
+        )
+        mock_connections.__getitem__.assert_called_with("data")
+
+    def test_explain_cannot_be_paged(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.post_report(dict(self.payload, top=5))
+
+        self.assertEqual(response.status_code, 400)
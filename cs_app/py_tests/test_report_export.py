@@ -0,0 +1,92 @@
+import gzip
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from decimal import Decimal
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_segments import segment_store
+
+import cs_app.utils.report_export as report_export
+
+
+class ReportExportTests(TestCase):
+
+    def setUp(self):
+        self.columns = ["department_name", "total_hours"]
+        self.batches = [
+            [{"department_name": "Sales", "total_hours": Decimal("8.0")}],
+            [{"department_name": "Engineering", "total_hours": Decimal("16.0")}],
+        ]
+
+    def test_csv_export(self):
+        exported = b"".join(report_export.iter_export(iter(self.batches), "csv", self.columns))
+
+        self.assertEqual(
+            exported.decode().splitlines(),
+            ["department_name,total_hours", "Sales,8.0", "Engineering,16.0"],
+        )
+
+    def test_compressed_csv_batches_form_one_gzip_file(self):
+        exported = b"".join(
+            report_export.iter_export(iter(self.batches), "csv", self.columns, compress=True)
+        )
+
+        self.assertEqual(len(gzip.decompress(exported).decode().splitlines()), 3)
+
+    def test_csv_export_without_rows_has_header(self):
+        exported = b"".join(report_export.iter_export(iter([]), "csv", self.columns))
+
+        self.assertEqual(exported, b"department_name,total_hours\r\n")
+
+    def test_unknown_format_is_unavailable(self):
+        self.assertTrue(report_export.export_available("csv"))
+        self.assertFalse(report_export.export_available("pdf"))
+
+
+class ExportTableViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_export(self, payload):
+        return self.client.post(
+            reverse("export_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @patch("cs_app.utils.report_functions.stream_statement")
+    def test_export_csv(self, mock_stream):
+        mock_stream.return_value = iter([[("Sales", Decimal("24.0"))]])
+
+        response = self.post_export(
+            {"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31", "format": "csv"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines(),
+            ["department_name,total_hours", "Sales,24.0"],
+        )
+
+    def test_export_unknown_format(self):
+        response = self.post_export(
+            {"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31", "format": "pdf"}
+        )
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,108 @@
+import json
+import time
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from unittest.mock import patch
+
+import cs_app.utils.report_fanout as report_fanout
+import cs_app.utils.report_registry as registry
+
+
+def fake_report_data(alias, definition, values, partition=None):
+    if alias == "slow_db":
+        time.sleep(0.5)
+    if alias == "broken_db":
+        raise Exception("Login failed")
+    return [{"department_name": "Sales", "total_hours": 8.0}]
+
+
+class FanoutTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+        self.values = registry.bind_parameters(self.definition, {})
+
+    @patch("cs_app.utils.report_functions.get_report_data", side_effect=fake_report_data)
+    def test_each_alias_reports_its_own_status(self, mock_report):
+        results = list(
+            report_fanout.iter_fanout_results(
+                ["data", "broken_db", "slow_db"], self.definition, self.values, timeout=0.2
+            )
+        )
+
+        statuses = {result["database"]: result["status"] for result in results}
+        self.assertEqual(statuses, {"data": "ok", "broken_db": "error", "slow_db": "timeout"})
+        self.assertEqual(results[-1]["database"], "slow_db")
+
+    def test_merge_adds_source_database(self):
+        merged = report_fanout.merge_fanout_results(
+            [
+                {"database": "a", "data": [{"department_name": "Sales"}]},
+                {"database": "b", "data": [{"department_name": "Sales"}]},
+            ]
+        )
+
+        self.assertEqual(
+            [row["source_database"] for row in merged],
+            ["a", "b"],
+        )
+
+
+class LoadMultiDatabaseTableViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        settings.DATABASES["broken_db"] = dict(settings.DATABASES["data"])
+
+    def tearDown(self):
+        settings.DATABASES.pop("broken_db", None)
+
+    def post_report(self, payload):
+        payload = dict(
+            {"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31"},
+            **payload,
+        )
+        return self.client.post(
+            reverse("load_multi_database_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @patch("cs_app.utils.report_functions.get_report_data", side_effect=fake_report_data)
+    def test_results_are_merged(self, mock_report):
+        response = self.post_report({"aliases": ["data", "broken_db"]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["data"],
+            [{"department_name": "Sales", "total_hours": 8.0, "source_database": "data"}],
+        )
+        self.assertEqual(
+            sorted(database["status"] for database in response.json()["databases"]),
+            ["error", "ok"],
+        )
+
+    @patch("cs_app.utils.report_functions.get_report_data", side_effect=fake_report_data)
+    def test_results_stream_per_database(self, mock_report):
+        response = self.post_report({"aliases": ["data", "broken_db"], "stream": "ndjson"})
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)["database"] for line in lines),
+            ["broken_db", "data"],
+        )
+
+    def test_unknown_alias_is_rejected(self):
+        response = self.post_report({"aliases": ["data", "missing_db"]})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_default_database_is_rejected(self):
+        response = self.post_report({"aliases": ["default"]})
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,177 @@
+import json
+import threading
+
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from unittest.mock import MagicMock, patch
+
+import cs_app.utils.report_inflight as report_inflight
+import cs_app.utils.report_queries as rq
+
+
+class FakeConnection:
+    alias = "data"
+    vendor = "microsoft"
+
+
+class InflightReportTests(TestCase):
+
+    def test_cancel_report_cancels_running_cursor(self):
+        cursor = MagicMock(spec=["cancel", "execute"])
+
+        with report_inflight.track_report("req-1", 1):
+            with report_inflight.watch_query(FakeConnection(), cursor):
+                self.assertTrue(report_inflight.cancel_report("req-1", 1))
+
+        cursor.cancel.assert_called_once()
+
+    def test_cancel_report_of_other_user_is_refused(self):
+        with report_inflight.track_report("req-1", 1):
+            self.assertFalse(report_inflight.cancel_report("req-1", 2))
+
+    def test_same_request_id_of_two_users_is_kept_apart(self):
+        cursor = MagicMock(spec=["cancel", "execute"])
+
+        with report_inflight.track_report("req-1", 1):
+            with report_inflight.watch_query(FakeConnection(), cursor):
+                with report_inflight.track_report("req-1", 2):
+                    self.assertTrue(report_inflight.cancel_report("req-1", 2))
+
+                cursor.cancel.assert_not_called()
+                self.assertTrue(report_inflight.cancel_report("req-1", 1))
+
+        cursor.cancel.assert_called_once()
+
+    def test_cancelled_query_raises_report_cancelled(self):
+        cursor = MagicMock(spec=["cancel", "execute"])
+
+        with self.assertRaises(report_inflight.ReportCancelled):
+            with report_inflight.track_report("req-1", 1):
+                with report_inflight.watch_query(FakeConnection(), cursor):
+                    report_inflight.cancel_report("req-1", 1)
+                    raise Exception("Operation canceled")
+
+    def test_new_report_supersedes_running_report(self):
+        cursor = MagicMock(spec=["cancel", "execute"])
+        watching = threading.Event()
+        finished = threading.Event()
+
+        def run_first_report():
+            with report_inflight.track_report("req-1", 1, supersede=True):
+                with report_inflight.watch_query(FakeConnection(), cursor):
+                    watching.set()
+                    finished.wait(5)
+
+        thread = threading.Thread(target=run_first_report)
+        thread.start()
+        watching.wait(5)
+
+        with report_inflight.track_report("req-2", 1, supersede=True):
+            cursor.cancel.assert_called_once()
+
+        finished.set()
+        thread.join()
+
+    def test_new_report_does_not_supersede_export(self):
+        cursor = MagicMock(spec=["cancel", "execute"])
+
+        with report_inflight.track_report("export-1", 1, supersedable=False):
+            with report_inflight.watch_query(FakeConnection(), cursor):
+                with report_inflight.track_report("req-2", 1, supersede=True):
+                    cursor.cancel.assert_not_called()
+
+    def test_cancelled_stream_raises(self):
+        def batches():
+            yield [1]
+            report_inflight.current_report().cancel()
+            raise Exception("Operation canceled")
+
+        stream = report_inflight.iter_tracked(batches(), "req-1", 1)
+
+        self.assertEqual(next(stream), [1])
+        with self.assertRaises(report_inflight.ReportCancelled):
+            next(stream)
+
+    def test_statement_timeout_errors(self):
+        timeout_error = Exception("HYT00", "[HYT00] Query timeout expired")
+        postgres_error = Exception("canceling statement due to statement timeout")
+        postgres_error.pgcode = "57014"
+
+        self.assertTrue(report_inflight.is_statement_timeout(timeout_error))
+        self.assertTrue(report_inflight.is_statement_timeout(postgres_error))
+        self.assertFalse(report_inflight.is_statement_timeout(Exception("Login failed")))
+
+
+class StatementTimeoutTests(TestCase):
+
+    def test_alias_timeout_overrides_engine_timeout(self):
+        with self.settings(
+            REPORT_STATEMENT_TIMEOUTS={"mssql": 300},
+            REPORT_ALIAS_STATEMENT_TIMEOUTS={"data": 30},
+        ):
+            self.assertEqual(rq.get_statement_timeout("data", "microsoft"), 30)
+            self.assertEqual(rq.get_statement_timeout("other", "microsoft"), 300)
+            self.assertEqual(rq.get_statement_timeout("other", "sqlite"), 0)
+
+    def test_mssql_timeout_is_set_on_pyodbc_connection(self):
+        conn = MagicMock(spec=["vendor", "connection"])
+        conn.vendor = "microsoft"
+
+        rq.apply_statement_timeout(conn, 30)
+
+        self.assertEqual(conn.connection.timeout, 30)
+
+    def test_postgresql_timeout_is_only_sent_when_changed(self):
+        conn = MagicMock(spec=["vendor", "connection", "cursor"])
+        conn.vendor = "postgresql"
+        cursor = conn.cursor.return_value.__enter__.return_value
+
+        rq.apply_statement_timeout(conn, 30)
+        rq.apply_statement_timeout(conn, 30)
+
+        cursor.execute.assert_called_once_with(
+            "SELECT set_config('statement_timeout', %s, false)", ["30000"]
+        )
+
+
+class CancelReportViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+
+    def test_cancel_unknown_report(self):
+        response = self.client.post(
+            reverse("cancel_report"),
+            data=json.dumps({"request_id": "missing"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch("cs_app.utils.report_functions.get_report_data")
+    def test_cancelled_report_returns_conflict(self, mock_report):
+        def cancel_while_running(alias, definition, values, partition=None):
+            report_inflight.current_report().cancel()
+            raise Exception("Operation canceled")
+
+        mock_report.side_effect = cancel_while_running
+
+        response = self.client.post(
+            reverse("load_table"),
+            data=json.dumps(
+                {
+                    "time_range": "Custom",
+                    "start_date": "2009-01-01",
+                    "end_date": "2009-12-31",
+                    "request_id": "req-1",
+                }
+            ),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 409)
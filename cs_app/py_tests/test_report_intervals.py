@@ -0,0 +1,146 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from ..models import User
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_intervals import IntervalIndex, IntervalIndexStore, interval_indexes
+from cs_app.utils.report_registry import get_report
+from cs_app.utils.report_segments import segment_store
+
+
+ROWS = [
+    ("Sales", date(2008, 1, 1), date(2008, 12, 31)),
+    ("Sales", date(2009, 6, 1), None),
+    ("Engineering", date(2007, 3, 1), date(2009, 1, 1)),
+    ("Engineering", date(2010, 1, 1), None),
+]
+
+
+class IntervalIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = IntervalIndex(ROWS)
+
+    def test_assignments_overlapping_the_range_are_counted(self):
+        self.assertEqual(
+            self.index.active_counts(date(2008, 6, 1), date(2009, 6, 30)),
+            {"Sales": 2, "Engineering": 1},
+        )
+
+    def test_range_bounds_are_inclusive(self):
+        self.assertEqual(self.index.active_counts(date(2009, 1, 1), date(2009, 1, 1)), {"Engineering": 1})
+        self.assertEqual(self.index.active_counts(date(2009, 6, 1), date(2009, 6, 1)), {"Sales": 1})
+
+    def test_assignments_without_end_date_stay_active(self):
+        self.assertEqual(
+            self.index.active_counts(date(2030, 1, 1), date(2030, 12, 31)),
+            {"Sales": 1, "Engineering": 1},
+        )
+
+    def test_index_matches_overlap_predicate(self):
+        days = [date(2006, 1, 1), date(2008, 1, 1), date(2008, 7, 1), date(2009, 1, 1), date(2009, 6, 1), date(2011, 1, 1)]
+
+        for start_date in days:
+            for end_date in days:
+                expected = {}
+                for department_name, start, end in ROWS:
+                    if start_date <= end_date and start <= end_date and (end is None or end >= start_date):
+                        expected[department_name] = expected.get(department_name, 0) + 1
+
+                self.assertEqual(self.index.active_counts(start_date, end_date), expected)
+
+
+@override_settings(REPORT_INTERVAL_ALIASES=["data"], REPORT_INTERVAL_CHECK_INTERVAL=0)
+class IntervalIndexStoreTests(TestCase):
+
+    def setUp(self):
+        self.store = IntervalIndexStore()
+
+    @patch("cs_app.utils.report_intervals.build_interval_index")
+    @patch("cs_app.utils.report_intervals.fetch_signature", return_value=(4, None))
+    def test_index_is_rebuilt_only_when_source_changes(self, mock_signature, mock_build):
+        mock_build.side_effect = lambda alias, signature: IntervalIndex(ROWS, signature)
+
+        first = self.store.get("data")
+        self.assertIs(self.store.get("data"), first)
+
+        mock_signature.return_value = (5, None)
+        self.assertIsNot(self.store.get("data"), first)
+        self.assertEqual(mock_build.call_count, 2)
+
+    def test_alias_not_configured(self):
+        self.assertIsNone(self.store.get("other"))
+
+
+class DepartmentActiveHoursTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+        interval_indexes.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+        interval_indexes.clear()
+
+    def post_report(self):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(
+                {
+                    "report_id": "department_active_hours",
+                    "time_range": "Custom",
+                    "start_date": "2008-06-01",
+                    "end_date": "2009-06-30",
+                }
+            ),
+            content_type="application/json",
+        )
+
+    def test_live_query_binds_range_end_first(self):
+        definition = get_report("department_active_hours")
+
+        self.assertIn("IS NULL", definition.statement_for("mssql").sql)
+        self.assertEqual(
+            definition.params_for({"start_date": date(2008, 6, 1), "end_date": date(2009, 6, 30)}),
+            [date(2009, 6, 30), date(2008, 6, 1)],
+        )
+
+    @override_settings(REPORT_INTERVAL_ALIASES=["data"])
+    @patch("cs_app.utils.report_functions.run_report_query")
+    @patch("cs_app.utils.report_intervals.fetch_signature", return_value=(4, None))
+    @patch("cs_app.utils.report_intervals.build_interval_index")
+    def test_report_is_answered_from_interval_index(self, mock_build, mock_signature, mock_query):
+        mock_build.return_value = IntervalIndex(ROWS, (4, None))
+
+        response = self.post_report()
+
+        mock_query.assert_not_called()
+        self.assertEqual(
+            response.json()["data"],
+            [
+                {"department_name": "Sales", "active_headcount": 2, "total_hours": "16.0"},
+                {"department_name": "Engineering", "active_headcount": 1, "total_hours": "8.0"},
+            ],
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_alias_without_index_uses_live_query(self, mock_query):
+        mock_query.return_value = [{"department_name": "Sales", "active_headcount": 2, "total_hours": Decimal("16.0")}]
+
+        response = self.post_report()
+
+        mock_query.assert_called_once()
+        self.assertEqual(response.json()["data"][0]["active_headcount"], 2)
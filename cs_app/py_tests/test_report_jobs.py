@@ -0,0 +1,207 @@
+import json
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User, ReportJob
+
+from datetime import date, timedelta
+from django.utils import timezone
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_segments import segment_store
+
+import cs_app.utils.report_jobs as report_jobs
+
+
+class ReportJobTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.job = report_jobs.create_job(
+            self.user,
+            "data",
+            "department_hours",
+            "All Time",
+            {"start_date": "1000-01-01", "end_date": "2024-01-01"},
+        )
+        report_cache.clear()
+        segment_store.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def test_claim_jobs_only_claims_once(self):
+        self.assertEqual(report_jobs.claim_jobs(5), [self.job.id])
+        self.assertEqual(report_jobs.claim_jobs(5), [])
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ReportJob.RUNNING)
+        self.assertEqual(self.job.attempts, 1)
+
+    @patch("cs_app.utils.report_functions.compute_report_data")
+    def test_run_job_stores_result(self, mock_compute):
+        mock_compute.return_value = [{"department_name": "Sales", "total_hours": 8.0}]
+        report_jobs.claim_jobs(1)
+
+        self.assertEqual(report_jobs.run_job(self.job.id), ReportJob.DONE)
+
+        self.job.refresh_from_db()
+        self.assertEqual(
+            report_jobs.job_to_dict(self.job)["data"],
+            [{"department_name": "Sales", "total_hours": 8.0}],
+        )
+        self.assertIsNotNone(self.job.expires_on)
+
+    @patch("cs_app.utils.report_functions.compute_report_data")
+    def test_run_job_retries_then_fails(self, mock_compute):
+        mock_compute.side_effect = Exception("timeout")
+        ReportJob.objects.filter(pk=self.job.pk).update(max_attempts=2)
+
+        report_jobs.claim_jobs(1)
+        self.assertEqual(report_jobs.run_job(self.job.id), ReportJob.QUEUED)
+
+        report_jobs.claim_jobs(1)
+        self.assertEqual(report_jobs.run_job(self.job.id), ReportJob.FAILED)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.error, "timeout")
+
+    def test_run_job_binds_stored_parameters(self):
+        report_jobs.claim_jobs(1)
+
+        with patch("cs_app.utils.report_functions.compute_report_data") as mock_compute:
+            mock_compute.return_value = []
+            report_jobs.run_job(self.job.id)
+
+        self.assertEqual(
+            mock_compute.call_args[0][2],
+            {"start_date": date(1000, 1, 1), "end_date": date(2024, 1, 1)},
+        )
+
+    def test_cancel_queued_job(self):
+        self.assertTrue(report_jobs.cancel_job(self.job))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ReportJob.CANCELLED)
+        self.assertEqual(report_jobs.claim_jobs(1), [])
+
+    @patch("cs_app.utils.report_functions.compute_report_data")
+    def test_cancel_running_job_drops_result(self, mock_compute):
+        report_jobs.claim_jobs(1)
+        self.assertTrue(report_jobs.cancel_job(self.job))
+
+        self.assertEqual(report_jobs.run_job(self.job.id), ReportJob.CANCELLED)
+        mock_compute.assert_not_called()
+
+    def test_job_runs_against_alias_of_same_database(self):
+        ReportJob.objects.filter(pk=self.job.pk).update(database_alias="data_runtime")
+        self.job.refresh_from_db()
+
+        self.assertEqual(report_jobs.get_job_alias(self.job), "data")
+
+    def test_job_keeps_no_credentials(self):
+        with patch.dict(settings.DATABASES, data=dict(settings.DATABASES["data"], USER="report")):
+            job = report_jobs.create_job(self.user, "data", "department_hours", "All Time", {})
+
+        self.assertEqual(set(job.connection), {"ENGINE", "HOST", "PORT", "NAME"})
+
+    def test_database_signed_in_with_password_is_not_queued(self):
+        with patch.dict(settings.DATABASES, data=dict(settings.DATABASES["data"], PASSWORD="secret")):
+            with self.assertRaises(ValueError):
+                report_jobs.create_job(self.user, "data", "department_hours", "All Time", {})
+
+    @patch("cs_app.utils.report_functions.compute_report_data")
+    def test_job_on_database_missing_from_worker_fails(self, mock_compute):
+        connection = dict(self.job.connection, HOST="another-server")
+        ReportJob.objects.filter(pk=self.job.pk).update(
+            database_alias="data_runtime", connection=connection, max_attempts=1
+        )
+        report_jobs.claim_jobs(1)
+
+        self.assertEqual(report_jobs.run_job(self.job.id), ReportJob.FAILED)
+        mock_compute.assert_not_called()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.connection, {})
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        ReportJob.objects.filter(pk=self.job.pk).update(max_attempts=2)
+        stale_on = timezone.now() - timedelta(seconds=report_jobs.DEFAULT_STALE_SECONDS + 1)
+
+        report_jobs.claim_jobs(1)
+        ReportJob.objects.filter(pk=self.job.pk).update(started_on=stale_on)
+        self.assertEqual(report_jobs.requeue_stale_jobs(), 1)
+
+        report_jobs.claim_jobs(1)
+        ReportJob.objects.filter(pk=self.job.pk).update(started_on=stale_on)
+        self.assertEqual(report_jobs.requeue_stale_jobs(), 0)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ReportJob.FAILED)
+
+    @patch("cs_app.utils.report_inflight.cancel_report", return_value=True)
+    def test_flagged_running_job_query_is_cancelled(self, mock_cancel):
+        report_jobs.claim_jobs(1)
+        self.assertEqual(report_jobs.cancel_flagged_jobs([self.job.id]), 0)
+
+        report_jobs.cancel_job(self.job)
+
+        self.assertEqual(report_jobs.cancel_flagged_jobs([self.job.id]), 1)
+        mock_cancel.assert_called_once_with(report_jobs.job_request_id(self.job.id), self.user.id)
+
+    def test_purge_expired_jobs(self):
+        ReportJob.objects.filter(pk=self.job.pk).update(
+            status=ReportJob.DONE, expires_on=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(report_jobs.purge_expired_jobs(), 1)
+        self.assertFalse(ReportJob.objects.exists())
+
+
+class ReportJobViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+
+    def test_async_load_table_queues_job(self):
+        response = self.client.post(
+            reverse("load_table"),
+            data=json.dumps(
+                {
+                    "time_range": "All Time",
+                    "start_date": "1000-01-01",
+                    "end_date": "2024-01-01",
+                    "async": True,
+                }
+            ),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], ReportJob.QUEUED)
+
+        status_response = self.client.get(
+            reverse("report_job_status", args=[response.json()["job_id"]])
+        )
+        self.assertEqual(status_response.json()["status"], ReportJob.QUEUED)
+
+    def test_job_status_of_other_user_is_hidden(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        job = report_jobs.create_job(other_user, "data", "department_hours", "All Time", {})
+
+        response = self.client.get(reverse("report_job_status", args=[job.id]))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_cancel_report_job(self):
+        job = report_jobs.create_job(self.user, "data", "department_hours", "All Time", {})
+
+        response = self.client.post(reverse("cancel_report_job", args=[job.id]))
+
+        self.assertEqual(response.json(), {"success": True})
@@ -0,0 +1,273 @@
+import json
+import sqlite3
+
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_paging import (
+    ReportPage,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    page_params,
+    page_result,
+    paginate_rows,
+    parse_page,
+)
+
+import cs_app.utils.report_registry as registry
+
+
+ROWS = [
+    {"department_name": "Engineering", "total_hours": Decimal("16.0")},
+    {"department_name": "Marketing", "total_hours": Decimal("24.0")},
+    {"department_name": "Sales", "total_hours": Decimal("24.0")},
+    {"department_name": "Shipping", "total_hours": Decimal("8.0")},
+]
+
+
+class ParsePageTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+
+    def test_no_page_requested(self):
+        self.assertIsNone(parse_page(self.definition, {"start_date": "2009-01-01"}))
+
+    def test_descending_order(self):
+        page = parse_page(self.definition, {"order_by": "-total_hours", "limit": 2, "offset": 4})
+
+        self.assertEqual(
+            (page.order_by, page.descending, page.limit, page.offset), ("total_hours", True, 2, 4)
+        )
+
+    def test_top_defaults_to_largest_additive_column(self):
+        page = parse_page(self.definition, {"top": 10})
+
+        self.assertEqual((page.order_by, page.descending, page.limit), ("total_hours", True, 10))
+        self.assertTrue(page.top)
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            parse_page(self.definition, {"order_by": "Name; DROP TABLE x"})
+
+    def test_limit_is_bounded(self):
+        with self.assertRaises(ValueError):
+            parse_page(self.definition, {"limit": 100000})
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            parse_page(self.definition, {"cursor": "not a cursor"})
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(
+            decode_cursor(encode_cursor([Decimal("24.0"), "Sales"])), ["24.0", "Sales"]
+        )
+
+
+class PageStatementTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+        self.values = {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)}
+
+    def test_mssql_offset_fetch(self):
+        statement = self.definition.page_statements["mssql"][("total_hours", True, False)]
+
+        self.assertIn(
+            "ORDER BY report.[total_hours] DESC, report.[department_name] DESC "
+            "OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
+            statement.sql,
+        )
+
+    def test_postgresql_sorts_null_like_mssql(self):
+        statement = self.definition.page_statements["postgresql"][("total_hours", True, False)]
+
+        self.assertIn(
+            'ORDER BY report."total_hours" DESC NULLS LAST, report."department_name" DESC NULLS LAST ',
+            statement.sql,
+        )
+
+    def test_postgresql_limit(self):
+        statement = self.definition.page_statements["postgresql"][("department_name", False, True)]
+
+        self.assertIn(
+            'WHERE ((((%s = 1 AND report."department_name" IS NOT NULL) '
+            'OR report."department_name" > %s))) ',
+            statement.sql,
+        )
+        self.assertTrue(statement.sql.endswith("LIMIT %s OFFSET %s"))
+
+    def test_keyset_params(self):
+        page = parse_page(
+            self.definition,
+            {"order_by": "-total_hours", "limit": 2, "cursor": encode_cursor(["24.0", "Sales"])},
+        )
+
+        self.assertEqual(
+            page_params(self.definition, self.values, page, "mssql"),
+            [date(2009, 1, 1), date(2009, 12, 31), 0, "24.0", 0, "24.0", 0, "Sales", 0, 3],
+        )
+        self.assertEqual(
+            page_params(self.definition, self.values, page, "postgresql")[-2:], [3, 0]
+        )
+
+
+    def test_keyset_pages_cross_null_values(self):
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE report (delta, name)")
+        connection.executemany(
+            "INSERT INTO report VALUES (?, ?)",
+            [(2, "a"), (None, "b"), (1, "c"), (None, None), (2, None), (None, "d")],
+        )
+
+        for descending in (False, True):
+            operator = "<" if descending else ">"
+            direction = "DESC" if descending else "ASC"
+            order_clause = f"ORDER BY delta {direction}, name {direction} LIMIT 2"
+            rows = connection.execute(f"SELECT * FROM report {order_clause}").fetchall()
+            seen = list(rows)
+
+            while rows:
+                page = ReportPage("delta", descending, 2, 0, list(rows[-1]), False)
+                condition = keyset_condition(["delta", "name"], operator).replace("%s", "?")
+                rows = connection.execute(
+                    f"SELECT * FROM report WHERE {condition} {order_clause}",
+                    page_params(self.definition, self.values, page, "postgresql")[2:-2],
+                ).fetchall()
+                seen.extend(rows)
+
+            expected = connection.execute(
+                f"SELECT * FROM report ORDER BY delta {direction}, name {direction}"
+            ).fetchall()
+            self.assertEqual(seen, expected)
+
+
+class PaginateRowsTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+
+    def test_keyset_pages_cover_every_row_once(self):
+        data = {"order_by": "-total_hours", "limit": 3}
+        seen = []
+
+        while True:
+            page = parse_page(self.definition, data)
+            rows, info = page_result(
+                self.definition, paginate_rows(self.definition, ROWS, page), page
+            )
+            seen.extend(row["department_name"] for row in rows)
+
+            if not info["has_more"]:
+                break
+
+            data = dict(data, cursor=info["next_cursor"])
+
+        self.assertEqual(seen, ["Sales", "Marketing", "Engineering", "Shipping"])
+
+    def test_null_sorts_below_any_value(self):
+        definition = registry.get_report("department_hours_comparison")
+        rows = [
+            {"department_name": "Engineering", "hours_delta_pct": Decimal("50.0")},
+            {"department_name": "Sales", "hours_delta_pct": None},
+            {"department_name": "Shipping", "hours_delta_pct": Decimal("-25.0")},
+        ]
+
+        ascending = paginate_rows(definition, rows, parse_page(definition, {"order_by": "hours_delta_pct"}))
+        descending = paginate_rows(definition, rows, parse_page(definition, {"order_by": "-hours_delta_pct"}))
+
+        self.assertEqual([row["department_name"] for row in ascending], ["Sales", "Shipping", "Engineering"])
+        self.assertEqual([row["department_name"] for row in descending], ["Engineering", "Shipping", "Sales"])
+
+    def test_keyset_page_after_null_value(self):
+        definition = registry.get_report("department_hours_comparison")
+        rows = [
+            {"department_name": "Engineering", "hours_delta_pct": Decimal("50.0")},
+            {"department_name": "Sales", "hours_delta_pct": None},
+        ]
+        page = parse_page(
+            definition, {"order_by": "hours_delta_pct", "cursor": encode_cursor([None, "Sales"])}
+        )
+
+        self.assertEqual(
+            [row["department_name"] for row in paginate_rows(definition, rows, page)], ["Engineering"]
+        )
+
+    def test_top_has_no_next_page(self):
+        page = parse_page(self.definition, {"top": 2})
+
+        rows, info = page_result(self.definition, paginate_rows(self.definition, ROWS, page), page)
+
+        self.assertEqual([row["department_name"] for row in rows], ["Sales", "Marketing"])
+        self.assertFalse(info["has_more"])
+        self.assertIsNone(info["next_cursor"])
+
+
+class LoadTablePageTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+        self.payload = {
+            "time_range": "Custom",
+            "start_date": "2009-01-01",
+            "end_date": "2009-12-31",
+        }
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_report(self, payload):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_page_is_pushed_down(self, mock_execute):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [("Sales", 24.0), ("Marketing", 24.0), ("Engineering", 16.0)]
+        mock_execute.return_value = cursor
+
+        response = self.post_report(dict(self.payload, order_by="-total_hours", limit=2))
+
+        statement, params = mock_execute.call_args[0][1:]
+        self.assertEqual(statement.name, "department_hours_mssql_page_total_hours_desc")
+        self.assertEqual(params, [date(2009, 1, 1), date(2009, 12, 31), 0, 3])
+
+        body = response.json()
+        self.assertEqual([row["department_name"] for row in body["data"]], ["Sales", "Marketing"])
+        self.assertTrue(body["page"]["has_more"])
+        self.assertEqual(decode_cursor(body["page"]["next_cursor"]), [24.0, "Marketing"])
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_cached_result_is_paged_in_memory(self, mock_execute):
+        values = {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)}
+        report_cache.set(make_cache_key("data", "department_hours", values), ROWS)
+
+        response = self.post_report(dict(self.payload, top=1))
+
+        mock_execute.assert_not_called()
+        self.assertEqual(
+            response.json()["data"], [{"department_name": "Sales", "total_hours": "24.0"}]
+        )
+
+    def test_page_cannot_be_streamed(self):
+        response = self.post_report(dict(self.payload, limit=10, stream="ndjson"))
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,203 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_partition import merge_partial_rows, slice_values, split_date_range
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter
+
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_registry as registry
+
+
+def fake_slice_query(alias, definition, values):
+    """Returns one partial row per department for each year of a slice."""
+
+    years = values["end_date"].year - values["start_date"].year + 1
+    return [
+        {"department_name": "Sales", "total_hours": Decimal("8.0") * years},
+        {"department_name": str(values["start_date"].year), "total_hours": Decimal("8.0")},
+    ]
+
+
+class SplitDateRangeTests(TestCase):
+
+    def test_month_slices_cut_at_range(self):
+        self.assertEqual(
+            split_date_range(date(2009, 1, 15), date(2009, 3, 10), "month", 24),
+            [
+                (date(2009, 1, 15), date(2009, 1, 31)),
+                (date(2009, 2, 1), date(2009, 2, 28)),
+                (date(2009, 3, 1), date(2009, 3, 10)),
+            ],
+        )
+
+    def test_quarter_slices(self):
+        self.assertEqual(
+            split_date_range(date(2009, 2, 1), date(2009, 7, 1), "quarter", 24),
+            [
+                (date(2009, 2, 1), date(2009, 3, 31)),
+                (date(2009, 4, 1), date(2009, 6, 30)),
+                (date(2009, 7, 1), date(2009, 7, 1)),
+            ],
+        )
+
+    def test_year_slices(self):
+        self.assertEqual(
+            split_date_range(date(2008, 6, 1), date(2010, 12, 31), "year", 24),
+            [
+                (date(2008, 6, 1), date(2008, 12, 31)),
+                (date(2009, 1, 1), date(2009, 12, 31)),
+                (date(2010, 1, 1), date(2010, 12, 31)),
+            ],
+        )
+
+    def test_periods_grouped_to_max_slices(self):
+        slices = split_date_range(date(2000, 1, 1), date(2009, 12, 31), "year", 4)
+
+        self.assertEqual(
+            slices,
+            [
+                (date(2000, 1, 1), date(2002, 12, 31)),
+                (date(2003, 1, 1), date(2005, 12, 31)),
+                (date(2006, 1, 1), date(2008, 12, 31)),
+                (date(2009, 1, 1), date(2009, 12, 31)),
+            ],
+        )
+
+    def test_all_time_range(self):
+        slices = split_date_range(date(1000, 1, 1), date(9999, 12, 31), "month", 24)
+
+        self.assertLessEqual(len(slices), 24)
+        self.assertEqual(slices[0][0], date(1000, 1, 1))
+        self.assertEqual(slices[-1][1], date(9999, 12, 31))
+
+        for (_, previous_end), (next_start, _) in zip(slices, slices[1:]):
+            self.assertEqual((next_start - previous_end).days, 1)
+
+    def test_empty_range(self):
+        self.assertEqual(split_date_range(date(2010, 1, 1), date(2009, 1, 1), "year", 24), [])
+
+
+class PartitionedReportTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+        self.values = {"start_date": date(2007, 1, 1), "end_date": date(2009, 12, 31)}
+
+    def test_department_hours_is_partitionable(self):
+        self.assertTrue(self.definition.partitionable)
+        self.assertEqual(len(slice_values(self.definition, self.values, "year")), 3)
+
+    def test_merge_sums_additive_columns(self):
+        merged = merge_partial_rows(
+            self.definition,
+            [
+                [{"department_name": "Sales", "total_hours": Decimal("8.0")}],
+                [
+                    {"department_name": "Sales", "total_hours": Decimal("16.0")},
+                    {"department_name": "Engineering", "total_hours": Decimal("8.0")},
+                ],
+            ],
+        )
+
+        self.assertEqual(
+            merged,
+            [
+                {"department_name": "Sales", "total_hours": Decimal("24.0")},
+                {"department_name": "Engineering", "total_hours": Decimal("8.0")},
+            ],
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query", side_effect=fake_slice_query)
+    def test_partitioned_query_matches_single_query(self, mock_query):
+        partitioned = rf.run_partitioned_query("data", self.definition, self.values, "year")
+
+        self.assertEqual(mock_query.call_count, 3)
+        self.assertEqual(
+            sorted(call[0][2]["start_date"] for call in mock_query.call_args_list),
+            [date(2007, 1, 1), date(2008, 1, 1), date(2009, 1, 1)],
+        )
+        self.assertEqual(
+            {row["department_name"]: row["total_hours"] for row in partitioned},
+            {"Sales": Decimal("24.0"), "2007": Decimal("8.0"), "2008": Decimal("8.0"), "2009": Decimal("8.0")},
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query", side_effect=fake_slice_query)
+    def test_single_slice_runs_one_query(self, mock_query):
+        values = {"start_date": date(2009, 2, 1), "end_date": date(2009, 5, 1)}
+
+        rf.run_partitioned_query("data", self.definition, values, "year")
+
+        mock_query.assert_called_once_with("data", self.definition, values)
+
+    @patch("cs_app.utils.report_functions.run_report_query", side_effect=ValueError("boom"))
+    def test_slice_error_is_raised(self, mock_query):
+        with self.assertRaises(ValueError):
+            rf.run_partitioned_query("data", self.definition, self.values, "year")
+
+    def test_partition_range_must_name_date_parameters(self):
+        definition = ReportDefinition(
+            report_id="bad_partition",
+            title="Bad Partition",
+            parameters=[ReportParameter("start_date"), ReportParameter("name", "text")],
+            sql={"mssql": "SELECT %s, %s", "postgresql": "SELECT %s, %s"},
+            columns=["name", "total"],
+            partition_range=("start_date", "name"),
+            additive_columns=["total"],
+        )
+
+        with self.assertRaises(ImproperlyConfigured):
+            definition.validate()
+
+
+class LoadTablePartitionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+        self.payload = {
+            "time_range": "Custom",
+            "start_date": "2007-01-01",
+            "end_date": "2009-12-31",
+        }
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_report(self, payload):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query", side_effect=fake_slice_query)
+    def test_partitioned_report(self, mock_query):
+        response = self.post_report(dict(self.payload, partition="year"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_query.call_count, 3)
+        self.assertIn(
+            {"department_name": "Sales", "total_hours": "24.0"}, response.json()["data"]
+        )
+
+    def test_invalid_partition(self):
+        response = self.post_report(dict(self.payload, partition="week"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid partition"})
@@ -0,0 +1,101 @@
+from django.test import TestCase
+from django.urls import reverse
+from ..models import User
+
+from unittest.mock import MagicMock
+
+import cs_app.utils.report_queries as rq
+
+
+class ExecuteStatementTests(TestCase):
+
+    def setUp(self):
+        rq.reset_statement_stats()
+        self.statement = rq.ReportStatement("test_statement", "SELECT %s, %s")
+
+    def tearDown(self):
+        rq.reset_statement_stats()
+
+    def test_execute_binds_parameters(self):
+        cursor = rq.execute_statement("default", self.statement, [1, "a"])
+
+        self.assertEqual(list(cursor.fetchall()), [(1, "a")])
+
+    def test_execute_records_statistics(self):
+        rq.execute_statement("default", self.statement, [1, "a"])
+        rq.execute_statement("default", self.statement, [2, "b"])
+
+        stats = rq.get_statement_stats()["test_statement"]
+        self.assertEqual(stats["executions"], 2)
+        self.assertGreaterEqual(stats["max_ms"], stats["last_ms"])
+
+    def test_numbered_placeholders(self):
+        self.assertEqual(
+            rq.to_numbered_placeholders("WHERE a BETWEEN %s AND %s"),
+            "WHERE a BETWEEN $1 AND $2",
+        )
+
+    def test_postgresql_prepares_once_per_connection(self):
+        conn = MagicMock(spec=["cursor", "connection", "wrap_database_errors"])
+        cursor = conn.cursor.return_value
+
+        rq.execute_prepared_postgresql(conn, self.statement, [1, "a"])
+        _, prepared = rq.execute_prepared_postgresql(conn, self.statement, [2, "b"])
+
+        self.assertFalse(prepared)
+        executed = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertEqual(
+            executed,
+            [
+                "PREPARE cs_test_statement AS SELECT $1, $2",
+                "EXECUTE cs_test_statement (%s, %s)",
+                "EXECUTE cs_test_statement (%s, %s)",
+            ],
+        )
+
+    def test_mssql_reuses_statement_cursor(self):
+        conn = MagicMock(spec=["cursor", "connection", "wrap_database_errors"])
+
+        first_cursor, first_prepared = rq.execute_prepared_mssql(conn, self.statement, [1, "a"])
+        second_cursor, second_prepared = rq.execute_prepared_mssql(conn, self.statement, [2, "b"])
+
+        self.assertIs(first_cursor, second_cursor)
+        self.assertTrue(first_prepared)
+        self.assertFalse(second_prepared)
+        first_cursor.execute.assert_called_with("SELECT ?, ?", [2, "b"])
+
+    def test_mssql_cursor_is_replaced_when_timeout_changes(self):
+        conn = MagicMock(spec=["cursor", "connection", "wrap_database_errors"])
+        conn.connection.cursor.side_effect = lambda: MagicMock()
+        conn.connection.timeout = 30
+
+        first_cursor, _ = rq.execute_prepared_mssql(conn, self.statement, [1, "a"])
+        conn.connection.timeout = 5
+        second_cursor, prepared = rq.execute_prepared_mssql(conn, self.statement, [2, "b"])
+
+        self.assertIsNot(first_cursor, second_cursor)
+        self.assertTrue(prepared)
+        first_cursor.close.assert_called_once()
+        second_cursor.execute.assert_called_once_with("SELECT ?, ?", [2, "b"])
+
+
+class ReportStatisticsViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def test_report_statistics_requires_staff(self):
+        response = self.client.get(reverse("report_statistics"))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_report_statistics_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse("report_statistics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("cache", response.json())
+        self.assertIn("statements", response.json())
@@ -0,0 +1,104 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+
+from datetime import date
+
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter
+
+import cs_app.utils.report_registry as registry
+
+
+class ReportDefinitionTests(TestCase):
+
+    def make_definition(self, **overrides):
+        options = {
+            "report_id": "test_report",
+            "title": "Test Report",
+            "parameters": [ReportParameter("start_date"), ReportParameter("end_date")],
+            "sql": {
+                "mssql": "SELECT a FROM t WHERE d BETWEEN %s AND %s",
+                "postgresql": "SELECT a FROM t WHERE d BETWEEN %s AND %s",
+            },
+            "columns": ["a"],
+        }
+        options.update(overrides)
+        return ReportDefinition(**options)
+
+    def test_compile_creates_statement_per_engine(self):
+        definition = self.make_definition()
+        definition.compile()
+
+        self.assertEqual(definition.statement_for("mssql").name, "test_report_mssql")
+        self.assertEqual(definition.statement_for("postgresql").name, "test_report_postgresql")
+
+    def test_placeholder_count_must_match_parameters(self):
+        definition = self.make_definition(
+            sql={"mssql": "SELECT a FROM t WHERE d > %s", "postgresql": "SELECT a FROM t WHERE d > %s"}
+        )
+
+        with self.assertRaises(ImproperlyConfigured):
+            definition.compile()
+
+    def test_missing_engine_sql_is_rejected(self):
+        definition = self.make_definition(sql={"mssql": "SELECT a FROM t WHERE d BETWEEN %s AND %s"})
+
+        with self.assertRaises(ImproperlyConfigured):
+            definition.compile()
+
+    def test_params_follow_bind_order(self):
+        definition = self.make_definition(bind_order=["end_date", "start_date"])
+
+        self.assertEqual(
+            definition.params_for({"start_date": 1, "end_date": 2}),
+            [2, 1],
+        )
+
+
+class BindParametersTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+
+    def test_dates_are_converted(self):
+        self.assertEqual(
+            registry.bind_parameters(
+                self.definition, {"start_date": "2009-01-01", "end_date": "2009-12-31T00:00:00"}
+            ),
+            {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)},
+        )
+
+    def test_missing_dates_use_defaults(self):
+        self.assertEqual(
+            registry.bind_parameters(self.definition, {"start_date": ""}),
+            {"start_date": date(1000, 1, 1), "end_date": date(9999, 12, 31)},
+        )
+
+    def test_invalid_date_is_rejected(self):
+        with self.assertRaises(ValueError):
+            registry.bind_parameters(self.definition, {"start_date": "yesterday"})
+
+    def test_required_parameter_is_rejected_when_missing(self):
+        definition = registry.get_report("department_daily_rollup", include_internal=True)
+
+        with self.assertRaises(ValueError):
+            registry.bind_parameters(definition, {})
+
+
+class RegistryTests(TestCase):
+
+    def test_reports_are_compiled_at_startup(self):
+        definition = registry.get_report("department_hours")
+
+        self.assertIn("mssql", definition.statements)
+        self.assertIn("postgresql", definition.statements)
+
+    def test_internal_reports_are_hidden(self):
+        self.assertIsNone(registry.get_report("department_daily_rollup"))
+        self.assertIsNotNone(registry.get_report("department_daily_rollup", include_internal=True))
+
+    def test_duplicate_report_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            registry.register_report(registry.get_report("department_hours"))
+
+    def test_engine_of_alias(self):
+        self.assertEqual(registry.get_engine("data"), "mssql")
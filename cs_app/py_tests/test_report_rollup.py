@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.test import TestCase
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+from ..models import DepartmentDailyRollup, RollupWatermark
+
+from cs_app.utils.report_queries import connection_identity
+
+import cs_app.utils.report_rollup as rollup
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_registry as registry
+
+
+class RefreshRollupTests(TestCase):
+
+    def mock_execute(self, rows):
+        mock_execute = MagicMock()
+        mock_execute.return_value.fetchall.return_value = rows
+        return mock_execute
+
+    def test_first_refresh_loads_all_days(self):
+        rows = [
+            (date(2009, 1, 5), "Sales", 2),
+            (date(2009, 1, 6), "Engineering", 1),
+        ]
+
+        with patch("cs_app.utils.report_rollup.execute_statement", self.mock_execute(rows)):
+            loaded = rollup.refresh_rollup("data", date(2009, 1, 31))
+
+        self.assertEqual(loaded, 2)
+        self.assertEqual(DepartmentDailyRollup.objects.count(), 2)
+        self.assertEqual(rollup.get_rollup_watermark("data"), date(2009, 1, 31))
+
+    def test_refresh_only_requests_days_after_watermark(self):
+        RollupWatermark.objects.create(connection_key=connection_identity("data"), last_day=date(2009, 1, 31))
+        mock_execute = self.mock_execute([(date(2009, 2, 2), "Sales", 1)])
+
+        with patch("cs_app.utils.report_rollup.execute_statement", mock_execute):
+            rollup.refresh_rollup("data", date(2009, 2, 28))
+
+        self.assertEqual(mock_execute.call_args[0][2], [date(2009, 1, 31), date(2009, 2, 28)])
+        self.assertEqual(rollup.get_rollup_watermark("data"), date(2009, 2, 28))
+
+    def test_rollup_follows_the_server_not_the_alias_name(self):
+        mock_execute = self.mock_execute([(date(2009, 1, 5), "Sales", 2)])
+
+        with patch("cs_app.utils.report_rollup.execute_statement", mock_execute):
+            rollup.refresh_rollup("data", date(2009, 1, 31))
+
+        with patch.dict(settings.DATABASES["data"], HOST="another-server"):
+            self.assertIsNone(rollup.get_rollup_watermark("data"))
+            self.assertEqual(rollup.rollup_department_counts("data", date(2009, 1, 1), date(2009, 1, 31)), {})
+
+        self.assertEqual(rollup.rollup_department_counts("data", date(2009, 1, 1), date(2009, 1, 31)), {"Sales": 2})
+
+    def test_refresh_up_to_date_does_nothing(self):
+        RollupWatermark.objects.create(connection_key=connection_identity("data"), last_day=date(2009, 1, 31))
+
+        with patch("cs_app.utils.report_rollup.execute_statement") as mock_execute:
+            loaded = rollup.refresh_rollup("data", date(2009, 1, 31))
+
+        self.assertEqual(loaded, 0)
+        mock_execute.assert_not_called()
+
+
+class RollupDepartmentHoursTests(TestCase):
+
+    def setUp(self):
+        RollupWatermark.objects.create(connection_key=connection_identity("data"), last_day=date(2009, 1, 31))
+        DepartmentDailyRollup.objects.create(
+            connection_key=connection_identity("data"), day=date(2009, 1, 10), department_name="Sales", assignment_count=2
+        )
+        DepartmentDailyRollup.objects.create(
+            connection_key="mssql://other:/AdventureWorks2022", day=date(2009, 1, 10), department_name="Sales", assignment_count=5
+        )
+
+    def values(self, start_date, end_date):
+        return {"start_date": start_date, "end_date": end_date}
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_range_inside_rollup_skips_live_query(self, mock_query):
+        data = rf.rollup_department_hours("data", self.values(date(2009, 1, 1), date(2009, 1, 31)))
+
+        self.assertEqual(data, [{"department_name": "Sales", "total_hours": Decimal("16.0")}])
+        mock_query.assert_not_called()
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_uncovered_days_fall_back_to_live_query(self, mock_query):
+        mock_query.return_value = [{"department_name": "Sales", "total_hours": Decimal("8.0")}]
+
+        data = rf.rollup_department_hours("data", self.values(date(2009, 1, 1), date(2009, 2, 28)))
+
+        self.assertEqual(mock_query.call_args[0][2], self.values(date(2009, 2, 1), date(2009, 2, 28)))
+        self.assertEqual(data, [{"department_name": "Sales", "total_hours": Decimal("24.0")}])
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_alias_without_rollup_uses_live_query(self, mock_query):
+        mock_query.return_value = []
+        definition = registry.get_report("department_hours")
+        values = self.values(date(2009, 1, 1), date(2009, 1, 31))
+
+        rf.compute_report_data("unknown", definition, values)
+
+        mock_query.assert_called_once_with("unknown", definition, values)
@@ -0,0 +1,170 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..models import User, ReportJob
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter
+from cs_app.utils.report_sampling import estimate_columns, estimate_rows
+
+import cs_app.utils.report_registry as registry
+
+
+class SampleStatementTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+
+    def test_tablesample_clause_per_engine(self):
+        self.assertIn(
+            "[EmployeeDepartmentHistory] TABLESAMPLE SYSTEM (10 PERCENT)",
+            self.definition.sample_statement_for("mssql").sql,
+        )
+        self.assertIn(
+            '"employeedepartmenthistory" TABLESAMPLE SYSTEM (10)',
+            self.definition.sample_statement_for("postgresql").sql,
+        )
+
+    def test_reports_without_sample_sql_have_no_preview(self):
+        definition = registry.get_report("department_hours_comparison")
+
+        self.assertFalse(definition.samplable)
+        with self.assertRaises(ValueError):
+            definition.sample_statement_for("mssql")
+
+    def test_sample_sql_needs_marker(self):
+        definition = ReportDefinition(
+            report_id="bad_sample",
+            title="Bad Sample",
+            parameters=[ReportParameter("start_date")],
+            sql={"mssql": "SELECT a, b FROM t WHERE d > %s", "postgresql": "SELECT a, b FROM t WHERE d > %s"},
+            columns=["a", "b"],
+            additive_columns=["b"],
+            sample_sql={"mssql": "SELECT a, b, COUNT(*) FROM t WHERE d > %s"},
+        )
+
+        with self.assertRaises(ImproperlyConfigured):
+            definition.validate()
+
+
+class EstimateRowsTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+
+    def test_counts_are_scaled_with_margin(self):
+        rows = estimate_rows(
+            self.definition,
+            [{"department_name": "Sales", "total_hours": Decimal("80.0"), "sample_rows": 10}],
+        )
+
+        # 10 sampled rows at 10%: 100 rows of 8 hours, margin 8 * 1.96 * sqrt(10 * 0.9) / 0.1
+        self.assertEqual(
+            rows,
+            [
+                {
+                    "department_name": "Sales",
+                    "total_hours": Decimal("800.00"),
+                    "total_hours_margin": Decimal("470.40"),
+                }
+            ],
+        )
+
+    def test_estimate_columns(self):
+        self.assertEqual(
+            estimate_columns(self.definition),
+            ["department_name", "total_hours", "total_hours_margin"],
+        )
+
+
+class LoadTablePreviewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+        self.payload = {
+            "time_range": "Custom",
+            "start_date": "2009-01-01",
+            "end_date": "2009-12-31",
+            "preview": True,
+        }
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def post_report(self, payload):
+        return self.client.post(
+            reverse("load_table"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    @override_settings(REPORT_JOB_WORKER=True)
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_preview_queues_exact_job(self, mock_execute):
+        mock_execute.return_value.fetchall.return_value = [("Sales", Decimal("80.0"), 10)]
+
+        response = self.post_report(self.payload)
+
+        body = response.json()
+        self.assertEqual(mock_execute.call_args[0][1].name, "department_hours_mssql_sample")
+        self.assertTrue(body["approximate"])
+        self.assertEqual(body["data"][0]["total_hours"], "800.00")
+        self.assertEqual(body["job"]["status"], ReportJob.QUEUED)
+        self.assertEqual(ReportJob.objects.get().report_id, "department_hours")
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_preview_without_job_worker_queues_nothing(self, mock_execute):
+        mock_execute.return_value.fetchall.return_value = [("Sales", Decimal("80.0"), 10)]
+
+        body = self.post_report(self.payload).json()
+
+        self.assertTrue(body["approximate"])
+        self.assertNotIn("job", body)
+        self.assertFalse(ReportJob.objects.exists())
+
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_cached_result_is_exact(self, mock_execute):
+        values = {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)}
+        report_cache.set(
+            make_cache_key("data", "department_hours", values),
+            [{"department_name": "Sales", "total_hours": 24.0}],
+        )
+
+        body = self.post_report(self.payload).json()
+
+        mock_execute.assert_not_called()
+        self.assertFalse(body["approximate"])
+        self.assertNotIn("job", body)
+        self.assertFalse(ReportJob.objects.exists())
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    @patch("cs_app.utils.report_functions.execute_statement")
+    def test_streamed_preview_sends_estimate_then_exact(self, mock_execute, mock_query):
+        mock_execute.return_value.fetchall.return_value = [("Sales", Decimal("80.0"), 10)]
+        mock_query.return_value = [{"department_name": "Sales", "total_hours": Decimal("792.0")}]
+
+        response = self.post_report(dict(self.payload, stream="ndjson"))
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        documents = [json.loads(line) for line in lines]
+        self.assertEqual([document["phase"] for document in documents], ["estimate", "exact"])
+        self.assertEqual(documents[1]["data"], [{"department_name": "Sales", "total_hours": "792.0"}])
+
+    def test_preview_cannot_be_paged(self):
+        response = self.post_report(dict(self.payload, top=5))
+
+        self.assertEqual(response.status_code, 400)
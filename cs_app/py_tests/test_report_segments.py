@@ -0,0 +1,140 @@
+from django.test import TestCase
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from cs_app.utils.report_segments import SegmentStore, make_segment_scope, segment_store
+
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_registry as registry
+
+
+def fake_range_query(alias, definition, values):
+    """Returns eight hours of Sales for every month touched by the range."""
+
+    start, end = values["start_date"], values["end_date"]
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    return [{"department_name": "Sales", "total_hours": Decimal("8.0") * months}]
+
+
+class SegmentStoreTests(TestCase):
+
+    def setUp(self):
+        self.store = SegmentStore(max_segments=3, ttl_seconds=60)
+        self.scope = ("data", "department_hours", ())
+
+    def test_empty_store_plans_one_gap(self):
+        self.assertEqual(
+            self.store.plan(self.scope, date(2009, 1, 1), date(2009, 3, 31)),
+            ([], [(date(2009, 1, 1), date(2009, 3, 31))]),
+        )
+
+    def test_widened_range_only_misses_new_days(self):
+        self.store.add(self.scope, date(2009, 1, 1), date(2009, 3, 31), ["jan-mar"])
+
+        self.assertEqual(
+            self.store.plan(self.scope, date(2009, 1, 1), date(2009, 4, 30)),
+            ([["jan-mar"]], [(date(2009, 4, 1), date(2009, 4, 30))]),
+        )
+
+    def test_gaps_between_segments(self):
+        self.store.add(self.scope, date(2009, 2, 1), date(2009, 2, 28), ["feb"])
+        self.store.add(self.scope, date(2009, 4, 1), date(2009, 4, 30), ["apr"])
+
+        self.assertEqual(
+            self.store.plan(self.scope, date(2009, 1, 1), date(2009, 5, 31)),
+            (
+                [["feb"], ["apr"]],
+                [
+                    (date(2009, 1, 1), date(2009, 1, 31)),
+                    (date(2009, 3, 1), date(2009, 3, 31)),
+                    (date(2009, 5, 1), date(2009, 5, 31)),
+                ],
+            ),
+        )
+
+    def test_segment_outside_range_is_not_reused(self):
+        self.store.add(self.scope, date(2009, 1, 1), date(2009, 3, 31), ["jan-mar"])
+
+        self.assertEqual(
+            self.store.plan(self.scope, date(2009, 2, 1), date(2009, 4, 30)),
+            ([], [(date(2009, 2, 1), date(2009, 4, 30))]),
+        )
+
+    def test_overlapping_segment_is_not_stored(self):
+        self.store.add(self.scope, date(2009, 1, 1), date(2009, 3, 31), ["jan-mar"])
+        self.store.add(self.scope, date(2009, 3, 1), date(2009, 4, 30), ["mar-apr"])
+
+        self.assertEqual(self.store.stats()["segments"], 1)
+
+    def test_scopes_do_not_mix(self):
+        self.store.add(self.scope, date(2009, 1, 1), date(2009, 3, 31), ["data"])
+        other_scope = ("other_db", "department_hours", ())
+
+        self.assertEqual(
+            self.store.plan(other_scope, date(2009, 1, 1), date(2009, 3, 31)),
+            ([], [(date(2009, 1, 1), date(2009, 3, 31))]),
+        )
+
+    def test_least_recently_used_segment_is_evicted(self):
+        self.store.add(self.scope, date(2009, 1, 1), date(2009, 1, 31), ["jan"])
+        self.store.add(self.scope, date(2009, 2, 1), date(2009, 2, 28), ["feb"])
+        self.store.add(self.scope, date(2009, 3, 1), date(2009, 3, 31), ["mar"])
+        self.store.plan(self.scope, date(2009, 1, 1), date(2009, 1, 31))
+        self.store.add(self.scope, date(2009, 4, 1), date(2009, 4, 30), ["apr"])
+
+        reused, gaps = self.store.plan(self.scope, date(2009, 1, 1), date(2009, 4, 30))
+
+        self.assertEqual(reused, [["jan"], ["mar"], ["apr"]])
+        self.assertEqual(gaps, [(date(2009, 2, 1), date(2009, 2, 28))])
+        self.assertEqual(self.store.stats()["evictions"], 1)
+
+    def test_expired_segment_is_a_gap(self):
+        with patch("cs_app.utils.report_segments.time.monotonic", return_value=1000):
+            self.store.add(self.scope, date(2009, 1, 1), date(2009, 1, 31), ["jan"])
+
+        with patch("cs_app.utils.report_segments.time.monotonic", return_value=1061):
+            reused, gaps = self.store.plan(self.scope, date(2009, 1, 1), date(2009, 1, 31))
+
+        self.assertEqual(reused, [])
+        self.assertEqual(self.store.stats()["segments"], 0)
+
+    def test_invalidate_alias(self):
+        self.store.add(self.scope, date(2009, 1, 1), date(2009, 1, 31), ["jan"])
+        self.store.add(("other_db", "department_hours", ()), date(2009, 1, 1), date(2009, 1, 31), ["jan"])
+
+        self.assertEqual(self.store.invalidate_alias("data"), 1)
+        self.assertEqual(self.store.stats()["segments"], 1)
+
+
+class SegmentedReportTests(TestCase):
+
+    def setUp(self):
+        self.definition = registry.get_report("department_hours")
+        segment_store.clear()
+
+    def tearDown(self):
+        segment_store.clear()
+
+    def test_scope_ignores_range(self):
+        self.assertEqual(
+            make_segment_scope("data", self.definition, {"start_date": date(2009, 1, 1), "end_date": date(2009, 3, 31)}),
+            ("data", "department_hours", ()),
+        )
+
+    @patch("cs_app.utils.report_functions.run_report_query", side_effect=fake_range_query)
+    def test_widened_range_queries_missing_segment(self, mock_query):
+        rf.run_segmented_query(
+            "data", self.definition, {"start_date": date(2009, 1, 1), "end_date": date(2009, 3, 31)}
+        )
+        rows = rf.run_segmented_query(
+            "data", self.definition, {"start_date": date(2009, 1, 1), "end_date": date(2009, 4, 30)}
+        )
+
+        self.assertEqual(rows, [{"department_name": "Sales", "total_hours": Decimal("32.0")}])
+        self.assertEqual(mock_query.call_count, 2)
+        self.assertEqual(
+            mock_query.call_args[0][2],
+            {"start_date": date(2009, 4, 1), "end_date": date(2009, 4, 30)},
+        )
@@ -0,0 +1,138 @@
+import json
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import User, SlowReportQuery
+
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_explain import StageTimer
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_slowlog import SlowQueryWriter, iter_recorded, record_report_run
+
+
+def slow_timer(milliseconds):
+    timer = StageTimer()
+    timer.stages["query"] = milliseconds
+    return timer
+
+
+class RecordReportRunTests(TestCase):
+
+    @patch("cs_app.utils.report_slowlog.slow_query_writer.submit")
+    def test_fast_runs_are_not_logged(self, mock_submit):
+        logged = record_report_run(None, "data", "department_hours", "All Time", {}, 4, slow_timer(5))
+
+        self.assertFalse(logged)
+        mock_submit.assert_not_called()
+
+    @override_settings(REPORT_SLOW_QUERY_THRESHOLD_MS=100)
+    @patch("cs_app.utils.report_slowlog.slow_query_writer.submit")
+    def test_slow_runs_are_queued(self, mock_submit):
+        record_report_run(
+            None, "data", "department_hours", "Custom", {"start_date": date(2009, 1, 1)}, 4, slow_timer(250)
+        )
+
+        entry = mock_submit.call_args[0][0]
+        self.assertEqual(entry["parameters"], {"start_date": "2009-01-01"})
+        self.assertEqual(entry["duration_ms"], 250)
+        self.assertEqual(entry["stage_timings"], {"query": 250, "total": 250})
+
+    def test_stream_is_logged_when_it_ends(self):
+        recorded = []
+        timer = StageTimer()
+
+        batches = list(iter_recorded(iter([[1, 2], [3]]), timer, recorded.append))
+
+        self.assertEqual(batches, [[1, 2], [3]])
+        self.assertEqual(recorded, [3])
+        self.assertIn("stream", timer.stages)
+
+
+class SlowQueryWriterTests(TestCase):
+
+    def entry(self, days_ago=0):
+        return {
+            "user_id": None,
+            "database_alias": "data",
+            "report_id": "department_hours",
+            "report_type": "Custom",
+            "parameters": {},
+            "row_count": 4,
+            "duration_ms": 2500.0,
+            "stage_timings": {"query": 2500.0, "total": 2500.0},
+            "ran_on": timezone.now() - timedelta(days=days_ago),
+        }
+
+    def test_write_inserts_batch(self):
+        writer = SlowQueryWriter()
+
+        writer.write([self.entry(), self.entry()])
+
+        self.assertEqual(SlowReportQuery.objects.count(), 2)
+        self.assertEqual(writer.stats()["written"], 2)
+
+    @patch.object(SlowQueryWriter, "start")
+    def test_full_queue_drops_entries(self, mock_start):
+        writer = SlowQueryWriter(max_queued=1)
+
+        self.assertTrue(writer.submit(self.entry()))
+        self.assertFalse(writer.submit(self.entry()))
+        self.assertEqual(writer.stats()["dropped"], 1)
+
+    def test_purge_command_deletes_old_entries(self):
+        SlowQueryWriter().write([self.entry(days_ago=40), self.entry(days_ago=1)])
+        out = StringIO()
+
+        call_command("purge_slow_queries", "--days", "30", stdout=out)
+
+        self.assertEqual(SlowReportQuery.objects.count(), 1)
+        self.assertIn("Deleted 1", out.getvalue())
+
+    def test_admin_shows_aggregates(self):
+        SlowQueryWriter().write([self.entry(), self.entry()])
+        User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.login(username="admin", password="adminpass")
+
+        response = self.client.get(reverse("admin:cs_app_slowreportquery_changelist"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["summary"]["runs"], 2)
+        self.assertEqual(response.context["summary_by_report"][0]["report_id"], "department_hours")
+
+
+@override_settings(REPORT_SLOW_QUERY_THRESHOLD_MS=0)
+class LoadTableSlowLogTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        report_cache.clear()
+        segment_store.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    @patch("cs_app.utils.report_slowlog.slow_query_writer.submit")
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_report_run_is_logged_with_stage_timings(self, mock_query, mock_submit):
+        mock_query.return_value = [{"department_name": "Sales", "total_hours": 24.0}]
+
+        self.client.post(
+            reverse("load_table"),
+            data=json.dumps({"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31"}),
+            content_type="application/json",
+        )
+
+        entry = mock_submit.call_args[0][0]
+        self.assertEqual(entry["user_id"], self.user.pk)
+        self.assertEqual(entry["row_count"], 1)
+        self.assertEqual(list(entry["stage_timings"]), ["history", "query", "serialize", "snapshot", "total"])
@@ -0,0 +1,236 @@
+import json
+import tempfile
+import unittest
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..models import User, RanReportParameter, ReportSnapshot
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_queries import connection_identity
+from cs_app.utils.report_registry import get_report
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_snapshots import (
+    SnapshotStore,
+    decode_snapshot,
+    encode_snapshot,
+    get_snapshot_format,
+    save_snapshot,
+    snapshot_available,
+)
+
+
+ROWS = [
+    {"department_name": "Sales", "total_hours": Decimal("24.0")},
+    {"department_name": "Marketing", "total_hours": Decimal("8.0")},
+]
+
+COLUMNS = ["department_name", "total_hours"]
+
+
+class SnapshotStoreTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_identical_content_is_stored_once(self):
+        first = self.store.put(b"rows", ".bin")
+        second = self.store.put(b"rows", ".bin")
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(".bin"))
+
+    def test_file_is_read_through_a_memory_map(self):
+        blob_name = self.store.put(b"rows", ".bin")
+
+        with self.store.open(blob_name) as mapped:
+            self.assertEqual(mapped[:], b"rows")
+
+        self.store.delete(blob_name)
+        self.assertFalse(self.store.exists(blob_name))
+
+    def test_unavailable_format_falls_back(self):
+        with patch(
+            "cs_app.utils.report_snapshots.snapshot_available",
+            side_effect=lambda snapshot_format: snapshot_format == "msgpack",
+        ):
+            self.assertEqual(get_snapshot_format(), "msgpack")
+
+        with patch("cs_app.utils.report_snapshots.snapshot_available", return_value=False):
+            self.assertIsNone(get_snapshot_format())
+
+
+class SnapshotFormatTests(TestCase):
+
+    @unittest.skipUnless(snapshot_available("arrow"), "pyarrow is not installed")
+    def test_arrow_round_trip(self):
+        columns, rows = decode_snapshot(encode_snapshot(ROWS, COLUMNS, "arrow"), "arrow")
+
+        self.assertEqual(columns, COLUMNS)
+        self.assertEqual(rows, ROWS)
+
+    @unittest.skipUnless(snapshot_available("msgpack"), "msgpack or zstandard is not installed")
+    def test_msgpack_round_trip(self):
+        columns, rows = decode_snapshot(encode_snapshot(ROWS, COLUMNS, "msgpack"), "msgpack")
+
+        self.assertEqual(columns, COLUMNS)
+        self.assertEqual(rows[0], {"department_name": "Sales", "total_hours": "24.0"})
+
+
+def fake_encode(rows, columns, snapshot_format):
+    return json.dumps({"columns": columns, "rows": rows}, default=str).encode("utf-8")
+
+
+def fake_decode(content, snapshot_format):
+    document = json.loads(bytes(content))
+    return document["columns"], document["rows"]
+
+
+@patch("cs_app.utils.report_snapshots.get_snapshot_format", return_value="msgpack")
+@patch("cs_app.utils.report_snapshots.encode_snapshot", side_effect=fake_encode)
+@patch("cs_app.utils.report_snapshots.decode_snapshot", side_effect=fake_decode)
+class SnapshotViewTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(REPORT_SNAPSHOT_DIR=self.directory.name)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.user.active_database_alias = "data"
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        self.run = RanReportParameter.objects.create(
+            user=self.user,
+            report_type="Custom",
+            ran_on_date=date(2024, 3, 15),
+            start_date=date(2009, 1, 1),
+            end_date=date(2009, 12, 31),
+            database_name="data",
+            connection_key=connection_identity("data"),
+        )
+        self.definition = get_report("department_hours")
+        self.values = {"start_date": date(2009, 1, 1), "end_date": date(2009, 12, 31)}
+        report_cache.clear()
+        segment_store.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def test_replaced_snapshot_releases_its_file(self, *mocks):
+        first = save_snapshot(self.run, "data", self.definition, self.values, ROWS)
+        second = save_snapshot(self.run, "data", self.definition, self.values, ROWS[:1])
+
+        self.assertEqual(ReportSnapshot.objects.count(), 1)
+        self.assertEqual(second.row_count, 1)
+        self.assertFalse(SnapshotStore(self.directory.name).exists(first.blob_name))
+
+    @override_settings(REPORT_SNAPSHOT_MAX_ROWS=1)
+    def test_large_results_are_not_kept(self, *mocks):
+        self.assertIsNone(save_snapshot(self.run, "data", self.definition, self.values, ROWS))
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_load_table_keeps_snapshot_of_history_entry(self, mock_query, *mocks):
+        mock_query.return_value = ROWS
+
+        self.client.post(
+            reverse("load_table"),
+            data=json.dumps({"time_range": "Custom", "start_date": "2009-01-01", "end_date": "2009-12-31"}),
+            content_type="application/json",
+        )
+
+        snapshot = ReportSnapshot.objects.get()
+        self.assertEqual(snapshot.run, self.run)
+        self.assertEqual(snapshot.parameters, {"start_date": "2009-01-01", "end_date": "2009-12-31"})
+
+    def test_snapshot_is_replayed(self, *mocks):
+        save_snapshot(self.run, "data", self.definition, self.values, ROWS)
+
+        response = self.client.get(reverse("report_snapshot", args=[self.run.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"][0], {"department_name": "Sales", "total_hours": "24.0"})
+        self.assertEqual(response.json()["snapshot"]["run_id"], self.run.pk)
+
+    def test_runs_of_other_users_are_not_replayed(self, *mocks):
+        save_snapshot(self.run, "data", self.definition, self.values, ROWS)
+        User.objects.create_user(username="other", password="otherpass")
+        self.client.login(username="other", password="otherpass")
+
+        response = self.client.get(reverse("report_snapshot", args=[self.run.pk]))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_run_without_snapshot(self, *mocks):
+        response = self.client.get(reverse("report_snapshot", args=[self.run.pk]))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"], "No snapshot for this report")
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_refresh_runs_report_again(self, mock_query, *mocks):
+        report_cache.set(make_cache_key("data", "department_hours", self.values), ROWS)
+        save_snapshot(self.run, "data", self.definition, self.values, ROWS)
+        mock_query.return_value = ROWS[:1]
+
+        response = self.client.post(
+            reverse("refresh_report_snapshot", args=[self.run.pk]), data="{}", content_type="application/json"
+        )
+
+        mock_query.assert_called_once()
+        self.assertEqual(len(response.json()["data"]), 1)
+        self.assertEqual(ReportSnapshot.objects.get().row_count, 1)
+        self.assertEqual(report_cache.get(make_cache_key("data", "department_hours", self.values)), ROWS[:1])
+
+    def test_generate_report_replays_history_entry(self, *mocks):
+        save_snapshot(self.run, "data", self.definition, self.values, ROWS)
+
+        response = self.client.get(
+            reverse("generate_report"), {"additionalInfo": json.dumps({"run_id": self.run.pk})}
+        )
+
+        self.assertEqual(response.context["snapshot_run_id"], self.run.pk)
+
+    def test_result_of_another_report_is_not_kept(self, *mocks):
+        definition = get_report("department_active_hours")
+
+        self.assertIsNone(save_snapshot(self.run, "data", definition, self.values, ROWS))
+        self.assertFalse(ReportSnapshot.objects.exists())
+
+    def test_result_of_another_database_is_not_kept(self, *mocks):
+        self.run.connection_key = "mssql|other|sales|"
+        self.run.save()
+
+        self.assertIsNone(save_snapshot(self.run, "data", self.definition, self.values, ROWS))
+
+    def test_mismatched_snapshot_is_refused(self, *mocks):
+        save_snapshot(self.run, "data", self.definition, self.values, ROWS)
+        ReportSnapshot.objects.update(report_id="department_active_hours")
+
+        response = self.client.get(reverse("report_snapshot", args=[self.run.pk]))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], "Snapshot does not match this report")
+
+    @patch("cs_app.utils.report_functions.run_report_query")
+    def test_refresh_on_another_database_is_refused(self, mock_query, *mocks):
+        self.run.connection_key = "mssql|other|sales|"
+        self.run.save()
+
+        response = self.client.post(
+            reverse("refresh_report_snapshot", args=[self.run.pk]), data="{}", content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 409)
+        mock_query.assert_not_called()
@@ -0,0 +1,63 @@
+import json
+
+from django.test import TestCase
+
+from decimal import Decimal
+
+from cs_app.utils.report_inflight import ReportCancelled
+from cs_app.utils.report_streaming import stream_ndjson, stream_json_array
+
+
+class ReportStreamingTests(TestCase):
+
+    def setUp(self):
+        self.batches = [
+            [{"department_name": "Sales", "total_hours": Decimal("8.0")}],
+            [],
+            [
+                {"department_name": "Engineering", "total_hours": Decimal("16.0")},
+                {"department_name": "Marketing", "total_hours": Decimal("24.0")},
+            ],
+        ]
+
+    def test_stream_ndjson(self):
+        lines = "".join(stream_ndjson(self.batches)).splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0]), {"department_name": "Sales", "total_hours": "8.0"})
+
+    def test_stream_json_array(self):
+        document = json.loads("".join(stream_json_array(self.batches)))
+
+        self.assertEqual(
+            [row["department_name"] for row in document["data"]],
+            ["Sales", "Engineering", "Marketing"],
+        )
+
+    def test_stream_json_array_empty(self):
+        self.assertEqual(json.loads("".join(stream_json_array([]))), {"data": []})
+
+    def cancelled_batches(self):
+        yield self.batches[0]
+        raise ReportCancelled("Report cancelled")
+
+    def test_cut_json_array_ends_with_error(self):
+        document = json.loads("".join(stream_json_array(self.cancelled_batches())))
+
+        self.assertEqual(len(document["data"]), 1)
+        self.assertEqual(document["error"], "Report cancelled")
+
+    def test_cut_ndjson_ends_with_error_line(self):
+        lines = "".join(stream_ndjson(self.cancelled_batches())).splitlines()
+
+        self.assertEqual(json.loads(lines[-1]), {"error": "Report cancelled"})
+
+    def test_failed_stream_is_logged(self):
+        def failing_batches():
+            raise ValueError("boom")
+            yield
+
+        with self.assertLogs("cs_app.utils.report_streaming", level="ERROR"):
+            document = json.loads("".join(stream_json_array(failing_batches())))
+
+        self.assertEqual(document, {"data": [], "error": "Report failed"})
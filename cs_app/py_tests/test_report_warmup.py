@@ -0,0 +1,179 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from ..models import User, RanReportParameter
+
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_queries import connection_identity
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_warmup import (
+    WarmupScheduler,
+    WarmupSet,
+    claim_warmup,
+    mine_warmup_sets,
+    preset_range,
+    warm_sets,
+)
+
+import threading
+import time
+
+
+TODAY = date(2024, 3, 15)
+
+
+class MineWarmupSetsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+
+    def log_run(self, time_range, start_date, end_date, days_ago=0, connection_key=None):
+        RanReportParameter.objects.create(
+            user=self.user,
+            report_type=time_range,
+            ran_on_date=TODAY - timedelta(days=days_ago),
+            start_date=start_date,
+            end_date=end_date,
+            database_name="data",
+            connection_key=connection_identity("data") if connection_key is None else connection_key,
+        )
+
+    def test_preset_range(self):
+        self.assertEqual(preset_range("YTD", TODAY), (date(2024, 1, 1), TODAY))
+        self.assertEqual(preset_range("Last Year", TODAY), (date(2023, 1, 1), date(2023, 12, 31)))
+        self.assertIsNone(preset_range("Custom", TODAY))
+
+    def test_frequent_and_recent_sets_rank_first(self):
+        for days_ago in (20, 21, 22):
+            self.log_run("Custom", date(2009, 1, 1), date(2009, 12, 31), days_ago)
+        for days_ago in (0, 1):
+            self.log_run("Custom", date(2010, 1, 1), date(2010, 12, 31), days_ago)
+        self.log_run("Custom", date(2011, 1, 1), date(2011, 12, 31), 60)
+
+        sets = mine_warmup_sets(today=TODAY)
+
+        self.assertEqual(
+            [(warmup_set.alias, warmup_set.start_date) for warmup_set in sets],
+            [("data", date(2010, 1, 1)), ("data", date(2009, 1, 1))],
+        )
+
+    def test_presets_are_recomputed_for_today(self):
+        self.log_run("YTD", date(2024, 1, 1), date(2024, 2, 1), 30)
+        self.log_run("YTD", date(2024, 1, 1), date(2024, 3, 14), 1)
+
+        sets = mine_warmup_sets(today=TODAY)
+
+        self.assertEqual(len(sets), 1)
+        self.assertEqual((sets[0].start_date, sets[0].end_date), (date(2024, 1, 1), TODAY))
+
+    def test_unknown_databases_are_skipped(self):
+        self.log_run("Custom", date(2009, 1, 1), date(2009, 12, 31), connection_key="mssql|gone|sales|")
+
+        self.assertEqual(mine_warmup_sets(today=TODAY), [])
+
+    def test_runs_without_connection_are_skipped(self):
+        self.log_run("Custom", date(2009, 1, 1), date(2009, 12, 31), connection_key="")
+
+        self.assertEqual(mine_warmup_sets(today=TODAY), [])
+
+    def test_dry_run_command(self):
+        self.log_run("Custom", date(2009, 1, 1), date(2009, 12, 31))
+        out = StringIO()
+
+        with patch("cs_app.utils.report_warmup.timezone.localdate", return_value=TODAY):
+            call_command("warm_report_cache", "--dry-run", stdout=out, stderr=StringIO())
+
+        self.assertIn("data: Custom 2009-01-01 to 2009-12-31", out.getvalue())
+
+
+class WarmSetsTests(TestCase):
+
+    def setUp(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    def tearDown(self):
+        report_cache.clear()
+        segment_store.clear()
+
+    @override_settings(REPORT_WARMUP_ALIAS_CONCURRENCIES={"data": 2})
+    @patch("cs_app.utils.report_functions.compute_report_data")
+    def test_results_are_cached_within_alias_limit(self, mock_compute):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def compute(alias, definition, values, partition=None):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+            return [{"department_name": "Sales", "total_hours": 8}]
+
+        mock_compute.side_effect = compute
+        sets = [
+            WarmupSet("data", "Custom", date(2000 + year, 1, 1), date(2000 + year, 12, 31), 1.0)
+            for year in range(5)
+        ]
+
+        results = warm_sets(sets)
+
+        self.assertEqual([result["rows"] for result in results], [1] * 5)
+        self.assertLessEqual(max(peak), 2)
+        self.assertIsNotNone(
+            report_cache.get(
+                make_cache_key(
+                    "data", "department_hours", {"start_date": date(2003, 1, 1), "end_date": date(2003, 12, 31)}
+                )
+            )
+        )
+
+    @patch("cs_app.utils.report_functions.compute_report_data", side_effect=ValueError("boom"))
+    def test_errors_are_reported_per_set(self, mock_compute):
+        results = warm_sets([WarmupSet("data", "Custom", date(2009, 1, 1), date(2009, 12, 31), 1.0)])
+
+        self.assertEqual(results[0]["error"], "boom")
+
+
+class WarmupSchedulerTests(TestCase):
+
+    @override_settings(REPORT_WARMUP_TIMES=["06:30", "12:00"], TIME_ZONE="UTC")
+    def test_next_run(self):
+        scheduler = WarmupScheduler()
+
+        self.assertEqual(
+            scheduler.next_run(datetime(2024, 3, 15, 7, 0, tzinfo=dt_timezone.utc)),
+            datetime(2024, 3, 15, 12, 0, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            scheduler.next_run(datetime(2024, 3, 15, 13, 0, tzinfo=dt_timezone.utc)),
+            datetime(2024, 3, 16, 6, 30, tzinfo=dt_timezone.utc),
+        )
+
+    @override_settings(REPORT_WARMUP_TIMES=[])
+    def test_not_started_without_times(self):
+        self.assertFalse(WarmupScheduler().start())
+
+    def test_scheduled_run_is_claimed_once(self):
+        run_on = datetime(2024, 3, 15, 6, 30, tzinfo=dt_timezone.utc)
+
+        self.assertTrue(claim_warmup(run_on))
+        self.assertFalse(claim_warmup(run_on))
+        self.assertTrue(claim_warmup(run_on + timedelta(days=1)))
+
+    @override_settings(REPORT_WARMUP_TIMES=["06:30"])
+    @patch("cs_app.utils.report_warmup.run_warmup")
+    @patch("cs_app.utils.report_warmup.claim_warmup", return_value=False)
+    def test_unclaimed_run_is_skipped(self, mock_claim, mock_run):
+        scheduler = WarmupScheduler()
+
+        with patch.object(scheduler._stop, "wait", side_effect=[False, True]):
+            scheduler.run()
+
+        mock_claim.assert_called_once()
+        mock_run.assert_not_called()
@@ -9,6 +9,14 @@
  * - alterDates(range): Adjusts date inputs according to a predefined time range selection.
  * - generateTable(): Initiates the process of generating a table based on user input.
  * - createTable(formdata): Sends fetch request to load table data based on provided form data.
+ * - newRequestId(): Creates the id a report request can be cancelled with.
+ * - cancelRunningReport(): Cancels the report that is still loading, if any.
+ * - isAsyncReport(formdata): Decides whether a report is queued as a job instead of run directly.
+ * - pollReportJob(jobId): Polls a queued report job until its data is ready.
+ * - loadSnapshot(runId): Shows the stored result of a report opened from the report history.
+ * - refreshSnapshot(): Runs the report opened from the report history again.
+ * - showSnapshotInformation(snapshot): Shows when the displayed snapshot was taken.
+ * - exportReport(format): Downloads the report as a CSV or Excel file.
  * - initializeTable(data): Renders a DataTable with formatted data and manages table height.
  * - setTableHeight(): Sets the height of the report table dynamically based on its container.
  * - formatData(data): Formats raw data from the server into a format suitable for DataTables.
@@ -28,6 +36,9 @@ try {
 // Global variable to disallow spamming same report type
 var currentReportParameters = "";
 
+// Id of the report that is still loading, used to cancel it
+var runningRequestId = null;
+
 attachEventListeners();
 
 function attachEventListeners() {
@@ -86,6 +97,17 @@ function attachEventListeners() {
         });
     } catch (error) {}
 
+    /**
+     * Cancels the report that is still loading when the user leaves the page
+     *
+     * Contained in try catch to allow testing of file
+     */
+    try {
+        $(window).on("pagehide", function () {
+            cancelRunningReport();
+        });
+    } catch (error) {}
+
     // Setting current screen name in nav bar
     $("#current-screen-name").text("Generate Report");
 }
@@ -107,6 +129,8 @@ function generateTable() {
         return;
     }
 
+    formdata["async"] = isAsyncReport(formdata);
+
     if (formdata !== currentReportParameters) {
         createTable(formdata);
     }
@@ -123,6 +147,10 @@ function generateTable() {
  * @param {string} formData - The input data used to create the report
  */
 function createTable(formdata) {
+    var requestId = newRequestId();
+    formdata["request_id"] = requestId;
+    runningRequestId = requestId;
+
     fetch("/load_table/", {
         method: "POST",
         headers: {
@@ -132,13 +160,226 @@ function createTable(formdata) {
         body: JSON.stringify(formdata),
     })
         .then((response) => {
+            if (runningRequestId === requestId) {
+                runningRequestId = null;
+            }
+            // A newer report cancelled this one, so its result is not shown
+            if (response.status === 409) {
+                return {};
+            }
+            if (!response.ok) {
+                alert("error");
+            }
+            return response.json();
+        })
+        .then((response) => {
+            if (!response.data && !response.job_id) {
+                return;
+            } else if (response.job_id) {
+                pollReportJob(response.job_id);
+            } else {
+                initializeTable(formatData(response.data));
+            }
+        })
+        .catch((error) => {
+            alert("error:", error);
+        });
+}
+
+/**
+ * Creates the id a report request can be cancelled with
+ *
+ * @returns {string} A random request id
+ */
+function newRequestId() {
+    if (typeof crypto !== "undefined" && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+/**
+ * Cancels the report that is still loading, if any
+ *
+ * Uses a keepalive request so the cancel is still sent while the page unloads
+ */
+function cancelRunningReport() {
+    if (!runningRequestId) {
+        return;
+    }
+
+    fetch("/cancel_report/", {
+        method: "POST",
+        keepalive: true,
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": csrf_token,
+        },
+        body: JSON.stringify({ request_id: runningRequestId }),
+    }).catch(() => {});
+
+    runningRequestId = null;
+}
+
+/**
+ * Decides whether a report is queued as a job instead of run directly
+ *
+ * Reports are queued and polled only when the user checks "Run in background",
+ * so long reports do not hold a server worker for the whole query
+ *
+ * @param {object} formdata - The input data used to create the report
+ * @return {boolean} - True if the report should be queued
+ */
+function isAsyncReport(formdata) {
+    return $("#run-in-background").is(":checked");
+}
+
+/**
+ * Polls a queued report job until its data is ready
+ *
+ * Calls initializeTable() once the job is done
+ *
+ * @param {number} jobId - The id of the queued report job
+ */
+function pollReportJob(jobId) {
+    fetch(`/report_job/${jobId}/`)
+        .then((response) => response.json())
+        .then((job) => {
+            if (job.status === "done") {
+                initializeTable(formatData(job.data));
+            } else if (job.status === "queued" || job.status === "running") {
+                setTimeout(() => pollReportJob(jobId), 1000);
+            } else {
+                alert(`Report ${job.status}: ${job.error}`);
+            }
+        })
+        .catch((error) => {
+            alert("error:", error);
+        });
+}
+
+/**
+ * Shows the stored result of a report opened from the report history
+ *
+ * Calls initializeTable() with the snapshot rows instead of running the report
+ *
+ * @param {number} runId - The id of the report history entry
+ */
+function loadSnapshot(runId) {
+    fetch(`/report_history/${runId}/snapshot/`)
+        .then((response) => {
+            if (!response.ok) {
+                throw new Error("Snapshot unavailable");
+            }
+            return response.json();
+        })
+        .then((response) => {
+            initializeTable(formatData(response.data));
+            showSnapshotInformation(response.snapshot);
+        })
+        .catch((error) => {
+            alert("error:", error);
+        });
+}
+
+/**
+ * Runs the report opened from the report history again
+ *
+ * Uses fetch to re-execute the report on the database, which replaces
+ * its snapshot, and calls initializeTable() with the fresh rows
+ */
+function refreshSnapshot() {
+    var requestId = newRequestId();
+    runningRequestId = requestId;
+
+    fetch(`/report_history/${snapshotRunId}/snapshot/refresh/`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": csrf_token,
+        },
+        body: JSON.stringify({ request_id: requestId }),
+    })
+        .then((response) => {
+            if (runningRequestId === requestId) {
+                runningRequestId = null;
+            }
+            if (response.status === 409) {
+                return {};
+            }
             if (!response.ok) {
                 alert("error");
             }
             return response.json();
         })
         .then((response) => {
+            if (!response.data) {
+                return;
+            }
             initializeTable(formatData(response.data));
+            showSnapshotInformation(response.snapshot);
+        })
+        .catch((error) => {
+            alert("error:", error);
+        });
+}
+
+/**
+ * Shows when the displayed snapshot was taken
+ *
+ * @param {object} snapshot - The snapshot description returned with the rows
+ */
+function showSnapshotInformation(snapshot) {
+    if (!snapshot) {
+        $("#snapshot-information").text("");
+        return;
+    }
+
+    const takenOn = new Date(snapshot.created_on).toLocaleString();
+    $("#snapshot-information").html(`<strong>Snapshot: </strong>${takenOn}`);
+}
+
+/**
+ * Downloads the report as a file
+ *
+ * Uses fetch to send inputs to the export view and saves the
+ * returned file through a temporary download link
+ *
+ * @param {string} format - The export format, "csv" or "xlsx"
+ */
+function exportReport(format) {
+    var formdata = {
+        time_range: $(".dropdown-button").text(),
+        start_date: $("#start_date").val(),
+        end_date: $("#end_date").val(),
+        format: format,
+    };
+
+    if (formdata["start_date"] == "" || formdata["end_date"] == "") {
+        alert("Please fill out starting and ending dates");
+        return;
+    }
+
+    fetch("/export_table/", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": csrf_token,
+        },
+        body: JSON.stringify(formdata),
+    })
+        .then((response) => {
+            if (!response.ok) {
+                throw new Error("Export failed");
+            }
+            return response.blob();
+        })
+        .then((blob) => {
+            let link = document.createElement("a");
+            link.href = URL.createObjectURL(blob);
+            link.download = `department_hours_${formdata["start_date"]}_${formdata["end_date"]}.${format}`;
+            link.click();
+            URL.revokeObjectURL(link.href);
         })
         .catch((error) => {
             alert("error:", error);
@@ -257,6 +498,14 @@ try {
         attachEventListeners,
         generateTable,
         createTable,
+        newRequestId,
+        cancelRunningReport,
+        isAsyncReport,
+        pollReportJob,
+        loadSnapshot,
+        refreshSnapshot,
+        showSnapshotInformation,
+        exportReport,
         initializeTable,
         alterDates,
         setTableHeight,
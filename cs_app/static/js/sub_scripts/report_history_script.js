@@ -2,6 +2,9 @@
  * This script handles click events on report history items.
  * When a report item is clicked, it constructs a URL to
  * generate a report with specific parameters and redirects the user to that URL.
+ * Items that kept a snapshot of their result pass their run id, so the
+ * generate report page shows the snapshot instead of running the report again.
+ * Selected items can be re-run together with one batch request.
  */
 
 // Required for global jqeury recognition for use in testing
@@ -34,6 +37,10 @@ function attachEventListeners() {
             database_name: database_name,
         };
 
+        if ($(this).data("snapshot") === true) {
+            additionalInfo["run_id"] = $(this).data("run-id");
+        }
+
         const jsonString = JSON.stringify(additionalInfo);
 
         // Encode the optionalField to make it URL-safe
@@ -44,14 +51,79 @@ function attachEventListeners() {
         window.location.assign(url);
     });
 
+    // Selecting an item must not open it
+    $("#report-history__listing .rep_select").on("click", function (event) {
+        event.stopPropagation();
+    });
+
     // Setting current screen name in nav bar
     $("#current-screen-name").text("Report History");
 }
 
+/**
+ * Re-runs the selected report history items together
+ *
+ * Sends the selected items to the batch endpoint, which runs them live in
+ * grouped queries and keeps their results as snapshots, and shows the
+ * status returned for each item
+ */
+function rerunSelectedReports() {
+    const selected = $("#report-history__listing > div").filter(function () {
+        return $(this).find(".rep_select").prop("checked");
+    });
+
+    if (selected.length === 0) {
+        alert("Please select reports to re-run");
+        return;
+    }
+
+    const items = selected
+        .map(function () {
+            // Other parameters, like the range of a comparison, are kept with the run
+            return Object.assign({}, $(this).data("parameters"), {
+                report_id: $(this).data("report-id"),
+                time_range: $(this).find(".rep_type").text(),
+                start_date: $(this).find(".rep_start_date").data("date"),
+                end_date: $(this).find(".rep_end_date").data("date"),
+            });
+        })
+        .get();
+
+    selected.find(".rep_status").removeClass("failed").text("Running");
+
+    fetch("/load_table/batch/", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": csrf_token,
+        },
+        body: JSON.stringify({ items: items, refresh: true }),
+    })
+        .then((response) => response.json())
+        .then((response) => {
+            if (!response.results) {
+                selected.find(".rep_status").addClass("failed").text(response.error || "Failed");
+                return;
+            }
+            response.results.forEach(function (result) {
+                const item = selected.eq(result.index);
+                item.find(".rep_status").toggleClass("failed", result.status !== "ok");
+                item.find(".rep_status").text(result.status === "ok" ? "Updated" : result.status);
+                if (result.status === "ok") {
+                    item.data("snapshot", true);
+                }
+            });
+        })
+        .catch((error) => {
+            alert("error:", error);
+        });
+}
+
 try {
     // Export all functions
     module.exports = {
         attachEventListeners,
+        rerunSelectedReports,
     };
 } catch (error) {
     console.log(error);
@@ -16,9 +16,21 @@ urlpatterns = [
     # Generate report and functions
     path('generate_report/', generate_report_views.generate_report_view, name='generate_report'),
     path('load_table/', generate_report_views.load_table_view, name='load_table'),
+    path('load_table/multi/', generate_report_views.load_multi_database_table_view, name='load_multi_database_table'),
+    path('load_table/batch/', generate_report_views.load_batch_table_view, name='load_batch_table'),
+    path('export_table/', generate_report_views.export_table_view, name='export_table'),
+    path('report_job/<int:job_id>/', generate_report_views.report_job_status_view, name='report_job_status'),
+    path('report_job/<int:job_id>/cancel/', generate_report_views.cancel_report_job_view, name='cancel_report_job'),
+    path('cancel_report/', generate_report_views.cancel_report_view, name='cancel_report'),
+    path('report_statistics/', generate_report_views.report_statistics_view, name='report_statistics'),
 
     # Report history and functions
     path('report_history/', report_history_views.report_history_view, name='report_history'),
+    path('report_history/<int:run_id>/snapshot/', report_history_views.report_snapshot_view, name='report_snapshot'),
+    path('report_history/<int:run_id>/snapshot/refresh/', report_history_views.refresh_report_snapshot_view, name='refresh_report_snapshot'),
+
+    # Report cube
+    path('report_cube/pivot/', report_cube_views.cube_pivot_view, name='cube_pivot'),
 
     # Directions page
     path('directions/', directions_views.directions_view, name='directions'),
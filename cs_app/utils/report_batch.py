@@ -0,0 +1,120 @@
+"""
+Python functions that run several parameter sets of a report in one query.
+
+This module contains the statements used by the batch endpoint. The parameter sets
+of one report that are not answered from the cache are grouped, and each group runs
+as one statement that joins the report statement of every set with UNION ALL. Each
+branch tags its rows with the position of its set in the group, so the rows are
+split back per set after a single round trip:
+
+    SELECT 0 AS "batch_item", report_0."department_name", ... FROM (...) AS report_0
+    UNION ALL
+    SELECT 1 AS "batch_item", report_1."department_name", ... FROM (...) AS report_1
+
+The sets of a batch usually differ in their date range, which is part of the WHERE
+clause of each branch, so they cannot share one GROUPING SETS aggregate.
+
+One statement is compiled per group size up to REPORT_BATCH_MAX_GROUP_SIZE when the
+report is compiled, so every group maps to a fixed, preparable text.
+
+Functions:
+- compile_batch_statements(definition, engine, sql): Compiles the grouped statements of a report
+- get_max_group_size(): Returns the largest number of parameter sets run in one statement
+- chunk_items(items, size): Splits pending parameter sets into groups
+- split_batch_rows(definition, rows, count): Splits the rows of a grouped statement per set
+
+Module Variables:
+- BATCH_ITEM_COLUMN: The column tagging each row with the position of its set
+
+Dependencies:
+- Django modules: settings
+- Project modules: report_dialects, report_queries
+"""
+
+from django.conf import settings
+
+from cs_app.utils.report_dialects import get_dialect
+from cs_app.utils.report_queries import ReportStatement
+
+
+BATCH_ITEM_COLUMN = "batch_item"
+
+DEFAULT_MAX_GROUP_SIZE = 8
+DEFAULT_MAX_ITEMS = 50
+
+
+def get_max_group_size():
+    """Returns the largest number of parameter sets run in one statement."""
+
+    return max(1, getattr(settings, "REPORT_BATCH_MAX_GROUP_SIZE", DEFAULT_MAX_GROUP_SIZE))
+
+
+def compile_batch_statements(definition, engine, sql):
+    """
+    Compiles the grouped statements of a report for an engine.
+
+    Args:
+        definition (ReportDefinition): The report being compiled.
+        engine (str): "mssql" or "postgresql".
+        sql (str): The report statement rendered for the engine.
+
+    Returns:
+        dict: Group sizes from 2 to the largest group size mapped to ReportStatement
+        objects. Groups of one set run the report statement itself.
+    """
+    dialect = get_dialect(engine)
+    if dialect is None:
+        return {}
+
+    statements = {}
+    branches = []
+
+    for position in range(get_max_group_size()):
+        table = f"report_{position}"
+        columns = ", ".join(f"{table}.{dialect.quote_name(column)}" for column in definition.columns)
+        branches.append(
+            f"SELECT {position} AS {dialect.quote_name(BATCH_ITEM_COLUMN)}, {columns} FROM ({sql}) AS {table}"
+        )
+
+        if position > 0:
+            statements[position + 1] = ReportStatement(
+                f"{definition.report_id}_{engine}_batch_{position + 1}",
+                " UNION ALL ".join(branches),
+            )
+
+    return statements
+
+
+def chunk_items(items, size):
+    """
+    Splits pending parameter sets into groups of at most size sets.
+
+    Args:
+        items (list): The pending parameter sets of one report.
+        size (int): The largest number of sets in a group.
+
+    Returns:
+        list: Lists of consecutive sets.
+    """
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def split_batch_rows(definition, rows, count):
+    """
+    Splits the rows of a grouped statement per parameter set.
+
+    Args:
+        definition (ReportDefinition): The report that ran.
+        rows (list): Row tuples starting with the batch item column.
+        count (int): The number of parameter sets in the group.
+
+    Returns:
+        list: One list of row dictionaries keyed by the report's columns per set,
+        in the order of the group.
+    """
+    results = [[] for _ in range(count)]
+
+    for row in rows:
+        results[int(row[0])].append(dict(zip(definition.columns, row[1:])))
+
+    return results
@@ -0,0 +1,188 @@
+"""
+In-process result cache for generated reports.
+
+This module contains a small thread safe cache used to hold report results in
+front of the remote report query. Entries are keyed by the database alias, the
+report id and the normalized report parameters, so users on the same database
+share entries. The cache is bounded in size, evicts the least recently used entry
+when full, and expires entries after a time to live.
+
+Classes:
+- ReportCache: LRU cache with TTL, hit/miss counters and per alias invalidation
+
+Functions:
+- make_cache_key(alias, report_id, values): Builds a normalized cache key
+
+Module Variables:
+- report_cache: Shared ReportCache instance configured from Django settings
+
+Dependencies:
+- Django modules: settings
+- Python modules: collections, threading, time
+"""
+
+from django.conf import settings
+
+from collections import OrderedDict
+
+import threading
+import time
+
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 300
+
+
+class ReportCache:
+    """
+    Bounded least recently used cache with a time to live for each entry.
+
+    Keys are tuples whose first item is the database alias. This allows all entries
+    for an alias to be dropped at once when the alias is removed.
+
+    Args:
+        max_entries (int): The maximum number of entries held before evicting.
+        ttl_seconds (int|float): Number of seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value for a key, or None if missing or expired.
+
+        Args:
+            key (tuple): The cache key built by make_cache_key.
+
+        Returns:
+            object or None: The cached value if present and fresh.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """
+        Stores a value, evicting the least recently used entries if full.
+
+        Args:
+            key (tuple): The cache key built by make_cache_key.
+            value (object): The value to be cached.
+            ttl_seconds (int|float): Number of seconds this entry stays valid, like
+                for warmed results. Defaults to the ttl of the cache.
+        """
+        if self.max_entries <= 0:
+            return
+
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_alias(self, alias):
+        """
+        Removes every entry belonging to a database alias.
+
+        Args:
+            alias (str): The database alias whose entries are removed.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            stale_keys = [key for key in self._entries if key[0] == alias]
+
+            for key in stale_keys:
+                del self._entries[key]
+
+            return len(stale_keys)
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the current cache counters.
+
+        Returns:
+            dict: Entry count, capacity, ttl, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def make_cache_key(alias, report_id, values):
+    """
+    Builds a normalized cache key from the report parameters.
+
+    Values are converted to strings, stripped, and empty values become None, so
+    requests that differ only in whitespace or missing values share an entry. The
+    user is deliberately not part of the key since the report query does not depend
+    on who runs it.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        report_id (str): The id of the report in the report registry.
+        values (dict): Parameter names mapped to the values the report is run with.
+
+    Returns:
+        tuple: The normalized cache key.
+    """
+
+    def normalize(value):
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+
+    return (
+        alias,
+        report_id,
+        tuple(sorted((name, normalize(value)) for name, value in values.items())),
+    )
+
+
+report_cache = ReportCache(
+    max_entries=getattr(settings, "REPORT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    ttl_seconds=getattr(settings, "REPORT_CACHE_TTL", DEFAULT_TTL_SECONDS),
+)
@@ -0,0 +1,364 @@
+"""
+Single flight coalescing of identical concurrent report queries.
+
+This module makes identical reports that are requested at the same time share one
+remote query. Reports are identified by their cache key, so by the alias, the
+report id and the normalized parameters. Across processes the alias is replaced by
+the identity of its database, since processes may name one database differently.
+The first request of a key runs the query and the requests arriving while it runs
+wait for its result instead of starting their own, like at the start of the day
+when several users of one database open the same default range within seconds.
+
+Within a process the waiting threads block on an event of the running call. With
+REPORT_COALESCE_CROSS_PROCESS the running query also holds a ReportFlight row in
+the default database, whose key is unique, so requests handled by other worker
+processes wait for it too and read the finished result from that row. Finished
+results stay readable for REPORT_COALESCE_RESULT_TTL seconds. Rows of a worker
+that died are ignored once their query would have passed REPORT_COALESCE_WAIT_TIMEOUT.
+
+ReportFlight rows must be committed at once to be seen by other processes, so they
+are only written outside transactions: the views running reports are excluded from
+ATOMIC_REQUESTS, and a report run inside a transaction of the default database is
+not coalesced across processes. This also keeps requests from holding the lock of
+the SQLite database while their report runs.
+
+When the running query fails or is cancelled by its own user, a waiting request of
+the process runs the query again and the other ones wait for that run, so each
+request only gets an error from a query it ran itself. Requests waiting in another
+process run the query themselves, and so does a request that waited longer than
+REPORT_COALESCE_WAIT_TIMEOUT. A waiting request that is cancelled stops waiting.
+
+Classes:
+- SingleFlight: Runs one computation per key at a time and shares its result
+
+Functions:
+- run_flight(key, compute): Runs a computation, coalesced across processes when enabled
+- cross_process_enabled(): Returns whether flights are shared with other processes
+- acquire_flight(digest, ttl_seconds): Claims the database lock of a key
+- publish_flight(digest, result): Stores the result of a claimed key for other processes
+- share_result(key, result, ttl_seconds): Publishes a result computed ahead of time to other processes
+- release_flight(digest): Drops the database lock of a key without a result
+- wait_for_flight(digest): Waits for another process to finish a key
+- flight_digest(key): Returns the database key of a report key
+
+Module Variables:
+- report_flights: The SingleFlight shared by every report request of the process
+
+Dependencies:
+- Django modules: settings, IntegrityError, transaction, timezone
+- Python modules: datetime, hashlib, os, pickle, socket, threading, time
+- Project modules: report_inflight, report_queries
+- Model: ReportFlight from the application's models
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from datetime import timedelta
+
+from ..models import ReportFlight
+
+from cs_app.utils.report_inflight import ReportCancelled, current_report
+from cs_app.utils.report_queries import connection_identity
+
+import hashlib
+import os
+import pickle
+import socket
+import threading
+import time
+
+
+DEFAULT_WAIT_TIMEOUT = 300
+DEFAULT_POLL_INTERVAL = 0.25
+DEFAULT_RESULT_TTL = 30
+
+
+class FlightCall:
+    """A computation in progress and, once the event is set, its result or error."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time and shares its result with every caller
+    that asked for the same key while it ran.
+
+    Results are not kept once the computation finishes, which is left to the report
+    cache in front of it.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        """
+        Returns the result of compute for a key, waiting for a running call of the same key.
+
+        Args:
+            key (tuple): The report cache key.
+            compute (callable): Computes the result when no call of the key is running.
+
+        Returns:
+            object: The result of compute.
+
+        Raises:
+            ReportCancelled: If the report of the calling request is cancelled while waiting.
+            Exception: The error of the computation the caller ran.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+
+                if leader:
+                    call = FlightCall()
+                    self._calls[key] = call
+                    self.leaders += 1
+                else:
+                    self.followers += 1
+
+            if leader:
+                try:
+                    call.result = run_flight(key, compute)
+                    return call.result
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        self._calls.pop(key, None)
+                    call.event.set()
+
+            if not wait_for_call(call):
+                return compute()
+
+            # The leader failed or was stopped by its own user, so one of the
+            # waiting requests runs the query again and the others wait for it
+            if call.error is not None:
+                continue
+
+            return call.result
+
+    def stats(self):
+        """Returns the number of calls that ran, that waited and that are running."""
+
+        with self._lock:
+            return {"leaders": self.leaders, "followers": self.followers, "running": len(self._calls)}
+
+    def clear(self):
+        """Resets the counters. Running calls are left to finish."""
+
+        with self._lock:
+            self.leaders = 0
+            self.followers = 0
+
+
+def wait_for_call(call):
+    """
+    Waits for a call of this process to finish.
+
+    Returns:
+        bool: True when the call finished, False when it ran past the wait timeout.
+
+    Raises:
+        ReportCancelled: If the report of the waiting request is cancelled.
+    """
+    deadline = time.monotonic() + getattr(settings, "REPORT_COALESCE_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT)
+    poll_interval = getattr(settings, "REPORT_COALESCE_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+
+    while not call.event.wait(poll_interval):
+        check_cancelled()
+
+        if time.monotonic() >= deadline:
+            return False
+
+    return True
+
+
+def check_cancelled():
+    """Raises ReportCancelled if the report of the running request was cancelled."""
+
+    report = current_report()
+
+    if report is not None and report.cancelled:
+        raise ReportCancelled("Report cancelled")
+
+
+def run_flight(key, compute):
+    """
+    Runs a computation, coalesced with other worker processes when enabled.
+
+    Args:
+        key (tuple): The report cache key.
+        compute (callable): Computes the result.
+
+    Returns:
+        object: The result computed here or by another process.
+    """
+    if not cross_process_enabled():
+        return compute()
+
+    digest = flight_digest(key)
+
+    if not acquire_flight(digest):
+        finished, result = wait_for_flight(digest)
+
+        if finished:
+            return result
+
+        # The other process failed or is too slow, so the query runs here without the lock
+        return compute()
+
+    try:
+        result = compute()
+    except BaseException:
+        release_flight(digest)
+        raise
+
+    publish_flight(digest, result)
+
+    return result
+
+
+def cross_process_enabled():
+    """
+    Returns whether flights are shared with other processes.
+
+    Rows written inside a transaction stay invisible to other processes until it
+    commits, so reports run inside one are only coalesced within the process.
+    """
+    if not getattr(settings, "REPORT_COALESCE_CROSS_PROCESS", False):
+        return False
+
+    return not transaction.get_connection("default").in_atomic_block
+
+
+def acquire_flight(digest, ttl_seconds=None):
+    """
+    Claims the database lock of a key by inserting its ReportFlight row.
+
+    Args:
+        digest (str): The database key, from flight_digest.
+        ttl_seconds (int|float): Seconds the lock is held at most. Defaults to
+            REPORT_COALESCE_WAIT_TIMEOUT.
+
+    Returns:
+        bool: Whether the lock was claimed, False if another process holds it.
+    """
+    if ttl_seconds is None:
+        ttl_seconds = getattr(settings, "REPORT_COALESCE_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT)
+
+    now = timezone.now()
+    ReportFlight.objects.filter(expires_on__lt=now).delete()
+
+    try:
+        with transaction.atomic(using="default"):
+            ReportFlight.objects.create(
+                key=digest,
+                owner=f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}",
+                expires_on=now + timedelta(seconds=ttl_seconds),
+            )
+    except IntegrityError:
+        return False
+
+    return True
+
+
+def publish_flight(digest, result):
+    """Stores the result of a claimed key, readable by other processes for a short time."""
+
+    ReportFlight.objects.filter(key=digest).update(
+        done=True,
+        result=pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+        expires_on=timezone.now()
+        + timedelta(seconds=getattr(settings, "REPORT_COALESCE_RESULT_TTL", DEFAULT_RESULT_TTL)),
+    )
+
+
+def share_result(key, result, ttl_seconds):
+    """
+    Publishes a result computed ahead of time, like a warmed report, to other processes.
+
+    Until it expires, other processes asking for the key find a finished flight and
+    read its result instead of running the query.
+
+    Args:
+        key (tuple): The report cache key.
+        result (object): The result of the report.
+        ttl_seconds (int|float): Number of seconds the result stays readable.
+    """
+    ReportFlight.objects.update_or_create(
+        key=flight_digest(key),
+        defaults={
+            "owner": f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}",
+            "done": True,
+            "result": pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+            "expires_on": timezone.now() + timedelta(seconds=ttl_seconds),
+        },
+    )
+
+
+def release_flight(digest):
+    """Drops the database lock of a key whose computation failed."""
+
+    ReportFlight.objects.filter(key=digest, done=False).delete()
+
+
+def wait_for_flight(digest):
+    """
+    Waits for another process to finish a key.
+
+    Returns:
+        tuple: Whether a result was published and the result, or (False, None) when
+        the lock was released without one or the wait timed out.
+
+    Raises:
+        ReportCancelled: If the report of the waiting request is cancelled.
+    """
+    deadline = time.monotonic() + getattr(settings, "REPORT_COALESCE_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT)
+    poll_interval = getattr(settings, "REPORT_COALESCE_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+
+    while time.monotonic() < deadline:
+        flight = ReportFlight.objects.filter(key=digest).values("done", "result").first()
+
+        if flight is None:
+            return False, None
+
+        if flight["done"]:
+            # Results are only written by this application to its own default database
+            return True, pickle.loads(bytes(flight["result"]))
+
+        check_cancelled()
+        time.sleep(poll_interval)
+
+    return False, None
+
+
+def flight_digest(key):
+    """
+    Returns the fixed length database key of a report cache key.
+
+    The alias of the key is replaced by the identity of its database, so processes
+    coalesce reports of one database whatever alias they reach it under, and never
+    share the results of two databases added under the same alias.
+    """
+    alias, *rest = key
+
+    try:
+        identity = connection_identity(alias)
+    except KeyError:
+        identity = alias
+
+    return hashlib.sha256(repr((identity, *rest)).encode("utf-8")).hexdigest()
+
+
+report_flights = SingleFlight()
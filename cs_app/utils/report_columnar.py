@@ -0,0 +1,316 @@
+"""
+In-memory columnar engine answering department hours for any date range.
+
+The assignment history of a database is small enough to be held in memory. For
+each alias of REPORT_COLUMNAR_ALIASES this module loads the start date, department
+and shift of every assignment once into NumPy arrays sorted by date, with a running
+count of the assignments of each department and shift:
+
+    prefix[i, c] = number of the first i assignments that belong to department and shift c
+
+The counts of any inclusive range [start, end] are then two binary searches and
+one vectorized difference, prefix[searchsorted(end, "right")] -
+prefix[searchsorted(start, "left")], whatever the length of the range. Summing the
+columns of a department gives its count over every shift, or over a chosen set of
+shifts. Departments are counted by DepartmentID and reported by name, like the
+GROUP BY of the department hours report.
+
+A background thread polls a cheap signature of the source tables (row count and
+last modification) every REPORT_COLUMNAR_REFRESH_INTERVAL seconds and rebuilds the
+arrays of an alias when it changes, so answers trail the source by at most one
+interval. The engine is optional: without NumPy, or for aliases not listed, the
+department hours report falls back to the daily rollup and the live query.
+
+Classes:
+- ColumnarIndex: Sorted assignment dates and per-department and shift prefix counts of one alias
+- ColumnarEngine: The indexes of the process and the thread refreshing them
+
+Functions:
+- numpy_available(): Returns whether NumPy is installed
+- fetch_signature(alias): Returns the change signature of the assignment tables of an alias
+- build_index(alias): Loads the assignments of an alias into a new index
+- department_counts(alias, start_date, end_date, shift_ids): Returns per-department counts from the index of an alias
+- start_engine(**kwargs): Starts the columnar engine of the process once
+
+Module Variables:
+- columnar_engine: The engine of the process
+
+Dependencies:
+- Django modules: settings, request_started, close_old_connections
+- Python modules: importlib, logging, threading
+- Optional modules: numpy
+- Project modules: report_queries, report_registry, report_rollup
+"""
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections
+
+from cs_app.utils.report_queries import execute_statement
+from cs_app.utils.report_rollup import to_date
+
+import cs_app.utils.report_registry as registry
+import importlib.util
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+ENGINE_DISPATCH_UID = "cs_app.report_columnar.start_engine"
+
+DEFAULT_REFRESH_INTERVAL = 300
+
+
+def numpy_available():
+    """Returns whether NumPy is installed."""
+
+    return importlib.util.find_spec("numpy") is not None
+
+
+class ColumnarIndex:
+    """
+    Sorted assignment dates and per-department and shift prefix counts of one alias.
+
+    Args:
+        rows (list): (start_date, department_id, department_name, shift_id) tuples.
+        signature (tuple): The source signature the rows were loaded at.
+    """
+
+    def __init__(self, rows, signature=None):
+        import numpy as np
+
+        self.signature = signature
+
+        # One prefix column per department and shift that has assignments
+        self.cells = sorted({(department_id, shift_id) for _, department_id, _, shift_id in rows})
+        names = {department_id: department_name for _, department_id, department_name, _ in rows}
+        self.department_names = [names[department_id] for department_id, _ in self.cells]
+        self.shift_ids = np.array([shift_id for _, shift_id in self.cells], dtype=np.int64)
+
+        codes = {cell: position for position, cell in enumerate(self.cells)}
+        days = np.array([to_date(row[0]) for row in rows], dtype="datetime64[D]")
+        positions = np.array([codes[(row[1], row[3])] for row in rows], dtype=np.intp)
+
+        order = np.argsort(days, kind="stable")
+        self.days = days[order]
+
+        # Row i holds the counts of the assignments before position i, so the
+        # first row is zero and a range is the difference of two rows
+        self.prefix = np.zeros((len(rows) + 1, len(self.cells)), dtype=np.int64)
+        if len(rows):
+            self.prefix[np.arange(1, len(rows) + 1), positions[order]] = 1
+            np.cumsum(self.prefix, axis=0, out=self.prefix)
+
+    def __len__(self):
+        return len(self.days)
+
+    def department_counts(self, start_date, end_date, shift_ids=None):
+        """
+        Returns the assignment counts per department over an inclusive date range.
+
+        Args:
+            start_date (date): The first day of the range.
+            end_date (date): The last day of the range.
+            shift_ids (list): Optional ShiftIDs the counts are limited to.
+
+        Returns:
+            dict: Department names mapped to their counts, for departments with
+            at least one assignment in the range.
+        """
+        import numpy as np
+
+        first = np.searchsorted(self.days, np.datetime64(start_date, "D"), side="left")
+        last = np.searchsorted(self.days, np.datetime64(end_date, "D"), side="right")
+
+        if last <= first:
+            return {}
+
+        counts = self.prefix[last] - self.prefix[first]
+
+        if shift_ids is not None:
+            counts = counts * np.isin(self.shift_ids, list(shift_ids))
+
+        totals = {}
+        for position in np.flatnonzero(counts):
+            department_name = self.department_names[position]
+            totals[department_name] = totals.get(department_name, 0) + int(counts[position])
+
+        return totals
+
+
+def fetch_signature(alias):
+    """
+    Returns the change signature of the assignment tables of an alias.
+
+    Args:
+        alias (str): The database alias of the source.
+
+    Returns:
+        tuple: The row count and the last modification times.
+    """
+    definition = registry.get_report("department_assignments_signature", include_internal=True)
+    cursor = execute_statement(alias, definition.statement_for(registry.get_engine(alias)), [])
+
+    return tuple(cursor.fetchone())
+
+
+def build_index(alias):
+    """
+    Loads the assignments of an alias into a new index.
+
+    Args:
+        alias (str): The database alias of the source.
+
+    Returns:
+        ColumnarIndex: The index, tagged with the signature read before loading.
+    """
+    signature = fetch_signature(alias)
+    definition = registry.get_report("department_assignments", include_internal=True)
+    cursor = execute_statement(alias, definition.statement_for(registry.get_engine(alias)), [])
+
+    return ColumnarIndex(cursor.fetchall(), signature)
+
+
+class ColumnarEngine:
+    """
+    The columnar indexes of the process and the thread refreshing them.
+
+    Indexes are replaced whole, so readers use the old arrays until the new ones
+    are built.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.refreshes = 0
+        self.errors = 0
+
+    def aliases(self):
+        """Returns the configured aliases, or none when NumPy is not installed."""
+
+        if not numpy_available():
+            return []
+
+        return list(getattr(settings, "REPORT_COLUMNAR_ALIASES", []))
+
+    def get(self, alias):
+        """Returns the index of an alias, or None if it is not loaded."""
+
+        return self._indexes.get(alias)
+
+    def refresh(self, alias, force=False):
+        """
+        Rebuilds the index of an alias if its source changed.
+
+        Args:
+            alias (str): The database alias of the source.
+            force (bool): Whether the index is rebuilt even if the signature is unchanged.
+
+        Returns:
+            bool: Whether the index was rebuilt.
+        """
+        current = self._indexes.get(alias)
+
+        if current is not None and not force and fetch_signature(alias) == current.signature:
+            return False
+
+        self._indexes[alias] = build_index(alias)
+        self.refreshes += 1
+
+        return True
+
+    def refresh_all(self):
+        """Refreshes the index of every configured alias, logging the errors."""
+
+        for alias in self.aliases():
+            try:
+                self.refresh(alias)
+            except Exception:
+                self.errors += 1
+                logger.exception("Error refreshing columnar index for %s", alias)
+            finally:
+                close_old_connections()
+
+    def start(self):
+        """Starts the refresh thread if aliases are configured and it is not running."""
+
+        with self._lock:
+            if not self.aliases():
+                return False
+
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self.run, name="report-columnar", daemon=True)
+                self._thread.start()
+
+            return True
+
+    def stop(self):
+        """Asks the refresh thread to stop."""
+
+        self._stop.set()
+
+    def run(self):
+        """Loads the indexes, then refreshes them every interval until stopped."""
+
+        interval = getattr(settings, "REPORT_COLUMNAR_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+
+        while not self._stop.is_set():
+            self.refresh_all()
+
+            if self._stop.wait(interval):
+                break
+
+    def clear(self):
+        """Drops every index."""
+
+        self._indexes.clear()
+
+    def stats(self):
+        """Returns the loaded aliases with their row counts, and the refresh counters."""
+
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "indexes": {alias: len(index) for alias, index in list(self._indexes.items())},
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+
+def department_counts(alias, start_date, end_date, shift_ids=None):
+    """
+    Returns the assignment counts per department of an alias from its columnar index.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        start_date (date): The first day of the range.
+        end_date (date): The last day of the range.
+        shift_ids (list): Optional ShiftIDs the counts are limited to.
+
+    Returns:
+        dict or None: Department names mapped to their counts, or None if the alias
+        has no columnar index.
+    """
+    index = columnar_engine.get(alias)
+
+    if index is None:
+        return None
+
+    return index.department_counts(start_date, end_date, shift_ids)
+
+
+def start_engine(**kwargs):
+    """
+    Starts the columnar engine of the process, connected to request_started.
+
+    Like the warm-up scheduler, only serving processes load the indexes. The
+    receiver disconnects itself once the engine runs.
+    """
+    if columnar_engine.start():
+        request_started.disconnect(start_engine, dispatch_uid=ENGINE_DISPATCH_UID)
+
+
+columnar_engine = ColumnarEngine()
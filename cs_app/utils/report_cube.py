@@ -0,0 +1,273 @@
+"""
+Python functions for the local department and shift cube.
+
+This module contains the functions that copy assignment counts per month,
+department, department group and shift from a remote database alias into the
+DepartmentShiftCube table of the default database, and that answer slices and
+pivots of those counts. Each cell holds the count of one combination of the four
+dimensions, so any selection of dimension values (a slice or dice) and any
+grouping of dimensions (a pivot) is a sum over local cells and never reaches the
+remote database.
+
+Like the daily rollup, cells and watermarks are keyed by the connection identity
+of the alias (see connection_identity), so an alias name pointing to another
+server never reads the cells of the previous one. Each database keeps a watermark
+of the last month loaded so a refresh only pulls newer months. Only complete
+months are loaded.
+
+Functions:
+- refresh_cube(alias, through_month): Loads months newer than the watermark of an alias
+- get_cube_watermark(alias): Returns the last month loaded for an alias
+- slice_cube(alias, dimensions, filters, start_month, end_month): Sums cells per group of dimensions
+- pivot_cube(alias, rows, columns, measure, filters, start_month, end_month): Returns a matrix of cells
+- month_start(value): Returns the first day of the month of a date or YYYY-MM string
+
+Module Variables:
+- CUBE_DIMENSIONS: The dimensions cells can be sliced and grouped by
+- CUBE_MEASURES: The measures a pivot can return
+
+Dependencies:
+- Django modules: transaction, Sum
+- Python modules: datetime, decimal
+- Project modules: report_queries, report_registry, report_rollup
+- Model: DepartmentShiftCube, CubeWatermark from the application's models
+"""
+
+from django.db import transaction
+from django.db.models import Sum
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from cs_app.utils.report_queries import connection_identity, execute_statement
+from cs_app.utils.report_rollup import EARLIEST_DAY, to_date
+
+import cs_app.utils.report_registry as registry
+
+from ..models import DepartmentShiftCube, CubeWatermark
+
+
+CUBE_DIMENSIONS = ("month", "department_name", "group_name", "shift_name")
+CUBE_MEASURES = ("assignment_count", "total_hours")
+
+# Hours counted per assignment, like the department hours report
+HOURS_PER_ASSIGNMENT = Decimal("8.0")
+
+
+def refresh_cube(alias, through_month=None):
+    """
+    Loads the cube cells of months newer than the watermark of an alias.
+
+    Only complete months are loaded, so by default the refresh stops at the month
+    before the current one. The watermark is then moved to the last loaded month,
+    which keeps the next refresh incremental.
+
+    Args:
+        alias (str): The database alias the counts are pulled from.
+        through_month (date): A day of the last month to load. Defaults to last month.
+
+    Returns:
+        int: The number of cube cells written.
+    """
+    if through_month is None:
+        through_month = month_start(date.today()) - timedelta(days=1)
+
+    through_day = month_end(month_start(through_month))
+
+    watermark = get_cube_watermark(alias)
+    after_day = month_end(watermark) if watermark else EARLIEST_DAY - timedelta(days=1)
+
+    if after_day >= through_day:
+        return 0
+
+    definition = registry.get_report("department_shift_cube", include_internal=True)
+    statement = definition.statement_for(registry.get_engine(alias))
+    cursor = execute_statement(
+        alias,
+        statement,
+        definition.params_for({"after_day": after_day, "through_day": through_day}),
+    )
+
+    connection_key = connection_identity(alias)
+    cells = [
+        DepartmentShiftCube(
+            connection_key=connection_key,
+            month=month_start(to_date(month)),
+            department_name=department_name,
+            group_name=group_name,
+            shift_name=shift_name,
+            assignment_count=assignment_count,
+        )
+        for month, department_name, group_name, shift_name, assignment_count in cursor.fetchall()
+    ]
+
+    with transaction.atomic(using="default"):
+        DepartmentShiftCube.objects.bulk_create(cells, batch_size=500)
+        CubeWatermark.objects.update_or_create(
+            connection_key=connection_key, defaults={"last_month": month_start(through_day)}
+        )
+
+    return len(cells)
+
+
+def get_cube_watermark(alias):
+    """
+    Returns the last month loaded into the cube for an alias.
+
+    Args:
+        alias (str): The database alias of the cube.
+
+    Returns:
+        date or None: The first day of the month, or None if the alias was never refreshed.
+    """
+    watermark = CubeWatermark.objects.filter(connection_key=connection_identity(alias)).first()
+
+    return watermark.last_month if watermark else None
+
+
+def slice_cube(alias, dimensions, filters=None, start_month=None, end_month=None):
+    """
+    Sums the cube cells of an alias per group of dimension values.
+
+    Args:
+        alias (str): The database alias of the cube.
+        dimensions (list): The dimensions the cells are grouped by. An empty list
+            sums every selected cell into one row.
+        filters (dict): Optional dimension names mapped to the lists of values kept.
+        start_month (date): Optional first month of the cells kept.
+        end_month (date): Optional last month of the cells kept.
+
+    Returns:
+        list: Dictionaries with the dimension values, assignment_count and total_hours,
+        sorted by the dimension values.
+
+    Raises:
+        ValueError: If a dimension or filter is not a cube dimension.
+    """
+    dimensions = list(dimensions)
+    filters = filters or {}
+
+    for name in dimensions + list(filters):
+        if name not in CUBE_DIMENSIONS:
+            raise ValueError(f"Unknown cube dimension '{name}'")
+
+    cells = DepartmentShiftCube.objects.filter(connection_key=connection_identity(alias))
+
+    if start_month is not None:
+        cells = cells.filter(month__gte=month_start(start_month))
+
+    if end_month is not None:
+        cells = cells.filter(month__lte=month_start(end_month))
+
+    for name, selected in filters.items():
+        if name == "month":
+            selected = [month_start(value) for value in selected]
+        cells = cells.filter(**{f"{name}__in": selected})
+
+    if dimensions:
+        totals = cells.values(*dimensions).annotate(assignment_count=Sum("assignment_count")).order_by(*dimensions)
+    else:
+        totals = [cells.aggregate(assignment_count=Sum("assignment_count"))]
+
+    rows = []
+
+    for total in totals:
+        count = total["assignment_count"] or 0
+        row = {name: total[name] for name in dimensions}
+        row["assignment_count"] = count
+        row["total_hours"] = count * HOURS_PER_ASSIGNMENT
+        rows.append(row)
+
+    return rows
+
+
+def pivot_cube(
+    alias,
+    rows="department_name",
+    columns="shift_name",
+    measure="total_hours",
+    filters=None,
+    start_month=None,
+    end_month=None,
+):
+    """
+    Returns a matrix of one measure over two dimensions of the cube of an alias.
+
+    Args:
+        alias (str): The database alias of the cube.
+        rows (str): The dimension whose values label the rows of the matrix.
+        columns (str): The dimension whose values label the columns of the matrix.
+        measure (str): "total_hours" or "assignment_count".
+        filters (dict): Optional dimension names mapped to the lists of values kept.
+        start_month (date): Optional first month of the cells kept.
+        end_month (date): Optional last month of the cells kept.
+
+    Returns:
+        dict: The row and column labels, the cells as one list per row with zero
+        where a combination has no assignments, and the row, column and grand totals.
+
+    Raises:
+        ValueError: If a dimension or the measure is unknown, or rows and columns
+        are the same dimension.
+    """
+    if measure not in CUBE_MEASURES:
+        raise ValueError(f"Unknown cube measure '{measure}'")
+
+    if rows == columns:
+        raise ValueError("Pivot rows and columns must be different dimensions")
+
+    totals = slice_cube(alias, [rows, columns], filters, start_month, end_month)
+
+    row_labels = sorted({total[rows] for total in totals})
+    column_labels = sorted({total[columns] for total in totals})
+    row_positions = {label: position for position, label in enumerate(row_labels)}
+    column_positions = {label: position for position, label in enumerate(column_labels)}
+
+    zero = Decimal("0.0") if measure == "total_hours" else 0
+    cells = [[zero] * len(column_labels) for _ in row_labels]
+
+    for total in totals:
+        cells[row_positions[total[rows]]][column_positions[total[columns]]] = total[measure]
+
+    row_totals = [sum(row, zero) for row in cells]
+    column_totals = [sum((row[position] for row in cells), zero) for position in range(len(column_labels))]
+
+    return {
+        "rows": rows,
+        "columns": columns,
+        "measure": measure,
+        "row_labels": [format_label(label) for label in row_labels],
+        "column_labels": [format_label(label) for label in column_labels],
+        "cells": cells,
+        "row_totals": row_totals,
+        "column_totals": column_totals,
+        "total": sum(row_totals, zero),
+    }
+
+
+def month_start(value):
+    """
+    Returns the first day of the month of a date, datetime or YYYY-MM(-DD) string.
+
+    Raises:
+        ValueError: If a string is not a month or a date.
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10] if len(value) > 7 else f"{value}-01")
+
+    return to_date(value).replace(day=1)
+
+
+def month_end(month):
+    """Returns the last day of a month given by its first day."""
+
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def format_label(value):
+    """Returns months of pivot labels as YYYY-MM strings and other labels unchanged."""
+
+    if isinstance(value, date):
+        return value.strftime("%Y-%m")
+
+    return value
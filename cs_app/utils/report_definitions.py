@@ -0,0 +1,280 @@
+"""
+Definitions of the reports that can be run against a user's database.
+
+This module registers every report with the report registry. It is imported once
+by CsAppConfig.ready, which then compiles the registered definitions, so a new
+report only needs a definition here and no new view or statement code.
+
+Reports:
+- department_hours: Total hours per department over a date range
+- department_hours_comparison: Hours per department over a base range and a comparison
+  range, with absolute and percentage deltas, computed in one scan
+- department_active_hours: Assignments active at any time during a date range and their
+  hours per department, including assignments without an end date
+- department_daily_rollup: Assignment counts per department and day, used internally
+  by the local daily rollup
+- department_shift_cube: Assignment counts per month, department, group and shift, used
+  internally by the local department and shift cube
+- department_assignments: Start date, department and shift of every assignment, used internally
+  by the in-memory columnar engine
+- department_assignment_intervals: Department, start and end date of every assignment, used
+  internally by the interval index of active assignments
+- department_assignments_signature: Row count and last modification of the assignment
+  tables, used internally to detect changes for the columnar engine
+
+Dependencies:
+- Python modules: datetime
+- Project modules: report_functions, report_registry
+"""
+
+from datetime import date
+
+from cs_app.utils.report_registry import ReportDefinition, ReportParameter, register_report
+
+import cs_app.utils.report_functions as rf
+
+
+# Report SQL is written as dialect templates: "quoted" identifiers are rendered as
+# [Name] on SQL Server and folded to the lower case names of the AdventureWorks
+# schema on PostgreSQL, so the same text runs against both engines
+DEPARTMENT_HOURS_SQL = """
+    SELECT "Department"."Name" AS "department_name", COUNT("Department"."Name") * 8.0 AS "total_hours"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+    WHERE "EmployeeDepartmentHistory"."StartDate" BETWEEN %s AND %s
+    GROUP BY "Department"."Name"
+"""
+
+# Approximate preview of the department hours report, reading a sample of the
+# assignment history pages. sample_rows is used to compute the error margins
+DEPARTMENT_HOURS_SAMPLE_SQL = """
+    SELECT "Department"."Name" AS "department_name", COUNT("Department"."Name") * 8.0 AS "total_hours",
+           COUNT(*) AS "sample_rows"
+    FROM "HumanResources"."EmployeeDepartmentHistory" {tablesample}
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+    WHERE "EmployeeDepartmentHistory"."StartDate" BETWEEN %s AND %s
+    GROUP BY "Department"."Name"
+"""
+
+# Both ranges are aggregated in one scan with conditional aggregation. The outer
+# query derives the deltas, and a department without comparison hours has no
+# percentage delta instead of a division by zero
+DEPARTMENT_HOURS_COMPARISON_SQL = """
+    SELECT "department_name", "total_hours", "compare_hours",
+           "total_hours" - "compare_hours" AS "hours_delta",
+           CASE WHEN "compare_hours" = 0 THEN NULL
+                ELSE ROUND(("total_hours" - "compare_hours") * 100.0 / "compare_hours", 2)
+           END AS "hours_delta_pct"
+    FROM (
+        SELECT "Department"."Name" AS "department_name",
+               SUM(CASE WHEN "StartDate" BETWEEN %s AND %s THEN 8.0 ELSE 0 END) AS "total_hours",
+               SUM(CASE WHEN "StartDate" BETWEEN %s AND %s THEN 8.0 ELSE 0 END) AS "compare_hours"
+        FROM "HumanResources"."EmployeeDepartmentHistory"
+        JOIN "HumanResources"."Department"
+          ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+        JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+        WHERE "StartDate" BETWEEN %s AND %s OR "StartDate" BETWEEN %s AND %s
+        GROUP BY "Department"."Name"
+    ) AS "totals"
+"""
+
+# An assignment is active during the range when it starts before the range ends and
+# ends after the range starts. Assignments without an EndDate are still running
+DEPARTMENT_ACTIVE_HOURS_SQL = """
+    SELECT "Department"."Name" AS "department_name", COUNT("Department"."Name") AS "active_headcount",
+           COUNT("Department"."Name") * 8.0 AS "total_hours"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+    WHERE "EmployeeDepartmentHistory"."StartDate" <= %s
+      AND ("EmployeeDepartmentHistory"."EndDate" IS NULL OR "EmployeeDepartmentHistory"."EndDate" >= %s)
+    GROUP BY "Department"."Name"
+"""
+
+DEPARTMENT_DAILY_ROLLUP_SQL = """
+    SELECT "EmployeeDepartmentHistory"."StartDate" AS "day", "Department"."Name" AS "department_name",
+           COUNT("Department"."Name") AS "assignment_count"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+    WHERE "EmployeeDepartmentHistory"."StartDate" > %s AND "EmployeeDepartmentHistory"."StartDate" <= %s
+    GROUP BY "EmployeeDepartmentHistory"."StartDate", "Department"."Name"
+"""
+
+# Cells of the department and shift cube. Dates are truncated to the first day of
+# their month, which has no common syntax, so each engine gets its own text
+DEPARTMENT_SHIFT_CUBE_SQL = """
+    SELECT {month} AS "month", "Department"."Name" AS "department_name",
+           "Department"."GroupName" AS "group_name", "Shift"."Name" AS "shift_name",
+           COUNT("Department"."Name") AS "assignment_count"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+    WHERE "EmployeeDepartmentHistory"."StartDate" > %s AND "EmployeeDepartmentHistory"."StartDate" <= %s
+    GROUP BY {month}, "Department"."Name", "Department"."GroupName", "Shift"."Name"
+"""
+
+CUBE_MONTH_EXPRESSIONS = {
+    "mssql": 'DATEFROMPARTS(YEAR("EmployeeDepartmentHistory"."StartDate"), '
+             'MONTH("EmployeeDepartmentHistory"."StartDate"), 1)',
+    "postgresql": 'CAST(DATE_TRUNC(\'month\', "EmployeeDepartmentHistory"."StartDate") AS date)',
+}
+
+# Facts loaded by the columnar engine, with the joins of the department hours report
+# so the counts it answers are the same
+DEPARTMENT_ASSIGNMENTS_SQL = """
+    SELECT "EmployeeDepartmentHistory"."StartDate" AS "start_date",
+           "EmployeeDepartmentHistory"."DepartmentID" AS "department_id", "Department"."Name" AS "department_name",
+           "EmployeeDepartmentHistory"."ShiftID" AS "shift_id"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+    ORDER BY "EmployeeDepartmentHistory"."StartDate"
+"""
+
+DEPARTMENT_ASSIGNMENT_INTERVALS_SQL = """
+    SELECT "Department"."Name" AS "department_name", "EmployeeDepartmentHistory"."StartDate" AS "start_date",
+           "EmployeeDepartmentHistory"."EndDate" AS "end_date"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+    JOIN "HumanResources"."Department"
+      ON "EmployeeDepartmentHistory"."DepartmentID" = "Department"."DepartmentID"
+    JOIN "HumanResources"."Shift" ON "EmployeeDepartmentHistory"."ShiftID" = "Shift"."ShiftID"
+"""
+
+DEPARTMENT_ASSIGNMENTS_SIGNATURE_SQL = """
+    SELECT COUNT(*) AS "row_count", MAX("EmployeeDepartmentHistory"."ModifiedDate") AS "modified_on",
+           (SELECT MAX("Department"."ModifiedDate") FROM "HumanResources"."Department") AS "department_modified_on"
+    FROM "HumanResources"."EmployeeDepartmentHistory"
+"""
+
+
+DEPARTMENT_HOURS = register_report(
+    ReportDefinition(
+        report_id="department_hours",
+        title="Department Hours",
+        parameters=[
+            # Missing dates cover all time, like the "All Time" range of the report page
+            ReportParameter("start_date", "date", default=date(1000, 1, 1)),
+            ReportParameter("end_date", "date", default=date(9999, 12, 31)),
+        ],
+        sql=DEPARTMENT_HOURS_SQL,
+        columns=["department_name", "total_hours"],
+        precomputed=rf.precomputed_department_hours,
+        # Hours are a plain count per department, so date slices add up exactly
+        partition_range=("start_date", "end_date"),
+        additive_columns=["total_hours"],
+        sample_sql=DEPARTMENT_HOURS_SAMPLE_SQL,
+        sample_percent=10,
+    )
+)
+
+DEPARTMENT_HOURS_COMPARISON = register_report(
+    ReportDefinition(
+        report_id="department_hours_comparison",
+        title="Department Hours Comparison",
+        parameters=[
+            # start_date and end_date hold the base range, like the department hours report
+            ReportParameter("start_date", "date"),
+            ReportParameter("end_date", "date"),
+            ReportParameter("compare_start_date", "date"),
+            ReportParameter("compare_end_date", "date"),
+        ],
+        sql=DEPARTMENT_HOURS_COMPARISON_SQL,
+        columns=["department_name", "total_hours", "compare_hours", "hours_delta", "hours_delta_pct"],
+        bind_order=[
+            "start_date", "end_date", "compare_start_date", "compare_end_date",
+            "start_date", "end_date", "compare_start_date", "compare_end_date",
+        ],
+        key_columns=["department_name"],
+    )
+)
+
+DEPARTMENT_ACTIVE_HOURS = register_report(
+    ReportDefinition(
+        report_id="department_active_hours",
+        title="Department Active Hours",
+        parameters=[
+            ReportParameter("start_date", "date", default=date(1000, 1, 1)),
+            ReportParameter("end_date", "date", default=date(9999, 12, 31)),
+        ],
+        sql=DEPARTMENT_ACTIVE_HOURS_SQL,
+        columns=["department_name", "active_headcount", "total_hours"],
+        bind_order=["end_date", "start_date"],
+        precomputed=rf.interval_department_active_hours,
+        # No partition_range: an assignment active in two slices of the range would be
+        # counted twice, so the range is never split
+        key_columns=["department_name"],
+    )
+)
+
+DEPARTMENT_DAILY_ROLLUP = register_report(
+    ReportDefinition(
+        report_id="department_daily_rollup",
+        title="Department Daily Rollup",
+        parameters=[
+            ReportParameter("after_day", "date"),
+            ReportParameter("through_day", "date"),
+        ],
+        sql=DEPARTMENT_DAILY_ROLLUP_SQL,
+        columns=["day", "department_name", "assignment_count"],
+        public=False,
+    )
+)
+
+DEPARTMENT_SHIFT_CUBE = register_report(
+    ReportDefinition(
+        report_id="department_shift_cube",
+        title="Department Shift Cube",
+        parameters=[
+            ReportParameter("after_day", "date"),
+            ReportParameter("through_day", "date"),
+        ],
+        sql={
+            engine: DEPARTMENT_SHIFT_CUBE_SQL.format(month=month)
+            for engine, month in CUBE_MONTH_EXPRESSIONS.items()
+        },
+        columns=["month", "department_name", "group_name", "shift_name", "assignment_count"],
+        public=False,
+    )
+)
+
+DEPARTMENT_ASSIGNMENTS = register_report(
+    ReportDefinition(
+        report_id="department_assignments",
+        title="Department Assignments",
+        parameters=[],
+        sql=DEPARTMENT_ASSIGNMENTS_SQL,
+        columns=["start_date", "department_id", "department_name", "shift_id"],
+        public=False,
+    )
+)
+
+DEPARTMENT_ASSIGNMENT_INTERVALS = register_report(
+    ReportDefinition(
+        report_id="department_assignment_intervals",
+        title="Department Assignment Intervals",
+        parameters=[],
+        sql=DEPARTMENT_ASSIGNMENT_INTERVALS_SQL,
+        columns=["department_name", "start_date", "end_date"],
+        public=False,
+    )
+)
+
+DEPARTMENT_ASSIGNMENTS_SIGNATURE = register_report(
+    ReportDefinition(
+        report_id="department_assignments_signature",
+        title="Department Assignments Signature",
+        parameters=[],
+        sql=DEPARTMENT_ASSIGNMENTS_SIGNATURE_SQL,
+        columns=["row_count", "modified_on", "department_modified_on"],
+        public=False,
+    )
+)
@@ -0,0 +1,203 @@
+"""
+SQL dialects of the database engines reports run on.
+
+This module contains the SQL generation layer of the reports. Report SQL is
+written once as a template in ANSI style and each dialect renders it for its
+engine when the reports are compiled at startup:
+
+- "Quoted" identifiers become [bracketed] names on SQL Server, and "folded" lower
+  case names on PostgreSQL, where the AdventureWorks schema is created unquoted.
+- ODBC date escapes {d 'YYYY-MM-DD'} become typed date literals.
+- A {tablesample} marker becomes the sampling clause of the engine.
+
+The dialects also give the pagination clause and the order of its bind parameters
+used by server side pages, and the NULL ordering that makes every engine sort NULL
+below any value, like SQL Server does. Single quoted string literals are left untouched.
+
+Classes:
+- SqlDialect: Identifier quoting, literals, pagination and sampling syntax of an engine
+
+Functions:
+- get_dialect(engine): Returns the dialect of an engine name
+
+Module Variables:
+- DIALECTS: Engine names mapped to their dialect
+
+Dependencies:
+- Python modules: datetime, re
+"""
+
+from datetime import date
+
+import re
+
+
+# Tokens a template is rendered from. Date escapes come before string literals,
+# since they contain one, and string literals before quoted identifiers, so a
+# double quote inside a string is never taken for an identifier
+TEMPLATE_TOKENS = re.compile(
+    r"\{d '(?P<date>\d{4}-\d{2}-\d{2})'\}"
+    r"|(?P<tablesample>\{tablesample\})"
+    r"|(?P<string>'(?:[^']|'')*')"
+    r'|"(?P<identifier>[^"]+)"'
+)
+
+
+class SqlDialect:
+    """
+    Identifier quoting, literals, pagination and sampling syntax of an engine.
+
+    Args:
+        name (str): The engine name, as returned by get_engine.
+        quotes (tuple): The opening and closing identifier quote.
+        date_format (str): Format of a date literal, with a {value} ISO date.
+        pagination_clause (str): Clause cutting an ordered result to a page, with
+            the offset and the limit as %s placeholders.
+        limit_first (bool): Whether the limit is bound before the offset.
+        sample_clause (str): Sampling clause, with a {percent} of the table to read.
+        fold_case (bool): Whether identifiers are folded to lower case.
+        null_ordering (tuple): Clauses appended to ascending and descending sort
+            terms so NULL sorts below any value. Empty where that is the default.
+    """
+
+    def __init__(
+        self,
+        name,
+        quotes,
+        date_format,
+        pagination_clause,
+        limit_first,
+        sample_clause,
+        fold_case=False,
+        null_ordering=("", ""),
+    ):
+        self.name = name
+        self.quotes = quotes
+        self.date_format = date_format
+        self.pagination_clause = pagination_clause
+        self.limit_first = limit_first
+        self.sample_clause = sample_clause
+        self.fold_case = fold_case
+        self.null_ordering = null_ordering
+
+    def quote_name(self, name):
+        """
+        Quotes an identifier, which may be qualified like Schema.Table.Column.
+
+        Args:
+            name (str): The identifier, with parts separated by dots.
+
+        Returns:
+            str: The quoted identifier.
+        """
+        open_quote, close_quote = self.quotes
+        parts = []
+
+        for part in name.split("."):
+            if self.fold_case:
+                part = part.lower()
+            parts.append(open_quote + part.replace(close_quote, close_quote * 2) + close_quote)
+
+        return ".".join(parts)
+
+    def date_literal(self, value):
+        """
+        Returns a typed date literal.
+
+        Args:
+            value (date|str): The date, or its ISO text.
+
+        Returns:
+            str: The literal, like CAST('20090101' AS date) or DATE '2009-01-01'.
+        """
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+
+        return self.date_format.format(value=value)
+
+    def order_term(self, column, descending):
+        """Returns the sort term of a column, with NULL sorting below any value."""
+
+        if descending:
+            return f"{column} DESC{self.null_ordering[1]}"
+
+        return f"{column} ASC{self.null_ordering[0]}"
+
+    def pagination_params(self, offset, limit):
+        """Returns the offset and limit in the order the pagination clause binds them."""
+
+        return [limit, offset] if self.limit_first else [offset, limit]
+
+    def tablesample(self, percent):
+        """Returns the clause sampling a percentage of a table's pages."""
+
+        return self.sample_clause.format(percent=percent)
+
+    def render(self, template, sample_percent=None):
+        """
+        Renders a report SQL template for the engine.
+
+        Args:
+            template (str): SQL with "quoted" identifiers, {d 'YYYY-MM-DD'} dates and
+                an optional {tablesample} marker.
+            sample_percent (int|float): The percentage {tablesample} reads.
+
+        Returns:
+            str: The SQL for the engine.
+
+        Raises:
+            ValueError: If the template has a {tablesample} marker but no percentage is given.
+        """
+
+        def replace(match):
+            if match.group("date"):
+                return self.date_literal(match.group("date"))
+
+            if match.group("tablesample"):
+                if sample_percent is None:
+                    raise ValueError("No sample percentage given for {tablesample}")
+                return self.tablesample(sample_percent)
+
+            if match.group("string"):
+                return match.group("string")
+
+            return self.quote_name(match.group("identifier"))
+
+        return TEMPLATE_TOKENS.sub(replace, template).strip()
+
+
+DIALECTS = {
+    "mssql": SqlDialect(
+        name="mssql",
+        quotes=("[", "]"),
+        # The unseparated form is read the same way under every language setting
+        date_format="CAST('{value:%Y%m%d}' AS date)",
+        pagination_clause="OFFSET %s ROWS FETCH NEXT %s ROWS ONLY",
+        limit_first=False,
+        sample_clause="TABLESAMPLE SYSTEM ({percent} PERCENT)",
+    ),
+    "postgresql": SqlDialect(
+        name="postgresql",
+        quotes=('"', '"'),
+        date_format="DATE '{value:%Y-%m-%d}'",
+        pagination_clause="LIMIT %s OFFSET %s",
+        limit_first=True,
+        sample_clause="TABLESAMPLE SYSTEM ({percent})",
+        fold_case=True,
+        # PostgreSQL sorts NULL above any value by default
+        null_ordering=(" NULLS FIRST", " NULLS LAST"),
+    ),
+}
+
+
+def get_dialect(engine):
+    """
+    Returns the dialect of an engine.
+
+    Args:
+        engine (str): The engine name returned by get_engine.
+
+    Returns:
+        SqlDialect or None: The dialect, or None if reports cannot run on the engine.
+    """
+    return DIALECTS.get(engine)
@@ -0,0 +1,231 @@
+"""
+Python functions that encode report rows in the format a client asks for.
+
+This module contains the content negotiation used by the report endpoints. The
+default stays the row oriented {"data": [...]} JSON document. Clients that read
+large results can ask for a more compact encoding with the Accept header:
+
+- application/vnd.cstool.columnar+json: {"columns": [...], "data": [[...], ...]},
+  one array of values per column, so key names are not repeated on every row.
+- application/x-msgpack: the same columnar document encoded as MessagePack.
+- application/vnd.apache.arrow.stream: an Arrow IPC stream holding one table, with
+  Decimal and date columns kept as native Arrow types.
+
+Decimal values are sent as strings and dates as ISO strings in the JSON and
+MessagePack encodings, like the default encoding does, but without going through
+DjangoJSONEncoder for every value. orjson is used for columnar JSON when installed.
+
+Functions:
+- encoding_available(encoding): Returns whether the libraries for an encoding are installed
+- negotiate_encoding(accept): Returns the encoding that best matches an Accept header
+- encoded_response(rows, columns, encoding, extra): Builds the HttpResponse for an encoding
+- to_columns(rows, columns): Returns the rows as one list of values per column
+- encode_value(value): Converts Decimal and date values for JSON and MessagePack
+
+Dependencies:
+- Django modules: HttpResponse
+- Python modules: datetime, decimal, importlib, io, json
+- Optional modules: orjson (columnar JSON), msgpack (MessagePack), pyarrow (Arrow IPC)
+"""
+
+from django.http import HttpResponse
+
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import importlib.util
+import io
+import json
+
+
+REPORT_ENCODINGS = {
+    "json": "application/json",
+    "columnar": "application/vnd.cstool.columnar+json",
+    "msgpack": "application/x-msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+ENCODING_REQUIRED_MODULES = {
+    "json": None,
+    "columnar": None,
+    "msgpack": "msgpack",
+    "arrow": "pyarrow",
+}
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+
+# Other media types clients commonly send for the same encodings
+ENCODING_ALIASES = {
+    "application/msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "application/vnd.apache.arrow.file": "arrow",
+}
+
+
+def encoding_available(encoding):
+    """
+    Returns whether an encoding is known and its libraries are installed.
+
+    Args:
+        encoding (str): One of "json", "columnar", "msgpack" or "arrow".
+
+    Returns:
+        bool: True if the encoding can be produced.
+    """
+    if encoding not in ENCODING_REQUIRED_MODULES:
+        return False
+
+    module_name = ENCODING_REQUIRED_MODULES[encoding]
+
+    return module_name is None or importlib.util.find_spec(module_name) is not None
+
+
+def negotiate_encoding(accept):
+    """
+    Returns the encoding that best matches an Accept header.
+
+    Media types are tried in order of their q value, and types whose libraries are
+    not installed are skipped. A missing header or a wildcard selects the default
+    row oriented JSON.
+
+    Args:
+        accept (str): The Accept header of the request.
+
+    Returns:
+        str or None: The encoding name, or None if nothing acceptable can be produced.
+    """
+    if not accept:
+        return "json"
+
+    media_types = []
+
+    for position, part in enumerate(accept.split(",")):
+        media_type, *parameters = [item.strip() for item in part.split(";")]
+        quality = 1.0
+
+        for parameter in parameters:
+            if parameter.startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+
+        if quality > 0:
+            media_types.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(media_types):
+        if media_type in ("*/*", "application/*"):
+            return "json"
+
+        for encoding, content_type in REPORT_ENCODINGS.items():
+            if media_type == content_type and encoding_available(encoding):
+                return encoding
+
+        encoding = ENCODING_ALIASES.get(media_type)
+        if encoding and encoding_available(encoding):
+            return encoding
+
+    return None
+
+
+def encoded_response(rows, columns, encoding, extra=None):
+    """
+    Builds the response holding report rows in an encoding.
+
+    Args:
+        rows (list): Row dictionaries.
+        columns (list): The row keys sent as columns, in order.
+        encoding (str): An encoding returned by negotiate_encoding, other than "json".
+        extra (dict): Additional top level members of the document. Arrow streams
+            carry them as JSON in the schema metadata.
+
+    Returns:
+        HttpResponse: The encoded response.
+    """
+    if encoding == "arrow":
+        content = encode_arrow(rows, columns, extra)
+    else:
+        document = dict(extra or {}, columns=columns, data=to_columns(rows, columns))
+
+        if encoding == "msgpack":
+            import msgpack
+
+            content = msgpack.packb(document, default=encode_value, use_bin_type=True)
+        else:
+            content = encode_columnar_json(document)
+
+    response = HttpResponse(content, content_type=REPORT_ENCODINGS[encoding])
+    response["Vary"] = "Accept"
+
+    return response
+
+
+def to_columns(rows, columns):
+    """Returns the rows as one list of values per column."""
+
+    return [[row.get(column) for row in rows] for column in columns]
+
+
+def encode_columnar_json(document):
+    """Encodes a columnar document as compact JSON, with orjson when installed."""
+
+    if ORJSON_AVAILABLE:
+        import orjson
+
+        return orjson.dumps(document, default=encode_value)
+
+    return json.dumps(document, default=encode_value, separators=(",", ":")).encode("utf-8")
+
+
+def encode_arrow(rows, columns, extra, compression=None):
+    """
+    Encodes rows as an Arrow IPC stream holding one table.
+
+    Args:
+        rows (list): Row dictionaries.
+        columns (list): The row keys sent as columns, in order.
+        extra (dict): Additional members stored as JSON in the schema metadata.
+        compression (str): Optional buffer compression, "zstd" or "lz4".
+
+    Returns:
+        bytes: The Arrow IPC stream.
+    """
+    import pyarrow as pa
+
+    table = pa.table(dict(zip(columns, to_columns(rows, columns))))
+
+    if extra:
+        table = table.replace_schema_metadata(
+            {key: json.dumps(value, default=encode_value) for key, value in extra.items()}
+        )
+
+    sink = io.BytesIO()
+
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+
+    return sink.getvalue()
+
+
+def encode_value(value):
+    """
+    Converts values the JSON and MessagePack encoders do not know.
+
+    Args:
+        value (object): The value to be converted.
+
+    Returns:
+        str: Decimal values as strings and dates as ISO strings.
+
+    Raises:
+        TypeError: If the value cannot be converted.
+    """
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
@@ -0,0 +1,209 @@
+"""
+Query plans and per stage timings of report runs.
+
+This module contains the helpers of the explain mode of load_table, which staff
+users turn on to find where the time of a slow report goes. The report runs live,
+bypassing the report cache and precomputed data, and the time of each stage is
+measured: logging the report history, acquiring the connection, executing the
+statement, fetching the rows and serializing the response.
+
+The plan of the statement is captured from the engine as well:
+
+- PostgreSQL: EXPLAIN (FORMAT JSON) for the estimated plan, or
+  EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for the actual plan with row counts,
+  timings and buffer usage of every node.
+- SQL Server: SET SHOWPLAN_XML for the estimated plan, or SET STATISTICS XML for
+  the actual plan, returned by the server after the report rows.
+
+The plan is captured in its own run after the timed one, so the stage timings are
+those of a regular report run. An actual plan executes the statement again.
+
+Classes:
+- StageTimer: Measures the time of the named stages of a report run
+
+Functions:
+- parse_explain_mode(value): Returns the plan requested by a report request
+- explain_statement(alias, statement, params, mode): Captures the plan of a report statement
+- explain_postgresql(conn, statement, params, mode): Captures a plan with EXPLAIN
+- explain_mssql(conn, statement, params, mode): Captures a plan with SHOWPLAN_XML or STATISTICS XML
+
+Module Variables:
+- EXPLAIN_MODES: The plans that can be requested
+
+Dependencies:
+- Django modules: connections
+- Python modules: contextlib, json, time
+- Project modules: report_inflight, report_queries
+"""
+
+from django.db import connections
+
+from contextlib import contextmanager
+
+from cs_app.utils.report_inflight import watch_query
+from cs_app.utils.report_queries import apply_statement_timeout, get_statement_timeout
+
+import json
+import time
+
+
+# "estimated" plans are compiled without running the statement, "actual" plans run it
+EXPLAIN_MODES = ("estimated", "actual")
+
+
+class StageTimer:
+    """
+    Measures the time of the named stages of a report run.
+
+    A stage entered more than once adds up, and stages keep the order they were
+    first entered in.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Measures the time spent inside the block under a stage name."""
+
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    @property
+    def total_ms(self):
+        """The time of every stage together, in milliseconds."""
+
+        return sum(self.stages.values())
+
+    def as_dict(self):
+        """Returns the stages and their total in milliseconds, rounded to microseconds."""
+
+        timings = {name: round(elapsed, 3) for name, elapsed in self.stages.items()}
+        timings["total"] = round(self.total_ms, 3)
+
+        return timings
+
+
+def parse_explain_mode(value):
+    """
+    Returns the plan requested by the "explain" value of a report request.
+
+    Args:
+        value (object): true or "actual" for the actual plan, "estimated" for the estimated plan.
+
+    Returns:
+        str or None: "estimated" or "actual", or None when no plan is requested.
+
+    Raises:
+        ValueError: If the value is not a known mode.
+    """
+    if value in (None, "", False):
+        return None
+
+    if value is True:
+        return "actual"
+
+    if value not in EXPLAIN_MODES:
+        raise ValueError(f"Explain must be one of {', '.join(EXPLAIN_MODES)}")
+
+    return value
+
+
+def explain_statement(alias, statement, params, mode):
+    """
+    Captures the plan of a report statement on the connection of an alias.
+
+    Args:
+        alias (str): The database alias the statement runs against.
+        statement (ReportStatement): The statement to be explained.
+        params (list|tuple): Values bound to the %s placeholders of the statement.
+        mode (str): "estimated" or "actual".
+
+    Returns:
+        dict: The mode, the format of the plan ("json" or "xml") and the plan.
+
+    Raises:
+        ValueError: If plans cannot be captured on the engine of the alias.
+    """
+    conn = connections[alias]
+    conn.ensure_connection()
+    apply_statement_timeout(conn, get_statement_timeout(alias, conn.vendor))
+
+    if conn.vendor == "postgresql":
+        plan_format, plan = "json", explain_postgresql(conn, statement, params, mode)
+    elif conn.vendor == "microsoft":
+        plan_format, plan = "xml", explain_mssql(conn, statement, params, mode)
+    else:
+        raise ValueError(f"Plans cannot be captured on {conn.vendor}")
+
+    return {"mode": mode, "format": plan_format, "plan": plan}
+
+
+def explain_postgresql(conn, statement, params, mode):
+    """
+    Captures the plan of a statement with EXPLAIN on PostgreSQL.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection of the alias.
+        statement (ReportStatement): The statement to be explained.
+        params (list|tuple): Values bound to the statement placeholders.
+        mode (str): "estimated" or "actual".
+
+    Returns:
+        list: The JSON plan returned by EXPLAIN.
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if mode == "actual" else "FORMAT JSON"
+
+    with conn.cursor() as cursor:
+        with watch_query(conn):
+            cursor.execute(f"EXPLAIN ({options}) {statement.sql}", params)
+        plan = cursor.fetchone()[0]
+
+    # Drivers without a JSON adapter return the plan as text
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def explain_mssql(conn, statement, params, mode):
+    """
+    Captures the XML plan of a statement on SQL Server.
+
+    With SHOWPLAN_XML the statement is compiled but not run, and the plan is its only
+    result. With STATISTICS XML the statement runs and the plan follows its rows as
+    an extra result set.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection of the alias.
+        statement (ReportStatement): The statement to be explained.
+        params (list|tuple): Values bound to the statement placeholders.
+        mode (str): "estimated" or "actual".
+
+    Returns:
+        str: The ShowPlanXML document, or None if the server returned no plan.
+    """
+    option = "STATISTICS XML" if mode == "actual" else "SHOWPLAN_XML"
+    cursor = conn.connection.cursor()
+    plan = None
+
+    try:
+        cursor.execute(f"SET {option} ON")
+
+        with watch_query(conn, cursor):
+            cursor.execute(statement.sql.replace("%s", "?"), list(params))
+
+            while True:
+                row = cursor.fetchone() if cursor.description else None
+
+                if row and isinstance(row[0], str) and "<ShowPlanXML" in row[0][:200]:
+                    plan = row[0]
+
+                if not cursor.nextset():
+                    break
+    finally:
+        cursor.execute(f"SET {option} OFF")
+        cursor.close()
+
+    return plan
@@ -0,0 +1,330 @@
+"""
+Python functions that export report results to CSV, XLSX and Parquet files.
+
+This module contains the generators used by the export endpoint. Rows are consumed
+batch by batch from the report cursor and are never held in memory as a whole:
+
+- CSV is encoded one batch at a time and streamed as it is produced. Once an export
+  passes REPORT_EXPORT_POOL_MIN_ROWS rows, batches are encoded (and gzip compressed
+  when requested) in a process pool while earlier batches are being sent.
+- XLSX and Parquet cannot be streamed before they are complete, so batches are
+  spooled to a temporary file on disk. The file is then encoded in the process pool
+  (or in the request thread for small exports) and streamed back in chunks.
+
+The functions run in the process pool only use the standard library, openpyxl and
+pyarrow, never Django, so they can be imported by freshly spawned processes.
+
+Functions:
+- export_available(export_format): Returns whether the libraries for a format are installed
+- iter_export(batches, export_format, columns, compress): Yields the bytes of an export file
+- encode_csv_batch(rows, columns, header, compress): Encodes one batch of rows as CSV
+- build_xlsx(spool_path, columns): Builds an XLSX file from spooled batches
+- build_parquet(spool_path, columns): Builds a Parquet file from spooled batches
+
+Dependencies:
+- Django modules: settings
+- Python modules: collections, concurrent.futures, csv, decimal, gzip, importlib, io,
+  multiprocessing, os, pickle, tempfile, threading
+- Optional modules: openpyxl (XLSX), pyarrow (Parquet)
+"""
+
+from django.conf import settings
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import csv
+import gzip
+import importlib.util
+import io
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_REQUIRED_MODULES = {
+    "csv": None,
+    "xlsx": "openpyxl",
+    "parquet": "pyarrow",
+}
+
+DEFAULT_POOL_PROCESSES = 2
+DEFAULT_POOL_MIN_ROWS = 10000
+FILE_CHUNK_SIZE = 64 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def export_available(export_format):
+    """
+    Returns whether an export format is known and its libraries are installed.
+
+    Args:
+        export_format (str): One of "csv", "xlsx" or "parquet".
+
+    Returns:
+        bool: True if the format can be exported.
+    """
+    if export_format not in EXPORT_REQUIRED_MODULES:
+        return False
+
+    module_name = EXPORT_REQUIRED_MODULES[export_format]
+
+    return module_name is None or importlib.util.find_spec(module_name) is not None
+
+
+def get_export_pool():
+    """Returns the shared process pool used for encoding large exports."""
+
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "REPORT_EXPORT_PROCESSES", DEFAULT_POOL_PROCESSES),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        return _pool
+
+
+def iter_export(batches, export_format, columns, compress=False):
+    """
+    Yields the bytes of an export file built from batches of report rows.
+
+    Args:
+        batches (iterable): Batches of row dictionaries.
+        export_format (str): One of "csv", "xlsx" or "parquet".
+        columns (list): The row keys written as columns, in order.
+        compress (bool): Whether CSV output is gzip compressed.
+
+    Yields:
+        bytes: Parts of the export file.
+    """
+    if export_format == "csv":
+        yield from iter_csv_export(batches, columns, compress)
+        return
+
+    builder = build_xlsx if export_format == "xlsx" else build_parquet
+    spool_path, row_count = spool_batches(batches)
+
+    try:
+        if row_count >= getattr(settings, "REPORT_EXPORT_POOL_MIN_ROWS", DEFAULT_POOL_MIN_ROWS):
+            export_path = get_export_pool().submit(builder, spool_path, columns).result()
+        else:
+            export_path = builder(spool_path, columns)
+    finally:
+        os.remove(spool_path)
+
+    yield from iter_file_chunks(export_path)
+
+
+def iter_csv_export(batches, columns, compress):
+    """
+    Yields a CSV export batch by batch.
+
+    Small exports are encoded in the calling thread. After the row threshold is
+    passed, batches are submitted to the process pool and at most one batch per pool
+    process is kept in flight, in order.
+
+    Args:
+        batches (iterable): Batches of row dictionaries.
+        columns (list): The row keys written as columns, in order.
+        compress (bool): Whether each batch is written as a gzip member.
+
+    Yields:
+        bytes: Encoded CSV batches.
+    """
+    pool_min_rows = getattr(settings, "REPORT_EXPORT_POOL_MIN_ROWS", DEFAULT_POOL_MIN_ROWS)
+    max_in_flight = getattr(settings, "REPORT_EXPORT_PROCESSES", DEFAULT_POOL_PROCESSES)
+    in_flight = deque()
+    rows_seen = 0
+    header = True
+
+    for rows in batches:
+        if not rows and not header:
+            continue
+
+        rows_seen += len(rows)
+
+        if rows_seen <= pool_min_rows:
+            yield encode_csv_batch(rows, columns, header, compress)
+        else:
+            in_flight.append(
+                get_export_pool().submit(encode_csv_batch, rows, columns, header, compress)
+            )
+
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+
+        header = False
+
+    while in_flight:
+        yield in_flight.popleft().result()
+
+    if header:
+        yield encode_csv_batch([], columns, True, compress)
+
+
+def encode_csv_batch(rows, columns, header, compress):
+    """
+    Encodes one batch of rows as CSV.
+
+    Concatenated gzip members form a valid gzip file, so compressed batches can be
+    produced independently and sent one after the other.
+
+    Args:
+        rows (list): Row dictionaries.
+        columns (list): The row keys written as columns, in order.
+        header (bool): Whether the column header line is written first.
+        compress (bool): Whether the batch is returned as a gzip member.
+
+    Returns:
+        bytes: The encoded batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    if header:
+        writer.writerow(columns)
+
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+
+    encoded = buffer.getvalue().encode("utf-8")
+
+    return gzip.compress(encoded) if compress else encoded
+
+
+def spool_batches(batches):
+    """
+    Writes batches of rows to a temporary file on disk.
+
+    Args:
+        batches (iterable): Batches of row dictionaries.
+
+    Returns:
+        tuple: The path of the spool file and the number of rows written.
+    """
+    row_count = 0
+
+    with tempfile.NamedTemporaryFile(suffix=".spool", delete=False) as spool:
+        for rows in batches:
+            if rows:
+                pickle.dump(rows, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                row_count += len(rows)
+
+    return spool.name, row_count
+
+
+def iter_spooled_batches(spool_path):
+    """Yields the batches written by spool_batches."""
+
+    with open(spool_path, "rb") as spool:
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                return
+
+
+def build_xlsx(spool_path, columns):
+    """
+    Builds an XLSX file from spooled batches with a write only workbook.
+
+    Args:
+        spool_path (str): The path of the spool file.
+        columns (list): The row keys written as columns, in order.
+
+    Returns:
+        str: The path of the temporary XLSX file.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Report")
+    worksheet.append(columns)
+
+    for rows in iter_spooled_batches(spool_path):
+        for row in rows:
+            worksheet.append([to_cell_value(row.get(column)) for column in columns])
+
+    export_file = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    export_file.close()
+    workbook.save(export_file.name)
+
+    return export_file.name
+
+
+def build_parquet(spool_path, columns):
+    """
+    Builds a Parquet file from spooled batches, one row group per batch.
+
+    Args:
+        spool_path (str): The path of the spool file.
+        columns (list): The row keys written as columns, in order.
+
+    Returns:
+        str: The path of the temporary Parquet file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    export_file = tempfile.NamedTemporaryFile(suffix=".parquet", delete=False)
+    export_file.close()
+    writer = None
+
+    try:
+        for rows in iter_spooled_batches(spool_path):
+            table = pa.table(
+                {column: [to_cell_value(row.get(column)) for row in rows] for column in columns}
+            )
+
+            if writer is None:
+                writer = pq.ParquetWriter(export_file.name, table.schema, compression="zstd")
+
+            writer.write_table(table.cast(writer.schema))
+
+        if writer is None:
+            empty_table = pa.table({column: pa.array([], pa.string()) for column in columns})
+            pq.write_table(empty_table, export_file.name)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return export_file.name
+
+
+def to_cell_value(value):
+    """Converts Decimal values to float so spreadsheet and Parquet cells are numeric."""
+
+    if isinstance(value, Decimal):
+        return float(value)
+
+    return value
+
+
+def iter_file_chunks(path):
+    """Yields a file in chunks and deletes it once it has been read."""
+
+    try:
+        with open(path, "rb") as export_file:
+            while True:
+                chunk = export_file.read(FILE_CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,168 @@
+"""
+Python functions that run one report against several databases at the same time.
+
+This module contains the functions used by the multi-database mode of load_table.
+The report runs once per database alias on a shared, bounded thread pool, and the
+result of each database is handed back as soon as it finishes, so a fast database
+never waits for a slow one. Each alias has its own timeout, counted from the moment
+its query starts running. An alias that passes it is reported as timed out, its
+query is cancelled when the report is tracked, and the remaining aliases carry on.
+
+Functions:
+- get_fanout_pool(): Returns the shared thread pool used for multi-database reports
+- iter_fanout_results(aliases, definition, values, timeout, partition): Yields the result of each alias as it finishes
+- run_report_on_alias(alias, definition, values, started, partition): Runs a report for one alias in a pool thread
+- merge_fanout_results(results): Combines result rows into one table with a source_database column
+
+Dependencies:
+- Django modules: settings, close_old_connections
+- Python modules: concurrent.futures, contextvars, threading, time
+- Project modules: report_functions, report_inflight
+"""
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import contextvars
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_inflight as report_inflight
+import threading
+import time
+
+
+DEFAULT_FANOUT_WORKERS = 4
+DEFAULT_FANOUT_TIMEOUT = 60
+
+# How long to wait for a result when no running alias is close to its timeout
+IDLE_WAIT_SECONDS = 1.0
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_fanout_pool():
+    """Returns the shared thread pool used for multi-database reports."""
+
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "REPORT_FANOUT_WORKERS", DEFAULT_FANOUT_WORKERS),
+                thread_name_prefix="report-fanout",
+            )
+
+        return _pool
+
+
+def iter_fanout_results(aliases, definition, values, timeout=None, partition=None):
+    """
+    Runs a report against several aliases and yields each result as it finishes.
+
+    Args:
+        aliases (list): The database aliases the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        timeout (int|float): Seconds each alias may run. Defaults to REPORT_FANOUT_TIMEOUT.
+        partition (str): Optional slice unit the query of each alias is split by.
+
+    Yields:
+        dict: The database alias, a status of "ok", "error" or "timeout", the error
+        message and the result rows of one alias.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "REPORT_FANOUT_TIMEOUT", DEFAULT_FANOUT_TIMEOUT)
+
+    pool = get_fanout_pool()
+    started = {}
+    pending = {}
+
+    for alias in aliases:
+        # Pool threads run in a copy of the caller's context, so their queries are
+        # registered with the report being tracked and can be cancelled with it
+        context = contextvars.copy_context()
+        future = pool.submit(
+            context.run, run_report_on_alias, alias, definition, values, started, partition
+        )
+        pending[future] = alias
+
+    while pending:
+        now = time.monotonic()
+        deadlines = [
+            started[alias] + timeout for alias in pending.values() if alias in started
+        ]
+        wait_seconds = min([IDLE_WAIT_SECONDS] + [deadline - now for deadline in deadlines])
+
+        done, _ = wait(list(pending), timeout=max(wait_seconds, 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            alias = pending.pop(future)
+
+            try:
+                yield {"database": alias, "status": "ok", "error": "", "data": future.result()}
+            except Exception as e:
+                yield {"database": alias, "status": "error", "error": str(e), "data": []}
+
+        now = time.monotonic()
+
+        for future, alias in list(pending.items()):
+            if alias in started and now - started[alias] >= timeout:
+                future.cancel()
+                del pending[future]
+
+                report = report_inflight.current_report()
+                if report:
+                    report.cancel(alias)
+
+                yield {
+                    "database": alias,
+                    "status": "timeout",
+                    "error": f"Timed out after {timeout} seconds",
+                    "data": [],
+                }
+
+
+def run_report_on_alias(alias, definition, values, started, partition=None):
+    """
+    Runs a report for one alias in a pool thread.
+
+    Pool threads are not tied to a request, so connections that went stale or passed
+    CONN_MAX_AGE are closed before and after the report, like Django does at the
+    start and end of every request.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        started (dict): Aliases mapped to the time their report started running.
+        partition (str): Optional slice unit the query is split by.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    started[alias] = time.monotonic()
+    close_old_connections()
+
+    try:
+        return rf.get_report_data(alias, definition, values, partition)
+    finally:
+        close_old_connections()
+
+
+def merge_fanout_results(results):
+    """
+    Combines the rows of several databases into one table.
+
+    Args:
+        results (list): Results yielded by iter_fanout_results.
+
+    Returns:
+        list: Every row of every database with a source_database column added.
+    """
+    return [
+        dict(row, source_database=result["database"])
+        for result in results
+        for row in result["data"]
+    ]
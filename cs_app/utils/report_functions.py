@@ -0,0 +1,667 @@
+"""
+Python functions used to run reports against a user's database.
+
+This module contains the functions that execute registered reports against the
+database connection of an alias and shape the rows for the views. Report results
+are kept in the shared report cache so repeated requests for the same parameters
+on the same database do not run the remote query again. A report may answer from
+local precomputed data first, like the department hours report which counts from
+the in-memory columnar index or sums the local daily rollup instead of scanning
+the remote join. Reports with additive
+columns reuse the rows of date segments queried before and only query the days
+they are missing, and can have their date range split into slices queried in parallel.
+Sorted pages of a report are pushed down to the remote query unless the whole
+result is already in memory. Reports with sample SQL can answer an approximate
+preview from a sampled scan before the exact result. Identical reports requested
+at the same time share one query. A batch of parameter sets groups the sets it has
+to query into UNION ALL statements run on one connection.
+
+Functions:
+- get_report_data(alias, definition, values, partition): Returns report rows, using the report cache
+- iter_report_data(alias, definition, values, batch_size, partition): Yields report rows in batches
+- get_report_page(alias, definition, values, page): Returns one sorted page of report rows
+- get_report_batch(alias, items, refresh): Returns the rows of several parameter sets, grouping their queries
+- run_batch_query(alias, definition, values_list): Runs several parameter sets of a report in one statement
+- get_report_estimate(alias, definition, values): Returns an approximate preview, or the exact result when cached
+- iter_report_phases(alias, definition, values, partition): Yields the preview and then the exact result
+- compute_report_data(alias, definition, values, partition): Computes report rows from precomputed data or the live query
+- refresh_report_data(alias, definition, values): Runs a report live and replaces its cached rows
+- explain_report(alias, definition, values, mode, timer): Runs a report live with stage timings and captures its plan
+- run_report_query(alias, definition, values): Executes the report statement for the engine of an alias
+- run_segmented_query(alias, definition, values, partition): Reuses stored date segments and queries the missing ones
+- run_partitioned_query(alias, definition, values, partition): Runs the slices of a report range in parallel and merges them
+- run_report_slice(alias, definition, values): Runs one slice of a partitioned report in a pool thread
+- precomputed_department_hours(alias, values): Answers department hours from the columnar index or the daily rollup
+- rollup_department_hours(alias, values): Answers department hours from the daily rollup
+- interval_department_active_hours(alias, values): Answers department active hours from the interval index
+
+Dependencies:
+- Django modules: close_old_connections, connections, DatabaseError
+- Python modules: contextvars, datetime, decimal, time
+- Project modules: report_batch, report_cache, report_coalesce, report_columnar, report_explain, report_inflight,
+  report_intervals, report_paging, report_partition, report_queries, report_registry, report_rollup, report_sampling, report_segments
+"""
+
+from django.db import DatabaseError, close_old_connections, connections
+
+from datetime import timedelta
+from decimal import Decimal
+
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_coalesce import report_flights
+from cs_app.utils.report_explain import explain_statement
+from cs_app.utils.report_inflight import ReportCancelled, current_report, is_statement_timeout
+from cs_app.utils.report_queries import execute_statement, stream_statement
+from cs_app.utils.report_segments import segment_store, make_segment_scope
+
+import contextvars
+import cs_app.utils.report_batch as report_batch
+import cs_app.utils.report_columnar as report_columnar
+import cs_app.utils.report_intervals as report_intervals
+import cs_app.utils.report_paging as report_paging
+import cs_app.utils.report_partition as report_partition
+import cs_app.utils.report_registry as registry
+import cs_app.utils.report_rollup as rollup
+import cs_app.utils.report_sampling as report_sampling
+import time
+
+
+# Every assignment row counts as one eight hour shift
+HOURS_PER_ASSIGNMENT = Decimal("8.0")
+
+
+def get_report_data(alias, definition, values, partition=None):
+    """
+    Returns the rows of a report, served from the cache when possible.
+
+    Partitioned and unpartitioned runs return the same rows, so they share the
+    cached result. On a cache miss, identical requests arriving while the query runs
+    wait for its result instead of running their own (see report_coalesce).
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        partition (str): Optional slice unit ("month", "quarter" or "year") the
+            live query is split by.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    cache_key = make_cache_key(alias, definition.report_id, values)
+
+    data = report_cache.get(cache_key)
+
+    if data is None:
+
+        def compute():
+            # A call of the same key may have filled the cache since the lookup above
+            cached = report_cache.get(cache_key)
+            return cached if cached is not None else compute_report_data(alias, definition, values, partition)
+
+        # Identical reports requested while this one runs wait for its result
+        data = report_flights.do(cache_key, compute)
+        report_cache.set(cache_key, data)
+
+    return data
+
+
+def iter_report_data(alias, definition, values, batch_size=500, partition=None):
+    """
+    Yields the rows of a report in batches for streaming responses.
+
+    Cached results and results answered from precomputed data are already in
+    memory, so they are sliced into batches. Partitioned results are merged in
+    memory from their segments too. Otherwise the live query is streamed with fetchmany and never held
+    in memory as a whole, so it is not cached either.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        batch_size (int): The number of rows yielded at a time.
+        partition (str): Optional slice unit the live query is split by.
+
+    Yields:
+        list: Batches of dictionaries keyed by the report's columns.
+    """
+    cache_key = make_cache_key(alias, definition.report_id, values)
+    data = report_cache.get(cache_key)
+
+    if data is None and definition.precomputed:
+        data = definition.precomputed(alias, values)
+
+        if data is not None:
+            report_cache.set(cache_key, data)
+
+    if data is None and partition and definition.partitionable:
+        data = run_segmented_query(alias, definition, values, partition)
+        report_cache.set(cache_key, data)
+
+    if data is not None:
+        for index in range(0, len(data), batch_size):
+            yield data[index : index + batch_size]
+        return
+
+    statement = definition.statement_for(registry.get_engine(alias))
+    batches = stream_statement(alias, statement, definition.params_for(values), batch_size)
+
+    for rows in batches:
+        yield [dict(zip(definition.columns, row)) for row in rows]
+
+
+def get_report_page(alias, definition, values, page):
+    """
+    Returns one sorted page of the rows of a report.
+
+    A whole result that is cached or answered from precomputed data is paged in
+    memory. Otherwise the ordering and the page limits are pushed down into the
+    remote query, so only the rows of the page are read.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        page (ReportPage): The page returned by parse_page.
+
+    Returns:
+        tuple: The rows of the page and its page information.
+    """
+    cache_key = make_cache_key(alias, definition.report_id, values)
+    data = report_cache.get(cache_key)
+
+    if data is None and definition.precomputed:
+        data = definition.precomputed(alias, values)
+
+        if data is not None:
+            report_cache.set(cache_key, data)
+
+    if data is not None:
+        rows = report_paging.paginate_rows(definition, data, page)
+    else:
+        engine = registry.get_engine(alias)
+        statement = report_paging.page_statement_for(definition, engine, page)
+
+        cursor = execute_statement(
+            alias, statement, report_paging.page_params(definition, values, page, engine)
+        )
+        rows = [dict(zip(definition.columns, row)) for row in cursor.fetchall()]
+
+    return report_paging.page_result(definition, rows, page)
+
+
+def get_report_batch(alias, items, refresh=False):
+    """
+    Returns the rows of several parameter sets run against one alias.
+
+    Sets found in the report cache or answered from precomputed data are returned
+    first. Repeated sets run once, and the remaining sets of each report are grouped
+    into UNION ALL statements of at most REPORT_BATCH_MAX_GROUP_SIZE sets, all run
+    one after the other on the connection of the calling thread. A failing group
+    only fails its own sets.
+
+    Args:
+        alias (str): The database alias the sets run against.
+        items (list): Tuples of a report definition and the values returned by
+            bind_parameters, one per parameter set.
+        refresh (bool): Whether the cache and precomputed data are bypassed, so every
+            set is queried live.
+
+    Returns:
+        list: One dictionary per set, in order, with a status of "ok", "error" or
+        "timeout", the error message, whether the rows came from the cache, and
+        the rows.
+
+    Raises:
+        ReportCancelled: If the tracked report was cancelled while a group ran.
+    """
+    results = [None] * len(items)
+    pending = {}
+
+    for index, (definition, values) in enumerate(items):
+        cache_key = make_cache_key(alias, definition.report_id, values)
+        data = None if refresh else report_cache.get(cache_key)
+        cached = data is not None
+
+        if data is None and not refresh and cache_key not in pending and definition.precomputed:
+            data = definition.precomputed(alias, values)
+
+            if data is not None:
+                report_cache.set(cache_key, data)
+
+        if data is not None:
+            results[index] = {"status": "ok", "error": None, "cached": cached, "data": data}
+        else:
+            pending.setdefault(cache_key, (definition, values, []))[2].append(index)
+
+    groups = {}
+    for cache_key, (definition, values, indexes) in pending.items():
+        groups.setdefault(definition.report_id, []).append((cache_key, definition, values, indexes))
+
+    for group in groups.values():
+        for chunk in report_batch.chunk_items(group, report_batch.get_max_group_size()):
+            definition = chunk[0][1]
+
+            try:
+                # Rows of SQL Server are fetched from the raw pyodbc cursor, whose
+                # errors are turned into Django's here
+                with connections[alias].wrap_database_errors:
+                    rows_per_set = run_batch_query(alias, definition, [values for _, _, values, _ in chunk])
+            except (DatabaseError, ValueError) as e:
+                report = current_report()
+
+                if report is not None and report.cancelled:
+                    raise ReportCancelled("Report cancelled") from e
+
+                failed = {
+                    "status": "timeout" if is_statement_timeout(e) else "error",
+                    "error": str(e),
+                    "cached": False,
+                    "data": [],
+                }
+
+                for _, _, _, indexes in chunk:
+                    for index in indexes:
+                        results[index] = dict(failed)
+
+                continue
+
+            for (cache_key, _, _, indexes), data in zip(chunk, rows_per_set):
+                report_cache.set(cache_key, data)
+
+                for index in indexes:
+                    results[index] = {"status": "ok", "error": None, "cached": False, "data": data}
+
+    return results
+
+
+def run_batch_query(alias, definition, values_list):
+    """
+    Runs several parameter sets of a report in one statement.
+
+    Args:
+        alias (str): The database alias the query runs against.
+        definition (ReportDefinition): The report being run.
+        values_list (list): Parameter values returned by bind_parameters, one per set.
+
+    Returns:
+        list: One list of dictionaries keyed by the report's columns per set, in order.
+    """
+    if len(values_list) == 1:
+        return [run_report_query(alias, definition, values_list[0])]
+
+    statement = definition.batch_statement_for(registry.get_engine(alias), len(values_list))
+    params = [param for values in values_list for param in definition.params_for(values)]
+
+    cursor = execute_statement(alias, statement, params)
+
+    return report_batch.split_batch_rows(definition, cursor.fetchall(), len(values_list))
+
+
+def get_report_estimate(alias, definition, values):
+    """
+    Returns an approximate preview of a report from a sampled scan.
+
+    A cached exact result is returned instead, since it costs nothing.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): A report with sample SQL.
+        values (dict): Parameter values returned by bind_parameters.
+
+    Returns:
+        dict: The preview document, or the exact document when the result is cached.
+    """
+    data = report_cache.get(make_cache_key(alias, definition.report_id, values))
+
+    if data is not None:
+        return report_sampling.exact_document(data)
+
+    statement = definition.sample_statement_for(registry.get_engine(alias))
+    cursor = execute_statement(alias, statement, definition.params_for(values))
+
+    columns = definition.columns + [report_sampling.SAMPLE_ROWS_COLUMN]
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    return report_sampling.estimate_document(definition, report_sampling.estimate_rows(definition, rows))
+
+
+def iter_report_phases(alias, definition, values, partition=None):
+    """
+    Yields the approximate preview of a report and then its exact result.
+
+    Reports without sample SQL only yield the exact result.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        partition (str): Optional slice unit the exact query is split by.
+
+    Yields:
+        list: One batch per phase, holding the document of that phase.
+    """
+    if definition.samplable:
+        estimate = get_report_estimate(alias, definition, values)
+        yield [estimate]
+
+        if not estimate["approximate"]:
+            return
+
+    yield [report_sampling.exact_document(get_report_data(alias, definition, values, partition))]
+
+
+def compute_report_data(alias, definition, values, partition=None):
+    """
+    Computes the rows of a report without the cache.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        partition (str): Optional slice unit the missing segments are split by.
+            Ignored for reports that are not partitionable.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    if definition.precomputed:
+        data = definition.precomputed(alias, values)
+
+        if data is not None:
+            return data
+
+    if definition.partitionable:
+        return run_segmented_query(alias, definition, values, partition)
+
+    return run_report_query(alias, definition, values)
+
+
+def refresh_report_data(alias, definition, values):
+    """
+    Runs the statement of a report live and replaces its rows in the report cache.
+
+    The report cache, stored segments and precomputed data are bypassed, so the
+    rows are those of the remote database at the time of the call.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    data = run_report_query(alias, definition, values)
+    report_cache.set(make_cache_key(alias, definition.report_id, values), data)
+
+    return data
+
+
+def explain_report(alias, definition, values, mode, timer):
+    """
+    Runs the statement of a report live with stage timings and captures its plan.
+
+    The report cache and precomputed data are bypassed, so the timings are those of
+    the remote query. The plan is captured after the timed run and is not part of
+    the stage timings.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        mode (str): "estimated" or "actual".
+        timer (StageTimer): Receives the connect, execute and fetch stages.
+
+    Returns:
+        tuple: A list of dictionaries keyed by the report's columns, and the plan
+        returned by explain_statement with the time it took to capture.
+
+    Raises:
+        ValueError: If the report or its plan is not available on the engine of the alias.
+    """
+    statement = definition.statement_for(registry.get_engine(alias))
+    params = definition.params_for(values)
+
+    with timer.stage("connect"):
+        connections[alias].ensure_connection()
+
+    with timer.stage("execute"):
+        cursor = execute_statement(alias, statement, params)
+
+    with timer.stage("fetch"):
+        rows = [dict(zip(definition.columns, row)) for row in cursor.fetchall()]
+
+    started = time.perf_counter()
+    plan = explain_statement(alias, statement, params, mode)
+    plan["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    return rows, plan
+
+
+def run_report_query(alias, definition, values):
+    """
+    Executes the statement of a report for the engine of an alias.
+
+    The values are sent as bind parameters, never pasted into the statement text.
+
+    Args:
+        alias (str): The database alias the query runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    statement = definition.statement_for(registry.get_engine(alias))
+
+    cursor = execute_statement(alias, statement, definition.params_for(values))
+
+    return [dict(zip(definition.columns, row)) for row in cursor.fetchall()]
+
+
+def run_segmented_query(alias, definition, values, partition=None):
+    """
+    Answers a report from stored date segments, querying only the missing days.
+
+    The range is broken into the segments stored for the alias and parameters and
+    the gaps between them. Each gap is queried, stored as a new segment, and merged
+    with the reused segments, which is exact because the report columns are additive.
+
+    Args:
+        alias (str): The database alias the query runs against.
+        definition (ReportDefinition): A partitionable report.
+        values (dict): Parameter values returned by bind_parameters.
+        partition (str): Optional slice unit each gap is split by.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    start_name, end_name = definition.partition_range
+    scope = make_segment_scope(alias, definition, values)
+
+    partials, gaps = segment_store.plan(scope, values[start_name], values[end_name])
+
+    for gap_start, gap_end in gaps:
+        gap_values = dict(values, **{start_name: gap_start, end_name: gap_end})
+
+        if partition:
+            rows = run_partitioned_query(alias, definition, gap_values, partition)
+        else:
+            rows = run_report_query(alias, definition, gap_values)
+
+        segment_store.add(scope, gap_start, gap_end, rows)
+        partials.append(rows)
+
+    if len(partials) == 1:
+        return partials[0]
+
+    return report_partition.merge_partial_rows(definition, partials)
+
+
+def run_partitioned_query(alias, definition, values, partition):
+    """
+    Runs the report statement once per slice of its date range and merges the rows.
+
+    The slices run in parallel on the partition pool, each thread on its own
+    connection, so a long range costs about as long as its slowest slice.
+
+    Args:
+        alias (str): The database alias the query runs against.
+        definition (ReportDefinition): A partitionable report.
+        values (dict): Parameter values returned by bind_parameters.
+        partition (str): One of "month", "quarter" or "year".
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    slices = report_partition.slice_values(definition, values, partition)
+
+    if len(slices) <= 1:
+        return run_report_query(alias, definition, values)
+
+    pool = report_partition.get_partition_pool()
+
+    # Slices run in a copy of the caller's context, so their queries are cancelled
+    # together with the report being tracked
+    futures = [
+        pool.submit(contextvars.copy_context().run, run_report_slice, alias, definition, slice_values)
+        for slice_values in slices
+    ]
+
+    try:
+        partials = [future.result() for future in futures]
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return report_partition.merge_partial_rows(definition, partials)
+
+
+def run_report_slice(alias, definition, values):
+    """
+    Runs one slice of a partitioned report in a pool thread.
+
+    Connections that went stale or passed CONN_MAX_AGE are closed before and after
+    the slice, like Django does at the start and end of every request.
+
+    Args:
+        alias (str): The database alias the query runs against.
+        definition (ReportDefinition): The report being run.
+        values (dict): The parameter values of the slice.
+
+    Returns:
+        list: A list of dictionaries keyed by the report's columns.
+    """
+    close_old_connections()
+
+    try:
+        return run_report_query(alias, definition, values)
+    finally:
+        close_old_connections()
+
+
+def precomputed_department_hours(alias, values):
+    """
+    Answers the department hours report from local precomputed data.
+
+    The columnar index of the alias answers any range in full when it is loaded.
+    Otherwise the daily rollup answers the days it covers.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        values (dict): The bound start_date and end_date of the report.
+
+    Returns:
+        list: Dictionaries with department_name and total_hours, or None if the
+        whole report must be queried live.
+    """
+    counts = report_columnar.department_counts(alias, values["start_date"], values["end_date"])
+
+    if counts is not None:
+        return [
+            {"department_name": department_name, "total_hours": count * HOURS_PER_ASSIGNMENT}
+            for department_name, count in counts.items()
+        ]
+
+    return rollup_department_hours(alias, values)
+
+
+def rollup_department_hours(alias, values):
+    """
+    Answers the department hours report from the daily rollup of an alias.
+
+    Days up to the rollup watermark are summed from the local rollup. Only the days
+    after the watermark are queried live from the remote database.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        values (dict): The bound start_date and end_date of the report.
+
+    Returns:
+        list: Dictionaries with department_name and total_hours, or None if the
+        alias has no rollup yet and the whole report must be queried live.
+    """
+    watermark = rollup.get_rollup_watermark(alias)
+
+    if not watermark:
+        return None
+
+    start = values["start_date"]
+    end = values["end_date"]
+
+    hours = {}
+
+    if start <= watermark:
+        counts = rollup.rollup_department_counts(alias, start, min(end, watermark))
+        for department_name, count in counts.items():
+            hours[department_name] = count * HOURS_PER_ASSIGNMENT
+
+    live_start = max(start, watermark + timedelta(days=1))
+
+    if live_start <= end:
+        live_rows = run_report_query(
+            alias,
+            registry.get_report("department_hours"),
+            {"start_date": live_start, "end_date": end},
+        )
+        for row in live_rows:
+            department_name = row["department_name"]
+            hours[department_name] = hours.get(department_name, 0) + Decimal(
+                str(row["total_hours"])
+            )
+
+    return [
+        {"department_name": department_name, "total_hours": total_hours}
+        for department_name, total_hours in hours.items()
+    ]
+
+
+def interval_department_active_hours(alias, values):
+    """
+    Answers the department active hours report from the interval index of an alias.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        values (dict): The bound start_date and end_date of the report.
+
+    Returns:
+        list: Dictionaries with department_name, active_headcount and total_hours,
+        or None if the alias has no interval index and the report must be queried live.
+    """
+    index = report_intervals.interval_indexes.get(alias)
+
+    if index is None:
+        return None
+
+    counts = index.active_counts(values["start_date"], values["end_date"])
+
+    return [
+        {
+            "department_name": department_name,
+            "active_headcount": count,
+            "total_hours": count * HOURS_PER_ASSIGNMENT,
+        }
+        for department_name, count in counts.items()
+    ]
@@ -0,0 +1,343 @@
+"""
+Tracking and cancellation of report queries while they run.
+
+This module keeps the running report requests of this process, keyed by the user
+and a request id chosen by the client, so two users sending the same id never
+reach each other's reports. Every query a report sends while it is tracked registers a
+handle that can stop it from another thread:
+
+- SQL Server: the pyodbc cursor running the statement, stopped with cursor.cancel().
+- PostgreSQL: the backend pid of the session, stopped with pg_cancel_backend() sent
+  over a separate connection.
+
+A report can be cancelled by id from the cancel endpoint, and a new report of a user
+cancels the reports that user still has running, except exports, which are
+downloads the user keeps waiting for. The aborted query then raises in
+the thread that runs it, which is turned into ReportCancelled, or into
+ReportTimedOut when the statement timeout of the alias stopped it instead.
+
+The handles live in memory, so a cancel only reaches the reports running in the
+process that receives it. When the site runs several worker processes, a cancel
+request handled by another process finds no running report and the query runs
+on; the same holds for report jobs, which are cancelled by the worker polling
+their cancel flag.
+
+Classes:
+- InflightReport: The running queries of one report request
+- ReportCancelled: Raised when a report is cancelled while its query runs
+- ReportTimedOut: Raised when a report query passes its statement timeout
+
+Functions:
+- track_report(request_id, user_id, supersede, supersedable): Context manager tracking the queries run inside it
+- iter_tracked(batches, request_id, user_id, supersede, supersedable): Tracks the queries of a streamed report
+- current_report(): Returns the report tracked in the running context
+- watch_query(conn, cursor): Context manager registering a running query of the current report
+- cancel_report(request_id, user_id): Cancels a running report of a user
+- is_statement_timeout(error): Returns whether a database error was raised by a statement timeout
+
+Dependencies:
+- Django modules: connections
+- Python modules: contextlib, contextvars, logging, threading
+"""
+
+from django.db import connections
+
+from contextlib import contextmanager
+
+import contextvars
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+_current_report = contextvars.ContextVar("current_report", default=None)
+_reports = {}
+_reports_lock = threading.Lock()
+
+# SQLSTATE of a cancelled PostgreSQL statement and of a pyodbc query timeout
+POSTGRESQL_QUERY_CANCELED = "57014"
+ODBC_TIMEOUT_EXPIRED = "HYT00"
+
+
+class ReportCancelled(Exception):
+    """Raised when a report is cancelled while its query runs."""
+
+
+class ReportTimedOut(Exception):
+    """Raised when a report query passes its statement timeout."""
+
+
+class InflightReport:
+    """
+    The running queries of one report request.
+
+    Args:
+        request_id (str): The id the client sent with the report request.
+        user_id (int): The id of the user running the report.
+        supersedable (bool): Whether a new report of the user cancels this one.
+    """
+
+    def __init__(self, request_id, user_id, supersedable=True):
+        self.request_id = request_id
+        self.user_id = user_id
+        self.supersedable = supersedable
+        self.cancelled = False
+        self._queries = []
+        self._lock = threading.Lock()
+
+    def add_query(self, alias, vendor, handle):
+        """Registers a running query, cancelling it at once if the report was cancelled."""
+
+        with self._lock:
+            query = (alias, vendor, handle)
+            self._queries.append(query)
+            cancelled = self.cancelled
+
+        if cancelled:
+            cancel_query(*query)
+
+        return query
+
+    def remove_query(self, query):
+        """Forgets a query once it has finished."""
+
+        with self._lock:
+            if query in self._queries:
+                self._queries.remove(query)
+
+    def cancel(self, alias=None):
+        """
+        Cancels the running queries of the report.
+
+        Args:
+            alias (str): Only cancel the queries on this alias and keep the report
+                running. By default every query is cancelled and so is the report.
+
+        Returns:
+            int: The number of queries a cancel was sent to.
+        """
+        with self._lock:
+            if alias is None:
+                self.cancelled = True
+
+            queries = [query for query in self._queries if alias in (None, query[0])]
+
+        return sum(1 for query in queries if cancel_query(*query))
+
+
+@contextmanager
+def track_report(request_id, user_id, supersede=False, supersedable=True):
+    """
+    Tracks the queries run inside the block so they can be cancelled.
+
+    Args:
+        request_id (str): The id the client sent with the report request.
+        user_id (int): The id of the user running the report.
+        supersede (bool): Whether the other running reports of the user are cancelled.
+        supersedable (bool): Whether a new report of the user cancels this one.
+
+    Yields:
+        InflightReport: The tracked report.
+
+    Raises:
+        ReportCancelled: If the report was cancelled while a query ran.
+        ReportTimedOut: If a query passed the statement timeout of its alias.
+    """
+    report = InflightReport(request_id, user_id, supersedable)
+
+    with _reports_lock:
+        superseded = [
+            other
+            for other in _reports.values()
+            if supersede and other.supersedable and other.user_id == user_id
+        ]
+        _reports[(user_id, request_id)] = report
+
+    for other in superseded:
+        other.cancel()
+
+    previous = _current_report.get()
+    _current_report.set(report)
+
+    try:
+        yield report
+    except (ReportCancelled, ReportTimedOut):
+        raise
+    except Exception as e:
+        if report.cancelled:
+            raise ReportCancelled("Report cancelled") from e
+        if is_statement_timeout(e):
+            raise ReportTimedOut("Report query timed out") from e
+        raise
+    finally:
+        _current_report.set(previous)
+
+        with _reports_lock:
+            if _reports.get((user_id, request_id)) is report:
+                del _reports[(user_id, request_id)]
+
+
+def iter_tracked(batches, request_id, user_id, supersede=False, supersedable=True):
+    """
+    Tracks the queries of a streamed report while its batches are produced.
+
+    Streaming responses run their generator after the view has returned, so the
+    tracking has to live inside the generator itself. A cancelled or timed out
+    report raises like in track_report, so the consumer of the stream can mark it
+    as incomplete instead of ending it like a finished report.
+
+    Args:
+        batches (iterable): Batches of report rows.
+        request_id (str): The id the client sent with the report request.
+        user_id (int): The id of the user running the report.
+        supersede (bool): Whether the other running reports of the user are cancelled.
+        supersedable (bool): Whether a new report of the user cancels this one.
+
+    Yields:
+        list: The batches of report rows.
+
+    Raises:
+        ReportCancelled: If the report was cancelled while a query ran.
+        ReportTimedOut: If a query passed the statement timeout of its alias.
+    """
+    with track_report(request_id, user_id, supersede, supersedable):
+        yield from batches
+
+
+def current_report():
+    """Returns the report tracked in the running context, or None."""
+
+    return _current_report.get()
+
+
+@contextmanager
+def watch_query(conn, cursor=None):
+    """
+    Registers the query run inside the block with the report being tracked.
+
+    Nothing is registered when no report is tracked, like for rollup refreshes and
+    report jobs, or for engines that cannot be cancelled.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection running the query.
+        cursor (cursor): The cursor running the query. Required on SQL Server.
+    """
+    report = _current_report.get()
+    handle = query_handle(conn, cursor) if report else None
+
+    if handle is None:
+        yield
+        return
+
+    if report.cancelled:
+        raise ReportCancelled("Report cancelled")
+
+    query = report.add_query(conn.alias, conn.vendor, handle)
+
+    try:
+        yield
+    finally:
+        report.remove_query(query)
+
+
+def query_handle(conn, cursor):
+    """
+    Returns the handle used to cancel a query on a connection.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection running the query.
+        cursor (cursor): The cursor running the query.
+
+    Returns:
+        object: The pyodbc cursor on SQL Server, the backend pid on PostgreSQL, or None.
+    """
+    if conn.vendor == "microsoft" and cursor is not None:
+        # Django and mssql-django both wrap the pyodbc cursor in a .cursor attribute
+        while hasattr(cursor, "cursor"):
+            cursor = cursor.cursor
+        return cursor
+
+    if conn.vendor == "postgresql":
+        return conn.connection.info.backend_pid
+
+    return None
+
+
+def cancel_query(alias, vendor, handle):
+    """
+    Sends a cancel for a running query.
+
+    Args:
+        alias (str): The database alias running the query.
+        vendor (str): The vendor of the connection.
+        handle (object): The handle returned by query_handle.
+
+    Returns:
+        bool: True if the cancel was sent.
+    """
+    try:
+        if vendor == "microsoft":
+            handle.cancel()
+            return True
+
+        if vendor == "postgresql":
+            # The session is busy with the query, so the cancel needs its own connection
+            cancel_connection = connections.create_connection(alias)
+            try:
+                with cancel_connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_cancel_backend(%s)", [handle])
+            finally:
+                cancel_connection.close()
+            return True
+    except Exception:
+        logger.exception("Error cancelling report query on %s", alias)
+
+    return False
+
+
+def cancel_report(request_id, user_id):
+    """
+    Cancels a running report of a user in this process.
+
+    Args:
+        request_id (str): The id the client sent with the report request.
+        user_id (int): The id of the user the report belongs to.
+
+    Returns:
+        bool: True if the report was running and has been cancelled.
+    """
+    with _reports_lock:
+        report = _reports.get((user_id, request_id))
+
+    if report is None:
+        return False
+
+    report.cancel()
+
+    return True
+
+
+def is_statement_timeout(error):
+    """
+    Returns whether a database error was raised because a statement timed out.
+
+    Args:
+        error (Exception): The error raised by the query, possibly wrapped by Django.
+
+    Returns:
+        bool: True for PostgreSQL statement timeouts and pyodbc query timeouts.
+    """
+    for cause in (error, error.__cause__):
+        if cause is None:
+            continue
+
+        sqlstate = getattr(cause, "pgcode", None) or getattr(cause, "sqlstate", None)
+        if sqlstate == POSTGRESQL_QUERY_CANCELED:
+            return True
+
+        if cause.args and cause.args[0] == ODBC_TIMEOUT_EXPIRED:
+            return True
+
+    return False
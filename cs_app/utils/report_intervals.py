@@ -0,0 +1,188 @@
+"""
+Interval index answering which assignments are active during a date range.
+
+An assignment is active during [start, end] when it starts on or before end and
+has no EndDate or ends on or after start. For each department the index keeps the
+start dates and the end dates of its assignments in two sorted lists, an endpoint
+sweep: every assignment ending before start also started before end (EndDate is
+never before StartDate), so
+
+    active = count(StartDate <= end) - count(EndDate < start)
+
+which is two binary searches per department, whatever the number of assignments.
+Assignments without an EndDate are never in the second count, so they stay active
+in every range after their start. The counts are exact, like the live query of the
+department active hours report.
+
+Indexes are loaded on first use for the aliases of REPORT_INTERVAL_ALIASES and are
+rebuilt when the signature of the source tables changes, checked at most every
+REPORT_INTERVAL_CHECK_INTERVAL seconds. Other aliases run the live query.
+
+Classes:
+- IntervalIndex: Sorted start and end dates of the assignments of each department
+- IntervalIndexStore: The interval indexes of the process
+
+Functions:
+- build_interval_index(alias, signature): Loads the assignments of an alias into a new index
+
+Module Variables:
+- interval_indexes: The interval index store of the process
+
+Dependencies:
+- Django modules: settings
+- Python modules: bisect, collections, threading, time
+- Project modules: report_columnar, report_queries, report_registry, report_rollup
+"""
+
+from django.conf import settings
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from cs_app.utils.report_columnar import fetch_signature
+from cs_app.utils.report_queries import execute_statement
+from cs_app.utils.report_rollup import to_date
+
+import cs_app.utils.report_registry as registry
+import threading
+import time
+
+
+DEFAULT_CHECK_INTERVAL = 60
+
+
+class IntervalIndex:
+    """
+    Sorted start and end dates of the assignments of each department.
+
+    Args:
+        rows (list): (department_name, start_date, end_date) tuples, with None as
+            the end date of assignments still running.
+        signature (tuple): The source signature the rows were loaded at.
+    """
+
+    def __init__(self, rows, signature=None):
+        starts = defaultdict(list)
+        ends = defaultdict(list)
+
+        for department_name, start_date, end_date in rows:
+            starts[department_name].append(to_date(start_date))
+            if end_date is not None:
+                ends[department_name].append(to_date(end_date))
+
+        self.signature = signature
+        self.size = len(rows)
+        self.starts = {department_name: sorted(days) for department_name, days in starts.items()}
+        self.ends = {department_name: sorted(days) for department_name, days in ends.items()}
+
+    def __len__(self):
+        return self.size
+
+    def active_counts(self, start_date, end_date):
+        """
+        Returns the number of assignments of each department active during a range.
+
+        Args:
+            start_date (date): The first day of the range.
+            end_date (date): The last day of the range.
+
+        Returns:
+            dict: Department names mapped to their counts, for departments with at
+            least one active assignment.
+        """
+        if end_date < start_date:
+            return {}
+
+        counts = {}
+
+        for department_name, starts in self.starts.items():
+            count = bisect_right(starts, end_date) - bisect_left(self.ends.get(department_name, []), start_date)
+
+            if count:
+                counts[department_name] = count
+
+        return counts
+
+
+def build_interval_index(alias, signature=None):
+    """
+    Loads the assignments of an alias into a new index.
+
+    Args:
+        alias (str): The database alias of the source.
+        signature (tuple): The source signature read before loading.
+
+    Returns:
+        IntervalIndex: The index.
+    """
+    definition = registry.get_report("department_assignment_intervals", include_internal=True)
+    cursor = execute_statement(alias, definition.statement_for(registry.get_engine(alias)), [])
+
+    return IntervalIndex(cursor.fetchall(), signature)
+
+
+class IntervalIndexStore:
+    """
+    The interval indexes of the process, keyed by alias.
+
+    A lock serializes loads, so requests arriving while an index is built wait for
+    it instead of loading it again.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, alias):
+        """
+        Returns the current index of an alias, loading or rebuilding it when needed.
+
+        Args:
+            alias (str): The database alias of the source.
+
+        Returns:
+            IntervalIndex or None: The index, or None if the alias is not in
+            REPORT_INTERVAL_ALIASES.
+        """
+        if alias not in getattr(settings, "REPORT_INTERVAL_ALIASES", []):
+            return None
+
+        check_interval = getattr(settings, "REPORT_INTERVAL_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL)
+
+        with self._lock:
+            index = self._indexes.get(alias)
+            now = time.monotonic()
+
+            if index is not None and now - self._checked.get(alias, 0) < check_interval:
+                return index
+
+            signature = fetch_signature(alias)
+
+            if index is None or index.signature != signature:
+                index = build_interval_index(alias, signature)
+                self._indexes[alias] = index
+                self.loads += 1
+
+            self._checked[alias] = now
+
+            return index
+
+    def clear(self):
+        """Drops every index."""
+
+        with self._lock:
+            self._indexes.clear()
+            self._checked.clear()
+
+    def stats(self):
+        """Returns the loaded aliases with their assignment counts, and the number of loads."""
+
+        return {
+            "indexes": {alias: len(index) for alias, index in list(self._indexes.items())},
+            "loads": self.loads,
+        }
+
+
+interval_indexes = IntervalIndexStore()
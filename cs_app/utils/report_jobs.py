@@ -0,0 +1,405 @@
+"""
+Python functions for asynchronous report jobs stored in the default database.
+
+This module contains the functions used to queue report jobs, run them from the
+run_report_jobs worker command, cancel them and expire their stored results. Jobs
+are plain ReportJob rows, so no external broker is needed. A job is claimed with a
+conditional UPDATE on its status, which works the same on SQLite and PostgreSQL and
+guarantees that only one worker runs it.
+
+Databases can be added at runtime by the web process, so their aliases do not exist
+in the worker. Jobs keep the engine, host, port and name of their database, never
+its credentials, and the worker runs them against a configured alias pointing to the
+same database, including the saved connections it configures (see run_report_jobs).
+Saved connections carry no credentials either, so reports on databases signed in
+with a password cannot be queued.
+
+A running job is cancelled by flagging it. The worker polls the flags of the jobs it
+runs and cancels their queries like cancel_report_view cancels a report. Jobs left
+running longer than REPORT_JOB_STALE_SECONDS are put back in the queue while they
+have attempts left and fail otherwise, so a query that never ends is not run again
+and again.
+
+Functions:
+- create_job(user, alias, report_id, time_range, parameters): Queues a new report job
+- claim_jobs(limit): Claims up to limit queued jobs for the calling worker
+- job_connection(alias): Returns the settings a job keeps of the database of an alias
+- get_job_alias(job): Returns the alias the worker runs a job against
+- run_job(job_id): Runs a claimed job and stores its result or error
+- cancel_job(job): Cancels a queued job or asks a running job to stop
+- cancel_flagged_jobs(job_ids): Cancels the queries of running jobs flagged for cancellation
+- requeue_stale_jobs(): Puts jobs of crashed workers back in the queue or fails them
+- purge_expired_jobs(): Deletes finished jobs whose results have expired
+- job_to_dict(job): Returns the JSON representation of a job
+
+Dependencies:
+- Django modules: settings, DjangoJSONEncoder, F, timezone
+- Python modules: datetime, json
+- Project modules: report_explain, report_functions, report_inflight, report_queries, report_registry,
+  report_slowlog, report_snapshots
+- Model: ReportJob from the application's models
+"""
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from datetime import timedelta
+
+from ..models import ReportJob
+
+from cs_app.utils.report_explain import StageTimer
+from cs_app.utils.report_queries import config_identity, connection_identity
+from cs_app.utils.report_slowlog import record_report_run
+
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_inflight as report_inflight
+import cs_app.utils.report_registry as registry
+import cs_app.utils.report_snapshots as report_snapshots
+import json
+
+
+DEFAULT_RESULT_TTL = 3600
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_STALE_SECONDS = 1800
+
+# Settings of a database a job keeps, enough to find it again but no credentials
+JOB_CONNECTION_KEYS = ("ENGINE", "HOST", "PORT", "NAME")
+
+
+def create_job(user, alias, report_id, time_range, parameters):
+    """
+    Queues a new report job.
+
+    Args:
+        user (User): The user the report is run for.
+        alias (str): The database alias the report runs against.
+        report_id (str): The id of the report in the report registry.
+        time_range (str): The time range label of the report.
+        parameters (dict): The request values of the report parameters.
+
+    Returns:
+        ReportJob: The queued job.
+
+    Raises:
+        ValueError: If the database of the alias is signed in with a password,
+            which the worker cannot be given.
+    """
+    if settings.DATABASES[alias].get("PASSWORD"):
+        raise ValueError("Reports on databases signed in with a password cannot be run in the background")
+
+    return ReportJob.objects.create(
+        user=user,
+        database_alias=alias,
+        connection=job_connection(alias),
+        report_id=report_id,
+        parameters=parameters,
+        report_type=time_range or "",
+        start_date=parameters.get("start_date") or None,
+        end_date=parameters.get("end_date") or None,
+        max_attempts=getattr(settings, "REPORT_JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS),
+    )
+
+
+def claim_jobs(limit):
+    """
+    Claims up to limit queued jobs, oldest first.
+
+    Args:
+        limit (int): The maximum number of jobs to claim.
+
+    Returns:
+        list: The ids of the claimed jobs.
+    """
+    claimed = []
+
+    if limit <= 0:
+        return claimed
+
+    candidate_ids = ReportJob.objects.filter(status=ReportJob.QUEUED).order_by(
+        "created_on"
+    ).values_list("id", flat=True)[: limit * 2]
+
+    for job_id in candidate_ids:
+        updated = ReportJob.objects.filter(pk=job_id, status=ReportJob.QUEUED).update(
+            status=ReportJob.RUNNING,
+            started_on=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+
+        if updated:
+            claimed.append(job_id)
+
+        if len(claimed) >= limit:
+            break
+
+    return claimed
+
+
+def job_connection(alias):
+    """
+    Returns the settings a job keeps of the database of an alias.
+
+    Args:
+        alias (str): A configured database alias.
+
+    Returns:
+        dict: The engine, host, port and name of the database, as strings.
+    """
+    config = settings.DATABASES[alias]
+
+    return {key: str(config.get(key) or "") for key in JOB_CONNECTION_KEYS}
+
+
+def get_job_alias(job):
+    """
+    Returns the alias the worker runs a job against.
+
+    The alias of the job is used if it points to the database the job was queued
+    for, then any other configured alias pointing to it.
+
+    Args:
+        job (ReportJob): The claimed job.
+
+    Returns:
+        str: The database alias.
+
+    Raises:
+        ValueError: If no configured alias points to the database of the job.
+    """
+    if not job.connection:
+        return job.database_alias
+
+    identity = config_identity(job.connection)
+    aliases = [job.database_alias] + [alias for alias in list(settings.DATABASES) if alias != job.database_alias]
+
+    for alias in aliases:
+        if alias in settings.DATABASES and alias != "default" and connection_identity(alias) == identity:
+            return alias
+
+    raise ValueError("The database of this report is not configured for report jobs")
+
+
+def run_job(job_id):
+    """
+    Runs a claimed job and stores its result or error.
+
+    Failed jobs are put back in the queue until they reach their maximum number of
+    attempts. Slow runs are kept in the slow query log, and the result is kept as the
+    snapshot of the run's report history entry.
+
+    Args:
+        job_id (int): The id of a job claimed with claim_jobs.
+
+    Returns:
+        str: The status the job ended with.
+    """
+    job = ReportJob.objects.get(pk=job_id)
+    timer = StageTimer()
+
+    if job.cancel_requested:
+        return finish_job(job, ReportJob.CANCELLED)
+
+    try:
+        definition = registry.get_report(job.report_id)
+
+        if definition is None:
+            raise ValueError(f"Unknown report '{job.report_id}'")
+
+        values = registry.bind_parameters(definition, job.parameters)
+        alias = get_job_alias(job)
+
+        # Tracked under the job, so cancel_flagged_jobs can stop its query
+        with timer.stage("query"), report_inflight.track_report(
+            job_request_id(job.pk), job.user_id, supersedable=False
+        ):
+            data = rf.get_report_data(alias, definition, values)
+    except Exception as e:
+        job.refresh_from_db()
+
+        if job.cancel_requested:
+            return finish_job(job, ReportJob.CANCELLED)
+
+        if job.attempts < job.max_attempts:
+            ReportJob.objects.filter(pk=job.pk).update(
+                status=ReportJob.QUEUED, error=str(e)
+            )
+            return ReportJob.QUEUED
+
+        return finish_job(job, ReportJob.FAILED, error=str(e))
+
+    job.refresh_from_db()
+
+    if job.cancel_requested:
+        return finish_job(job, ReportJob.CANCELLED)
+
+    record_report_run(
+        job.user, job.database_alias, job.report_id, job.report_type, values, len(data), timer
+    )
+
+    # Queued runs are kept with their history entry like runs returned directly
+    report_snapshots.save_snapshot(
+        report_snapshots.find_history_run(
+            job.user, alias, job.report_type, job.start_date, job.end_date,
+            job.report_id, report_snapshots.history_parameters(values),
+        ),
+        alias,
+        definition,
+        values,
+        data,
+    )
+
+    return finish_job(
+        job, ReportJob.DONE, result=json.dumps(data, cls=DjangoJSONEncoder)
+    )
+
+
+def finish_job(job, status, result=None, error=""):
+    """
+    Stores the final status of a job and when its result expires.
+
+    The stored connection settings are cleared, since the job no longer needs them.
+
+    Args:
+        job (ReportJob): The job being finished.
+        status (str): The final status.
+        result (str): The JSON encoded result, if any.
+        error (str): The error message, if any.
+
+    Returns:
+        str: The final status.
+    """
+    now = timezone.now()
+    ttl = getattr(settings, "REPORT_JOB_RESULT_TTL", DEFAULT_RESULT_TTL)
+
+    ReportJob.objects.filter(pk=job.pk).update(
+        status=status,
+        connection={},
+        result=result,
+        error=error,
+        finished_on=now,
+        expires_on=now + timedelta(seconds=ttl),
+    )
+
+    return status
+
+
+def cancel_job(job):
+    """
+    Cancels a job.
+
+    A queued job is cancelled at once. A running job is flagged, and the worker
+    running it cancels its query at its next poll (see cancel_flagged_jobs) and
+    drops its result.
+
+    Args:
+        job (ReportJob): The job to be cancelled.
+
+    Returns:
+        bool: True if the job was cancelled or flagged, False if it had already finished.
+    """
+    if ReportJob.objects.filter(pk=job.pk, status=ReportJob.QUEUED).update(
+        status=ReportJob.CANCELLED, cancel_requested=True, connection={}, finished_on=timezone.now()
+    ):
+        return True
+
+    return bool(
+        ReportJob.objects.filter(pk=job.pk, status=ReportJob.RUNNING).update(
+            cancel_requested=True
+        )
+    )
+
+
+def job_request_id(job_id):
+    """Returns the id a running job is tracked under by report_inflight."""
+
+    return f"report_job:{job_id}"
+
+
+def cancel_flagged_jobs(job_ids):
+    """
+    Cancels the queries of running jobs flagged for cancellation.
+
+    Called by the worker for the jobs it runs, since the queries can only be
+    cancelled from the process running them.
+
+    Args:
+        job_ids (list): The ids of the jobs the calling worker runs.
+
+    Returns:
+        int: The number of jobs whose queries were cancelled.
+    """
+    flagged = ReportJob.objects.filter(
+        pk__in=job_ids, status=ReportJob.RUNNING, cancel_requested=True
+    ).values_list("pk", "user_id")
+
+    return sum(
+        1 for job_id, user_id in flagged if report_inflight.cancel_report(job_request_id(job_id), user_id)
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Puts running jobs that were claimed too long ago back in the queue.
+
+    This recovers jobs left behind by a worker that crashed or was killed. A stale
+    job may also still be running, so jobs without attempts left are failed instead
+    of running their query once more.
+
+    Returns:
+        int: The number of jobs put back in the queue.
+    """
+    now = timezone.now()
+    stale_seconds = getattr(settings, "REPORT_JOB_STALE_SECONDS", DEFAULT_STALE_SECONDS)
+    stale = ReportJob.objects.filter(
+        status=ReportJob.RUNNING, started_on__lt=now - timedelta(seconds=stale_seconds)
+    )
+
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=ReportJob.FAILED,
+        connection={},
+        error="Report job stopped responding",
+        finished_on=now,
+        expires_on=now + timedelta(seconds=getattr(settings, "REPORT_JOB_RESULT_TTL", DEFAULT_RESULT_TTL)),
+    )
+
+    return stale.filter(attempts__lt=F("max_attempts")).update(status=ReportJob.QUEUED)
+
+
+def purge_expired_jobs():
+    """
+    Deletes finished jobs whose stored results have expired.
+
+    Queued jobs never expire, but they only keep the non-secret settings of their
+    database (see job_connection).
+
+    Returns:
+        int: The number of jobs deleted.
+    """
+    deleted, _ = ReportJob.objects.filter(expires_on__lt=timezone.now()).delete()
+
+    return deleted
+
+
+def job_to_dict(job):
+    """
+    Returns the JSON representation of a job.
+
+    Args:
+        job (ReportJob): The job to be represented.
+
+    Returns:
+        dict: The job id, status, attempts, error and result data once done.
+    """
+    job_info = {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+    }
+
+    if job.status == ReportJob.DONE and job.result is not None:
+        job_info["data"] = json.loads(job.result)
+
+    return job_info
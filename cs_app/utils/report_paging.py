@@ -0,0 +1,380 @@
+"""
+Server side sorting, pagination and top-N for report results.
+
+This module contains the page requests accepted by the report API and the fixed
+statements that push them down to the remote database. The report statement is
+wrapped in a derived table that is ordered by the requested column, with the key
+columns of the report as a tie breaker so pages never overlap, and then cut with
+the pagination clause of the engine's dialect: OFFSET ... FETCH NEXT on SQL Server
+or LIMIT ... OFFSET on PostgreSQL.
+
+Pages can be addressed by offset or by keyset cursor. A keyset cursor holds the
+sort values of the last row of a page, and the next page starts after it with a
+WHERE clause instead of skipping rows, so deep pages cost as much as the first.
+Top-N is an ordered first page without a cursor, like the top 10 departments by hours.
+
+The page statements of every sortable column and direction are compiled with the
+report at startup, so no SQL is assembled while handling a request. Results that
+are already in memory, like cached or precomputed rows, are paged in Python with
+the same ordering. On both sides NULL sorts below any value, so a column like
+hours_delta_pct, which is NULL when there is nothing to compare with, comes first
+in ascending order and last in descending order.
+
+Classes:
+- ReportPage: A requested page of a report result
+
+Functions:
+- parse_page(definition, data): Builds the page requested by a report request
+- compile_page_statements(definition, engine, sql): Compiles the page statements of a report for an engine
+- page_statement_for(definition, engine, page): Returns the compiled statement of a page
+- page_params(definition, values, page, engine): Returns the bind parameters of a page statement
+- paginate_rows(definition, rows, page): Pages rows already in memory
+- null_sort_key(values): Returns a sort key where None sorts below any value
+- page_result(definition, rows, page): Trims the look-ahead row and builds the page information
+- encode_cursor(values) / decode_cursor(cursor): Converts keyset cursors to and from tokens
+
+Dependencies:
+- Django modules: settings, DjangoJSONEncoder
+- Python modules: base64, datetime, json
+- Project modules: report_dialects, report_queries
+"""
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from datetime import date, datetime
+
+from cs_app.utils.report_dialects import get_dialect
+from cs_app.utils.report_queries import ReportStatement
+
+import base64
+import json
+
+
+DEFAULT_PAGE_LIMIT = 100
+DEFAULT_PAGE_MAX_LIMIT = 1000
+
+# Request keys that ask for a page instead of the whole result
+PAGE_REQUEST_KEYS = ("order_by", "limit", "offset", "cursor", "top")
+
+
+class ReportPage:
+    """
+    A requested page of a report result.
+
+    Args:
+        order_by (str): The output column the rows are sorted by.
+        descending (bool): Whether the rows are sorted in descending order.
+        limit (int): The number of rows in the page.
+        offset (int): The number of rows skipped before the page.
+        after (list): Sort values of the row the page starts after, from a keyset cursor.
+        top (bool): Whether this is a top-N request, which has no next page.
+    """
+
+    def __init__(self, order_by, descending=False, limit=DEFAULT_PAGE_LIMIT, offset=0, after=None, top=False):
+        self.order_by = order_by
+        self.descending = descending
+        self.limit = limit
+        self.offset = offset
+        self.after = after
+        self.top = top
+
+
+def parse_page(definition, data):
+    """
+    Builds the page requested by a report request.
+
+    "order_by" names an output column, prefixed with "-" for descending order.
+    "top" asks for the first N rows, ordered by default by the first additive
+    column in descending order. "cursor" continues after the page it was returned with.
+
+    Args:
+        definition (ReportDefinition): The requested report.
+        data (dict): The decoded request body.
+
+    Returns:
+        ReportPage or None: The requested page, or None if the whole result is requested.
+
+    Raises:
+        ValueError: If a page value is invalid.
+    """
+    if not any(data.get(key) not in (None, "") for key in PAGE_REQUEST_KEYS):
+        return None
+
+    max_limit = getattr(settings, "REPORT_PAGE_MAX_LIMIT", DEFAULT_PAGE_MAX_LIMIT)
+    top = data.get("top") not in (None, "")
+
+    order_by = data.get("order_by")
+    if not order_by:
+        if top and definition.additive_columns:
+            order_by = f"-{definition.additive_columns[0]}"
+        else:
+            order_by = definition.key_columns[0]
+
+    descending = order_by.startswith("-")
+    order_by = order_by.lstrip("-")
+
+    if order_by not in definition.columns:
+        raise ValueError(f"Cannot order by '{order_by}'")
+
+    try:
+        limit = int(data.get("top") if top else data.get("limit") or 0) or getattr(
+            settings, "REPORT_PAGE_DEFAULT_LIMIT", DEFAULT_PAGE_LIMIT
+        )
+        offset = 0 if top else int(data.get("offset") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("Limit and offset must be whole numbers")
+
+    if not 0 < limit <= max_limit or offset < 0:
+        raise ValueError(f"Limit must be between 1 and {max_limit} and offset not negative")
+
+    after = None
+    if data.get("cursor") and not top:
+        after = decode_cursor(data["cursor"])
+        offset = 0
+
+        if len(after) != len(sort_columns(definition, order_by)):
+            raise ValueError("Invalid cursor")
+
+    return ReportPage(order_by, descending, limit, offset, after, top)
+
+
+def sort_columns(definition, order_by):
+    """Returns the columns rows are sorted by: the requested column, then the key columns."""
+
+    return [order_by] + [column for column in definition.key_columns if column != order_by]
+
+
+def compile_page_statements(definition, engine, sql):
+    """
+    Compiles the page statements of a report for an engine.
+
+    One statement is compiled for every output column, direction and for offset or
+    keyset pages, so every page request maps to a fixed, preparable text.
+
+    Args:
+        definition (ReportDefinition): The report being compiled.
+        engine (str): "mssql" or "postgresql".
+        sql (str): The report statement rendered for the engine.
+
+    Returns:
+        dict: (column, descending, keyset) mapped to ReportStatement objects.
+    """
+    dialect = get_dialect(engine)
+    if dialect is None:
+        return {}
+
+    statements = {}
+
+    for order_by in definition.columns:
+        columns = [
+            f"report.{dialect.quote_name(column)}" for column in sort_columns(definition, order_by)
+        ]
+
+        for descending in (False, True):
+            direction = "DESC" if descending else "ASC"
+            order_clause = ", ".join(dialect.order_term(column, descending) for column in columns)
+
+            for keyset in (False, True):
+                where_clause = ""
+                if keyset:
+                    where_clause = f"WHERE {keyset_condition(columns, '<' if descending else '>')} "
+
+                name = f"{definition.report_id}_{engine}_page_{order_by}_{direction.lower()}"
+                statements[(order_by, descending, keyset)] = ReportStatement(
+                    name + ("_after" if keyset else ""),
+                    f"SELECT * FROM ({sql}) AS report {where_clause}"
+                    f"ORDER BY {order_clause} {dialect.pagination_clause}",
+                )
+
+    return statements
+
+
+def keyset_condition(columns, operator):
+    """
+    Builds the condition selecting rows after a keyset cursor.
+
+    For sort columns (a, b) it selects the rows where a > x OR (a = x AND b > y),
+    which unlike a row value comparison works on both engines. Every cursor value is bound
+    with a flag telling whether it is NULL, since NULL sorts below any value but
+    compares with nothing: in ascending order the rows after a NULL are the values
+    that are not NULL, and in descending order the NULLs come after every value.
+    """
+
+    def equal_term(column):
+        return f"((%s = 1 AND {column} IS NULL) OR {column} = %s)"
+
+    def after_term(column):
+        if operator == "<":
+            return f"((%s = 0 AND {column} IS NULL) OR {column} < %s)"
+        return f"((%s = 1 AND {column} IS NOT NULL) OR {column} > %s)"
+
+    conditions = []
+
+    for index, column in enumerate(columns):
+        equal_terms = [equal_term(previous) for previous in columns[:index]]
+        conditions.append(" AND ".join(equal_terms + [after_term(column)]))
+
+    return "(" + " OR ".join(f"({condition})" for condition in conditions) + ")"
+
+
+def page_statement_for(definition, engine, page):
+    """
+    Returns the compiled statement of a page.
+
+    Args:
+        definition (ReportDefinition): The report being run.
+        engine (str): The engine name returned by get_engine.
+        page (ReportPage): The requested page.
+
+    Returns:
+        ReportStatement: The compiled statement.
+
+    Raises:
+        ValueError: If the report cannot be paged on the engine.
+    """
+    key = (page.order_by, page.descending, page.after is not None)
+    statement = definition.page_statements.get(engine, {}).get(key)
+
+    if statement is None:
+        raise ValueError(f"Report '{definition.report_id}' cannot be paged on {engine}")
+
+    return statement
+
+
+def page_params(definition, values, page, engine):
+    """
+    Returns the bind parameters of a page statement.
+
+    One extra row is fetched past the limit to tell whether another page follows.
+    Keyset values are bound after a flag telling whether they are NULL.
+
+    Args:
+        definition (ReportDefinition): The report being run.
+        values (dict): Parameter values returned by bind_parameters.
+        page (ReportPage): The requested page.
+        engine (str): The engine name returned by get_engine.
+
+    Returns:
+        list: The report parameters, keyset values and pagination values, in order.
+    """
+    params = definition.params_for(values)
+
+    if page.after is not None:
+        for index in range(len(page.after)):
+            for value in page.after[: index + 1]:
+                params.extend([int(value is None), value])
+
+    return params + get_dialect(engine).pagination_params(page.offset, page.limit + 1)
+
+
+def paginate_rows(definition, rows, page):
+    """
+    Pages rows already in memory the same way the page statements do.
+
+    Args:
+        definition (ReportDefinition): The report being run.
+        rows (list): Every row of the report.
+        page (ReportPage): The requested page.
+
+    Returns:
+        list: The rows of the page plus one look-ahead row when another page follows.
+    """
+    columns = sort_columns(definition, page.order_by)
+
+    def sort_key(row):
+        return null_sort_key([row[column] for column in columns])
+
+    rows = sorted(rows, key=sort_key, reverse=page.descending)
+
+    if page.after is not None:
+        after = null_sort_key(
+            [
+                coerce_cursor_value(
+                    value, next((row[column] for row in rows if row[column] is not None), None)
+                )
+                for value, column in zip(page.after, columns)
+            ]
+        )
+        if page.descending:
+            rows = [row for row in rows if sort_key(row) < after]
+        else:
+            rows = [row for row in rows if sort_key(row) > after]
+
+    return rows[page.offset : page.offset + page.limit + 1]
+
+
+def null_sort_key(values):
+    """Returns a sort key of values where None sorts below any value, like in the page statements."""
+
+    return [(value is not None, value) for value in values]
+
+
+def coerce_cursor_value(value, sample):
+    """Converts a decoded cursor value back to the type of the column it is compared with."""
+
+    if sample is None or value is None or isinstance(value, type(sample)):
+        return value
+
+    if isinstance(sample, (date, datetime)):
+        return type(sample).fromisoformat(value)
+
+    return type(sample)(value)
+
+
+def page_result(definition, rows, page):
+    """
+    Trims the look-ahead row of a page and builds its page information.
+
+    Args:
+        definition (ReportDefinition): The report being run.
+        rows (list): The rows of the page plus the optional look-ahead row.
+        page (ReportPage): The requested page.
+
+    Returns:
+        tuple: The rows of the page and a dictionary with the order, limit, offset,
+        whether more rows follow and the cursor of the next page.
+    """
+    has_more = len(rows) > page.limit and not page.top
+    rows = rows[: page.limit]
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(
+            [rows[-1][column] for column in sort_columns(definition, page.order_by)]
+        )
+
+    info = {
+        "order_by": ("-" if page.descending else "") + page.order_by,
+        "limit": page.limit,
+        "offset": page.offset,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    }
+
+    return rows, info
+
+
+def encode_cursor(values):
+    """Encodes the sort values of a row as an opaque URL safe cursor."""
+
+    payload = json.dumps(values, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor returned by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is not valid.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor).encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    return values
@@ -0,0 +1,165 @@
+"""
+Python functions that split a report's date range into slices run in parallel.
+
+This module contains the helpers of the partitioned execution mode of load_table.
+A report whose definition declares a date range and additive columns can have
+[start, end] split into month, quarter or year slices. Each slice runs the normal
+report statement on a pool thread, so with its own persistent connection, and the
+partial rows are merged by summing the additive columns per group. The slices do
+not overlap, so for counts and sums the merge gives exactly the unpartitioned result.
+
+Functions:
+- get_partition_pool(): Returns the shared thread pool used for report slices
+- split_date_range(start, end, unit, max_slices): Splits a date range into consecutive slices
+- slice_values(definition, values, unit): Returns the parameter values of each slice of a report
+- merge_partial_rows(definition, partials): Sums the partial rows of the slices per group
+
+Dependencies:
+- Django modules: settings
+- Python modules: concurrent.futures, datetime, math, threading
+"""
+
+from django.conf import settings
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import math
+import threading
+
+
+# Slice units and their length in months
+PARTITION_UNITS = {"month": 1, "quarter": 3, "year": 12}
+
+DEFAULT_PARTITION_WORKERS = 4
+DEFAULT_PARTITION_MAX_SLICES = 24
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_partition_pool():
+    """
+    Returns the shared thread pool used for report slices.
+
+    The pool is separate from the fan-out pool, so a multi-database report whose
+    aliases are partitioned never waits on its own threads.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "REPORT_PARTITION_WORKERS", DEFAULT_PARTITION_WORKERS),
+                thread_name_prefix="report-partition",
+            )
+
+        return _pool
+
+
+def split_date_range(start, end, unit, max_slices=None):
+    """
+    Splits a date range into consecutive slices aligned to calendar periods.
+
+    The first and last slices are cut at the start and end of the range. When the
+    range holds more periods than max_slices, neighbouring periods are grouped so
+    that wide ranges like "All Time" still run as a bounded number of queries.
+
+    Args:
+        start (date): The first day of the range.
+        end (date): The last day of the range, included.
+        unit (str): One of "month", "quarter" or "year".
+        max_slices (int): The most slices returned. Defaults to REPORT_PARTITION_MAX_SLICES.
+
+    Returns:
+        list: (start, end) tuples of dates covering the range without overlap.
+    """
+    if max_slices is None:
+        max_slices = getattr(settings, "REPORT_PARTITION_MAX_SLICES", DEFAULT_PARTITION_MAX_SLICES)
+
+    if start > end:
+        return []
+
+    months = PARTITION_UNITS[unit]
+    first_period = month_index(start) // months
+    last_period = month_index(end) // months
+    group = math.ceil((last_period - first_period + 1) / max(max_slices, 1))
+
+    slices = []
+
+    for period in range(first_period, last_period + 1, group):
+        slice_start = max(start, month_start(period * months))
+        next_month = (period + group) * months
+
+        if next_month > month_index(end):
+            slice_end = end
+        else:
+            slice_end = month_start(next_month) - timedelta(days=1)
+
+        slices.append((slice_start, slice_end))
+
+    return slices
+
+
+def slice_values(definition, values, unit):
+    """
+    Returns the parameter values of each slice of a partitioned report.
+
+    Args:
+        definition (ReportDefinition): A report with a partition_range.
+        values (dict): Parameter values returned by bind_parameters.
+        unit (str): One of "month", "quarter" or "year".
+
+    Returns:
+        list: One copy of the values per slice, with the range narrowed to the slice.
+    """
+    start_name, end_name = definition.partition_range
+
+    return [
+        dict(values, **{start_name: slice_start, end_name: slice_end})
+        for slice_start, slice_end in split_date_range(values[start_name], values[end_name], unit)
+    ]
+
+
+def merge_partial_rows(definition, partials):
+    """
+    Merges the partial rows of the slices of a report.
+
+    Rows are grouped by every column that is not additive, and the additive columns
+    of a group are summed. Groups keep the order in which they first appear.
+
+    Args:
+        definition (ReportDefinition): A report with additive_columns.
+        partials (list): The result rows of each slice.
+
+    Returns:
+        list: The merged rows, as the unpartitioned query would return them.
+    """
+    key_columns = [column for column in definition.columns if column not in definition.additive_columns]
+    merged = {}
+
+    for rows in partials:
+        for row in rows:
+            key = tuple(row[column] for column in key_columns)
+            total = merged.get(key)
+
+            if total is None:
+                merged[key] = dict(row)
+                continue
+
+            for column in definition.additive_columns:
+                total[column] = total[column] + row[column]
+
+    return list(merged.values())
+
+
+def month_index(day):
+    """Returns the number of months from year 0 to the month of a date."""
+
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    """Returns the first day of the month with a month_index."""
+
+    return date(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,387 @@
+"""
+Report query layer that executes fixed statements with bind parameters.
+
+This module contains the functions used to send report statements to a remote
+database. Statement text never contains parameter values, so each report type has
+one statement text and the server can reuse its cached plan. Statements are also
+prepared once per connection and reused:
+
+- PostgreSQL: a named server side PREPARE followed by EXECUTE for every run.
+- SQL Server: one pyodbc cursor per statement and connection. pyodbc keeps the last
+  prepared statement of a cursor and skips SQLPrepare when the same text runs again.
+  A cursor is replaced when the statement timeout changes, see apply_statement_timeout.
+- Other engines: the statement runs through a regular cursor with bind parameters.
+
+Execution counts and timings are kept per statement so plan reuse can be observed.
+
+Every statement runs under the statement timeout of its alias, taken from
+REPORT_ALIAS_STATEMENT_TIMEOUTS or else from REPORT_STATEMENT_TIMEOUTS for its engine.
+SQL Server applies it through the timeout pyodbc gives each new cursor and PostgreSQL through
+the statement_timeout setting of the session. Queries are registered with the
+report being tracked, so they can be cancelled while they run.
+
+Classes:
+- ReportStatement: A named report statement using %s bind parameters
+
+Functions:
+- execute_statement(alias, statement, params): Executes a statement and returns the cursor
+- stream_statement(alias, statement, params, batch_size): Yields the rows of a statement in batches
+- connection_identity(alias): Returns a stable identity of the database an alias points to
+- config_identity(config): Returns the identity of the database of a connection config
+- get_statement_timeout(alias, vendor): Returns the statement timeout of an alias in seconds
+- apply_statement_timeout(conn, seconds): Sets the statement timeout of a connection
+- get_statement_stats(): Returns execution counts and timings per statement
+- reset_statement_stats(): Clears the execution counts and timings
+
+Dependencies:
+- Django modules: settings, connections
+- Python modules: hashlib, re, threading, time
+- Project modules: report_inflight
+"""
+
+from django.conf import settings
+from django.db import connections
+
+from cs_app.utils.report_inflight import watch_query
+
+import hashlib
+import re
+import threading
+import time
+
+
+class ReportStatement:
+    """
+    A named report statement.
+
+    Args:
+        name (str): Unique statement name, also used as the server side statement name.
+        sql (str): Statement text using %s bind parameters.
+    """
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+
+    def __repr__(self):
+        return f"ReportStatement({self.name!r})"
+
+
+# Engine names used by REPORT_STATEMENT_TIMEOUTS for each connection vendor
+TIMEOUT_ENGINE_NAMES = {"microsoft": "mssql", "postgresql": "postgresql"}
+
+# Longest identity stored as is. Longer identities are stored as their digest
+IDENTITY_MAX_LENGTH = 255
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def execute_statement(alias, statement, params=()):
+    """
+    Executes a report statement with bind parameters on the connection of an alias.
+
+    Args:
+        alias (str): The database alias the statement runs against.
+        statement (ReportStatement): The statement to be executed.
+        params (list|tuple): Values bound to the %s placeholders of the statement.
+
+    Returns:
+        cursor: A cursor positioned on the statement's result rows.
+    """
+    conn = connections[alias]
+    conn.ensure_connection()
+    apply_statement_timeout(conn, get_statement_timeout(alias, conn.vendor))
+
+    started = time.perf_counter()
+
+    if conn.vendor == "postgresql":
+        cursor, prepared = execute_prepared_postgresql(conn, statement, params)
+    elif conn.vendor == "microsoft":
+        cursor, prepared = execute_prepared_mssql(conn, statement, params)
+    else:
+        cursor = conn.cursor()
+        cursor.execute(statement.sql, params)
+        prepared = False
+
+    record_execution(statement.name, time.perf_counter() - started, prepared)
+
+    return cursor
+
+
+def stream_statement(alias, statement, params=(), batch_size=500):
+    """
+    Executes a report statement and yields its rows in batches read with fetchmany.
+
+    On PostgreSQL the statement runs on a named server side cursor, so rows stay on
+    the server until they are fetched. SQL Server already streams results to pyodbc
+    as they are fetched. A dedicated cursor is used and closed when the generator
+    finishes, so an abandoned stream never leaves a busy cursor behind.
+
+    Args:
+        alias (str): The database alias the statement runs against.
+        statement (ReportStatement): The statement to be executed.
+        params (list|tuple): Values bound to the %s placeholders of the statement.
+        batch_size (int): The number of rows fetched at a time.
+
+    Yields:
+        list: Batches of at most batch_size row tuples.
+    """
+    conn = connections[alias]
+    conn.ensure_connection()
+    apply_statement_timeout(conn, get_statement_timeout(alias, conn.vendor))
+
+    if conn.vendor == "postgresql":
+        cursor = conn.chunked_cursor()
+    else:
+        cursor = conn.cursor()
+
+    try:
+        with watch_query(conn, cursor):
+            started = time.perf_counter()
+            cursor.execute(statement.sql, params)
+            record_execution(statement.name, time.perf_counter() - started, False)
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+
+                if not rows:
+                    break
+
+                yield rows
+    finally:
+        cursor.close()
+
+
+def execute_prepared_postgresql(conn, statement, params):
+    """
+    Executes a statement through a server side prepared statement on PostgreSQL.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection of the alias.
+        statement (ReportStatement): The statement to be executed.
+        params (list|tuple): Values bound to the statement placeholders.
+
+    Returns:
+        tuple: The cursor and whether the statement was prepared by this call.
+    """
+    prepared_names = get_connection_state(conn, "report_prepared_statements", set)
+    server_name = f"cs_{statement.name}"
+    cursor = conn.cursor()
+    prepared = False
+
+    if server_name not in prepared_names:
+        cursor.execute(f"PREPARE {server_name} AS {to_numbered_placeholders(statement.sql)}")
+        prepared_names.add(server_name)
+        prepared = True
+
+    with watch_query(conn):
+        if params:
+            placeholders = ", ".join(["%s"] * len(params))
+            cursor.execute(f"EXECUTE {server_name} ({placeholders})", params)
+        else:
+            cursor.execute(f"EXECUTE {server_name}")
+
+    return cursor, prepared
+
+
+def execute_prepared_mssql(conn, statement, params):
+    """
+    Executes a statement on a pyodbc cursor dedicated to the statement.
+
+    pyodbc only prepares a statement when its text differs from the last one run on
+    the cursor, so keeping one cursor per statement reuses the prepared handle.
+    pyodbc copies the connection timeout into a cursor only when the cursor is
+    created, so a cursor created under another timeout is closed and replaced.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection of the alias.
+        statement (ReportStatement): The statement to be executed.
+        params (list|tuple): Values bound to the statement placeholders.
+
+    Returns:
+        tuple: The cursor and whether the statement was prepared by this call.
+    """
+    cursors = get_connection_state(conn, "report_prepared_cursors", dict)
+    timeout = conn.connection.timeout
+    cursor, cursor_timeout = cursors.get(statement.name, (None, None))
+
+    if cursor is not None and cursor_timeout != timeout:
+        cursor.close()
+        cursor = None
+
+    prepared = cursor is None
+
+    # The raw pyodbc cursor raises pyodbc errors, which are turned into Django's
+    # like on the cursors Django hands out
+    with conn.wrap_database_errors:
+        if cursor is None:
+            cursor = conn.connection.cursor()
+            cursors[statement.name] = (cursor, timeout)
+
+        with watch_query(conn, cursor):
+            cursor.execute(statement.sql.replace("%s", "?"), list(params))
+
+    return cursor, prepared
+
+
+def connection_identity(alias):
+    """
+    Returns a stable identity of the database an alias points to.
+
+    Aliases added by switch_database_view are named after the database and only
+    exist in the process that added them, so one alias name can point to different
+    servers over time or in different processes. Data kept per database outside the
+    process, like the daily rollup, is keyed by this identity instead of the alias.
+
+    Args:
+        alias (str): A configured database alias.
+
+    Returns:
+        str: "engine://host:port/name", or its SHA-256 digest when longer than
+        IDENTITY_MAX_LENGTH.
+    """
+    return config_identity(settings.DATABASES[alias])
+
+
+def config_identity(config):
+    """
+    Returns the identity of the database a connection config points to.
+
+    Args:
+        config (dict): A DATABASES entry.
+
+    Returns:
+        str: The identity, like connection_identity.
+    """
+    engine = str(config.get("ENGINE") or "").rsplit(".", 1)[-1]
+    host = str(config.get("HOST") or "").lower()
+
+    identity = f"{engine}://{host}:{config.get('PORT') or ''}/{config.get('NAME') or ''}"
+
+    if len(identity) > IDENTITY_MAX_LENGTH:
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    return identity
+
+
+def get_statement_timeout(alias, vendor):
+    """
+    Returns the statement timeout of an alias.
+
+    Args:
+        alias (str): The database alias the statement runs against.
+        vendor (str): The vendor of the alias's connection.
+
+    Returns:
+        int|float: The timeout in seconds, or 0 for no timeout.
+    """
+    alias_timeouts = getattr(settings, "REPORT_ALIAS_STATEMENT_TIMEOUTS", {})
+
+    if alias in alias_timeouts:
+        return alias_timeouts[alias] or 0
+
+    engine_timeouts = getattr(settings, "REPORT_STATEMENT_TIMEOUTS", {})
+
+    return engine_timeouts.get(TIMEOUT_ENGINE_NAMES.get(vendor, vendor)) or 0
+
+
+def apply_statement_timeout(conn, seconds):
+    """
+    Sets the statement timeout of a connection before a report statement runs.
+
+    The timeout is remembered per session, so it is only sent when it changes.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection of the alias.
+        seconds (int|float): The timeout in seconds, or 0 for no timeout.
+    """
+    if conn.vendor == "microsoft":
+        # pyodbc applies the connection timeout to the cursors created afterwards.
+        # execute_prepared_mssql replaces its cached cursors when the timeout changes
+        conn.connection.timeout = int(seconds)
+    elif conn.vendor == "postgresql":
+        state = get_connection_state(conn, "report_statement_timeout", dict)
+
+        if state.get("seconds") != seconds:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('statement_timeout', %s, false)",
+                    [str(int(seconds * 1000))],
+                )
+            state["seconds"] = seconds
+
+
+def get_connection_state(conn, attribute, factory):
+    """
+    Returns per connection state stored on a Django connection.
+
+    The state is reset whenever the underlying DB-API connection changes, because
+    prepared statements and cursors only live as long as the session.
+
+    Args:
+        conn (DatabaseWrapper): The Django connection of the alias.
+        attribute (str): Name of the attribute holding the state.
+        factory (callable): Creates empty state for a new session.
+
+    Returns:
+        object: The state for the current DB-API connection.
+    """
+    owner, state = getattr(conn, attribute, (None, None))
+
+    if owner is not conn.connection:
+        state = factory()
+        setattr(conn, attribute, (conn.connection, state))
+
+    return state
+
+
+def to_numbered_placeholders(sql):
+    """Converts %s placeholders to the $1, $2, ... form used by PREPARE."""
+
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda match: f"${next(counter)}", sql)
+
+
+def record_execution(name, seconds, prepared):
+    """
+    Records one execution of a statement.
+
+    Args:
+        name (str): The statement name.
+        seconds (float): Time taken by the execution.
+        prepared (bool): Whether the statement was prepared by this execution.
+    """
+    elapsed_ms = seconds * 1000
+
+    with _stats_lock:
+        stats = _stats.setdefault(
+            name,
+            {"executions": 0, "prepares": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0},
+        )
+        stats["executions"] += 1
+        stats["prepares"] += 1 if prepared else 0
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_ms"] = elapsed_ms
+
+
+def get_statement_stats():
+    """
+    Returns execution counts and timings per statement.
+
+    Returns:
+        dict: Statement names mapped to executions, prepares, total, average, max and last time in ms.
+    """
+    with _stats_lock:
+        return {
+            name: dict(stats, avg_ms=stats["total_ms"] / stats["executions"])
+            for name, stats in _stats.items()
+        }
+
+
+def reset_statement_stats():
+    """Clears the execution counts and timings of all statements."""
+
+    with _stats_lock:
+        _stats.clear()
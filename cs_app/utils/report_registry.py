@@ -0,0 +1,406 @@
+"""
+Registry of the reports that can be run against a user's database.
+
+This module contains the classes used to declare reports and the registry that
+holds them. Each report declares its parameters, its SQL and its output columns.
+The SQL is a template rendered by the dialect of each database engine, or a text
+per engine where an engine has a faster form. Definitions are validated and
+compiled into fixed report statements once, when the application starts
+(CsAppConfig.ready), so no SQL is assembled while handling a request.
+
+Classes:
+- ReportParameter: A parameter accepted by a report
+- ReportDefinition: A report with its parameters, SQL per engine and output columns
+
+Functions:
+- per_engine(sql): Returns report SQL as engine names mapped to templates
+- register_report(definition): Adds a report definition to the registry
+- compile_reports(): Validates every definition and compiles its statements
+- get_report(report_id): Returns a public report definition by id
+- get_engine(alias): Returns the engine name ("mssql", "postgresql", ...) of an alias
+- bind_parameters(definition, raw_values): Validates and converts request values
+
+Dependencies:
+- Django modules: settings, ImproperlyConfigured
+- Python modules: datetime
+- Project modules: report_batch, report_dialects, report_paging, report_queries, report_sampling
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from datetime import date, datetime
+
+from cs_app.utils.report_batch import compile_batch_statements
+from cs_app.utils.report_dialects import get_dialect
+from cs_app.utils.report_paging import compile_page_statements
+from cs_app.utils.report_queries import ReportStatement
+from cs_app.utils.report_sampling import DEFAULT_SAMPLE_PERCENT, compile_sample_statement
+
+
+SUPPORTED_ENGINES = ("mssql", "postgresql")
+PARAMETER_KINDS = ("date", "text", "integer")
+
+_reports = {}
+
+
+class ReportParameter:
+    """
+    A parameter accepted by a report.
+
+    Args:
+        name (str): The request key of the parameter.
+        kind (str): One of "date", "text" or "integer".
+        default (object): Value used when the request leaves the parameter empty.
+            Parameters without a default are required.
+    """
+
+    def __init__(self, name, kind="date", default=None):
+        self.name = name
+        self.kind = kind
+        self.default = default
+
+    def convert(self, value):
+        """
+        Converts a request value to the parameter's Python type.
+
+        Args:
+            value (object): The raw request value.
+
+        Returns:
+            object: The converted value.
+
+        Raises:
+            ValueError: If the value is missing and required, or cannot be converted.
+        """
+        if value is None or value == "":
+            if self.default is None:
+                raise ValueError(f"Parameter '{self.name}' is required")
+            return self.default
+
+        if self.kind == "date":
+            if isinstance(value, datetime):
+                return value.date()
+            if isinstance(value, date):
+                return value
+            return date.fromisoformat(str(value).strip()[:10])
+
+        if self.kind == "integer":
+            return int(value)
+
+        return str(value)
+
+
+class ReportDefinition:
+    """
+    A report with its parameters, SQL per engine and output columns.
+
+    Args:
+        report_id (str): Unique id used by clients to request the report.
+        title (str): Human readable title.
+        parameters (list): ReportParameter objects accepted by the report.
+        sql (str|dict): Statement template using %s placeholders, rendered for every
+            supported engine by its dialect, or engine names mapped to templates for
+            engine specific statements. Column aliases must match the output columns.
+        columns (list): Names of the output columns, in order.
+        bind_order (list): Parameter names bound to the %s placeholders, in order.
+            Defaults to the declared parameters.
+        precomputed (callable): Optional function(alias, values) returning rows
+            answered from local precomputed data, or None to run the live query.
+        public (bool): Whether clients may request the report directly.
+        partition_range (tuple): Names of the date parameters holding the first and
+            last day of the report range. Together with additive_columns it allows
+            the range to be split into slices that run in parallel.
+        additive_columns (list): Output columns that are counts or sums, so the rows
+            of separate slices merge exactly by adding them up per group.
+        key_columns (list): Output columns that identify a row, used to break ties
+            when sorting pages. Defaults to every column that is not additive.
+        sample_sql (str|dict): Optional template of the report statement with a
+            {tablesample} marker and a sample_rows column after the output columns,
+            which opts the report in to approximate previews. Requires additive_columns.
+        sample_percent (int|float): Percentage of the table pages read by a preview.
+    """
+
+    def __init__(
+        self,
+        report_id,
+        title,
+        parameters,
+        sql,
+        columns,
+        bind_order=None,
+        precomputed=None,
+        public=True,
+        partition_range=None,
+        additive_columns=None,
+        key_columns=None,
+        sample_sql=None,
+        sample_percent=DEFAULT_SAMPLE_PERCENT,
+    ):
+        self.report_id = report_id
+        self.title = title
+        self.parameters = parameters
+        self.sql = per_engine(sql)
+        self.columns = columns
+        self.bind_order = bind_order or [parameter.name for parameter in parameters]
+        self.precomputed = precomputed
+        self.public = public
+        self.partition_range = partition_range
+        self.additive_columns = additive_columns or []
+        self.key_columns = key_columns or [
+            column for column in columns if column not in self.additive_columns
+        ] or list(columns)
+        self.sample_sql = per_engine(sample_sql)
+        self.sample_percent = sample_percent
+        self.statements = {}
+        self.page_statements = {}
+        self.sample_statements = {}
+        self.batch_statements = {}
+
+    @property
+    def partitionable(self):
+        """Whether the date range of the report can be split into merged slices."""
+
+        return bool(self.partition_range and self.additive_columns)
+
+    @property
+    def samplable(self):
+        """Whether the report can return an approximate preview from a sampled scan."""
+
+        return bool(self.sample_sql)
+
+    def validate(self):
+        """
+        Validates the definition.
+
+        Raises:
+            ImproperlyConfigured: If the definition is incomplete or inconsistent.
+        """
+        parameter_names = [parameter.name for parameter in self.parameters]
+
+        if not self.columns:
+            raise ImproperlyConfigured(f"Report '{self.report_id}' declares no columns")
+
+        if len(set(parameter_names)) != len(parameter_names):
+            raise ImproperlyConfigured(f"Report '{self.report_id}' repeats a parameter")
+
+        for parameter in self.parameters:
+            if parameter.kind not in PARAMETER_KINDS:
+                raise ImproperlyConfigured(
+                    f"Report '{self.report_id}' parameter '{parameter.name}' has unknown kind '{parameter.kind}'"
+                )
+
+        unknown_names = set(self.bind_order) - set(parameter_names)
+        if unknown_names:
+            raise ImproperlyConfigured(
+                f"Report '{self.report_id}' binds unknown parameters {sorted(unknown_names)}"
+            )
+
+        if self.partition_range:
+            date_names = [parameter.name for parameter in self.parameters if parameter.kind == "date"]
+
+            if len(self.partition_range) != 2 or not set(self.partition_range) <= set(date_names):
+                raise ImproperlyConfigured(
+                    f"Report '{self.report_id}' partition range must name two date parameters"
+                )
+
+        unknown_columns = set(self.additive_columns + self.key_columns) - set(self.columns)
+        if unknown_columns:
+            raise ImproperlyConfigured(
+                f"Report '{self.report_id}' declares unknown additive or key columns {sorted(unknown_columns)}"
+            )
+
+        for engine in SUPPORTED_ENGINES:
+            if engine not in self.sql:
+                raise ImproperlyConfigured(f"Report '{self.report_id}' has no SQL for {engine}")
+
+        for engine, sql in list(self.sql.items()) + list(self.sample_sql.items()):
+            if sql.count("%s") != len(self.bind_order):
+                raise ImproperlyConfigured(
+                    f"Report '{self.report_id}' SQL for {engine} has {sql.count('%s')} placeholders, "
+                    f"expected {len(self.bind_order)}"
+                )
+
+        if self.sample_sql:
+            if not self.additive_columns or not 0 < self.sample_percent < 100:
+                raise ImproperlyConfigured(
+                    f"Report '{self.report_id}' previews need additive columns and a sample percent below 100"
+                )
+
+            for engine, sql in self.sample_sql.items():
+                if "{tablesample}" not in sql:
+                    raise ImproperlyConfigured(
+                        f"Report '{self.report_id}' sample SQL for {engine} has no {{tablesample}} marker"
+                    )
+
+    def compile(self):
+        """
+        Validates the definition and renders one fixed statement per engine, plus
+        the page statements used for server side sorting and pagination, the
+        statements of approximate previews and the grouped statements of batches.
+        """
+        self.validate()
+        self.statements = {
+            engine: ReportStatement(f"{self.report_id}_{engine}", get_dialect(engine).render(sql))
+            for engine, sql in self.sql.items()
+            if get_dialect(engine)
+        }
+        self.page_statements = {
+            engine: compile_page_statements(self, engine, statement.sql)
+            for engine, statement in self.statements.items()
+        }
+        self.sample_statements = {
+            engine: compile_sample_statement(self, engine, sql)
+            for engine, sql in self.sample_sql.items()
+        }
+        self.batch_statements = {
+            engine: compile_batch_statements(self, engine, statement.sql)
+            for engine, statement in self.statements.items()
+        }
+
+    def statement_for(self, engine):
+        """
+        Returns the compiled statement of the report for an engine.
+
+        Args:
+            engine (str): The engine name returned by get_engine.
+
+        Returns:
+            ReportStatement: The compiled statement.
+
+        Raises:
+            ValueError: If the report has no SQL for the engine.
+        """
+        if engine not in self.statements:
+            raise ValueError(f"Report '{self.report_id}' is not available for {engine}")
+
+        return self.statements[engine]
+
+    def sample_statement_for(self, engine):
+        """
+        Returns the compiled preview statement of the report for an engine.
+
+        Raises:
+            ValueError: If the report has no preview on the engine.
+        """
+        if self.sample_statements.get(engine) is None:
+            raise ValueError(f"Report '{self.report_id}' has no preview for {engine}")
+
+        return self.sample_statements[engine]
+
+    def batch_statement_for(self, engine, size):
+        """
+        Returns the compiled statement running size parameter sets of the report.
+
+        Raises:
+            ValueError: If the report has no grouped statement of that size on the engine.
+        """
+        statement = self.batch_statements.get(engine, {}).get(size)
+
+        if statement is None:
+            raise ValueError(f"Report '{self.report_id}' cannot group {size} sets on {engine}")
+
+        return statement
+
+    def params_for(self, values):
+        """Returns the bind parameters of the statement for bound values."""
+
+        return [values[name] for name in self.bind_order]
+
+
+def per_engine(sql):
+    """Returns SQL given as one template for every engine as a per engine dictionary."""
+
+    if sql is None:
+        return {}
+
+    if isinstance(sql, str):
+        return {engine: sql for engine in SUPPORTED_ENGINES}
+
+    return dict(sql)
+
+
+def register_report(definition):
+    """
+    Adds a report definition to the registry.
+
+    Args:
+        definition (ReportDefinition): The definition to be added.
+
+    Returns:
+        ReportDefinition: The definition, so it can be kept in a module variable.
+
+    Raises:
+        ImproperlyConfigured: If a report with the same id is already registered.
+    """
+    if definition.report_id in _reports:
+        raise ImproperlyConfigured(f"Report '{definition.report_id}' is registered twice")
+
+    _reports[definition.report_id] = definition
+
+    return definition
+
+
+def compile_reports():
+    """Validates every registered definition and compiles its statements."""
+
+    for definition in _reports.values():
+        definition.compile()
+
+
+def get_report(report_id, include_internal=False):
+    """
+    Returns a report definition by id.
+
+    Args:
+        report_id (str): The id of the report.
+        include_internal (bool): Whether non public reports are returned too.
+
+    Returns:
+        ReportDefinition or None: The definition, or None if there is no such report.
+    """
+    definition = _reports.get(report_id)
+
+    if definition is None or not (definition.public or include_internal):
+        return None
+
+    return definition
+
+
+def get_engine(alias):
+    """
+    Returns the engine name of a database alias.
+
+    Args:
+        alias (str): The database alias.
+
+    Returns:
+        str: "mssql", "postgresql", or the last part of the configured ENGINE.
+    """
+    engine = settings.DATABASES[alias]["ENGINE"]
+
+    for engine_name in SUPPORTED_ENGINES:
+        if engine_name in engine:
+            return engine_name
+
+    return engine.rsplit(".", 1)[-1]
+
+
+def bind_parameters(definition, raw_values):
+    """
+    Validates and converts request values for the parameters of a report.
+
+    Args:
+        definition (ReportDefinition): The report being run.
+        raw_values (dict): Values taken from the request.
+
+    Returns:
+        dict: Parameter names mapped to converted values.
+
+    Raises:
+        ValueError: If a value is missing or invalid.
+    """
+    return {
+        parameter.name: parameter.convert(raw_values.get(parameter.name))
+        for parameter in definition.parameters
+    }
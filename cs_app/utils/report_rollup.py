@@ -0,0 +1,147 @@
+"""
+Python functions for the local daily rollup of department hours.
+
+This module contains the functions that copy department-by-day assignment counts
+from a remote database alias into the DepartmentDailyRollup table of the default
+database, and that answer department hours reports from those rows. Each alias
+keeps a watermark of the last day loaded so a refresh only pulls newer days. Days
+after the watermark are not covered by the rollup and must be queried live.
+
+Rows and watermarks are keyed by the connection identity of the alias (engine,
+host, port and database name), not by the alias name: aliases added at runtime
+are named after the database, so the same name can later point to another server.
+
+Functions:
+- refresh_rollup(alias, through_day): Loads days newer than the watermark of an alias
+- get_rollup_watermark(alias): Returns the last day loaded for an alias
+- rollup_department_counts(alias, start_date, end_date): Sums rollup rows over a date range
+
+Dependencies:
+- Django modules: settings, transaction, Sum
+- Python modules: datetime
+- Project modules: report_queries, report_registry
+- Model: DepartmentDailyRollup, RollupWatermark from the application's models
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from datetime import date, timedelta
+
+from cs_app.utils.report_queries import connection_identity, execute_statement
+
+import cs_app.utils.report_registry as registry
+
+from ..models import DepartmentDailyRollup, RollupWatermark
+
+
+# Lower bound used for the first refresh of an alias
+EARLIEST_DAY = date(1000, 1, 1)
+
+
+def refresh_rollup(alias, through_day=None):
+    """
+    Loads department-by-day counts newer than the watermark of an alias.
+
+    Only complete days are loaded, so by default the refresh stops at yesterday.
+    The watermark is then moved to the last loaded day, which keeps the next
+    refresh incremental.
+
+    Args:
+        alias (str): The database alias the counts are pulled from.
+        through_day (date): The last day to load. Defaults to yesterday.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    if through_day is None:
+        through_day = date.today() - timedelta(days=1)
+
+    watermark = get_rollup_watermark(alias)
+    after_day = watermark or (EARLIEST_DAY - timedelta(days=1))
+
+    if after_day >= through_day:
+        return 0
+
+    definition = registry.get_report("department_daily_rollup", include_internal=True)
+    statement = definition.statement_for(registry.get_engine(alias))
+    cursor = execute_statement(
+        alias,
+        statement,
+        definition.params_for({"after_day": after_day, "through_day": through_day}),
+    )
+
+    connection_key = connection_identity(alias)
+
+    rollup_rows = [
+        DepartmentDailyRollup(
+            connection_key=connection_key,
+            day=to_date(day),
+            department_name=department_name,
+            assignment_count=assignment_count,
+        )
+        for day, department_name, assignment_count in cursor.fetchall()
+    ]
+
+    with transaction.atomic(using="default"):
+        DepartmentDailyRollup.objects.bulk_create(rollup_rows, batch_size=500)
+        RollupWatermark.objects.update_or_create(
+            connection_key=connection_key, defaults={"last_day": through_day}
+        )
+
+    return len(rollup_rows)
+
+
+def get_rollup_watermark(alias):
+    """
+    Returns the last day loaded into the rollup for an alias.
+
+    Args:
+        alias (str): The database alias of the rollup.
+
+    Returns:
+        date or None: The watermark, or None if the database of the alias was never
+        refreshed or the alias is not configured.
+    """
+    if alias not in settings.DATABASES:
+        return None
+
+    watermark = RollupWatermark.objects.filter(connection_key=connection_identity(alias)).first()
+
+    return watermark.last_day if watermark else None
+
+
+def rollup_department_counts(alias, start_date, end_date):
+    """
+    Sums the rollup rows of an alias over an inclusive date range.
+
+    Args:
+        alias (str): The database alias of the rollup.
+        start_date (date): The first day of the range.
+        end_date (date): The last day of the range.
+
+    Returns:
+        dict: Department names mapped to their assignment counts.
+    """
+    totals = (
+        DepartmentDailyRollup.objects.filter(
+            connection_key=connection_identity(alias), day__gte=start_date, day__lte=end_date
+        )
+        .values("department_name")
+        .annotate(total=Sum("assignment_count"))
+    )
+
+    return {row["department_name"]: row["total"] for row in totals}
+
+
+def to_date(value):
+    """Returns a date for a date, datetime or YYYY-MM-DD string value."""
+
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+
+    if hasattr(value, "date"):
+        return value.date()
+
+    return value
@@ -0,0 +1,152 @@
+"""
+Approximate report previews from a sampled scan.
+
+This module contains the helpers of the two phase preview mode of load_table. A
+report definition opts in with sample SQL, the report statement with a
+{tablesample} marker after its largest table. The engine's dialect replaces the
+marker at startup with TABLESAMPLE SYSTEM (n PERCENT) on SQL Server or
+TABLESAMPLE SYSTEM (n) on PostgreSQL, so the preview statement reads only about
+n percent of the table's pages.
+
+The sampled counts are scaled up by the sampling fraction to estimate the exact
+result. Each additive column gets a margin at 95% confidence, computed from the
+number of sampled rows of its group as for Bernoulli sampling of rows with the
+same value. SYSTEM sampling picks whole pages, so rows stored together are
+sampled together and the true error can be wider when the data is clustered.
+The exact result replaces the estimate once it is ready.
+
+Functions:
+- compile_sample_statement(definition, engine, sql): Compiles the preview statement of a report for an engine
+- estimate_rows(definition, rows): Scales sampled rows and adds the margin of each additive column
+- estimate_columns(definition): Returns the output columns of a preview
+- estimate_document(definition, rows): Builds the preview document sent to clients
+- exact_document(rows): Builds the document of the exact result
+
+Dependencies:
+- Python modules: decimal, math
+- Project modules: report_dialects, report_queries
+"""
+
+from decimal import Decimal
+
+from cs_app.utils.report_dialects import get_dialect
+from cs_app.utils.report_queries import ReportStatement
+
+import math
+
+
+DEFAULT_SAMPLE_PERCENT = 10
+
+# Two sided normal quantile of the confidence level the margins are given at
+CONFIDENCE = 0.95
+CONFIDENCE_Z = Decimal("1.96")
+
+# Estimates and margins are rounded to this precision
+ESTIMATE_PRECISION = Decimal("0.01")
+
+# Column of the sample statement holding the number of sampled rows in each group
+SAMPLE_ROWS_COLUMN = "sample_rows"
+
+
+def compile_sample_statement(definition, engine, sql):
+    """
+    Compiles the preview statement of a report for an engine.
+
+    Args:
+        definition (ReportDefinition): A report with sample SQL.
+        engine (str): "mssql" or "postgresql".
+        sql (str): The sample SQL template of the engine, holding a {tablesample} marker.
+
+    Returns:
+        ReportStatement or None: The statement, or None if the engine cannot sample.
+    """
+    dialect = get_dialect(engine)
+    if dialect is None:
+        return None
+
+    return ReportStatement(
+        f"{definition.report_id}_{engine}_sample",
+        dialect.render(sql, sample_percent=definition.sample_percent),
+    )
+
+
+def estimate_rows(definition, rows):
+    """
+    Scales the rows of a sampled scan up to an estimate of the exact result.
+
+    Args:
+        definition (ReportDefinition): The report being previewed.
+        rows (list): Rows of the sample statement, with the sample_rows column.
+
+    Returns:
+        list: Rows keyed by the report's columns, each additive column followed by
+        a <column>_margin holding its margin at 95% confidence.
+    """
+    fraction = Decimal(definition.sample_percent) / 100
+    estimates = []
+
+    for row in rows:
+        sample_rows = row[SAMPLE_ROWS_COLUMN] or 0
+        estimate = {}
+
+        for column in definition.columns:
+            value = row[column]
+
+            if column not in definition.additive_columns:
+                estimate[column] = value
+                continue
+
+            value = Decimal(str(value or 0))
+            estimate[column] = (value / fraction).quantize(ESTIMATE_PRECISION)
+
+            # Standard error of n / p for n rows sampled with probability p, scaled
+            # by the value each row contributes to the column
+            per_row = value / sample_rows if sample_rows else Decimal(0)
+            spread = Decimal(math.sqrt(sample_rows * (1 - float(fraction))) / float(fraction))
+            estimate[f"{column}_margin"] = (per_row * CONFIDENCE_Z * spread).quantize(ESTIMATE_PRECISION)
+
+        estimates.append(estimate)
+
+    return estimates
+
+
+def estimate_columns(definition):
+    """Returns the output columns of a preview, with a margin after each additive column."""
+
+    columns = []
+
+    for column in definition.columns:
+        columns.append(column)
+
+        if column in definition.additive_columns:
+            columns.append(f"{column}_margin")
+
+    return columns
+
+
+def estimate_document(definition, rows):
+    """
+    Builds the preview document sent to clients.
+
+    Args:
+        definition (ReportDefinition): The report being previewed.
+        rows (list): Rows returned by estimate_rows.
+
+    Returns:
+        dict: The rows marked as approximate, with the sampling percentage, the
+        confidence level of the margins and the columns of the rows.
+    """
+    return {
+        "phase": "estimate",
+        "approximate": True,
+        "sample_percent": definition.sample_percent,
+        "confidence": CONFIDENCE,
+        "columns": estimate_columns(definition),
+        "data": rows,
+    }
+
+
+def exact_document(rows):
+    """Builds the document of the exact result that replaces a preview."""
+
+    return {"phase": "exact", "approximate": False, "data": rows}
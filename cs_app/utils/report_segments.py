@@ -0,0 +1,225 @@
+"""
+In-process store of report results for segments of a date range.
+
+This module contains the segment store used for incremental range evaluation.
+Reports with a partition range and additive columns keep the rows of every date
+segment they queried. A later request is broken into the stored segments that fit
+inside its range and the gaps between them, and only the gaps are queried on the
+remote database. Widening Jan-Mar to Jan-Apr then only queries April.
+
+Segments are scoped by the database alias, the report id and the other parameter
+values, so results from different databases or parameters never mix. The store is
+bounded, evicts the least recently used segment when full, and expires segments
+after a time to live like the report cache.
+
+Classes:
+- SegmentStore: Bounded store of per segment report rows with gap planning
+
+Functions:
+- make_segment_scope(alias, definition, values): Builds the scope segments of a request are stored under
+
+Module Variables:
+- segment_store: Shared SegmentStore instance configured from Django settings
+
+Dependencies:
+- Django modules: settings
+- Python modules: collections, datetime, threading, time
+- Project modules: report_cache
+"""
+
+from django.conf import settings
+
+from collections import OrderedDict
+from datetime import timedelta
+
+from cs_app.utils.report_cache import make_cache_key
+
+import threading
+import time
+
+
+DEFAULT_MAX_SEGMENTS = 1024
+DEFAULT_TTL_SECONDS = 300
+
+
+class SegmentStore:
+    """
+    Bounded least recently used store of report rows per date segment.
+
+    Args:
+        max_segments (int): The maximum number of segments held before evicting.
+        ttl_seconds (int|float): Number of seconds a segment stays valid.
+    """
+
+    def __init__(self, max_segments=DEFAULT_MAX_SEGMENTS, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_segments = max_segments
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (scope, start, end) mapped to (expires_at, rows), in least recently used order
+        self._segments = OrderedDict()
+        # scope mapped to the set of (start, end) segments stored for it
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    def plan(self, scope, start, end):
+        """
+        Breaks a date range into stored segments and missing gaps.
+
+        Only stored segments lying entirely inside the range can be reused, since
+        their rows cannot be cut further. Overlapping segments are never both used.
+
+        Args:
+            scope (tuple): The scope built by make_segment_scope.
+            start (date): The first day of the range.
+            end (date): The last day of the range, included.
+
+        Returns:
+            tuple: The rows of each reused segment, and the (start, end) gaps that
+            still have to be queried, in date order.
+        """
+        now = time.monotonic()
+        reused = []
+        gaps = []
+
+        with self._lock:
+            next_day = start
+
+            for segment_start, segment_end in sorted(self._scopes.get(scope, ())):
+                if segment_start < next_day or segment_end > end:
+                    continue
+
+                key = (scope, segment_start, segment_end)
+                expires_at, rows = self._segments[key]
+
+                if expires_at <= now:
+                    self._remove(key)
+                    continue
+
+                self._segments.move_to_end(key)
+
+                if segment_start > next_day:
+                    gaps.append((next_day, segment_start - timedelta(days=1)))
+
+                reused.append(rows)
+                next_day = segment_end + timedelta(days=1)
+
+            if next_day <= end:
+                gaps.append((next_day, end))
+
+            self.hits += len(reused)
+            self.misses += len(gaps)
+
+        return reused, gaps
+
+    def add(self, scope, start, end, rows):
+        """
+        Stores the rows of a segment, evicting the least recently used segments if full.
+
+        A segment overlapping one already stored, like a gap filled by a concurrent
+        request, is not stored again.
+
+        Args:
+            scope (tuple): The scope built by make_segment_scope.
+            start (date): The first day of the segment.
+            end (date): The last day of the segment, included.
+            rows (list): The report rows of the segment.
+        """
+        if self.max_segments <= 0:
+            return
+
+        with self._lock:
+            for segment_start, segment_end in self._scopes.get(scope, ()):
+                if segment_start <= end and start <= segment_end:
+                    return
+
+            key = (scope, start, end)
+            self._segments[key] = (time.monotonic() + self.ttl_seconds, rows)
+            self._scopes.setdefault(scope, set()).add((start, end))
+
+            while len(self._segments) > self.max_segments:
+                self._remove(next(iter(self._segments)))
+                self.evictions += 1
+
+    def invalidate_alias(self, alias):
+        """
+        Removes every segment belonging to a database alias.
+
+        Args:
+            alias (str): The database alias whose segments are removed.
+
+        Returns:
+            int: The number of segments removed.
+        """
+        with self._lock:
+            stale_keys = [key for key in self._segments if key[0][0] == alias]
+
+            for key in stale_keys:
+                self._remove(key)
+
+            return len(stale_keys)
+
+    def clear(self):
+        """Removes all segments and resets the counters."""
+
+        with self._lock:
+            self._segments.clear()
+            self._scopes.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the current store counters.
+
+        Returns:
+            dict: Segment count, capacity, ttl, reused segments, queried gaps and evictions.
+        """
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "max_segments": self.max_segments,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key):
+        """Removes a segment and its scope entry. Must be called with the lock held."""
+
+        scope, start, end = key
+        del self._segments[key]
+
+        segments = self._scopes[scope]
+        segments.discard((start, end))
+
+        if not segments:
+            del self._scopes[scope]
+
+
+def make_segment_scope(alias, definition, values):
+    """
+    Builds the scope the segments of a report request are stored under.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): A partitionable report.
+        values (dict): Parameter values returned by bind_parameters.
+
+    Returns:
+        tuple: The normalized scope, with the alias as its first item.
+    """
+    other_values = {
+        name: value for name, value in values.items() if name not in definition.partition_range
+    }
+
+    return make_cache_key(alias, definition.report_id, other_values)
+
+
+segment_store = SegmentStore(
+    max_segments=getattr(settings, "REPORT_SEGMENT_MAX_ENTRIES", DEFAULT_MAX_SEGMENTS),
+    ttl_seconds=getattr(settings, "REPORT_SEGMENT_TTL", DEFAULT_TTL_SECONDS),
+)
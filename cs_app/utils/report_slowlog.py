@@ -0,0 +1,246 @@
+"""
+Persistent log of slow report runs.
+
+This module contains the slow query log of the reports. Every report run that takes
+longer than REPORT_SLOW_QUERY_THRESHOLD_MS is stored as a SlowReportQuery row with
+its alias, report, parameters, row count, duration and stage timings, so slow
+reports can be browsed and aggregated in the admin site.
+
+Entries are written by a background thread in batches, so the request that was slow
+is not also held up by the insert. The queue is bounded, and when the writer falls
+behind new entries are dropped and counted instead of blocking the request path.
+Entries older than REPORT_SLOW_QUERY_RETENTION_DAYS are deleted by the
+purge_slow_queries management command.
+
+Classes:
+- SlowQueryWriter: Background thread writing slow report runs in batches
+
+Functions:
+- get_slow_query_threshold(): Returns the duration in milliseconds a run is logged from
+- record_report_run(user, alias, report_id, time_range, values, row_count, timer): Logs a run if it was slow
+- iter_recorded(batches, timer, record): Times a streamed report and logs it once the stream ends
+- purge_slow_queries(days): Deletes slow report runs older than the retention period
+
+Module Variables:
+- slow_query_writer: The writer shared by every request of the process
+
+Dependencies:
+- Django modules: settings, DjangoJSONEncoder, close_old_connections, timezone
+- Python modules: datetime, json, logging, queue, threading
+- Model: SlowReportQuery from the application's models
+"""
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+from datetime import timedelta
+
+from ..models import SlowReportQuery
+
+import json
+import logging
+import queue
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_THRESHOLD_MS = 2000
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_QUEUE_SIZE = 1000
+
+# Entries inserted with one bulk_create by the writer
+WRITE_BATCH_SIZE = 100
+
+
+class SlowQueryWriter:
+    """
+    Background thread writing slow report runs to the default database in batches.
+
+    The thread is started by the first submitted entry.
+
+    Args:
+        max_queued (int): The number of entries waiting to be written before new
+            entries are dropped.
+    """
+
+    def __init__(self, max_queued=DEFAULT_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, entry):
+        """
+        Queues an entry without blocking.
+
+        Args:
+            entry (dict): SlowReportQuery field values.
+
+        Returns:
+            bool: Whether the entry was queued, False if the queue is full.
+        """
+        self.start()
+
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        return True
+
+    def start(self):
+        """Starts the writer thread if it is not running."""
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="slow-report-query-writer", daemon=True
+                )
+                self._thread.start()
+
+    def run(self):
+        """Writes queued entries until the process exits."""
+
+        while True:
+            entries = [self.queue.get()]
+
+            # Everything already waiting goes in the same insert
+            while len(entries) < WRITE_BATCH_SIZE:
+                try:
+                    entries.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write(entries)
+            except Exception:
+                logger.exception("Error writing slow report queries")
+            finally:
+                for _ in entries:
+                    self.queue.task_done()
+
+    def write(self, entries):
+        """
+        Inserts a batch of entries.
+
+        Args:
+            entries (list): Dictionaries of SlowReportQuery field values.
+        """
+        close_old_connections()
+
+        try:
+            SlowReportQuery.objects.bulk_create([SlowReportQuery(**entry) for entry in entries])
+        finally:
+            close_old_connections()
+
+        with self._lock:
+            self.written += len(entries)
+
+    def flush(self):
+        """Blocks until every queued entry has been written."""
+
+        self.queue.join()
+
+    def stats(self):
+        """Returns the number of entries queued, written and dropped."""
+
+        with self._lock:
+            return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+
+def get_slow_query_threshold():
+    """Returns the duration in milliseconds from which report runs are logged."""
+
+    return getattr(settings, "REPORT_SLOW_QUERY_THRESHOLD_MS", DEFAULT_THRESHOLD_MS)
+
+
+def record_report_run(user, alias, report_id, time_range, values, row_count, timer):
+    """
+    Logs a report run in the slow query log if it took longer than the threshold.
+
+    Args:
+        user (User): The user who ran the report, or None.
+        alias (str): The database alias the report ran against.
+        report_id (str): The id of the report in the report registry.
+        time_range (str): The time range label of the report.
+        values (dict): The bound parameter values of the report.
+        row_count (int): The number of rows returned.
+        timer (StageTimer): The stage timings of the run.
+
+    Returns:
+        bool: Whether the run was queued to be logged.
+    """
+    duration_ms = timer.total_ms
+
+    if duration_ms < get_slow_query_threshold():
+        return False
+
+    return slow_query_writer.submit(
+        {
+            "user_id": getattr(user, "pk", None),
+            "database_alias": alias or "",
+            "report_id": report_id,
+            "report_type": time_range or "",
+            # Dates and decimals are stored the way the report API returns them
+            "parameters": json.loads(json.dumps(values or {}, cls=DjangoJSONEncoder)),
+            "row_count": row_count,
+            "duration_ms": round(duration_ms, 3),
+            "stage_timings": timer.as_dict(),
+            "ran_on": timezone.now(),
+        }
+    )
+
+
+def iter_recorded(batches, timer, record):
+    """
+    Times a streamed report under the "stream" stage and logs it once the stream ends.
+
+    Args:
+        batches (iterable): Batches of rows of the report.
+        timer (StageTimer): The timer of the report run.
+        record (callable): Called with the number of rows sent when the stream ends.
+
+    Yields:
+        list: The batches, unchanged.
+    """
+    row_count = 0
+
+    try:
+        with timer.stage("stream"):
+            for batch in batches:
+                row_count += len(batch)
+                yield batch
+    finally:
+        record(row_count)
+
+
+def purge_slow_queries(days=None):
+    """
+    Deletes slow report runs older than the retention period.
+
+    Args:
+        days (int): Days entries are kept. Defaults to REPORT_SLOW_QUERY_RETENTION_DAYS.
+
+    Returns:
+        int: The number of entries deleted.
+    """
+    if days is None:
+        days = getattr(settings, "REPORT_SLOW_QUERY_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+
+    deleted, _ = SlowReportQuery.objects.filter(
+        ran_on__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+
+    return deleted
+
+
+slow_query_writer = SlowQueryWriter(
+    getattr(settings, "REPORT_SLOW_QUERY_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+)
@@ -0,0 +1,493 @@
+"""
+Compressed snapshots of report results kept for the report history.
+
+Every run in a user's report history can keep a snapshot of the rows it returned,
+so opening the run again from the history page shows the stored result instead of
+running the remote query. The refresh action of the run re-executes the report and
+replaces its snapshot.
+
+Snapshots are stored column by column and compressed:
+
+- arrow: an Arrow IPC stream with zstd compressed buffers, keeping Decimal and date
+  columns as native Arrow types.
+- msgpack: the columnar {"columns": [...], "data": [[...], ...]} document encoded as
+  MessagePack and compressed with zstd, used when pyarrow is not installed.
+
+The files live in a local blob store under REPORT_SNAPSHOT_DIR and are named after
+the SHA-256 of their content, so identical results of several runs share one file.
+Files are written once and read back through a read-only memory map. A client asking
+for the stored encoding is sent the file as it is (with Content-Encoding: zstd for
+MessagePack), which the server can hand to sendfile, and other clients get the rows
+decoded straight from the map.
+
+Results larger than REPORT_SNAPSHOT_MAX_ROWS rows are not kept, and neither are
+results of another report, database or parameter values than the ones the history
+entry was logged with, so an entry never replays a result it did not run.
+
+Classes:
+- SnapshotStore: Content addressed blob store of snapshot files
+
+Functions:
+- snapshot_available(snapshot_format): Returns whether the libraries for a format are installed
+- get_snapshot_format(): Returns the format new snapshots are stored in
+- get_snapshot_store(): Returns the blob store under REPORT_SNAPSHOT_DIR
+- history_parameters(values): Returns the parameter values a history entry keeps besides its dates
+- find_history_run(user, alias, time_range, start_date, end_date, report_id, parameters): Returns the history entry of a report run
+- run_matches(run, alias, report_id, values): Returns whether a report is the run of a history entry
+- snapshot_matches_run(snapshot): Returns whether a snapshot holds the result of its history entry
+- save_snapshot(run, alias, definition, values, rows): Stores the result of a run as its snapshot
+- release_blob(blob_name): Deletes a snapshot file no snapshot refers to anymore
+- encode_snapshot(rows, columns, snapshot_format): Encodes rows as a compressed snapshot file
+- decode_snapshot(content, snapshot_format): Decodes the columns and rows of a snapshot file
+- read_snapshot(snapshot): Returns the columns and rows of a snapshot
+- snapshot_response(snapshot, encoding, accept_encoding): Builds the response replaying a snapshot
+- snapshot_to_dict(snapshot): Returns the description of a snapshot sent to clients
+
+Dependencies:
+- Django modules: settings, FileResponse, JsonResponse, timezone
+- Python modules: hashlib, importlib, logging, mmap, os, tempfile
+- Optional modules: pyarrow (arrow), msgpack and zstandard (msgpack)
+- Project modules: report_encoding, report_queries
+- Models: RanReportParameter, ReportSnapshot from the application's models
+"""
+
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
+from django.utils import timezone
+
+from ..models import RanReportParameter, ReportSnapshot
+
+from cs_app.utils.report_encoding import (
+    REPORT_ENCODINGS,
+    encode_arrow,
+    encode_value,
+    encoded_response,
+    to_columns,
+)
+from cs_app.utils.report_queries import connection_identity
+
+import hashlib
+import importlib.util
+import logging
+import mmap
+import os
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_REQUIRED_MODULES = {
+    "arrow": ("pyarrow",),
+    "msgpack": ("msgpack", "zstandard"),
+}
+
+SNAPSHOT_SUFFIXES = {
+    "arrow": ".arrows",
+    "msgpack": ".msgpack.zst",
+}
+
+# Content encoding a stored file is sent with when the client asks for its format
+SNAPSHOT_CONTENT_ENCODINGS = {
+    "arrow": None,
+    "msgpack": "zstd",
+}
+
+DEFAULT_SNAPSHOT_FORMAT = "arrow"
+DEFAULT_MAX_ROWS = 100000
+DEFAULT_ZSTD_LEVEL = 3
+
+
+class SnapshotStore:
+    """
+    Content addressed store of snapshot files in a local directory.
+
+    Files are spread over subdirectories named after the first two characters of
+    their digest. A file is written to a temporary name and renamed in place, so
+    readers never see a partial file.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def path(self, blob_name):
+        """Returns the path of a stored file."""
+
+        return os.path.join(self.root, blob_name[:2], blob_name)
+
+    def put(self, content, suffix):
+        """
+        Stores a file unless a file with the same content is already stored.
+
+        Args:
+            content (bytes): The content of the file.
+            suffix (str): The extension of the file name.
+
+        Returns:
+            str: The name the file is stored under.
+        """
+        blob_name = hashlib.sha256(content).hexdigest() + suffix
+        path = self.path(blob_name)
+
+        if os.path.exists(path):
+            return blob_name
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+
+        try:
+            with os.fdopen(descriptor, "wb") as temp_file:
+                temp_file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        return blob_name
+
+    def open(self, blob_name):
+        """
+        Maps a stored file into memory.
+
+        Returns:
+            mmap.mmap: A read-only map of the file, to be closed by the caller.
+
+        Raises:
+            FileNotFoundError: If the file is not stored.
+        """
+        with open(self.path(blob_name), "rb") as blob_file:
+            return mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def open_file(self, blob_name):
+        """Opens a stored file for reading, for responses sent with sendfile."""
+
+        return open(self.path(blob_name), "rb")
+
+    def exists(self, blob_name):
+        """Returns whether a file is stored."""
+
+        return os.path.exists(self.path(blob_name))
+
+    def delete(self, blob_name):
+        """Deletes a stored file if it exists."""
+
+        try:
+            os.unlink(self.path(blob_name))
+        except FileNotFoundError:
+            pass
+
+
+def snapshot_available(snapshot_format):
+    """
+    Returns whether a snapshot format is known and its libraries are installed.
+
+    Args:
+        snapshot_format (str): "arrow" or "msgpack".
+
+    Returns:
+        bool: True if snapshots can be stored in the format.
+    """
+    if snapshot_format not in SNAPSHOT_REQUIRED_MODULES:
+        return False
+
+    return all(
+        importlib.util.find_spec(module_name) is not None
+        for module_name in SNAPSHOT_REQUIRED_MODULES[snapshot_format]
+    )
+
+
+def get_snapshot_format():
+    """
+    Returns the format new snapshots are stored in.
+
+    REPORT_SNAPSHOT_FORMAT is used when its libraries are installed, and the other
+    format otherwise.
+
+    Returns:
+        str or None: The snapshot format, or None if no format can be stored.
+    """
+    preferred = getattr(settings, "REPORT_SNAPSHOT_FORMAT", DEFAULT_SNAPSHOT_FORMAT)
+
+    for snapshot_format in [preferred] + list(SNAPSHOT_REQUIRED_MODULES):
+        if snapshot_available(snapshot_format):
+            return snapshot_format
+
+    return None
+
+
+def get_snapshot_store():
+    """Returns the blob store under REPORT_SNAPSHOT_DIR."""
+
+    return SnapshotStore(
+        getattr(settings, "REPORT_SNAPSHOT_DIR", os.path.join(settings.BASE_DIR, "report_snapshots"))
+    )
+
+
+def history_parameters(values):
+    """
+    Returns the parameter values a history entry keeps besides its dates.
+
+    Args:
+        values (dict): Parameter values, as bound or as sent in the request.
+
+    Returns:
+        dict: The other parameters mapped to their values as text, so the report
+        can be bound again from them, like the comparison range of a comparison.
+    """
+    return {
+        name: str(value)
+        for name, value in values.items()
+        if name not in ("start_date", "end_date") and value not in (None, "")
+    }
+
+
+def find_history_run(user, alias, time_range, start_date, end_date, report_id="department_hours", parameters=None):
+    """
+    Returns the history entry a report run was logged under.
+
+    Runs are logged once per user, database, time range, dates, report and other
+    parameter values (see log_report_run).
+
+    Returns:
+        RanReportParameter or None: The history entry, or None if the run was not logged.
+    """
+    parameters = parameters or {}
+
+    for run in RanReportParameter.objects.filter(
+        user=user,
+        connection_key=connection_identity(alias),
+        report_type=time_range,
+        start_date=start_date,
+        end_date=end_date,
+        report_id=report_id,
+    ).order_by("pk"):
+        if run.parameters == parameters:
+            return run
+
+    return None
+
+
+def run_matches(run, alias, report_id, values):
+    """
+    Returns whether a report run is the run a history entry was logged for.
+
+    Entries logged before connection identities were kept are matched by the
+    database name they recorded.
+
+    Args:
+        run (RanReportParameter): The history entry.
+        alias (str): The database alias the report runs against.
+        report_id (str): The id of the report in the report registry.
+        values (dict): The parameter values of the report.
+
+    Returns:
+        bool: True if the database, report and other parameter values are the ones
+        of the entry.
+    """
+    if run.report_id != report_id or history_parameters(values) != run.parameters:
+        return False
+
+    if not run.connection_key:
+        return run.database_name == alias.split("_")[0]
+
+    try:
+        return connection_identity(alias) == run.connection_key
+    except KeyError:
+        return False
+
+
+def snapshot_matches_run(snapshot):
+    """Returns whether a snapshot holds the result of the history entry it is kept with."""
+
+    return run_matches(snapshot.run, snapshot.database_alias, snapshot.report_id, snapshot.parameters)
+
+
+def save_snapshot(run, alias, definition, values, rows):
+    """
+    Stores the result of a report run as the snapshot of its history entry.
+
+    A previous snapshot of the entry is replaced. Results of another database,
+    report or parameter values than the entry's are not stored (see run_matches).
+    Failing to store a snapshot never fails the report, so errors are logged and
+    None is returned.
+
+    Args:
+        run (RanReportParameter): The history entry of the run.
+        alias (str): The database alias the report ran against.
+        definition (ReportDefinition): The report that ran.
+        values (dict): Parameter values returned by bind_parameters.
+        rows (list): The rows of the report.
+
+    Returns:
+        ReportSnapshot or None: The snapshot, or None if it was not stored.
+    """
+    snapshot_format = get_snapshot_format()
+
+    if run is None or snapshot_format is None or not run_matches(run, alias, definition.report_id, values):
+        return None
+
+    if len(rows) > getattr(settings, "REPORT_SNAPSHOT_MAX_ROWS", DEFAULT_MAX_ROWS):
+        return None
+
+    try:
+        content = encode_snapshot(rows, definition.columns, snapshot_format)
+        blob_name = get_snapshot_store().put(content, SNAPSHOT_SUFFIXES[snapshot_format])
+    except (OSError, TypeError, ValueError):
+        logger.exception("Error saving report snapshot")
+        return None
+
+    previous_blob = ReportSnapshot.objects.filter(run=run).values_list("blob_name", flat=True).first()
+
+    snapshot, _ = ReportSnapshot.objects.update_or_create(
+        run=run,
+        defaults={
+            "database_alias": alias,
+            "report_id": definition.report_id,
+            "parameters": values,
+            "columns": definition.columns,
+            "row_count": len(rows),
+            "format": snapshot_format,
+            "blob_name": blob_name,
+            "size_bytes": len(content),
+            "created_on": timezone.now(),
+        },
+    )
+
+    if previous_blob and previous_blob != blob_name:
+        release_blob(previous_blob)
+
+    return snapshot
+
+
+def release_blob(blob_name):
+    """Deletes a snapshot file once no snapshot refers to it anymore."""
+
+    if not ReportSnapshot.objects.filter(blob_name=blob_name).exists():
+        get_snapshot_store().delete(blob_name)
+
+
+def encode_snapshot(rows, columns, snapshot_format):
+    """
+    Encodes rows as a compressed snapshot file.
+
+    Args:
+        rows (list): Row dictionaries.
+        columns (list): The row keys stored as columns, in order.
+        snapshot_format (str): "arrow" or "msgpack".
+
+    Returns:
+        bytes: The content of the snapshot file.
+    """
+    if snapshot_format == "arrow":
+        return encode_arrow(rows, columns, None, compression="zstd")
+
+    import msgpack
+    import zstandard
+
+    document = {"columns": columns, "data": to_columns(rows, columns)}
+    packed = msgpack.packb(document, default=encode_value, use_bin_type=True)
+
+    return zstandard.ZstdCompressor(
+        level=getattr(settings, "REPORT_SNAPSHOT_ZSTD_LEVEL", DEFAULT_ZSTD_LEVEL)
+    ).compress(packed)
+
+
+def decode_snapshot(content, snapshot_format):
+    """
+    Decodes a snapshot file.
+
+    Arrow snapshots are read in place from the buffer they are given, and only the
+    compressed column buffers are expanded.
+
+    Args:
+        content (bytes|mmap.mmap): The content of the snapshot file.
+        snapshot_format (str): "arrow" or "msgpack".
+
+    Returns:
+        tuple: The column names and the row dictionaries.
+    """
+    if snapshot_format == "arrow":
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(pa.py_buffer(content)).read_all()
+
+        return table.column_names, table.to_pylist()
+
+    import msgpack
+    import zstandard
+
+    document = msgpack.unpackb(zstandard.ZstdDecompressor().decompress(content), raw=False)
+    columns = document["columns"]
+
+    return columns, [dict(zip(columns, values)) for values in zip(*document["data"])]
+
+
+def read_snapshot(snapshot):
+    """
+    Returns the columns and rows of a snapshot, decoded from its mapped file.
+
+    Raises:
+        FileNotFoundError: If the snapshot file is missing from the store.
+    """
+    with get_snapshot_store().open(snapshot.blob_name) as mapped:
+        return decode_snapshot(mapped, snapshot.format)
+
+
+def snapshot_response(snapshot, encoding, accept_encoding=""):
+    """
+    Builds the response replaying a snapshot.
+
+    When the client asks for the encoding the snapshot is stored in, the stored file
+    is sent unchanged. Otherwise the rows are decoded and encoded like a live report,
+    with a "snapshot" member describing the snapshot.
+
+    Args:
+        snapshot (ReportSnapshot): The snapshot to replay.
+        encoding (str): An encoding returned by negotiate_encoding.
+        accept_encoding (str): The Accept-Encoding header of the request.
+
+    Returns:
+        HttpResponse: The response holding the snapshot.
+
+    Raises:
+        FileNotFoundError: If the snapshot file is missing from the store.
+    """
+    content_encoding = SNAPSHOT_CONTENT_ENCODINGS[snapshot.format]
+
+    if encoding == snapshot.format and (
+        content_encoding is None or content_encoding in (accept_encoding or "").lower()
+    ):
+        response = FileResponse(
+            get_snapshot_store().open_file(snapshot.blob_name),
+            content_type=REPORT_ENCODINGS[encoding],
+        )
+
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+    else:
+        columns, rows = read_snapshot(snapshot)
+        extra = {"snapshot": snapshot_to_dict(snapshot)}
+
+        if encoding != "json":
+            response = encoded_response(rows, columns, encoding, extra)
+        else:
+            response = JsonResponse(dict(extra, data=rows))
+
+    response["Vary"] = "Accept, Accept-Encoding"
+    response["X-Report-Snapshot"] = snapshot.created_on.isoformat()
+
+    return response
+
+
+def snapshot_to_dict(snapshot):
+    """Returns the description of a snapshot sent to clients."""
+
+    return {
+        "run_id": snapshot.run_id,
+        "database": snapshot.database_alias,
+        "report_id": snapshot.report_id,
+        "row_count": snapshot.row_count,
+        "format": snapshot.format,
+        "size_bytes": snapshot.size_bytes,
+        "created_on": snapshot.created_on.isoformat(),
+    }
@@ -0,0 +1,133 @@
+"""
+Python functions that encode report row batches for streaming responses.
+
+This module contains generators that turn batches of report rows into chunks of a
+StreamingHttpResponse. Each batch is encoded and sent as soon as it arrives, so the
+memory used stays the same no matter how many rows the report returns.
+
+The status of a streamed response is sent before its rows, so a report that fails
+after the stream started still returns 200. The stream then ends with an error
+instead: an "error" member after the rows of a JSON document, or a last
+{"error": ...} line in NDJSON, which clients check before using the rows.
+
+Functions:
+- stream_ndjson(batches): Yields one JSON document per row, separated by newlines
+- stream_json_array(batches): Yields a {"data": [...]} document one batch at a time
+- streaming_response(batches, stream_format): Builds the StreamingHttpResponse for a format
+- stream_error(error): Returns the message a stream ends with when its report fails
+
+Dependencies:
+- Django modules: StreamingHttpResponse, DjangoJSONEncoder
+- Python modules: json, logging
+- Project modules: report_inflight
+"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from cs_app.utils.report_inflight import ReportCancelled, ReportTimedOut
+
+import json
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+STREAM_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def stream_ndjson(batches):
+    """
+    Yields newline delimited JSON, one row per line.
+
+    Args:
+        batches (iterable): Batches of row dictionaries.
+
+    Yields:
+        str: The encoded rows of one batch, then an {"error": ...} line if the
+        report failed.
+    """
+    try:
+        for rows in batches:
+            yield "".join(json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows)
+    except Exception as e:
+        yield json.dumps({"error": stream_error(e)}) + "\n"
+
+
+def stream_json_array(batches):
+    """
+    Yields a {"data": [...]} JSON document in chunks.
+
+    The document is the same one load_table returns without streaming, so existing
+    clients can read it unchanged. If the report fails, the document ends with an
+    "error" member after the rows sent so far.
+
+    Args:
+        batches (iterable): Batches of row dictionaries.
+
+    Yields:
+        str: Parts of the JSON document.
+    """
+    yield '{"data": ['
+
+    first = True
+    try:
+        for rows in batches:
+            if not rows:
+                continue
+
+            chunk = ", ".join(json.dumps(row, cls=DjangoJSONEncoder) for row in rows)
+            yield chunk if first else ", " + chunk
+            first = False
+    except Exception as e:
+        yield "], " + json.dumps({"error": stream_error(e)})[1:]
+        return
+
+    yield "]}"
+
+
+def streaming_response(batches, stream_format):
+    """
+    Builds a streaming response for a stream format.
+
+    Args:
+        batches (iterable): Batches of row dictionaries.
+        stream_format (str): Either "ndjson" or "json".
+
+    Returns:
+        StreamingHttpResponse: The response streaming the encoded rows.
+    """
+    if stream_format == "ndjson":
+        content = stream_ndjson(batches)
+    else:
+        content = stream_json_array(batches)
+
+    return StreamingHttpResponse(content, content_type=STREAM_CONTENT_TYPES[stream_format])
+
+
+def stream_error(error):
+    """
+    Returns the message a stream ends with when its report fails.
+
+    Must be called while handling the error, so unexpected errors are logged with
+    their traceback.
+
+    Args:
+        error (Exception): The error raised while producing the rows.
+
+    Returns:
+        str: The error message sent to the client.
+    """
+    if isinstance(error, ReportCancelled):
+        return "Report cancelled"
+
+    if isinstance(error, ReportTimedOut):
+        return "Report timed out"
+
+    logger.exception("Error streaming report")
+
+    return "Report failed"
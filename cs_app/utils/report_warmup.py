@@ -0,0 +1,435 @@
+"""
+Warm-up of report results ahead of business hours.
+
+This module mines the report history kept in RanReportParameter for the parameter
+sets users run most often and most recently, and computes their results ahead of
+time so the first report of the morning is answered from a warm result.
+
+History rows are scored per database and time range. Every run counts for
+0.5 ** (age / REPORT_WARMUP_HALF_LIFE_DAYS), so frequent and recent runs rank first,
+and the REPORT_WARMUP_MAX_SETS best sets of each database are warmed. Preset time
+ranges ("YTD", "Last Year", "All Time") are recomputed for the day of the warm-up,
+like the report page does, while custom ranges keep their stored dates. The history
+only records the department hours report, so that is the report being warmed.
+Databases are matched by the connection identity kept with each run, so a set is
+warmed under every configured alias pointing to the database it ran on.
+
+Results are stored in the report cache for REPORT_WARMUP_TTL seconds. Warm-ups are
+scheduled in process with REPORT_WARMUP_TIMES. Every worker process runs a
+scheduler, but each scheduled run is first claimed in the flight table of the
+default database, so only one process runs it. The report cache lives in each
+process, so with REPORT_COALESCE_CROSS_PROCESS results are also published through
+that table, where every worker reads them (see report_coalesce); without it only
+the process that ran the warm-up is warm. The warm_report_cache management command
+runs the same warm-up on demand.
+
+At most REPORT_WARMUP_ALIAS_CONCURRENCY reports run at the same time against one
+database, or the limit of the alias in REPORT_WARMUP_ALIAS_CONCURRENCIES.
+
+Classes:
+- WarmupSet: A parameter set chosen for warm-up
+- WarmupScheduler: Background thread running the warm-up at the configured times
+
+Functions:
+- preset_range(time_range, today): Returns the dates of a preset time range on a day
+- aliases_for_connection(connection_key): Returns the configured aliases of a connection identity
+- mine_warmup_sets(aliases, limit, today): Picks the parameter sets to warm from the report history
+- warm_sets(sets, ttl_seconds, concurrency): Computes the results of the sets, bounded per alias
+- warm_report(alias, definition, values, ttl_seconds): Computes one report and stores it as warm
+- run_warmup(aliases, limit): Mines the history and warms the chosen sets
+- claim_warmup(run_on): Claims a scheduled warm-up for this process
+- start_scheduler(**kwargs): Starts the warm-up scheduler of the process once
+
+Module Variables:
+- warmup_scheduler: The scheduler of the process
+
+Dependencies:
+- Django modules: settings, request_started, close_old_connections, timezone
+- Python modules: concurrent.futures, datetime, hashlib, logging, threading, time
+- Project modules: report_cache, report_coalesce, report_functions, report_queries, report_registry
+- Model: RanReportParameter from the application's models
+"""
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.utils import timezone
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from ..models import RanReportParameter
+
+from cs_app.utils.report_cache import report_cache, make_cache_key
+from cs_app.utils.report_coalesce import acquire_flight, cross_process_enabled, report_flights, share_result
+from cs_app.utils.report_queries import connection_identity
+
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_registry as registry
+import hashlib
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_SETS = 10
+DEFAULT_HISTORY_DAYS = 30
+DEFAULT_HALF_LIFE_DAYS = 7
+DEFAULT_ALIAS_CONCURRENCY = 2
+DEFAULT_TTL_SECONDS = 4 * 3600
+
+# The report recorded by the report history
+WARMUP_REPORT_ID = "department_hours"
+
+# Receiver id of start_scheduler on request_started
+SCHEDULER_DISPATCH_UID = "cs_app_report_warmup_scheduler"
+
+# Seconds the claim of a scheduled warm-up is kept, longer than any process is late
+CLAIM_TTL_SECONDS = 12 * 3600
+
+# Time ranges of the report page that are relative to the day they are run on
+PRESET_RANGES = ("YTD", "Last Year", "All Time")
+
+
+class WarmupSet:
+    """
+    A parameter set chosen for warm-up.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        time_range (str): The time range label of the report history.
+        start_date (date): The first day of the report.
+        end_date (date): The last day of the report.
+        score (float): The frequency and recency score of the set.
+    """
+
+    def __init__(self, alias, time_range, start_date, end_date, score):
+        self.alias = alias
+        self.time_range = time_range
+        self.start_date = start_date
+        self.end_date = end_date
+        self.score = score
+
+    def __repr__(self):
+        return f"WarmupSet({self.alias!r}, {self.time_range!r}, {self.start_date}, {self.end_date})"
+
+
+def preset_range(time_range, today):
+    """
+    Returns the dates of a preset time range on a day, as the report page computes them.
+
+    Args:
+        time_range (str): "YTD", "Last Year" or "All Time".
+        today (date): The day the report is run on.
+
+    Returns:
+        tuple: The first and last day, or None if the time range is not a preset.
+    """
+    if time_range == "YTD":
+        return date(today.year, 1, 1), today
+
+    if time_range == "Last Year":
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+
+    if time_range == "All Time":
+        return date(1000, 1, 1), today
+
+    return None
+
+
+def aliases_for_connection(connection_key):
+    """
+    Returns the configured aliases of a connection identity recorded in the report history.
+
+    Args:
+        connection_key (str): The connection_identity kept with a history entry.
+
+    Returns:
+        list: The aliases, other than default, pointing to that database.
+    """
+    return [
+        alias
+        for alias in list(settings.DATABASES)
+        if alias != "default" and connection_identity(alias) == connection_key
+    ]
+
+
+def mine_warmup_sets(aliases=None, limit=None, today=None):
+    """
+    Picks the parameter sets to warm from the report history.
+
+    Args:
+        aliases (list): Optional aliases to warm. Defaults to every configured alias.
+        limit (int): The number of sets kept per alias. Defaults to REPORT_WARMUP_MAX_SETS.
+        today (date): The day the reports are warmed for. Defaults to today.
+
+    Returns:
+        list: WarmupSet objects, best first within each alias.
+    """
+    today = today or timezone.localdate()
+    limit = limit or getattr(settings, "REPORT_WARMUP_MAX_SETS", DEFAULT_MAX_SETS)
+    half_life = getattr(settings, "REPORT_WARMUP_HALF_LIFE_DAYS", DEFAULT_HALF_LIFE_DAYS)
+    since = today - timedelta(days=getattr(settings, "REPORT_WARMUP_HISTORY_DAYS", DEFAULT_HISTORY_DAYS))
+
+    # Only runs of the warmed report with no other parameters can be warmed, and
+    # entries logged before connection identities were kept cannot be matched
+    history = RanReportParameter.objects.filter(
+        ran_on_date__gte=since, report_id=WARMUP_REPORT_ID, parameters={}
+    ).exclude(connection_key="").values_list(
+        "connection_key", "report_type", "start_date", "end_date", "ran_on_date"
+    )
+
+    scores = {}
+    for connection_key, time_range, start_date, end_date, ran_on_date in history:
+        dates = preset_range(time_range, today) or (start_date, end_date)
+        weight = 0.5 ** (max((today - ran_on_date).days, 0) / half_life)
+        key = (connection_key, time_range if time_range in PRESET_RANGES else "Custom") + dates
+        scores[key] = scores.get(key, 0.0) + weight
+
+    sets_by_alias = {}
+    for (connection_key, time_range, start_date, end_date), score in scores.items():
+        for alias in aliases_for_connection(connection_key):
+            if aliases is None or alias in aliases:
+                sets_by_alias.setdefault(alias, []).append(
+                    WarmupSet(alias, time_range, start_date, end_date, score)
+                )
+
+    warmup_sets = []
+    for alias_sets in sets_by_alias.values():
+        alias_sets.sort(key=lambda warmup_set: warmup_set.score, reverse=True)
+        warmup_sets.extend(alias_sets[:limit])
+
+    return warmup_sets
+
+
+def get_alias_concurrency(alias):
+    """Returns the number of reports warmed at the same time against an alias."""
+
+    limits = getattr(settings, "REPORT_WARMUP_ALIAS_CONCURRENCIES", {})
+
+    return max(1, limits.get(alias, getattr(settings, "REPORT_WARMUP_ALIAS_CONCURRENCY", DEFAULT_ALIAS_CONCURRENCY)))
+
+
+def warm_sets(sets, ttl_seconds=None, concurrency=None):
+    """
+    Computes the results of parameter sets, bounded per alias.
+
+    Every alias gets a semaphore of its concurrency limit, so a database with many
+    sets never takes all the workers and no database runs more reports at once than allowed.
+
+    Args:
+        sets (list): WarmupSet objects returned by mine_warmup_sets.
+        ttl_seconds (int|float): Number of seconds results stay warm. Defaults to REPORT_WARMUP_TTL.
+        concurrency (int): Reports run at the same time against every alias, instead
+            of the configured limit of each alias.
+
+    Returns:
+        list: One dictionary per set with its alias, time range, dates, row count,
+        duration in seconds and error, in the order of the sets.
+    """
+    if not sets:
+        return []
+
+    ttl_seconds = ttl_seconds or getattr(settings, "REPORT_WARMUP_TTL", DEFAULT_TTL_SECONDS)
+    definition = registry.get_report(WARMUP_REPORT_ID, include_internal=True)
+    limits = {
+        warmup_set.alias: max(1, concurrency or get_alias_concurrency(warmup_set.alias)) for warmup_set in sets
+    }
+    semaphores = {alias: threading.BoundedSemaphore(limit) for alias, limit in limits.items()}
+
+    def warm(warmup_set):
+        result = {
+            "alias": warmup_set.alias,
+            "time_range": warmup_set.time_range,
+            "start_date": warmup_set.start_date,
+            "end_date": warmup_set.end_date,
+            "rows": None,
+            "seconds": None,
+            "error": None,
+        }
+
+        with semaphores[warmup_set.alias]:
+            close_old_connections()
+            started = time.perf_counter()
+
+            try:
+                values = registry.bind_parameters(
+                    definition,
+                    {"start_date": warmup_set.start_date, "end_date": warmup_set.end_date},
+                )
+                result["rows"] = len(warm_report(warmup_set.alias, definition, values, ttl_seconds))
+            except Exception as e:
+                result["error"] = str(e)
+            finally:
+                result["seconds"] = round(time.perf_counter() - started, 3)
+                close_old_connections()
+
+        return result
+
+    with ThreadPoolExecutor(max_workers=sum(limits.values())) as executor:
+        return list(executor.map(warm, sets))
+
+
+def warm_report(alias, definition, values, ttl_seconds):
+    """
+    Computes one report and stores its result as warm.
+
+    The result replaces any cached one, so a warm-up always refreshes. Identical
+    reports requested meanwhile wait for it instead of running their own.
+
+    Args:
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The report being warmed.
+        values (dict): Parameter values returned by bind_parameters.
+        ttl_seconds (int|float): Number of seconds the result stays warm.
+
+    Returns:
+        list: The rows of the report.
+    """
+    cache_key = make_cache_key(alias, definition.report_id, values)
+
+    data = report_flights.do(cache_key, lambda: rf.compute_report_data(alias, definition, values))
+    report_cache.set(cache_key, data, ttl_seconds)
+
+    if cross_process_enabled():
+        share_result(cache_key, data, ttl_seconds)
+
+    return data
+
+
+def run_warmup(aliases=None, limit=None):
+    """
+    Mines the report history and warms the chosen parameter sets.
+
+    Args:
+        aliases (list): Optional aliases to warm. Defaults to every configured alias.
+        limit (int): The number of sets warmed per alias.
+
+    Returns:
+        list: The results returned by warm_sets.
+    """
+    return warm_sets(mine_warmup_sets(aliases, limit))
+
+
+def claim_warmup(run_on):
+    """
+    Claims a scheduled warm-up for this process.
+
+    Every worker process schedules the same times, and only the first one to insert
+    the flight row of a time runs it.
+
+    Args:
+        run_on (datetime): The scheduled time of the warm-up.
+
+    Returns:
+        bool: Whether this process runs the warm-up.
+    """
+    digest = hashlib.sha256(f"report_warmup:{run_on.isoformat()}".encode("utf-8")).hexdigest()
+
+    return acquire_flight(digest, ttl_seconds=CLAIM_TTL_SECONDS)
+
+
+class WarmupScheduler:
+    """
+    Background thread running the warm-up every day at the times of REPORT_WARMUP_TIMES.
+
+    Times are "HH:MM" in the time zone of the project. A time is only run by the
+    process that claims it (see claim_warmup).
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_run = None
+        self.last_results = []
+
+    def start(self):
+        """Starts the scheduler thread if warm-up times are configured and it is not running."""
+
+        with self._lock:
+            if not getattr(settings, "REPORT_WARMUP_TIMES", []):
+                return False
+
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self.run, name="report-warmup", daemon=True)
+                self._thread.start()
+
+            return True
+
+    def stop(self):
+        """Asks the scheduler thread to stop."""
+
+        self._stop.set()
+
+    def next_run(self, now):
+        """
+        Returns the next configured time after now.
+
+        Args:
+            now (datetime): An aware datetime.
+
+        Returns:
+            datetime: The next warm-up time.
+        """
+        now = timezone.localtime(now)
+        candidates = []
+
+        for value in getattr(settings, "REPORT_WARMUP_TIMES", []):
+            hour, minute = (int(part) for part in value.split(":"))
+
+            for days in (0, 1):
+                run_on = (now + timedelta(days=days)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+                if run_on > now:
+                    candidates.append(run_on)
+                    break
+
+        return min(candidates)
+
+    def run(self):
+        """Sleeps until each configured time and runs the warm-up, until stopped."""
+
+        while not self._stop.is_set():
+            run_on = self.next_run(timezone.now())
+
+            if self._stop.wait(max((run_on - timezone.now()).total_seconds(), 0)):
+                break
+
+            try:
+                if claim_warmup(run_on):
+                    self.last_results = run_warmup()
+                    self.last_run = timezone.now()
+            except Exception:
+                logger.exception("Error warming report cache")
+            finally:
+                close_old_connections()
+
+    def stats(self):
+        """Returns when the warm-up last ran and how many sets it warmed and failed."""
+
+        return {
+            "scheduled": bool(self._thread and self._thread.is_alive()),
+            "last_run": self.last_run,
+            "warmed": sum(1 for result in self.last_results if result["error"] is None),
+            "failed": sum(1 for result in self.last_results if result["error"] is not None),
+        }
+
+
+def start_scheduler(**kwargs):
+    """
+    Starts the warm-up scheduler of the process, connected to request_started.
+
+    Starting on the first request keeps management commands like migrate from
+    running warm-ups, and only serving processes keep a warm cache. The receiver
+    disconnects itself once the scheduler runs.
+    """
+    if warmup_scheduler.start():
+        request_started.disconnect(start_scheduler, dispatch_uid=SCHEDULER_DISPATCH_UID)
+
+
+warmup_scheduler = WarmupScheduler()
@@ -10,6 +10,9 @@ from .generate_report_views import *
 # Import all report history-related views
 from .report_history_views import *
 
+# Import all report cube-related views
+from .report_cube_views import *
+
 # Import all directions-related views
 from .directions_views import *
 
@@ -12,14 +12,16 @@ Functions:
 - switch_database_view(request): Handles POST request to switch database configurations dynamically.
 - test_database_connection(db_config): Creates connection to ensure proper config.
 - save_database_into_history(req_user, db_engine, db_name, db_host, db_driver, db_port): Saves database information into history
-- remove_config(alias): Removes a config from settings
+- remove_config(alias): Removes a config from settings and its cached reports
 - remove_conn(alias): Removes a connection from the list of connections
+- register_saved_connections(): Configures the databases of the connection history outside a web process
 - generate_unique_alias(base_alias): Generates a unique alias to ensure no duplicate aliases
 - validate_db_fields(db_engine, db_name, db_host, db_driver, db_port): validates input fields
 - construct_config(db_engine, db_name, db_host, db_driver, db_user, db_pass, db_port): contructs database config from parameters
 
 Dependencies:
 - Django modules: render, JsonResponse, settings, connections, ImproperlyConfigured
+- Project modules: common_functions, report_cache, report_queries, report_segments
 - External modules: pyodbc (for database connectivity)
 """
 
@@ -31,6 +33,10 @@ from django.http import JsonResponse
 
 from ..models import DatabaseConnection
 
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_queries import connection_identity
+from cs_app.utils.report_segments import segment_store
+
 import cs_app.utils.common_functions as cf
 import json
 import pyodbc
@@ -283,6 +289,10 @@ def remove_config(alias):
     """
     Helper function to remove database configuration from Django settings.
 
+    Also drops any cached report results and report segments for the alias, so a
+    later database registered under the same alias never sees them. The local rollup
+    and cube are kept, since they belong to the database and not to the alias.
+
     Args:
         alias (str): The alias of the database configuration to be removed.
     """
@@ -290,6 +300,9 @@ def remove_config(alias):
     if alias in settings.DATABASES:
         del settings.DATABASES[alias]
 
+    report_cache.invalidate_alias(alias)
+    segment_store.invalidate_alias(alias)
+
 
 def remove_conn(alias):
     """
@@ -309,6 +322,44 @@ def remove_conn(alias):
             connections.__delitem__(alias)
 
 
+def register_saved_connections():
+    """
+    Helper function to configure the databases of the connection history.
+
+    Databases added with switch_database_view only exist in the web process that
+    added them. Management commands call this to reach them too. Credentials are
+    never saved, so the configs use a trusted connection on SQL Server and the
+    server's own authentication (for example a .pgpass file) on PostgreSQL.
+    Databases already configured under another alias are skipped.
+
+    Returns:
+        list: The aliases added.
+    """
+    identities = {connection_identity(alias) for alias in settings.DATABASES}
+    aliases = []
+
+    for saved in DatabaseConnection.objects.order_by("pk"):
+        try:
+            config = construct_config(
+                saved.engine, saved.name, saved.host, saved.driver, None, None, saved.port
+            )
+        except ValueError:
+            continue
+
+        alias = generate_unique_alias(saved.name)
+        settings.DATABASES[alias] = config
+        identity = connection_identity(alias)
+
+        if identity in identities:
+            del settings.DATABASES[alias]
+            continue
+
+        identities.add(identity)
+        aliases.append(alias)
+
+    return aliases
+
+
 def generate_unique_alias(base_alias):
     """
     Helper function to generate a unique database configuration alias.
@@ -6,6 +6,10 @@ and loading data into tables. These views require users to be logged in, enforce
 @login_required decorator. The functions handle HTTP requests to render HTML templates 
 and respond with JSON data for AJAX requests.
 
+Views running reports are excluded from ATOMIC_REQUESTS, so the history entry is
+committed at once and the request does not hold a transaction of the default
+database open while the remote query runs.
+
 Functions:
 - generate_report_view(request): Renders the 'generate_report.html' template with the
   latest 25 entries from PastParameter and the current user's information.
@@ -14,24 +18,86 @@ Functions:
   and time_range parameters. Logs parameters in PastParameter, executes a SQL query to
   calculate department-wise total hours, and returns JSON response with the data.
 
+- load_multi_database_table_view(request): Runs one report against several databases at the
+  same time and returns the merged rows, or streams each database's rows as it finishes.
+
+- load_batch_table_view(request): Runs several report parameter sets in one request, grouping
+  their queries, and returns the result and status of each set.
+
+- export_table_view(request): Streams the report as a CSV, XLSX or Parquet file.
+
+- report_job_status_view(request, job_id): Returns the status and result of a queued report job.
+
+- cancel_report_job_view(request, job_id): Cancels a queued or running report job.
+
+- cancel_report_view(request): Cancels a running report and its query by request id.
+
+- report_statistics_view(request): Returns report cache, segment, coalescing, warm-up, columnar and
+  interval index counters and per-statement execution counts and timings to staff users.
+
+- explain_report_response(request, alias, definition, values, mode, timer, request_id, time_range):
+  Runs a report in explain mode and returns its rows, plan and stage timings.
+
+- bind_report_request(data): Finds the requested report and binds its parameters.
+
+- bind_report_values(data): Finds a report and binds its parameters, returning an error message.
+
+- get_report_partition(data, definition): Returns the slice unit a report request is split by.
+
+- get_request_id(data): Returns the id a report request is tracked under.
+
+- log_report_run(user, alias, time_range, start_date, end_date, report_id, parameters): Logs
+  a report run in the user's report history and returns its entry.
+
+- log_report_runs(user, alias, entries): Logs several report runs in the user's report history at once.
+
+- get_snapshot_run_id(user, run_id): Checks that a report history entry can be replayed.
+
 Dependencies:
-- Django modules: render, JsonResponse, connections
-- Python modules: datetime
-- Model: PastParameter from the application's models
+- Django modules: render, get_object_or_404, DjangoJSONEncoder, HttpResponse, JsonResponse, StreamingHttpResponse, transaction
+- Python modules: datetime, uuid
+- Project modules: report_batch, report_cache, report_coalesce, report_columnar, report_encoding, report_explain, report_export, report_fanout, report_functions, report_inflight, report_intervals,
+  report_jobs, report_paging, report_partition, report_queries, report_registry, report_segments, report_slowlog,
+  report_snapshots, report_streaming, report_warmup
+- Models: RanReportParameter, ReportJob, ReportSnapshot from the application's models
 
 """
 
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.shortcuts import render
-from django.db import connections
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404
 from django.conf import settings
+from django.db import transaction
 
 from datetime import datetime
 
-from ..models import RanReportParameter
+from ..models import RanReportParameter, ReportJob, ReportSnapshot
+
+from cs_app.utils.report_cache import report_cache
+from cs_app.utils.report_coalesce import report_flights
+from cs_app.utils.report_columnar import columnar_engine
+from cs_app.utils.report_encoding import negotiate_encoding, encoded_response
+from cs_app.utils.report_explain import StageTimer, parse_explain_mode
+from cs_app.utils.report_fanout import iter_fanout_results, merge_fanout_results
+from cs_app.utils.report_intervals import interval_indexes
+from cs_app.utils.report_partition import PARTITION_UNITS
+from cs_app.utils.report_queries import connection_identity, get_statement_stats
+from cs_app.utils.report_segments import segment_store
+from cs_app.utils.report_slowlog import iter_recorded, record_report_run
+from cs_app.utils.report_streaming import STREAM_CONTENT_TYPES, streaming_response
+from cs_app.utils.report_warmup import warmup_scheduler
 
+import cs_app.utils.report_batch as report_batch
+import cs_app.utils.report_export as report_export
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_inflight as report_inflight
+import cs_app.utils.report_jobs as report_jobs
+import cs_app.utils.report_paging as report_paging
+import cs_app.utils.report_registry as registry
+import cs_app.utils.report_snapshots as report_snapshots
 import json
+import uuid
 
 
 @login_required
@@ -44,6 +110,9 @@ def generate_report_view(request):
     Prepares the data along with the current user's information, and renders
     the 'generate_report.html' template with the context.
 
+    When opened from a report history entry that kept a snapshot of its result, the
+    page replays the snapshot instead of running the report again.
+
     Args:
         request (HttpRequest): The HTTP request object.
 
@@ -58,6 +127,7 @@ def generate_report_view(request):
     end_date = None
     report_type = None
     history_database_name = None
+    snapshot_run_id = None
 
     additional_info = request.GET.get("additionalInfo", None)
 
@@ -69,6 +139,7 @@ def generate_report_view(request):
             end_date = format_date(decoded_info.get("end_date", None))
             report_type = decoded_info.get("report_type", None)
             history_database_name = decoded_info.get("database_name", None)
+            snapshot_run_id = get_snapshot_run_id(user, decoded_info.get("run_id", None))
         except (ValueError, TypeError) as e:
             print(f"Error decoding additional_info: {e}")
 
@@ -80,12 +151,14 @@ def generate_report_view(request):
         "report_type": report_type,
         "history_database_name": history_database_name,
         "current_database_name": request.user.active_database_alias,
+        "snapshot_run_id": snapshot_run_id,
     }
 
     return render(request, "subpages/generate_report.html", context)
 
 
 @login_required
+@transaction.non_atomic_requests
 def load_table_view(request):
     """
     View function to handle AJAX POST requests for loading data into a table.
@@ -93,10 +166,52 @@ def load_table_view(request):
     Requires the user to be logged in to access the view.
 
     Processes POST requests containing parameters like start_date, end_date, and time_range.
+    The report is chosen with "report_id" (department hours by default) from the report
+    registry, and its parameters are validated before anything runs.
     Stores relevant parameters in the PastParameter model for logging purposes.
     Executes a SQL query to retrieve department-wise total hours based on given date filters.
+    Results are shared through the report cache between users of the same database.
     Returns JSON response with department names and corresponding total hours.
 
+    When the request sets "async", a report job is queued instead and its id is returned
+    with status 202. The result is then polled with report_job_status_view.
+
+    When the request sets "stream" to "ndjson" or "json", rows are read in batches with
+    fetchmany and streamed as newline delimited JSON or as a chunked {"data": [...]}
+    document, so memory use does not grow with the size of the result.
+
+    The Accept header selects the encoding of the result: the row oriented JSON by
+    default, or columnar JSON, MessagePack or Arrow IPC (see report_encoding).
+
+    When the request sets "partition" to "month", "quarter" or "year", the date range
+    is split into slices queried in parallel and merged, which shortens long ranges.
+
+    When the request sets "order_by", "limit", "offset", "cursor" or "top", only one
+    sorted page of the result is returned, with a "page" member holding the cursor of
+    the next page. Sorting and the page limits are pushed down into the report query.
+
+    When the request sets "preview" and the report supports it, an approximate result
+    from a sampled scan is returned first, marked with "approximate" and error margins.
+    The exact result then follows as a second document when streamed as ndjson.
+    Returned whole, the exact result is computed by a queued report job whose status
+    is returned under "job", but only when REPORT_JOB_WORKER says a run_report_jobs
+    worker is running and the database can be reached without stored credentials.
+
+    The report is tracked under the optional "request_id" of the request, so it can be
+    cancelled with cancel_report_view. A new report of the same user cancels the one
+    still running, and every query runs under the statement timeout of the alias.
+
+    When a staff user sets "explain" to "estimated" or "actual" (or true), the report
+    runs live and the JSON response has an "explain" member with the engine's query
+    plan and the time taken by each stage: history logging, connection, execute,
+    fetch and serialize (see report_explain).
+
+    Runs that take longer than REPORT_SLOW_QUERY_THRESHOLD_MS are kept in the slow
+    query log with their stage timings (see report_slowlog).
+
+    Whole results returned directly are kept as a compressed snapshot of the run's
+    history entry, which the report history replays (see report_snapshots).
+
     Args:
         request (HttpRequest): The HTTP request object containing POST data.
 
@@ -108,66 +223,831 @@ def load_table_view(request):
         start_date = data.get("start_date")
         end_date = data.get("end_date")
         time_range = data.get("time_range")
-        current_date = datetime.now().date()
         active_database_alias = request.user.active_database_alias
 
         # Check to ensure an active database is being used
         if not any(active_database_alias in key for key in settings.DATABASES):
             return JsonResponse({"error": "No connections with database name active"}, status=400) 
 
-        existing_report = RanReportParameter.objects.filter(
-            user=request.user,
-            report_type=time_range,
-            start_date=start_date,
-            end_date=end_date,
-        ).exists()
-
-        if not existing_report:
-            RanReportParameter.objects.create(
-                user=request.user,
-                report_type=time_range,
-                ran_on_date=current_date,
-                start_date=start_date,
-                end_date=end_date,
-                database_name=active_database_alias.split("_")[0] if active_database_alias else "unrecognized name format",
+        definition, values, error_response = bind_report_request(data)
+        if error_response:
+            return error_response
+
+        partition, error_response = get_report_partition(data, definition)
+        if error_response:
+            return error_response
+
+        try:
+            page = report_paging.parse_page(definition, data)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        if page and (data.get("async") or data.get("stream")):
+            return JsonResponse({"error": "Pages cannot be queued or streamed"}, status=400)
+
+        preview = bool(data.get("preview")) and definition.samplable
+
+        if preview and (page or data.get("async") or data.get("stream") not in (None, "", "ndjson")):
+            return JsonResponse({"error": "Previews are only returned whole or as ndjson"}, status=400)
+
+        try:
+            explain = parse_explain_mode(data.get("explain"))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        if explain and not request.user.is_staff:
+            return JsonResponse({"error": "Staff access required"}, status=403)
+
+        if explain and (page or preview or partition or data.get("async") or data.get("stream")):
+            return JsonResponse({"error": "Explain runs the whole report as one query"}, status=400)
+
+        encoding = negotiate_encoding(request.headers.get("Accept"))
+        if encoding is None:
+            return JsonResponse({"error": "Requested encoding unavailable"}, status=406)
+
+        request_id = get_request_id(data)
+        timer = StageTimer()
+
+        with timer.stage("history"):
+            history_run = log_report_run(
+                request.user, active_database_alias, time_range, start_date, end_date,
+                definition.report_id, report_snapshots.history_parameters(values),
             )
 
-        conn = connections[active_database_alias]
+        # Staff can see the plan of a slow report and where its time went
+        if explain:
+            return explain_report_response(
+                request, active_database_alias, definition, values, explain, timer, request_id, time_range
+            )
 
-        cursor = conn.cursor()
+        # Long reports can be queued and polled instead of holding this worker
+        if data.get("async"):
+            try:
+                job = report_jobs.create_job(
+                    request.user,
+                    active_database_alias,
+                    definition.report_id,
+                    time_range,
+                    {parameter.name: data.get(parameter.name) for parameter in definition.parameters},
+                )
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
 
-        where_clause = ""
+            return JsonResponse(report_jobs.job_to_dict(job), status=202)
 
-        if start_date and end_date:
-            where_clause = f"WHERE StartDate BETWEEN '{start_date}' AND '{end_date}'"
+        # Large results can be streamed as rows arrive instead of built in memory
+        stream_format = data.get("stream")
+        if stream_format:
+            if stream_format not in STREAM_CONTENT_TYPES:
+                return JsonResponse({"error": "Invalid stream format"}, status=400)
 
-        query = f"""SELECT Department.Name, COUNT(Department.Name) * 8.0 AS 'TotalHours'
-                   FROM HumanResources.EmployeeDepartmentHistory
-                   JOIN HumanResources.Department ON EmployeeDepartmentHistory.DepartmentID = Department.DepartmentID
-                   JOIN HumanResources.Shift ON EmployeeDepartmentHistory.ShiftID = Shift.ShiftID
-                   {where_clause}
-                   GROUP BY Department.Name;
-                   """
+            # A streamed preview sends the estimate and then the exact result as documents
+            if preview:
+                return streaming_response(
+                    report_inflight.iter_tracked(
+                        rf.iter_report_phases(active_database_alias, definition, values, partition),
+                        request_id,
+                        request.user.id,
+                        supersede=True,
+                    ),
+                    stream_format,
+                )
 
-        cursor.execute(query)
+            batches = rf.iter_report_data(
+                active_database_alias,
+                definition,
+                values,
+                getattr(settings, "REPORT_STREAM_BATCH_SIZE", 500),
+                partition,
+            )
+            batches = report_inflight.iter_tracked(batches, request_id, request.user.id, supersede=True)
+
+            return streaming_response(
+                iter_recorded(
+                    batches,
+                    timer,
+                    lambda row_count: record_report_run(
+                        request.user, active_database_alias, definition.report_id, time_range,
+                        values, row_count, timer,
+                    ),
+                ),
+                stream_format,
+            )
 
-        rows = cursor.fetchall()
+        # Identical reports on the same database are served from the report cache.
+        # A newer report of the same user cancels this one while its query runs.
+        page_info = None
 
-        # Prepare data for JsonResponse
-        data = []
-        for row in rows:
-            department_name, total_hours = row
-            data.append(
-                {"department_name": department_name, "total_hours": total_hours}
+        try:
+            with timer.stage("query"), report_inflight.track_report(
+                request_id, request.user.id, supersede=True
+            ):
+                if preview:
+                    document = rf.get_report_estimate(active_database_alias, definition, values)
+                elif page:
+                    data, page_info = rf.get_report_page(active_database_alias, definition, values, page)
+                else:
+                    data = rf.get_report_data(active_database_alias, definition, values, partition)
+        except report_inflight.ReportCancelled:
+            return JsonResponse({"error": "Report cancelled"}, status=409)
+        except report_inflight.ReportTimedOut:
+            return JsonResponse({"error": "Report timed out"}, status=504)
+
+        # The exact result of a preview is computed by a report job the client polls,
+        # when a worker runs them. Otherwise clients stream the preview to get it.
+        if preview:
+            if document["approximate"] and getattr(settings, "REPORT_JOB_WORKER", False):
+                try:
+                    job = report_jobs.create_job(
+                        request.user,
+                        active_database_alias,
+                        definition.report_id,
+                        time_range,
+                        {parameter.name: data.get(parameter.name) for parameter in definition.parameters},
+                    )
+                    document["job"] = report_jobs.job_to_dict(job)
+                except ValueError:
+                    pass
+
+            with timer.stage("serialize"):
+                response = JsonResponse(document)
+
+            record_report_run(
+                request.user, active_database_alias, definition.report_id, time_range,
+                values, len(document["data"]), timer,
             )
+            return response
+
+        extra = {"page": page_info} if page_info else None
+
+        with timer.stage("serialize"):
+            # Clients reading large results can ask for a columnar or binary encoding
+            if encoding != "json":
+                response = encoded_response(data, definition.columns, encoding, extra)
+            else:
+                response = JsonResponse(dict(extra or {}, data=data))
+
+        # Whole results are kept with the history entry, so the run can be replayed from it
+        if not page:
+            with timer.stage("snapshot"):
+                report_snapshots.save_snapshot(
+                    history_run, active_database_alias, definition, values, data
+                )
+
+        # Runs over the slow query threshold are logged in the background
+        record_report_run(
+            request.user, active_database_alias, definition.report_id, time_range,
+            values, len(data), timer,
+        )
 
         # Return JsonResponse with data
-        return JsonResponse({"data": data})
+        return response
 
     else:
         return JsonResponse({"error": "Invalid request method"}, status=400)
 
 
+@login_required
+@transaction.non_atomic_requests
+def load_multi_database_table_view(request):
+    """
+    View function to handle POST requests running one report against several databases.
+
+    Requires the user to be logged in to access the view.
+
+    Takes the same parameters as load_table_view plus "aliases", the configured database
+    aliases the report runs against. The report runs on every alias at the same time in
+    a bounded thread pool, and each alias has its own timeout so one slow server never
+    stalls the rest.
+
+    Without "stream" the results are merged into one table with a source_database
+    column. With "stream" set to "ndjson", one document per database is sent as soon as
+    that database finishes.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing POST data.
+
+    Returns:
+        JsonResponse: JSON response with the merged rows and the status of each database,
+        a streaming response, or an error message.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    data = json.loads(request.body.decode("utf-8"))
+    aliases = data.get("aliases")
+    stream_format = data.get("stream")
+
+    if not isinstance(aliases, list) or not aliases:
+        return JsonResponse({"error": "No databases selected"}, status=400)
+
+    aliases = list(dict.fromkeys(aliases))
+
+    if any(alias == "default" or alias not in settings.DATABASES for alias in aliases):
+        return JsonResponse({"error": "No connections with database name active"}, status=400)
+
+    if stream_format and stream_format != "ndjson":
+        return JsonResponse({"error": "Invalid stream format"}, status=400)
+
+    definition, values, error_response = bind_report_request(data)
+    if error_response:
+        return error_response
+
+    partition, error_response = get_report_partition(data, definition)
+    if error_response:
+        return error_response
+
+    encoding = negotiate_encoding(request.headers.get("Accept"))
+    if encoding is None:
+        return JsonResponse({"error": "Requested encoding unavailable"}, status=406)
+
+    for alias in aliases:
+        log_report_run(
+            request.user, alias, data.get("time_range"), data.get("start_date"), data.get("end_date"),
+            definition.report_id, report_snapshots.history_parameters(values),
+        )
+
+    request_id = get_request_id(data)
+    results = (
+        dict(result, data=merge_fanout_results([result]))
+        for result in iter_fanout_results(aliases, definition, values, partition=partition)
+    )
+
+    # Each database is sent as its own document as soon as it finishes
+    if stream_format:
+        return streaming_response(
+            report_inflight.iter_tracked(
+                ([result] for result in results), request_id, request.user.id, supersede=True
+            ),
+            stream_format,
+        )
+
+    try:
+        with report_inflight.track_report(request_id, request.user.id, supersede=True):
+            results = list(results)
+    except report_inflight.ReportCancelled:
+        return JsonResponse({"error": "Report cancelled"}, status=409)
+
+    rows = [row for result in results for row in result["data"]]
+    databases = [
+        {"database": result["database"], "status": result["status"], "error": result["error"]}
+        for result in results
+    ]
+
+    if encoding != "json":
+        return encoded_response(
+            rows, definition.columns + ["source_database"], encoding, {"databases": databases}
+        )
+
+    return JsonResponse({"data": rows, "databases": databases})
+
+
+@login_required
+@transaction.non_atomic_requests
+def load_batch_table_view(request):
+    """
+    View function to handle POST requests running several report parameter sets at once.
+
+    Requires the user to be logged in to access the view.
+
+    Takes "items", a list of report requests with the same keys as load_table_view
+    ("report_id", "time_range", "start_date", "end_date", ...), all run against the
+    active database. The sets are logged in the report history with one read and one
+    insert. Sets in the report cache are answered from it, and the others are grouped
+    into UNION ALL queries run on one connection (see report_batch). With "refresh",
+    the cache is bypassed and every set runs live, which the report history page uses
+    to re-run the selected entries.
+
+    Every item of the response has its own status, so an invalid or failing set does
+    not fail the others. Results are kept as the snapshot of their history entry.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing POST data.
+
+    Returns:
+        JsonResponse: JSON response with one result per item, in order, or an error message.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    data = json.loads(request.body.decode("utf-8"))
+    items = data.get("items")
+    active_database_alias = request.user.active_database_alias
+
+    if not active_database_alias or active_database_alias not in settings.DATABASES:
+        return JsonResponse({"error": "No connections with database name active"}, status=400)
+
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "No report parameter sets"}, status=400)
+
+    if len(items) > getattr(settings, "REPORT_BATCH_MAX_ITEMS", report_batch.DEFAULT_MAX_ITEMS):
+        return JsonResponse({"error": "Too many report parameter sets"}, status=400)
+
+    results = [None] * len(items)
+    bound = []
+
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            definition, values, error = bind_report_values(item)
+        else:
+            definition, values, error = None, None, "Invalid report parameters"
+
+        if error:
+            results[index] = {"status": "error", "error": error, "cached": False, "data": []}
+        else:
+            history_key = (
+                item.get("time_range") or "Custom",
+                values.get("start_date"),
+                values.get("end_date"),
+                definition.report_id,
+                tuple(sorted(report_snapshots.history_parameters(values).items())),
+            )
+            bound.append((index, definition, values, history_key))
+
+    timer = StageTimer()
+
+    with timer.stage("history"):
+        runs = log_report_runs(
+            request.user,
+            active_database_alias,
+            [history_key for _, _, _, history_key in bound],
+        )
+
+    try:
+        with timer.stage("query"), report_inflight.track_report(
+            get_request_id(data), request.user.id, supersede=True
+        ):
+            batch = rf.get_report_batch(
+                active_database_alias,
+                [(definition, values) for _, definition, values, _ in bound],
+                refresh=bool(data.get("refresh")),
+            )
+    except report_inflight.ReportCancelled:
+        return JsonResponse({"error": "Report cancelled"}, status=409)
+
+    snapshot_runs = set()
+
+    with timer.stage("snapshot"):
+        for (index, definition, values, history_key), result in zip(bound, batch):
+            results[index] = result
+            run = runs.get(history_key)
+
+            if result["status"] == "ok" and run is not None and run.pk not in snapshot_runs:
+                snapshot_runs.add(run.pk)
+                report_snapshots.save_snapshot(run, active_database_alias, definition, values, result["data"])
+
+    return JsonResponse(
+        {
+            "results": [
+                dict(
+                    result,
+                    index=index,
+                    report_id=(item.get("report_id") or "department_hours") if isinstance(item, dict) else None,
+                )
+                for index, (item, result) in enumerate(zip(items, results))
+            ]
+        }
+    )
+
+
+@login_required
+@transaction.non_atomic_requests
+def export_table_view(request):
+    """
+    View function to handle POST requests exporting a report to a file.
+
+    Requires the user to be logged in to access the view.
+
+    Takes the same parameters as load_table_view plus "format" ("csv", "xlsx" or
+    "parquet") and an optional "compress" flag for gzip compressed CSV. The file is
+    generated batch by batch from the report cursor and streamed as an attachment.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing POST data.
+
+    Returns:
+        StreamingHttpResponse: The export file, or a JSON error response.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    data = json.loads(request.body.decode("utf-8"))
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    time_range = data.get("time_range")
+    export_format = data.get("format", "csv")
+    compress = bool(data.get("compress")) and export_format == "csv"
+    active_database_alias = request.user.active_database_alias
+
+    if not active_database_alias or active_database_alias not in settings.DATABASES:
+        return JsonResponse({"error": "No connections with database name active"}, status=400)
+
+    if not report_export.export_available(export_format):
+        return JsonResponse({"error": "Export format unavailable"}, status=400)
+
+    definition, values, error_response = bind_report_request(data)
+    if error_response:
+        return error_response
+
+    log_report_run(
+        request.user, active_database_alias, time_range, start_date, end_date,
+        definition.report_id, report_snapshots.history_parameters(values),
+    )
+
+    batches = rf.iter_report_data(
+        active_database_alias,
+        definition,
+        values,
+        getattr(settings, "REPORT_STREAM_BATCH_SIZE", 500),
+    )
+
+    # The export keeps running when the user starts another report. A cancelled
+    # export raises, which aborts the download instead of ending the file early
+    batches = report_inflight.iter_tracked(batches, get_request_id(data), request.user.id, supersedable=False)
+
+    response = StreamingHttpResponse(
+        report_export.iter_export(batches, export_format, definition.columns, compress),
+        content_type="application/gzip" if compress else report_export.EXPORT_CONTENT_TYPES[export_format],
+    )
+
+    file_name = f"{definition.report_id}_{start_date or 'all'}_{end_date or 'all'}.{export_format}"
+    if compress:
+        file_name += ".gz"
+    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+
+    return response
+
+
+@login_required
+def report_job_status_view(request, job_id):
+    """
+    View function to return the status of an asynchronous report job.
+
+    Requires the user to be logged in to access the view. Users can only see their
+    own jobs.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        job_id (int): The id of the report job.
+
+    Returns:
+        JsonResponse: JSON response with the job status, and the report data once done.
+    """
+    job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+
+    return JsonResponse(report_jobs.job_to_dict(job))
+
+
+@login_required
+def cancel_report_job_view(request, job_id):
+    """
+    View function to handle POST requests cancelling an asynchronous report job.
+
+    Requires the user to be logged in to access the view. Users can only cancel their
+    own jobs.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        job_id (int): The id of the report job.
+
+    Returns:
+        JsonResponse: JSON response indicating whether the job was cancelled.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+
+    if not report_jobs.cancel_job(job):
+        return JsonResponse({"success": False, "error": "Job already finished"}, status=409)
+
+    return JsonResponse({"success": True})
+
+
+@login_required
+def cancel_report_view(request):
+    """
+    View function to handle POST requests cancelling a running report.
+
+    Requires the user to be logged in to access the view. Users can only cancel their
+    own reports.
+
+    The report is identified by the "request_id" the client sent with it. Its running
+    query is cancelled on the database server and the report request returns an error.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing POST data.
+
+    Returns:
+        JsonResponse: JSON response indicating whether the report was cancelled.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    data = json.loads(request.body.decode("utf-8"))
+
+    if not report_inflight.cancel_report(data.get("request_id"), request.user.id):
+        return JsonResponse({"success": False, "error": "No running report with this id"}, status=404)
+
+    return JsonResponse({"success": True})
+
+
+@login_required
+def report_statistics_view(request):
+    """
+    View function to return report cache and statement statistics.
+
+    Requires the user to be logged in and to be a staff member.
+
+    Returns the report cache, segment store, coalescing, warm-up, columnar and interval
+    index counters and the execution counts and timings of each report statement, which
+    shows whether prepared statements are being reused.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        JsonResponse: JSON response with cache and statement statistics, or an error if not staff.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff access required"}, status=403)
+
+    return JsonResponse(
+        {
+            "cache": report_cache.stats(),
+            "segments": segment_store.stats(),
+            "flights": report_flights.stats(),
+            "warmup": warmup_scheduler.stats(),
+            "columnar": columnar_engine.stats(),
+            "intervals": interval_indexes.stats(),
+            "statements": get_statement_stats(),
+        }
+    )
+
+
+def explain_report_response(request, alias, definition, values, mode, timer, request_id, time_range):
+    """
+    Helper function to run a report in explain mode and build its response.
+
+    The rows are serialized before the response is built, so the serialize stage
+    can be reported next to the others.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        alias (str): The database alias the report runs against.
+        definition (ReportDefinition): The requested report.
+        values (dict): Parameter values returned by bind_parameters.
+        mode (str): "estimated" or "actual".
+        timer (StageTimer): The timer holding the stages measured so far.
+        request_id (str): The id the report is tracked under.
+        time_range (str): The time range label of the report.
+
+    Returns:
+        HttpResponse: JSON response with the rows, the plan and the stage timings,
+        or an error message.
+    """
+    try:
+        with report_inflight.track_report(request_id, request.user.id, supersede=True):
+            rows, plan = rf.explain_report(alias, definition, values, mode, timer)
+    except report_inflight.ReportCancelled:
+        return JsonResponse({"error": "Report cancelled"}, status=409)
+    except report_inflight.ReportTimedOut:
+        return JsonResponse({"error": "Report timed out"}, status=504)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    with timer.stage("serialize"):
+        encoded_rows = json.dumps(rows, cls=DjangoJSONEncoder)
+
+    encoded_explain = json.dumps({"plan": plan, "timings": timer.as_dict()}, cls=DjangoJSONEncoder)
+
+    record_report_run(request.user, alias, definition.report_id, time_range, values, len(rows), timer)
+
+    return HttpResponse(
+        f'{{"data": {encoded_rows}, "explain": {encoded_explain}}}', content_type="application/json"
+    )
+
+
+def bind_report_request(data):
+    """
+    Helper function to find the requested report and bind its parameters.
+
+    The report is chosen with "report_id" and defaults to the department hours
+    report, so existing clients keep working unchanged.
+
+    Args:
+        data (dict): The decoded request body.
+
+    Returns:
+        tuple: The report definition, the bound parameter values and an error
+        response, which is None when the request is valid.
+    """
+    definition, values, error = bind_report_values(data)
+
+    if error:
+        return definition, values, JsonResponse({"error": error}, status=400)
+
+    return definition, values, None
+
+
+def bind_report_values(data):
+    """
+    Helper function to find a report and bind its parameters without building a response.
+
+    Args:
+        data (dict): The report request values.
+
+    Returns:
+        tuple: The report definition, the bound parameter values and an error
+        message, which is None when the values are valid.
+    """
+    definition = registry.get_report(data.get("report_id") or "department_hours")
+
+    if definition is None:
+        return None, None, "Unknown report"
+
+    try:
+        values = registry.bind_parameters(definition, data)
+    except ValueError as e:
+        return definition, None, str(e)
+
+    return definition, values, None
+
+
+def get_report_partition(data, definition):
+    """
+    Helper function to read the slice unit a report request is split by.
+
+    Args:
+        data (dict): The decoded request body.
+        definition (ReportDefinition): The requested report.
+
+    Returns:
+        tuple: The slice unit, or None for a single query, and an error response,
+        which is None when the request is valid.
+    """
+    partition = data.get("partition") or None
+
+    if partition is None:
+        return None, None
+
+    if partition not in PARTITION_UNITS:
+        return None, JsonResponse({"error": "Invalid partition"}, status=400)
+
+    if not definition.partitionable:
+        return None, JsonResponse({"error": "Report cannot be partitioned"}, status=400)
+
+    return partition, None
+
+
+def get_request_id(data):
+    """
+    Helper function to return the id a report request is tracked under.
+
+    Clients send a "request_id" so they can cancel the report later. Requests without
+    one get a new id, which still lets a newer report of the user cancel them.
+
+    Args:
+        data (dict): The decoded request body.
+
+    Returns:
+        str: The request id.
+    """
+    return str(data.get("request_id") or uuid.uuid4().hex)
+
+
+def log_report_run(user, alias, time_range, start_date, end_date, report_id="department_hours", parameters=None):
+    """
+    Helper function to log a report run in the user's report history.
+
+    A RanReportParameter row is only created the first time a user runs a report
+    type over a date range against a database with the same report and other
+    parameter values, so a comparison keeps its comparison range and can be run
+    again from the history. The entry keeps the connection identity of the alias,
+    which the warm-up matches against the configured aliases. Runs without both
+    dates are not logged, like in log_report_runs.
+
+    Args:
+        user (User): The user running the report.
+        alias (str): The database alias the report runs against.
+        time_range (str): The time range label of the report.
+        start_date (str): The starting date of the report.
+        end_date (str): The ending date of the report.
+        report_id (str): The id of the report in the report registry.
+        parameters (dict): The other parameter values, from history_parameters.
+
+    Returns:
+        RanReportParameter or None: The history entry of the run, or None if it has
+        no dates.
+    """
+    if start_date in (None, "") or end_date in (None, ""):
+        return None
+
+    parameters = parameters or {}
+    existing_report = report_snapshots.find_history_run(
+        user, alias, time_range, start_date, end_date, report_id, parameters
+    )
+
+    if existing_report is None:
+        existing_report = RanReportParameter.objects.create(
+            user=user,
+            report_type=time_range,
+            ran_on_date=datetime.now().date(),
+            start_date=start_date,
+            end_date=end_date,
+            database_name=alias.split("_")[0] if alias else "unrecognized name format",
+            connection_key=connection_identity(alias),
+            report_id=report_id,
+            parameters=parameters,
+        )
+
+    return existing_report
+
+
+def log_report_runs(user, alias, entries):
+    """
+    Helper function to log several report runs in the user's report history at once.
+
+    Like log_report_run, an entry is only created the first time a user runs a
+    report type over a date range against a database with the same report and
+    other parameter values, and runs without both dates are not logged. Existing
+    entries are read with one query and the missing ones are inserted together.
+
+    Args:
+        user (User): The user running the reports.
+        alias (str): The database alias the reports run against.
+        entries (list): Tuples of the time range label, the starting date, the
+            ending date, the report id and the other parameter values as sorted
+            (name, value) pairs of each run. Repeated runs are logged once.
+
+    Returns:
+        dict: Each entry tuple mapped to its history entry.
+    """
+    entries = {entry for entry in entries if entry[1] not in (None, "") and entry[2] not in (None, "")}
+
+    def existing_runs():
+        runs = {}
+
+        for run in RanReportParameter.objects.filter(
+            user=user,
+            connection_key=connection_identity(alias),
+            report_type__in={entry[0] for entry in entries},
+        ).order_by("pk"):
+            runs.setdefault(
+                (run.report_type, run.start_date, run.end_date, run.report_id, tuple(sorted(run.parameters.items()))),
+                run,
+            )
+
+        return runs
+
+    runs = existing_runs()
+    missing = [entry for entry in entries if entry not in runs]
+
+    if missing:
+        RanReportParameter.objects.bulk_create(
+            [
+                RanReportParameter(
+                    user=user,
+                    report_type=time_range,
+                    ran_on_date=datetime.now().date(),
+                    start_date=start_date,
+                    end_date=end_date,
+                    database_name=alias.split("_")[0] if alias else "unrecognized name format",
+                    connection_key=connection_identity(alias),
+                    report_id=report_id,
+                    parameters=dict(parameters),
+                )
+                for time_range, start_date, end_date, report_id, parameters in missing
+            ]
+        )
+        runs = existing_runs()
+
+    return {entry: runs[entry] for entry in entries if entry in runs}
+
+
+def get_snapshot_run_id(user, run_id):
+    """
+    Helper function to check that a report history entry can be replayed.
+
+    Args:
+        user (User): The user opening the entry.
+        run_id (int|str): The id of the RanReportParameter entry.
+
+    Returns:
+        int or None: The id of the entry if it belongs to the user and kept a snapshot
+        of its own result.
+    """
+    if run_id in (None, ""):
+        return None
+
+    snapshot = ReportSnapshot.objects.filter(run_id=int(run_id), run__user=user).select_related("run").first()
+
+    if snapshot is None or not report_snapshots.snapshot_matches_run(snapshot):
+        return None
+
+    return snapshot.run_id
+
+
 def format_date(date_str):
     """Convert a date string to the format YYYY-MM-DD."""
 
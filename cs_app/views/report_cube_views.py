@@ -0,0 +1,85 @@
+"""
+Django views for pivots of the department and shift cube.
+
+This module contains Django view functions that answer pivots from the cube cells
+precomputed in the default database, without querying the user's database. These
+views require users to be logged in, enforced by the @login_required decorator.
+
+Functions:
+- cube_pivot_view(request): Processes AJAX POST requests for a matrix of one measure
+  over two cube dimensions and returns it as JSON.
+
+Dependencies:
+- Django modules: JsonResponse
+- Python modules: json
+- Project modules: report_cube
+"""
+
+from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.http import JsonResponse
+
+import cs_app.utils.report_cube as report_cube
+import json
+
+
+@login_required
+def cube_pivot_view(request):
+    """
+    View function to handle AJAX POST requests for a pivot of the cube.
+
+    Requires the user to be logged in to access the view. The pivot covers the cube
+    of the user's active database. The request may give "rows" and "columns" (cube
+    dimensions, by default department_name by shift_name), "measure" (total_hours or
+    assignment_count), "start_month" and "end_month" as YYYY-MM, and "filters"
+    mapping dimensions to the values kept.
+
+    Months after the cube watermark are not loaded yet, so the response says up to
+    which month the matrix is complete.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing POST data.
+
+    Returns:
+        JsonResponse: JSON response with the pivot and the cube watermark, or an
+        error message.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    active_database_alias = request.user.active_database_alias
+
+    if not active_database_alias or active_database_alias not in settings.DATABASES:
+        return JsonResponse({"error": "No connections with database name active"}, status=400)
+
+    watermark = report_cube.get_cube_watermark(active_database_alias)
+
+    if watermark is None:
+        return JsonResponse({"error": "No cube for this database"}, status=404)
+
+    data = json.loads(request.body.decode("utf-8") or "{}")
+    filters = data.get("filters") or {}
+
+    if not isinstance(filters, dict) or not all(isinstance(values, list) for values in filters.values()):
+        return JsonResponse({"error": "Filters must map dimensions to lists of values"}, status=400)
+
+    try:
+        start_month = report_cube.month_start(data["start_month"]) if data.get("start_month") else None
+        end_month = report_cube.month_start(data["end_month"]) if data.get("end_month") else None
+
+        pivot = report_cube.pivot_cube(
+            active_database_alias,
+            rows=data.get("rows") or "department_name",
+            columns=data.get("columns") or "shift_name",
+            measure=data.get("measure") or "total_hours",
+            filters=filters,
+            start_month=start_month,
+            end_month=end_month,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    pivot["watermark"] = report_cube.format_label(watermark)
+    pivot["complete"] = end_month is not None and end_month <= watermark
+
+    return JsonResponse(pivot)
@@ -1,15 +1,55 @@
+"""
+Django views for the report history page and replaying past reports.
+
+This module contains Django view functions that list a user's past report runs and
+replay the snapshot a run kept of its result. These views require users to be
+logged in, enforced by the @login_required decorator.
+
+Functions:
+- report_history_view(request): Renders the 'report_history.html' template with the
+  user's past report runs.
+
+- report_snapshot_view(request, run_id): Returns the stored result of a past report run.
+
+- refresh_report_snapshot_view(request, run_id): Runs a past report again and replaces
+  its snapshot.
+
+Dependencies:
+- Django modules: render, get_object_or_404, JsonResponse, transaction
+- Python modules: json, uuid
+- Project modules: report_encoding, report_explain, report_functions, report_inflight,
+  report_registry, report_slowlog, report_snapshots
+- Models: RanReportParameter, ReportSnapshot from the application's models
+"""
+
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import render, get_object_or_404
+
+from ..models import RanReportParameter, ReportSnapshot
 
-from ..models import RanReportParameter
+from cs_app.utils.report_encoding import negotiate_encoding
+from cs_app.utils.report_explain import StageTimer
+from cs_app.utils.report_slowlog import record_report_run
 
+import cs_app.utils.report_functions as rf
+import cs_app.utils.report_inflight as report_inflight
+import cs_app.utils.report_registry as registry
+import cs_app.utils.report_snapshots as report_snapshots
 import json
+import uuid
 
 
 @login_required
 def report_history_view(request):
 
-    past_reports = RanReportParameter.objects.filter(user=request.user)[::-1]
+    past_reports = RanReportParameter.objects.filter(user=request.user).select_related("snapshot")[::-1]
+
+    # Re-running a run sends its other parameters, like a comparison range
+    for past_report in past_reports:
+        past_report.parameters_json = json.dumps(past_report.parameters)
 
     user = request.user
 
@@ -27,3 +67,126 @@ def report_history_view(request):
     context = {"user": user, "past_reports": past_reports, "menu_status": menu_status}
 
     return render(request, "subpages/report_history.html", context)
+
+
+@login_required
+def report_snapshot_view(request, run_id):
+    """
+    View function to return the stored result of a past report run.
+
+    Requires the user to be logged in to access the view. Users can only replay their
+    own runs.
+
+    The Accept header selects the encoding like for load_table_view. A client asking
+    for the encoding the snapshot is stored in gets the stored file unchanged. A
+    snapshot of another database, report or parameter values than the run's is
+    refused.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        run_id (int): The id of the RanReportParameter entry.
+
+    Returns:
+        HttpResponse: The snapshot rows with a "snapshot" member describing them, or
+        an error message if the run kept no snapshot.
+    """
+    run = get_object_or_404(RanReportParameter, pk=run_id, user=request.user)
+    snapshot = ReportSnapshot.objects.filter(run=run).first()
+
+    if snapshot is None:
+        return JsonResponse({"error": "No snapshot for this report"}, status=404)
+
+    if not report_snapshots.snapshot_matches_run(snapshot):
+        return JsonResponse({"error": "Snapshot does not match this report"}, status=409)
+
+    encoding = negotiate_encoding(request.headers.get("Accept"))
+    if encoding is None:
+        return JsonResponse({"error": "Requested encoding unavailable"}, status=406)
+
+    try:
+        return report_snapshots.snapshot_response(
+            snapshot, encoding, request.headers.get("Accept-Encoding")
+        )
+    except FileNotFoundError:
+        return JsonResponse({"error": "Snapshot file missing"}, status=404)
+
+
+@login_required
+@transaction.non_atomic_requests
+def refresh_report_snapshot_view(request, run_id):
+    """
+    View function to handle POST requests running a past report again.
+
+    Requires the user to be logged in to access the view. Users can only refresh their
+    own runs.
+
+    The report runs live against the database, report and parameters of the run's
+    snapshot, bypassing the report cache. Runs without a matching snapshot use the
+    report and parameters logged with the run against the active database, which
+    must be the database of the run. The new rows replace the snapshot and the
+    cached result. Like load_table_view, the report is tracked under the optional
+    "request_id" of the request so it can be cancelled.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing POST data.
+        run_id (int): The id of the RanReportParameter entry.
+
+    Returns:
+        JsonResponse: JSON response with the fresh rows and the new snapshot, or an
+        error message.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    run = get_object_or_404(RanReportParameter, pk=run_id, user=request.user)
+    snapshot = ReportSnapshot.objects.filter(run=run).first()
+    data = json.loads(request.body.decode("utf-8") or "{}")
+
+    if snapshot is not None and report_snapshots.snapshot_matches_run(snapshot):
+        alias = snapshot.database_alias
+        report_id = snapshot.report_id
+        parameters = snapshot.parameters
+    else:
+        alias = request.user.active_database_alias
+        report_id = run.report_id
+        parameters = dict(run.parameters, start_date=run.start_date, end_date=run.end_date)
+
+    if not alias or alias == "default" or alias not in settings.DATABASES:
+        return JsonResponse({"error": "No connections with database name active"}, status=400)
+
+    definition = registry.get_report(report_id)
+
+    if definition is None:
+        return JsonResponse({"error": "Unknown report"}, status=400)
+
+    try:
+        values = registry.bind_parameters(definition, parameters)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if not report_snapshots.run_matches(run, alias, definition.report_id, values):
+        return JsonResponse({"error": "The active database is not the database of this report"}, status=409)
+
+    timer = StageTimer()
+
+    try:
+        with timer.stage("query"), report_inflight.track_report(
+            str(data.get("request_id") or uuid.uuid4().hex), request.user.id, supersede=True
+        ):
+            rows = rf.refresh_report_data(alias, definition, values)
+    except report_inflight.ReportCancelled:
+        return JsonResponse({"error": "Report cancelled"}, status=409)
+    except report_inflight.ReportTimedOut:
+        return JsonResponse({"error": "Report timed out"}, status=504)
+
+    with timer.stage("snapshot"):
+        snapshot = report_snapshots.save_snapshot(run, alias, definition, values, rows)
+
+    record_report_run(request.user, alias, definition.report_id, run.report_type, values, len(rows), timer)
+
+    return JsonResponse(
+        {
+            "data": rows,
+            "snapshot": report_snapshots.snapshot_to_dict(snapshot) if snapshot else None,
+        }
+    )